@@ -7,11 +7,19 @@ import cython
 import numpy as np
 cimport numpy as cnp
 
-from chemreac cimport ReactionDiffusion
-from cvodes_cxx cimport lmm_from_name, iter_type_from_name, linear_solver_from_name
-from cvodes_anyode cimport simple_predefined, simple_adaptive
+from chemreac cimport ReactionDiffusion, SolverState, Workspace, get_simd_isa as _get_simd_isa
+from cvodes_cxx cimport LMM, IterType, LinSol, lmm_from_name, iter_type_from_name, linear_solver_from_name
+from chemreac_cvodes_nogil cimport simple_predefined, simple_adaptive
+from chemreac_ensemble cimport ensemble_predefined
+from chemreac_batch cimport BatchRosenbrock
+from chemreac_split cimport SplitIntegrator
+from chemreac_imex cimport ImexARK
+from chemreac_rkc cimport RKC
+from chemreac_rosenbrock cimport Rosenbrock
+from chemreac_expm cimport LinearPropagator
 
 from libcpp cimport bool
+from libcpp.string cimport string
 from libcpp.vector cimport vector
 from libcpp.utility cimport pair
 
@@ -40,11 +48,32 @@ cdef fromaddress(address, shape, dtype=np.float64, strides=None, ro=True):
     ))
 
 
+cdef class PyWorkspace:
+    """
+    Scratch space for evaluations of ``f`` and ``*_jac_*``, see
+    :meth:`PyReactionDiffusion.make_workspace`.
+    """
+    cdef Workspace[double] *thisptr
+    cdef readonly object rd
+
+    def __dealloc__(self):
+        del self.thisptr
+
+
 cdef class PyReactionDiffusion:
     """
     Wrapper around C++ class ReactionDiffusion,
+
+    The GIL is released during native evaluations (``f``, ``*_jac_*``) and
+    integrations (``cvode_*``). The ``cvode_*`` drivers keep the work
+    buffers, cached preconditioner and counters of an integration in a
+    solver state of their own, so one instance may be integrated by several
+    threads at a time (as long as its attributes are not modified meanwhile).
+    ``f`` and ``*_jac_*`` may be called concurrently on one shared instance
+    when every thread passes its own ``workspace`` (see :meth:`make_workspace`).
     """
     cdef ReactionDiffusion[double] *thisptr
+    cdef tuple _last_info  # statistics of the last cvode_* integration, see _solver_info
     cdef public vector[double] k_err, D_err
     cdef public list names, tex_names
 
@@ -92,49 +121,127 @@ cdef class PyReactionDiffusion:
             lrefl, rrefl, auto_efield, surf_chg, eps_rel, faraday_const,
             vacuum_permittivity, g_values, g_value_parents, fields,
             modulated_rxns, modulation, ilu_limit, n_jac_diags, use_log2, clip_to_pos)
+        self._last_info = ({}, {}, {}, {})
 
     def __dealloc__(self):
         del self.thisptr
 
+    def make_workspace(self):
+        """ Returns scratch space which makes ``f`` & ``*_jac_*`` reentrant
+
+        Pass one workspace per thread (as ``workspace``) to evaluate one
+        instance concurrently from several threads.
+        """
+        cdef PyWorkspace ws = PyWorkspace.__new__(PyWorkspace)
+        ws.thisptr = self.thisptr.make_workspace().release()
+        ws.rd = self
+        return ws
+
+    cdef Workspace[double] * _workspace_ptr(self, PyWorkspace workspace) except? NULL:
+        if workspace is None:
+            return NULL
+        if workspace.rd is not self:
+            raise ValueError("workspace was not created by this instance")
+        return workspace.thisptr
+
     def f(self, double t, cnp.ndarray[cnp.float64_t, ndim=1] y,
-          cnp.ndarray[cnp.float64_t, ndim=1] fout):
+          cnp.ndarray[cnp.float64_t, ndim=1] fout, PyWorkspace workspace=None):
+        cdef double * yp = &y[0]
+        cdef double * fp = &fout[0]
+        cdef Workspace[double] * ws = self._workspace_ptr(workspace)
         assert y.size == fout.size
         assert y.size >= self.n
-        self.thisptr.rhs(t, &y[0], &fout[0])
+        with nogil:
+            if ws == NULL:
+                self.thisptr.rhs(t, yp, fp)
+            else:
+                self.thisptr.rhs(t, yp, fp, ws[0])
 
     def dense_jac_rmaj(self, double t, cnp.ndarray[cnp.float64_t, ndim=1] y,
-                       cnp.ndarray[cnp.float64_t, ndim=2, mode="c"] Jout):
+                       cnp.ndarray[cnp.float64_t, ndim=2, mode="c"] Jout,
+                       PyWorkspace workspace=None):
         assert y.size >= self.n*self.N
         assert Jout.shape[0] >= self.n*self.N
         assert Jout.shape[1] >= self.n*self.N
-        self.thisptr.dense_jac_rmaj(
-            t, &y[0], NULL, &Jout[0, 0], Jout.shape[1])
+        cdef double * yp = &y[0]
+        cdef double * Jp = &Jout[0, 0]
+        cdef long ldj = Jout.shape[1]
+        cdef Workspace[double] * ws = self._workspace_ptr(workspace)
+        with nogil:
+            if ws == NULL:
+                self.thisptr.dense_jac_rmaj(t, yp, NULL, Jp, ldj)
+            else:
+                self.thisptr.dense_jac_rmaj(t, yp, NULL, Jp, ldj, ws[0])
 
     def dense_jac_cmaj(self, double t, cnp.ndarray[cnp.float64_t, ndim=1] y,
-                       cnp.ndarray[cnp.float64_t, ndim=2, mode="fortran"] Jout):
+                       cnp.ndarray[cnp.float64_t, ndim=2, mode="fortran"] Jout,
+                       PyWorkspace workspace=None):
         assert y.size >= self.n*self.N
         assert Jout.shape[0] >= self.n*self.N
         assert Jout.shape[1] >= self.n*self.N
-        self.thisptr.dense_jac_cmaj(
-            t, &y[0], NULL, &Jout[0, 0], Jout.shape[0])
+        cdef double * yp = &y[0]
+        cdef double * Jp = &Jout[0, 0]
+        cdef long ldj = Jout.shape[0]
+        cdef Workspace[double] * ws = self._workspace_ptr(workspace)
+        with nogil:
+            if ws == NULL:
+                self.thisptr.dense_jac_cmaj(t, yp, NULL, Jp, ldj)
+            else:
+                self.thisptr.dense_jac_cmaj(t, yp, NULL, Jp, ldj, ws[0])
 
     def banded_jac_cmaj(self, double t, cnp.ndarray[cnp.float64_t, ndim=1] y,
-                       cnp.ndarray[cnp.float64_t, ndim=2, mode="fortran"] Jout):
+                       cnp.ndarray[cnp.float64_t, ndim=2, mode="fortran"] Jout,
+                       PyWorkspace workspace=None):
         cdef int offset = self.n*self.n_jac_diags
         assert y.size >= self.n*self.N
         assert Jout.shape[0] >= 3*self.n*self.n_jac_diags+1
         assert Jout.shape[1] >= self.n*self.N
-        self.thisptr.banded_jac_cmaj(
-            t, &y[0], NULL, <double *>Jout.data + offset, Jout.shape[0])
+        cdef double * yp = &y[0]
+        cdef double * Jp = <double *>Jout.data + offset
+        cdef long ldj = Jout.shape[0]
+        cdef Workspace[double] * ws = self._workspace_ptr(workspace)
+        with nogil:
+            if ws == NULL:
+                self.thisptr.banded_jac_cmaj(t, yp, NULL, Jp, ldj)
+            else:
+                self.thisptr.banded_jac_cmaj(t, yp, NULL, Jp, ldj, ws[0])
 
     def compressed_jac_cmaj(self, double t, cnp.ndarray[cnp.float64_t, ndim=1] y,
-                            cnp.ndarray[cnp.float64_t, ndim=1] Jout):
+                            cnp.ndarray[cnp.float64_t, ndim=1] Jout,
+                            PyWorkspace workspace=None):
         from block_diag_ilu import diag_data_len
         assert y.size >= self.n*self.N
         assert Jout.size >= self.n*self.n*self.N + 2*diag_data_len(
             self.N, self.n, self.n_jac_diags)
-        self.thisptr.compressed_jac_cmaj(
-            t, &y[0], NULL, <double *>Jout.data, self.n)
+        cdef double * yp = &y[0]
+        cdef double * Jp = <double *>Jout.data
+        cdef long ldj = self.n
+        cdef Workspace[double] * ws = self._workspace_ptr(workspace)
+        with nogil:
+            if ws == NULL:
+                self.thisptr.compressed_jac_cmaj(t, yp, NULL, Jp, ldj)
+            else:
+                self.thisptr.compressed_jac_cmaj(t, yp, NULL, Jp, ldj, ws[0])
+
+    def sparse_jac_csc(self, double t, cnp.ndarray[cnp.float64_t, ndim=1] y,
+                       cnp.ndarray[cnp.float64_t, ndim=1] data,
+                       cnp.ndarray[cnp.int32_t, ndim=1] colptrs,
+                       cnp.ndarray[cnp.int32_t, ndim=1] rowvals,
+                       PyWorkspace workspace=None):
+        assert y.size >= self.n*self.N
+        assert data.size >= self.nnz
+        assert rowvals.size >= self.nnz
+        assert colptrs.size >= self.n*self.N + 1
+        cdef double * yp = &y[0]
+        cdef double * dp = <double *>data.data
+        cdef int * cp = <int *>colptrs.data
+        cdef int * rp = <int *>rowvals.data
+        cdef Workspace[double] * ws = self._workspace_ptr(workspace)
+        with nogil:
+            if ws == NULL:
+                self.thisptr.sparse_jac_csc(t, yp, NULL, dp, cp, rp)
+            else:
+                self.thisptr.sparse_jac_csc(t, yp, NULL, dp, cp, rp, ws[0])
 
     def calc_efield(self, cnp.ndarray[cnp.float64_t, ndim=1] linC):
         self.thisptr.calc_efield(&linC[0])
@@ -179,6 +286,66 @@ cdef class PyReactionDiffusion:
         def __get__(self):
             return 'fcs'[self.thisptr.get_geom_as_int()]
 
+    property nnz:
+        def __get__(self):
+            return self.thisptr.get_nnz()
+
+    property linear:
+        """ True when rhs is affine in y (see ``integrate_expm``). """
+        def __get__(self):
+            return self.thisptr.is_linear()
+
+    property sparse_order:
+        """ Fill-reducing species order used by the 'sparse_lu' preconditioner. """
+        def __get__(self):
+            return np.asarray(self.thisptr.get_sparse_order(), dtype=np.int32)
+
+    property prec_factorization:
+        def __get__(self):
+            return _prec_factorizations[self.thisptr.get_prec_factorization_as_int()]
+        def __set__(self, basestring kind):
+            self.thisptr.set_prec_factorization_from_int(_prec_factorizations.index(kind))
+
+    property jtimes_mode:
+        """ Jacobian-vector products (``with_jtimes=True``): 'analytic' (matrix-free)
+        or 'finite_difference' (directional difference of ``f`` reusing f(t, y)). """
+        def __get__(self):
+            return _jtimes_modes[self.thisptr.get_jtimes_mode_as_int()]
+        def __set__(self, basestring kind):
+            self.thisptr.set_jtimes_mode_from_int(_jtimes_modes.index(kind))
+
+    property nthreads:
+        """ Number of threads used in f & *_jac_* (OpenMP builds), 0: default. """
+        def __get__(self):
+            return self.thisptr.get_nthreads()
+        def __set__(self, int nthreads):
+            self.thisptr.set_nthreads(nthreads)
+
+    property par_threshold_rhs:
+        """ f is evaluated in parallel when n*N exceeds this value. """
+        def __get__(self):
+            return self.thisptr.par_threshold_rhs
+        def __set__(self, long value):
+            self.thisptr.par_threshold_rhs = value
+
+    property par_threshold_jac:
+        """ The *_jac_* methods run in parallel when n*n*N exceeds this value. """
+        def __get__(self):
+            return self.thisptr.par_threshold_jac
+        def __set__(self, long value):
+            self.thisptr.par_threshold_jac = value
+
+    def calibrate_parallel(self, int nrep=5):
+        """ Sets ``par_threshold_rhs`` & ``par_threshold_jac`` from timings
+
+        Serial and threaded evaluations of this instance are timed (best of
+        ``nrep``) and the problem size above which threading pays off is
+        estimated from a linear cost model. Returns the new thresholds.
+        """
+        self.thisptr.calibrate_parallel(nrep)
+        return {'par_threshold_rhs': self.par_threshold_rhs,
+                'par_threshold_jac': self.par_threshold_jac}
+
     property stoich_active:
         def __get__(self):
             return self.thisptr.stoich_active
@@ -197,6 +364,7 @@ cdef class PyReactionDiffusion:
         def __set__(self, vector[double] k):
             assert len(k) == self.nr
             self.thisptr.k = k
+            self.thisptr.update_k_eff()
 
     property D:
         def __get__(self):
@@ -206,6 +374,8 @@ cdef class PyReactionDiffusion:
             cdef size_t i
             assert len(D) == self.n
             self.thisptr.D = D
+            self.thisptr.update_transport_jac()
+            self.thisptr.invalidate_state_cache()
 
     property z_chg:
         def __get__(self):
@@ -214,6 +384,7 @@ cdef class PyReactionDiffusion:
         def __set__(self, vector[int] z_chg):
             assert len(z_chg) == self.n
             self.thisptr.z_chg = z_chg
+            self.thisptr.invalidate_state_cache()
 
     property mobility:
         def __get__(self):
@@ -223,6 +394,8 @@ cdef class PyReactionDiffusion:
             cdef size_t i
             assert len(mobility) == self.n
             self.thisptr.mobility = mobility
+            self.thisptr.update_transport_jac()
+            self.thisptr.invalidate_state_cache()
 
     property x:
         def __get__(self):
@@ -281,12 +454,16 @@ cdef class PyReactionDiffusion:
             return self.thisptr.g_values
         def __set__(self, vector[vector[double]] g_values):
             self.thisptr.g_values = g_values
+            self.thisptr.update_sparse_pattern()
+            self.thisptr.invalidate_state_cache()
 
     property g_value_parents:
         def __get__(self):
             return self.thisptr.g_value_parents
         def __set__(self, vector[int] g_value_parents):
             self.thisptr.g_value_parents = g_value_parents
+            self.thisptr.update_sparse_pattern()
+            self.thisptr.invalidate_state_cache()
 
     property fields:
         def __get__(self):
@@ -294,18 +471,25 @@ cdef class PyReactionDiffusion:
         def __set__(self, vector[vector[double]] fields):
             assert len(fields) == len(self.g_values)
             self.thisptr.fields = fields
+            self.thisptr.invalidate_state_cache()
 
     property modulated_rxns:
         def __get__(self):
             return self.thisptr.modulated_rxns
         def __set__(self, vector[int] modulated_rxns):
             self.thisptr.modulated_rxns = modulated_rxns
+            if modulated_rxns.size() == self.thisptr.modulation.size():
+                self.thisptr.update_k_eff()  # else: modulation is expected next
+            self.thisptr.invalidate_state_cache()
 
     property modulation:
         def __get__(self):
             return self.thisptr.modulation
         def __set__(self, vector[vector[double]] modulation):
             self.thisptr.modulation = modulation
+            if modulation.size() == self.thisptr.modulated_rxns.size():
+                self.thisptr.update_k_eff()  # else: modulated_rxns is expected next
+            self.thisptr.invalidate_state_cache()
 
     property ilu_limit:
         def __get__(self):
@@ -339,65 +523,75 @@ cdef class PyReactionDiffusion:
 
     property nfev:
         def __get__(self):
-            return self.thisptr.nfev
+            return self.thisptr.get_nfev()
 
     property njev:
         def __get__(self):
-            return self.thisptr.njev
+            return self.thisptr.get_njev()
 
     property nprec_setup:
         def __get__(self):
-            return self.thisptr.nprec_setup
+            return self._last_info[0].get('nprec_setup', 0)
 
     property nprec_solve:
         def __get__(self):
-            return self.thisptr.nprec_solve
-
+            return self._last_info[0].get('nprec_solve', 0)
 
     property njacvec_dot:
         def __get__(self):
-            return self.thisptr.njacvec_dot
+            return self._last_info[0].get('njacvec_dot', 0)
 
     property nprec_solve_ilu:
         def __get__(self):
-            return self.thisptr.nprec_solve_ilu
+            return self._last_info[0].get('nprec_solve_ilu', 0)
 
     property nprec_solve_lu:
         def __get__(self):
-            return self.thisptr.nprec_solve_lu
+            return self._last_info[0].get('nprec_solve_lu', 0)
+
+    property nprec_factor_ilu:
+        def __get__(self):
+            return self._last_info[0].get('nprec_factor_ilu', 0)
+
+    property nprec_factor_lu:
+        def __get__(self):
+            return self._last_info[0].get('nprec_factor_lu', 0)
+
+    property nprec_reuse_lu:
+        def __get__(self):
+            return self._last_info[0].get('nprec_reuse_lu', 0)
+
+    property nstate_reuse:
+        def __get__(self):
+            return self.thisptr.get_nstate_reuse()
 
     property last_integration_info:
         def __get__(self):
-            return {str(k.decode('utf-8')): v for k, v
-                    in dict(self.thisptr.current_info.nfo_int).items()}
+            return dict(self._last_info[0])
 
     property last_integration_info_dbl:
         def __get__(self):
-            return {str(k.decode('utf-8')): v for k, v
-                    in dict(self.thisptr.current_info.nfo_dbl).items()}
+            return dict(self._last_info[1])
 
     property last_integration_info_vecdbl:
         def __get__(self):
-            return {str(k.decode('utf-8')): np.array(v, dtype=np.float64) for k, v
-                    in dict(self.thisptr.current_info.nfo_vecdbl).items()}
+            return dict(self._last_info[2])
 
     property last_integration_info_vecint:
         def __get__(self):
-            return {str(k.decode('utf-8')): np.array(v, dtype=np.int) for k, v
-                    in dict(self.thisptr.current_info.nfo_vecint).items()}
+            return dict(self._last_info[3])
 
     def get_last_info(self, *, success):
         info = self.last_integration_info
         # info.update(self.last_integration_info_dbl)
         # info.update(self.last_integration_info_vecdbl)
         # info.update(self.last_integration_info_vecint)
-        info['nfev'] = self.nfev
-        info['njev'] = self.njev
         info['success'] = success
         return info
 
     def zero_counters(self):
         self.thisptr.zero_counters()
+        self._last_info = ({}, {}, {}, {})
 
     # Extra convenience
     def per_rxn_contrib_to_fi(self, double t, cnp.ndarray[cnp.float64_t, ndim=1] y,
@@ -450,22 +644,79 @@ cdef class PyReactionDiffusion:
 
     property efield:
         def __get__(self):
-            return fromaddress(<long>&self.thisptr.efield[0], (self.thisptr.N,))
+            # a copy: in-place edits would bypass update_transport_jac()
+            return fromaddress(<long>&self.thisptr.efield[0], (self.thisptr.N,)).copy()
         def __set__(self, double[:] efield):
             cdef int i
             assert efield.size == self.thisptr.N
             for i in range(self.thisptr.N):
                 self.thisptr.efield[i] = efield[i]
+            self.thisptr.update_transport_jac()
+            self.thisptr.invalidate_state_cache()
 
 # sundials wrapper:
 
+_prec_factorizations = ('auto', 'block_tridiag', 'block_cyclic_reduction', 'sparse_lu',
+                        'operator_split', 'multigrid')
+_jtimes_modes = ('analytic', 'finite_difference')
+
+
+_iterative_linear_solvers = ('gmres', 'gmres_classic', 'bicgstab', 'tfqmr')
+
+
+def _prep_linear_solver(PyReactionDiffusion rd, basestring linear_solver, basestring iter_type,
+                        preconditioner=None):
+    # Returns (linear_solver, iter_type, prec_factorization), ``rd`` is not modified
+    # (``preconditioner=None`` keeps ``rd.prec_factorization``).
+    # The block-tridiagonal and sparse LU solvers act as an exact
+    # preconditioner for GMRES (which then converges in a single iteration).
+    if linear_solver in _prec_factorizations[1:]:
+        return 'gmres', 'newton', linear_solver
+    if preconditioner is None:
+        return linear_solver, iter_type, rd.prec_factorization
+    if preconditioner not in _prec_factorizations:
+        raise ValueError("Unknown preconditioner: %s" % preconditioner)
+    if preconditioner != 'auto' and linear_solver not in _iterative_linear_solvers:
+        return 'gmres', 'newton', preconditioner
+    return linear_solver, iter_type, preconditioner
+
+
+cdef tuple _solver_info(SolverState[double] * state):
+    # CVODE's statistics (nfo_int with the counters of ``state``, nfo_dbl,
+    # nfo_vecdbl, nfo_vecint) of an integration, see last_integration_info
+    nfo_int = {str(k.decode('utf-8')): v for k, v in dict(state.current_info.nfo_int).items()}
+    nfo_int.update(
+        nfev=state.nfev, njev=state.njev, nprec_setup=state.nprec_setup,
+        nprec_solve=state.nprec_solve, njacvec_dot=state.njacvec_dot,
+        nprec_solve_ilu=state.nprec_solve_ilu, nprec_solve_lu=state.nprec_solve_lu,
+        nprec_factor_ilu=state.nprec_factor_ilu, nprec_factor_lu=state.nprec_factor_lu,
+        nprec_reuse_lu=state.nprec_reuse_lu)
+    return (
+        nfo_int,
+        {str(k.decode('utf-8')): v for k, v in dict(state.current_info.nfo_dbl).items()},
+        {str(k.decode('utf-8')): np.array(v, dtype=np.float64) for k, v
+         in dict(state.current_info.nfo_vecdbl).items()},
+        {str(k.decode('utf-8')): np.array(v, dtype=np.int) for k, v
+         in dict(state.current_info.nfo_vecint).items()},
+    )
+
+
+def get_simd_isa():
+    """ Instruction set used by the runtime dispatched kernels on this host
+
+    One of ``'avx512f'``, ``'avx2'``, ``'sse2'`` or ``'generic'``.
+    """
+    return str(_get_simd_isa().decode('utf-8'))
+
+
 def cvode_predefined(
         PyReactionDiffusion rd, cnp.ndarray[cnp.float64_t, ndim=1] y0,
         cnp.ndarray[cnp.float64_t, ndim=1] tout,
         vector[double] atol, double rtol, basestring method, bool with_jacobian=True,
         basestring iter_type='undecided', str linear_solver="default", int maxl=5, double eps_lin=0.05,
         double first_step=0.0, double dx_min=0.0, double dx_max=0.0, int nsteps=500, int autorestart=0,
-        bool return_on_error=False, bool with_jtimes=False, bool ew_ele=False):
+        bool return_on_error=False, bool with_jtimes=False, bool ew_ele=False,
+        preconditioner=None):
     cdef:
         int ny = rd.n*rd.N
         cnp.ndarray[cnp.float64_t, ndim=1] yout = np.empty(tout.size*ny)
@@ -473,14 +724,33 @@ def cvode_predefined(
         vector[int] root_indices
         vector[double] roots_output
         int nderiv = 0
+        int nreached
+        size_t nt = tout.size
+        double * y0p = &y0[0]
+        double * toutp = &tout[0]
+        double * youtp = &yout[0]
+        double * ew_ele_out = <double *>ew_ele_arr.data if ew_ele else NULL
+        LMM lmm
+        IterType iter_type_
+        LinSol linsol
+        SolverState[double] * state
     assert y0.size == rd.n*rd.N
     assert atol.size() in (1, rd.n*rd.N)
-    nreached = simple_predefined[ReactionDiffusion[double]](
-        rd.thisptr, atol, rtol, lmm_from_name(method.lower().encode('utf-8')),
-        &y0[0], tout.size, &tout[0], &yout[0], root_indices, roots_output, nsteps, first_step, dx_min,
-        dx_max, with_jacobian, iter_type_from_name(iter_type.lower().encode('UTF-8')),
-        linear_solver_from_name(linear_solver.encode('UTF-8')),
-        maxl, eps_lin, nderiv, autorestart, return_on_error, with_jtimes, <double *>ew_ele_arr.data if ew_ele else NULL)
+    linear_solver, iter_type, prec_factorization = _prep_linear_solver(
+        rd, linear_solver, iter_type, preconditioner)
+    lmm = lmm_from_name(method.lower().encode('utf-8'))
+    iter_type_ = iter_type_from_name(iter_type.lower().encode('UTF-8'))
+    linsol = linear_solver_from_name(linear_solver.encode('UTF-8'))
+    state = new SolverState[double](rd.thisptr[0], _prec_factorizations.index(prec_factorization))
+    try:
+        with nogil:
+            nreached = simple_predefined[SolverState[double]](
+                state, atol, rtol, lmm, y0p, nt, toutp, youtp, root_indices, roots_output,
+                nsteps, first_step, dx_min, dx_max, with_jacobian, iter_type_, linsol,
+                maxl, eps_lin, nderiv, autorestart, return_on_error, with_jtimes, ew_ele_out)
+        rd._last_info = _solver_info(state)
+    finally:
+        del state
     info = rd.get_last_info(success=False if return_on_error and nreached < tout.size else True)
     info['nreached'] = nreached
     if ew_ele:
@@ -498,7 +768,8 @@ def cvode_predefined_durations_fields(
         bool with_jacobian=True,
         basestring iter_type='undecided', str linear_solver='default', int maxl=5, double eps_lin=0.05,
         double first_step=0.0, double dx_min=0.0, double dx_max=0.0, int nsteps=500, int autorestart=0,
-        bool return_on_error=False, bool with_jtimes=False, ew_ele=False):
+        bool return_on_error=False, bool with_jtimes=False, ew_ele=False,
+        preconditioner=None):
     cdef:
         cnp.ndarray[cnp.float64_t, ndim=1, mode='c'] tout = np.empty(durations.size*npoints + 1)
         cnp.ndarray[cnp.float64_t, ndim=1, mode='c'] yout = np.empty(tout.size*rd.n*rd.N)
@@ -508,12 +779,23 @@ def cvode_predefined_durations_fields(
         vector[int] root_indices
         vector[double] roots_output
         int nderiv = 0
-        int i, offset, j
+        int i, offset, j, nreached
+        double * youtp
+        double * tbufp = &tbuf[0]
+        LMM lmm
+        IterType iter_type_
+        LinSol linsol
+        SolverState[double] * state
     assert npoints > 0
     assert durations.size == fields.size
     assert y0.size == rd.n*rd.N
     assert atol.size() in (1, rd.n*rd.N)
     assert len(rd.g_values) == 1, 'only field type assumed for now'
+    linear_solver, iter_type, prec_factorization = _prep_linear_solver(
+        rd, linear_solver, iter_type, preconditioner)
+    lmm = lmm_from_name(method.lower().encode('utf-8'))
+    iter_type_ = iter_type_from_name(iter_type.lower().encode('UTF-8'))
+    linsol = linear_solver_from_name(linear_solver.encode('UTF-8'))
     for i in range(rd.n*rd.N):
         yout[i] = y0[i]
     if ew_ele:
@@ -525,24 +807,29 @@ def cvode_predefined_durations_fields(
         tout[i::npoints] = tout[:-1:npoints] + i*durations/npoints
     assert np.all(np.diff(tout) > 0)
     rd.zero_counters()
-    for i in range(durations.size):
-        offset = i*npoints*rd.n*rd.N
-        rd.fields = [[fields[i]]]
-        for j in range(1, npoints+1):
-            tbuf[j] = j*durations[i]/npoints
-        if ew_ele:
-            ew_ele_out = <double *>ew_ele_arr.data + offset
-
-        nreached = simple_predefined[ReactionDiffusion[double]](
-            rd.thisptr, atol, rtol, lmm_from_name(method.lower().encode('utf-8')),
-            &yout[offset], npoints+1, &tbuf[0], &yout[offset],
-            root_indices, roots_output, nsteps, first_step, dx_min,
-            dx_max, with_jacobian, iter_type_from_name(iter_type.lower().encode('UTF-8')),
-            linear_solver_from_name(linear_solver.encode('UTF-8')), maxl, eps_lin, nderiv,
-            autorestart, return_on_error, with_jtimes, ew_ele_out)
-
-        if nreached != npoints+1:
-            raise ValueError("Did not reach all points for index %d" % i)
+    state = new SolverState[double](rd.thisptr[0], _prec_factorizations.index(prec_factorization))
+    try:
+        for i in range(durations.size):
+            offset = i*npoints*rd.n*rd.N
+            rd.fields = [[fields[i]]]
+            for j in range(1, npoints+1):
+                tbuf[j] = j*durations[i]/npoints
+            if ew_ele:
+                ew_ele_out = <double *>ew_ele_arr.data + offset
+
+            youtp = &yout[offset]
+            with nogil:
+                nreached = simple_predefined[SolverState[double]](
+                    state, atol, rtol, lmm, youtp, npoints+1, tbufp, youtp,
+                    root_indices, roots_output, nsteps, first_step, dx_min,
+                    dx_max, with_jacobian, iter_type_, linsol, maxl, eps_lin, nderiv,
+                    autorestart, return_on_error, with_jtimes, ew_ele_out)
+            rd._last_info = _solver_info(state)
+
+            if nreached != npoints+1:
+                raise ValueError("Did not reach all points for index %d" % i)
+    finally:
+        del state
     return tout, yout.reshape((tout.size, rd.N, rd.n))
 
 
@@ -553,21 +840,31 @@ def cvode_adaptive(
         basestring iter_type='undecided', str linear_solver="default", int maxl=5, double eps_lin=0.05,
         double first_step=0.0, double dx_min=0.0, double dx_max=0.0, int nsteps=500,
         bool return_on_root=False, int autorestart=0, bool return_on_error=False,
-        bool with_jtimes=False, bool ew_ele=False):
+        bool with_jtimes=False, bool ew_ele=False, preconditioner=None):
     cdef:
         int nout, nderiv = 0, td = 1
         vector[int] root_indices
         double * xyout = <double *>malloc(td*(y0.size*(nderiv+1) + 1)*sizeof(double))
         double * ew_ele_out
+        double ** ew_ele_outp
         cnp.ndarray[cnp.float64_t, ndim=2] xyout_arr
         cnp.ndarray[cnp.float64_t, ndim=4] ew_ele_arr
         cnp.npy_intp xyout_dims[2]
         cnp.npy_intp ew_ele_dims[4]
         int ny = rd.n*rd.N
+        LMM lmm
+        IterType iter_type_
+        LinSol linsol
+        SolverState[double] * state
     if y0.size != ny:
         raise ValueError("y0 of incorrect size")
 
     assert atol.size() in (1, rd.n*rd.N)
+    linear_solver, iter_type, prec_factorization = _prep_linear_solver(
+        rd, linear_solver, iter_type, preconditioner)
+    lmm = lmm_from_name(method.lower().encode('utf-8'))
+    iter_type_ = iter_type_from_name(iter_type.lower().encode('UTF-8'))
+    linsol = linear_solver_from_name(linear_solver.encode('UTF-8'))
     xyout[0] = t0
     for i in range(y0.size):
         xyout[i+1] = y0[i]
@@ -576,13 +873,17 @@ def cvode_adaptive(
         for i in range(ny):
             ew_ele_out[i] = 0.0
 
-    nout = simple_adaptive[ReactionDiffusion[double]](
-        &xyout, &td, rd.thisptr, atol, rtol, lmm_from_name(method.lower().encode('utf-8')),
-        tend, root_indices, nsteps, first_step, dx_min,
-        dx_max, with_jacobian, iter_type_from_name(iter_type.lower().encode('UTF-8')),
-        linear_solver_from_name(linear_solver.encode('UTF-8')), maxl, eps_lin, nderiv,
-        return_on_root, autorestart, return_on_error,
-        with_jtimes, 0, &ew_ele_out if ew_ele else NULL)
+    ew_ele_outp = &ew_ele_out if ew_ele else NULL
+    state = new SolverState[double](rd.thisptr[0], _prec_factorizations.index(prec_factorization))
+    try:
+        with nogil:
+            nout = simple_adaptive[SolverState[double]](
+                &xyout, &td, state, atol, rtol, lmm, tend, root_indices, nsteps, first_step,
+                dx_min, dx_max, with_jacobian, iter_type_, linsol, maxl, eps_lin, nderiv,
+                return_on_root, autorestart, return_on_error, with_jtimes, 0, ew_ele_outp)
+        rd._last_info = _solver_info(state)
+    finally:
+        del state
     xyout_dims[0] = nout + 1
     xyout_dims[1] = y0.size*(nderiv+1) + 1
     xyout_arr = cnp.PyArray_SimpleNewFromData(2, xyout_dims, cnp.NPY_DOUBLE, <void *>xyout)
@@ -609,6 +910,423 @@ def cvode_adaptive(
     return tout, yout.reshape((tout.size, rd.N, rd.n)), info
 
 
+def cvode_ensemble(
+        PyReactionDiffusion rd, cnp.ndarray[cnp.float64_t, ndim=2, mode='c'] Y0, K,
+        cnp.ndarray[cnp.float64_t, ndim=1, mode='c'] tout,
+        vector[double] atol, double rtol, basestring method, fields=None,
+        bool with_jacobian=True, basestring iter_type='undecided', str linear_solver="default",
+        int maxl=5, double eps_lin=0.05, double first_step=0.0, double dx_min=0.0,
+        double dx_max=0.0, int nsteps=500, int autorestart=0, bool with_jtimes=False,
+        int nthreads=1, preconditioner=None):
+    """
+    Integrates ``M`` independent members (rows of ``Y0``, ``K`` and
+    ``fields``) of the reaction network of ``rd`` in one native call.
+
+    ``rd`` (not modified) is shared by ``nthreads`` (OpenMP) threads, each one
+    with a solver state and a CVODE integrator of its own. ``K`` (shape
+    ``(M, nr)``) and ``fields`` (shape ``(M, len(rd.g_values), N)``) may be
+    ``None`` in which case the values of ``rd`` are used, otherwise every
+    thread works on a copy of ``rd`` (these are parameters of the model).
+
+    Returns
+    -------
+    yout : array of shape ``(M, tout.size, N, n)``, NaN where not reached
+    info : dict of per member arrays (``nreached``, ``success``, ``nfev``,
+        ``njev``, ``nsteps``)
+    """
+    cdef:
+        int M = Y0.shape[0]
+        int ny = rd.n*rd.N
+        size_t nt = tout.size
+        cnp.ndarray[cnp.float64_t, ndim=2, mode='c'] K_arr
+        cnp.ndarray[cnp.float64_t, ndim=3, mode='c'] fields_arr
+        cnp.ndarray[cnp.float64_t, ndim=4, mode='c'] yout = np.empty((M, nt, rd.N, rd.n))
+        cnp.ndarray[cnp.int32_t, ndim=1] nreached = np.zeros(M, dtype=np.int32)
+        cnp.ndarray[cnp.int64_t, ndim=1] nfev = np.zeros(M, dtype=np.int64)
+        cnp.ndarray[cnp.int64_t, ndim=1] njev = np.zeros(M, dtype=np.int64)
+        cnp.ndarray[cnp.int64_t, ndim=1] nsteps_out = np.zeros(M, dtype=np.int64)
+        double * Kp = NULL
+        double * fieldsp = NULL
+        double * Y0p = &Y0[0, 0] if M > 0 else NULL
+        double * toutp = &tout[0]
+        double * youtp = <double *>yout.data
+        vector[ReactionDiffusion[double]*] models
+        PyReactionDiffusion clone
+        int prec_kind
+        LMM lmm
+        IterType iter_type_
+        LinSol linsol
+    if Y0.shape[1] != ny:
+        raise ValueError("Y0 of incorrect shape")
+    if atol.size() not in (1, ny):
+        raise ValueError("atol of incorrect size")
+    if nthreads < 1:
+        raise ValueError("nthreads must be positive")
+    if K is not None:
+        K_arr = np.ascontiguousarray(K, dtype=np.float64)
+        if K_arr.shape[0] != M or K_arr.shape[1] != rd.nr:
+            raise ValueError("K of incorrect shape")
+        Kp = <double *>K_arr.data
+    if fields is not None:
+        fields_arr = np.ascontiguousarray(fields, dtype=np.float64)
+        if (fields_arr.shape[0] != M or fields_arr.shape[1] != len(rd.g_values) or
+                fields_arr.shape[2] != rd.N):
+            raise ValueError("fields of incorrect shape")
+        fieldsp = <double *>fields_arr.data
+    linear_solver, iter_type, prec_factorization = _prep_linear_solver(
+        rd, linear_solver, iter_type, preconditioner)
+    lmm = lmm_from_name(method.lower().encode('utf-8'))
+    iter_type_ = iter_type_from_name(iter_type.lower().encode('UTF-8'))
+    linsol = linear_solver_from_name(linear_solver.encode('UTF-8'))
+    nthreads = max(min(nthreads, M), 1)
+    prec_kind = _prec_factorizations.index(prec_factorization)
+    if K is None and fields is None:
+        models.push_back(rd.thisptr)
+    else:
+        cls, args = rd.__reduce__()
+        clones = [cls(*args) for _ in range(nthreads)]
+        for clone in clones:
+            # settings applied after construction are not covered by __reduce__
+            if not rd.auto_efield:
+                clone.efield = rd.efield
+            clone.jtimes_mode = rd.jtimes_mode
+            clone.nthreads = rd.nthreads
+            clone.par_threshold_rhs = rd.par_threshold_rhs
+            clone.par_threshold_jac = rd.par_threshold_jac
+            models.push_back(clone.thisptr)
+    if M > 0:
+        with nogil:
+            ensemble_predefined(
+                models, nthreads, prec_kind, M, Y0p, Kp, fieldsp, atol, rtol, lmm, nt, toutp, youtp,
+                <int *>nreached.data, <long int *>nfev.data, <long int *>njev.data,
+                <long int *>nsteps_out.data, nsteps, first_step, dx_min, dx_max, with_jacobian,
+                iter_type_, linsol, maxl, eps_lin, autorestart, with_jtimes)
+    return yout, dict(nreached=nreached, success=nreached == nt,
+                      nfev=nfev, njev=njev, nsteps=nsteps_out)
+
+
+def batch_rosenbrock(
+        PyReactionDiffusion rd, cnp.ndarray[cnp.float64_t, ndim=2, mode='c'] Y0,
+        cnp.ndarray[cnp.float64_t, ndim=2, mode='c'] K,
+        cnp.ndarray[cnp.float64_t, ndim=1, mode='c'] tout,
+        vector[double] atol, double rtol, double first_step=0.0, double dx_min=0.0,
+        double dx_max=0.0, long nsteps=500, int block_size=64, int nthreads=1):
+    """
+    Integrates ``M`` single compartment systems (``rd.N == 1``) with the
+    reaction network of ``rd`` using a batched Rosenbrock method (ROS3),
+    advancing blocks of ``block_size`` members in lock-step.
+
+    ``Y0`` and ``K`` have shapes ``(M, n)`` and ``(M, nr)`` respectively.
+
+    Returns
+    -------
+    yout : array of shape ``(M, tout.size, 1, n)``, NaN where not reached
+    info : dict of per member arrays (``nreached``, ``success``, ``nsteps``,
+        ``nrejected``)
+    """
+    cdef:
+        int M = Y0.shape[0]
+        size_t nt = tout.size
+        cnp.ndarray[cnp.float64_t, ndim=4, mode='c'] yout = np.empty((M, nt, 1, rd.n))
+        cnp.ndarray[cnp.int32_t, ndim=1] nreached = np.zeros(M, dtype=np.int32)
+        cnp.ndarray[cnp.int64_t, ndim=1] nsteps_out = np.zeros(M, dtype=np.int64)
+        cnp.ndarray[cnp.int64_t, ndim=1] nrejected = np.zeros(M, dtype=np.int64)
+        double * Y0p = <double *>Y0.data
+        double * Kp = <double *>K.data
+        double * toutp = &tout[0]
+        double * youtp = <double *>yout.data
+        BatchRosenbrock[double] * batch
+    if Y0.shape[1] != rd.n:
+        raise ValueError("Y0 of incorrect shape")
+    if K.shape[0] != M or K.shape[1] != rd.nr:
+        raise ValueError("K of incorrect shape")
+    if block_size < 1 or nthreads < 1:
+        raise ValueError("block_size and nthreads must be positive")
+    batch = new BatchRosenbrock[double](rd.thisptr[0])
+    try:
+        batch.block_size = block_size
+        with nogil:
+            batch.predefined(M, Y0p, Kp, nt, toutp, youtp, atol, rtol, first_step, dx_min, dx_max,
+                             nsteps, <int *>nreached.data, <long int *>nsteps_out.data,
+                             <long int *>nrejected.data, nthreads)
+    finally:
+        del batch
+    return yout, dict(nreached=nreached, success=nreached == nt,
+                      nsteps=nsteps_out, nrejected=nrejected)
+
+
+def split_predefined(
+        PyReactionDiffusion rd, cnp.ndarray[cnp.float64_t, ndim=1, mode='c'] y0,
+        cnp.ndarray[cnp.float64_t, ndim=1, mode='c'] tout,
+        vector[double] atol, double rtol, int order=2, double first_step=0.0,
+        double dx_min=0.0, double dx_max=0.0, long nsteps=500, double inner_tol_factor=0.1,
+        int nthreads=1):
+    """
+    Integrates ``rd`` by operator splitting: independent (stiff) reaction
+    integrations per bin and implicit transport steps, alternated as Lie
+    (``order=1``) or Strang (``order=2``) splitting with the step size
+    controlled by step doubling (see ``chemreac_split.hpp``).
+
+    ``y0`` (linear concentrations) has shape ``(N*n,)`` and ``tout`` holds
+    linear times (irrespective of ``rd.logy`` and ``rd.logt``).
+
+    Returns
+    -------
+    yout : array of shape ``(tout.size, N, n)``, NaN where not reached
+    info : dict (``nreached``, ``success``, ``nsteps``, ``nrejected``,
+        ``nreaction_steps``, ``ntransport_factor``)
+    """
+    cdef:
+        int ny = rd.n*rd.N
+        int nreached
+        size_t nt = tout.size
+        cnp.ndarray[cnp.float64_t, ndim=1, mode='c'] yout = np.empty(nt*ny)
+        double * y0p = &y0[0]
+        double * toutp = &tout[0]
+        double * youtp = &yout[0]
+        SplitIntegrator[double] * split
+    if y0.size != ny:
+        raise ValueError("y0 of incorrect size")
+    if nthreads < 1:
+        raise ValueError("nthreads must be positive")
+    split = new SplitIntegrator[double](rd.thisptr[0], order)
+    try:
+        split.nthreads = nthreads
+        split.inner_tol_factor = inner_tol_factor
+        with nogil:
+            nreached = split.predefined(y0p, nt, toutp, youtp, atol, rtol, first_step, dx_min,
+                                        dx_max, nsteps)
+        info = dict(nreached=nreached, success=nreached == nt, nsteps=split.nsteps,
+                    nrejected=split.nrejected, nreaction_steps=split.nreaction_steps,
+                    ntransport_factor=split.ntransport_factor)
+    finally:
+        del split
+    return yout.reshape((nt, rd.N, rd.n)), info
+
+
+def imex_predefined(
+        PyReactionDiffusion rd, cnp.ndarray[cnp.float64_t, ndim=1, mode='c'] y0,
+        cnp.ndarray[cnp.float64_t, ndim=1, mode='c'] tout,
+        vector[double] atol, double rtol, int order=3, basestring implicit='transport',
+        double first_step=0.0, double dx_min=0.0, double dx_max=0.0, long nsteps=500):
+    """
+    Integrates ``rd`` using an additive Runge-Kutta (IMEX) method of order 3 or 4
+    with either the transport (``implicit='transport'``) or the reactions
+    (``implicit='reaction'``) treated implicitly (see ``chemreac_imex.hpp``).
+
+    ``y0`` and ``tout`` are in the variables of ``rd`` (``logy``, ``logt``).
+
+    Returns
+    -------
+    yout : array of shape ``(tout.size, N, n)``, NaN where not reached
+    info : dict (``nreached``, ``success``, ``nsteps``, ``nrejected``, ``nfev``,
+        ``njev``, ``nfactor``, ``nsolve``, ``nnewton_fail`` & ``linear_implicit``)
+    """
+    cdef:
+        int ny = rd.n*rd.N
+        int nreached
+        size_t nt = tout.size
+        cnp.ndarray[cnp.float64_t, ndim=1, mode='c'] yout = np.empty(nt*ny)
+        double * y0p = &y0[0]
+        double * toutp = &tout[0]
+        double * youtp = &yout[0]
+        ImexARK[double] * imex
+    if y0.size != ny:
+        raise ValueError("y0 of incorrect size")
+    if implicit not in ('transport', 'reaction'):
+        raise ValueError("Unknown implicit part: %s" % implicit)
+    imex = new ImexARK[double](rd.thisptr[0], order, implicit == 'transport')
+    try:
+        with nogil:
+            nreached = imex.predefined(y0p, nt, toutp, youtp, atol, rtol, first_step, dx_min,
+                                       dx_max, nsteps)
+        info = dict(nreached=nreached, success=nreached == nt, nsteps=imex.nsteps,
+                    nrejected=imex.nrejected, nfev=imex.nfev_explicit + imex.nfev_implicit,
+                    njev=imex.njev, nfactor=imex.nfactor, nsolve=imex.nsolve,
+                    nnewton_fail=imex.nnewton_fail, linear_implicit=imex.linear_implicit)
+    finally:
+        del imex
+    return yout.reshape((nt, rd.N, rd.n)), info
+
+
+def rkc_predefined(
+        PyReactionDiffusion rd, cnp.ndarray[cnp.float64_t, ndim=1, mode='c'] y0,
+        cnp.ndarray[cnp.float64_t, ndim=1, mode='c'] tout,
+        vector[double] atol, double rtol, double first_step=0.0, double dx_min=0.0,
+        double dx_max=0.0, long nsteps=500, int max_stages=1000, int rho_interval=25):
+    """
+    Integrates ``rd`` using the explicit stabilised Runge-Kutta-Chebyshev method
+    (RKC, second order) which only evaluates ``rd.f`` and stores a handful of
+    state vectors (see ``chemreac_rkc.hpp``).
+
+    ``y0`` and ``tout`` are in the variables of ``rd`` (``logy``, ``logt``).
+
+    Returns
+    -------
+    yout : array of shape ``(tout.size, N, n)``, NaN where not reached
+    info : dict (``nreached``, ``success``, ``nsteps``, ``nrejected``, ``nfev``
+        (including ``nfev_rho``: evaluations by the spectral radius estimates),
+        ``nrho``, ``rho``, ``max_stages_used`` & ``stencil_rho``)
+    """
+    cdef:
+        int ny = rd.n*rd.N
+        int nreached
+        size_t nt = tout.size
+        cnp.ndarray[cnp.float64_t, ndim=1, mode='c'] yout = np.empty(nt*ny)
+        double * y0p = &y0[0]
+        double * toutp = &tout[0]
+        double * youtp = &yout[0]
+        RKC[double] * rkc
+    if y0.size != ny:
+        raise ValueError("y0 of incorrect size")
+    if max_stages < 2:
+        raise ValueError("max_stages must be at least 2")
+    rkc = new RKC[double](rd.thisptr[0])
+    try:
+        rkc.max_stages = max_stages
+        rkc.rho_interval = rho_interval
+        with nogil:
+            nreached = rkc.predefined(y0p, nt, toutp, youtp, atol, rtol, first_step, dx_min,
+                                      dx_max, nsteps)
+        info = dict(nreached=nreached, success=nreached == nt, nsteps=rkc.nsteps,
+                    nrejected=rkc.nrejected, nfev=rkc.nfev + rkc.nfev_rho, nfev_rho=rkc.nfev_rho,
+                    nrho=rkc.nrho, rho=rkc.rho, max_stages_used=rkc.max_stages_used,
+                    stencil_rho=rkc.stencil_rho)
+    finally:
+        del rkc
+    return yout.reshape((nt, rd.N, rd.n)), info
+
+
+cdef dict _rosenbrock_info(Rosenbrock[double] * ros):
+    return dict(nsteps=ros.nsteps, nrejected=ros.nrejected, nfev=ros.nfev, njev=ros.njev,
+                nfactor=ros.nfactor, nsolve=ros.nsolve, block_tridiag=ros.block_tridiag)
+
+
+def rosenbrock_predefined(
+        PyReactionDiffusion rd, cnp.ndarray[cnp.float64_t, ndim=1, mode='c'] y0,
+        cnp.ndarray[cnp.float64_t, ndim=1, mode='c'] tout,
+        vector[double] atol, double rtol, basestring method='rodas3', double first_step=0.0,
+        double dx_min=0.0, double dx_max=0.0, long nsteps=500):
+    """
+    Integrates ``rd`` using a Rosenbrock method (``'rodas3'`` or ``'ros3p'``):
+    the Jacobian is assembled once per step and ``I - gamma*h*J`` is factorized
+    (block-tridiagonal or banded LU) once per step and shared by all stages
+    (see ``chemreac_rosenbrock.hpp``).
+
+    ``y0`` and ``tout`` are in the variables of ``rd`` (``logy``, ``logt``).
+
+    Returns
+    -------
+    yout : array of shape ``(tout.size, N, n)``, NaN where not reached
+    info : dict (``nreached``, ``success``, ``nsteps``, ``nrejected``, ``nfev``,
+        ``njev``, ``nfactor``, ``nsolve`` & ``block_tridiag``)
+    """
+    cdef:
+        int ny = rd.n*rd.N
+        int nreached
+        size_t nt = tout.size
+        cnp.ndarray[cnp.float64_t, ndim=1, mode='c'] yout = np.empty(nt*ny)
+        double * y0p = &y0[0]
+        double * toutp = &tout[0]
+        double * youtp = &yout[0]
+        Rosenbrock[double] * ros
+    if y0.size != ny:
+        raise ValueError("y0 of incorrect size")
+    ros = new Rosenbrock[double](rd.thisptr[0], method.encode('utf-8'))
+    try:
+        with nogil:
+            nreached = ros.predefined(y0p, nt, toutp, youtp, atol, rtol, first_step, dx_min,
+                                      dx_max, nsteps)
+        info = _rosenbrock_info(ros)
+    finally:
+        del ros
+    info['nreached'] = nreached
+    info['success'] = nreached == nt
+    return yout.reshape((nt, rd.N, rd.n)), info
+
+
+def rosenbrock_adaptive(
+        PyReactionDiffusion rd, cnp.ndarray[cnp.float64_t, ndim=1, mode='c'] y0,
+        double t0, double tend, vector[double] atol, double rtol, basestring method='rodas3',
+        double first_step=0.0, double dx_min=0.0, double dx_max=0.0, long nsteps=500):
+    """
+    As :func:`rosenbrock_predefined` but reports every accepted step from ``t0``
+    to ``tend`` (``nsteps``: the maximum number of steps in total).
+
+    Returns
+    -------
+    tout : array
+    yout : array of shape ``(tout.size, N, n)``
+    info : dict (see :func:`rosenbrock_predefined`)
+    """
+    cdef:
+        int ny = rd.n*rd.N
+        vector[double] xout_vec, yout_vec
+        double * y0p = &y0[0]
+        Rosenbrock[double] * ros
+    if y0.size != ny:
+        raise ValueError("y0 of incorrect size")
+    ros = new Rosenbrock[double](rd.thisptr[0], method.encode('utf-8'))
+    try:
+        with nogil:
+            ros.adaptive(y0p, t0, tend, xout_vec, yout_vec, atol, rtol, first_step, dx_min,
+                         dx_max, nsteps)
+        info = _rosenbrock_info(ros)
+    finally:
+        del ros
+    tout = np.array(xout_vec)
+    info['success'] = tout[-1] == tend
+    return tout, np.array(yout_vec).reshape((tout.size, rd.N, rd.n)), info
+
+
+def expm_predefined(
+        PyReactionDiffusion rd, cnp.ndarray[cnp.float64_t, ndim=1, mode='c'] y0,
+        cnp.ndarray[cnp.float64_t, ndim=1, mode='c'] tout,
+        vector[double] atol, double rtol, int krylov_dim=30, long nsteps=500):
+    """
+    Evaluates the solution of a linear system (``rd.linear``) at ``tout`` as
+    ``exp((t - t0)*A)`` acting on ``y0`` (source terms included): analytic
+    (generalised Bateman) or Pade for ``N == 1``, Krylov (Arnoldi) otherwise
+    (see ``chemreac_expm.hpp``).
+
+    ``y0`` and ``tout`` are linear (irrespective of ``rd.logt``), ``atol``,
+    ``rtol`` and ``nsteps`` (maximum number of Krylov steps between outputs)
+    only apply to the Krylov approximation.
+
+    Returns
+    -------
+    yout : array of shape ``(tout.size, N, n)``, NaN where not reached
+    info : dict (``nreached``, ``success``, ``method``, ``nmatvec``,
+        ``nkrylov_steps``, ``nkrylov_rejected``, ``nexpm`` (dense Pade
+        evaluations), ``nbateman``, ``with_source`` & ``jac_exact``)
+    """
+    cdef:
+        int ny = rd.n*rd.N
+        int nreached
+        size_t nt = tout.size
+        cnp.ndarray[cnp.float64_t, ndim=1, mode='c'] yout = np.empty(nt*ny)
+        double * y0p = &y0[0]
+        double * toutp = &tout[0]
+        double * youtp = &yout[0]
+        LinearPropagator[double] * prop
+    if y0.size != ny:
+        raise ValueError("y0 of incorrect size")
+    if krylov_dim < 2:
+        raise ValueError("krylov_dim must be at least 2")
+    prop = new LinearPropagator[double](rd.thisptr[0])
+    try:
+        prop.krylov_dim = krylov_dim
+        with nogil:
+            nreached = prop.predefined(y0p, nt, toutp, youtp, atol, rtol, nsteps)
+        info = dict(nreached=nreached, success=nreached == nt, method=prop.method.decode('utf-8'),
+                    nmatvec=prop.nmatvec, nkrylov_steps=prop.nkrylov_steps,
+                    nkrylov_rejected=prop.nkrylov_rejected, nexpm=prop.nexpm,
+                    nbateman=prop.nbateman, with_source=prop.with_source,
+                    jac_exact=prop.jac_exact)
+    finally:
+        del prop
+    return yout.reshape((nt, rd.N, rd.n)), info
+
 
 # Below is an implementation of the classic Runge Kutta 4th order stepper with fixed step size
 # it is only useful for debugging purposes (fixed step size is not for production runs)
@@ -88,8 +88,6 @@ class ODESys(_ODESys):
             atol=atol, rtol=rtol, method=method, npoints=npoints, **integrate_kwargs)
         info = dict(
             nsteps=-1,
-            nfev=self.rd.nfev,
-            njev=self.rd.njev,
             time_wall=time.time() - time_wall,
             time_cpu=time.clock() - time_cpu,
             success=True,
@@ -97,6 +95,6 @@ class ODESys(_ODESys):
             t0_set=False,
             linear_solver=0,  # pyodesys.results.Result work-around for now (not important)
         )
-        info.update(self.rd.last_integration_info)
+        info.update(self.rd.last_integration_info)  # includes nfev & njev
         dr_out = np.concatenate((np.repeat(drate, npoints), drate[-1:]))
         return Result(tout*time_u, yout[:, 0, :]*conc_u, dr_out.reshape((-1, 1))*dr_u, info, self)
@@ -198,6 +198,11 @@ class ReactionDiffusionBase(object):
         from block_diag_ilu import alloc_compressed
         return alloc_compressed(self.N, self.n, self.n_jac_diags, nsat)
 
+    def alloc_jout_sparse(self):
+        """ Returns (data, colptrs, rowvals) for use with :meth:`sparse_jac_csc` """
+        return (np.zeros(self.nnz), np.zeros(self.n*self.N + 1, dtype=np.int32),
+                np.zeros(self.nnz, dtype=np.int32))
+
     @property
     def ny(self):
         return self.N*self.n
@@ -237,6 +242,18 @@ def k_units(unit_registry, reaction_orders):
             for order in reaction_orders]
 
 
+def _native_base(cls):
+    """ Returns the extension type (``PyReactionDiffusion``) ``cls`` derives from.
+
+    Mechanism specific subclasses (see :mod:`chemreac.specialize`) derive from
+    the ``PyReactionDiffusion`` of their own compiled extension module.
+    """
+    for base in cls.__mro__:
+        if base.__name__ == 'PyReactionDiffusion':
+            return base
+    raise TypeError("%s does not derive from PyReactionDiffusion" % cls.__name__)
+
+
 class ReactionDiffusion(PyReactionDiffusion, ReactionDiffusionBase):
     """
     Object representing the numerical model, with callbacks for evaluating
@@ -469,7 +486,7 @@ class ReactionDiffusion(PyReactionDiffusion, ReactionDiffusionBase):
         if _k.ndim != 1:
             raise ValueError("Rates vector has inproper dimension")
 
-        rd = super(ReactionDiffusion, cls).__new__(
+        rd = _native_base(cls).__new__(
             cls, n, stoich_active, stoich_prod, _k,
             N, D, z_chg, mobility, _x, stoich_inact, 'fcs'.index(geom), logy,
             logt, logx, g_values, g_value_parents, fields,
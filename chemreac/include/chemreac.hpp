@@ -1,19 +1,30 @@
 #ifndef CHEMREAC_PVHQOBGMVZECTIJSMOKFUXJXXM
 #define CHEMREAC_PVHQOBGMVZECTIJSMOKFUXJXXM
 
+#include <atomic>
 #include <vector>
 #include <utility>
 #include <stdexcept>
+#include <string>
 #include <memory> // unique_ptr
+#include <mutex>
 #include <unordered_map>
 #include "block_diag_ilu.hpp"
 #include "anyode/anyode.hpp"
 #include "anyode/anyode_buffer.hpp"
+#include "anyode/anyode_decomposition_lapack.hpp"
+#include "chemreac_block_tridiag.hpp"
+#include "chemreac_multigrid.hpp"
+#include "chemreac_operator_split.hpp"
+#include "chemreac_sparse.hpp"
 
 
 namespace chemreac {
 
 enum class Geom {FLAT, CYLINDRICAL, SPHERICAL, PERIODIC};
+enum class PrecFactorization {AUTO, BLOCK_TRIDIAG, BLOCK_CYCLIC_REDUCTION, SPARSE_LU, OPERATOR_SPLIT, MULTIGRID};
+enum class JtimesMode {ANALYTIC, FINITE_DIFFERENCE};
+enum class RhsPart {ALL, REACTION, TRANSPORT}; // REACTION: reactions & fields, TRANSPORT: diffusion & drift
 
 using std::vector;
 using std::pair;
@@ -23,9 +34,39 @@ using AnyODE::buffer_factory;
 
 template<class T> void ignore( const T& ) { } // ignore compiler warnings about unused parameter
 
+std::string get_simd_isa(); // widest instruction set dispatched to on this host (e.g. "avx2")
+
+template <typename Real_t = double>
+struct Workspace {
+    // Scratch space for evaluating rhs & Jacobians (see ReactionDiffusion::make_workspace).
+    // A ReactionDiffusion instance may be evaluated concurrently from several
+    // threads as long as each thread passes its own Workspace.
+    buffer_t<Real_t> linC, rlinC, local_r, efield, netchg;
+    // State cache: (t, y) of the last rhs evaluation for which linC, rlinC,
+    // efield and dydt are still valid (reused by the *_jac_* methods).
+    buffer_t<Real_t> state_y, dydt;
+    // Species major (transposed) tiles for the diffusion/advection kernel in rhs.
+    buffer_t<Real_t> linC_T, transport_T;
+    // jtimes: direction in linear concentrations (analytic) or perturbed y and f
+    // at that point (finite differences).
+    buffer_t<Real_t> jtimes_y, jtimes_f;
+    Real_t state_t {0};
+    long state_epoch {-1}; // compared with ReactionDiffusion::state_epoch, -1: empty
+    const int nslots; // number of per-thread slices in local_r, linC_T & transport_T
+    Workspace(int ny, int N, int nlocal_r, int ntransport, int nslots=1) :
+        linC(buffer_factory<Real_t>(ny)), rlinC(buffer_factory<Real_t>(ny)),
+        local_r(buffer_factory<Real_t>(nlocal_r*nslots)), efield(buffer_factory<Real_t>(N)),
+        netchg(buffer_factory<Real_t>(N)), state_y(buffer_factory<Real_t>(ny)),
+        dydt(buffer_factory<Real_t>(ny)), linC_T(buffer_factory<Real_t>(ntransport*nslots)),
+        transport_T(buffer_factory<Real_t>(ntransport*nslots)), jtimes_y(buffer_factory<Real_t>(ny)),
+        jtimes_f(buffer_factory<Real_t>(ny)), nslots(nslots) {}
+};
+
 template <typename Real_t = double>
-class ReactionDiffusion : public AnyODE::OdeSysBase<Real_t>
+class ReactionDiffusion
 {
+    // The discretized model: evaluations (rhs, *_jac_*, jtimes) taking a Workspace
+    // leave the instance untouched, CVODE integrates it through a SolverState.
 public:
     const int n; // number of species
     const int N; // number of compartments
@@ -33,10 +74,13 @@ public:
     const int nsidep; // (nstencil-1)/2
     const int nr; // number of reactions
     buffer_t<int> coeff_active, coeff_prod, coeff_total, coeff_inact;
-    buffer_t<Real_t> lap_weight, div_weight, grad_weight, efield, netchg, gradD, xc, work1, work2, work3;
+    // Structural non-zeros of the reaction network (CSR), built at construction:
+    vector<int> net_ptr, net_si, net_coeff; // per reaction: species with non-zero net stoichiometry
+    vector<int> jac_nz_si, jac_nz_dsi; // non-zero reaction contributions to a Jacobian block
+    vector<int> jac_ptr, jac_rxn, jac_order, jac_net; // per such (si, dsi): reactions, A_kj and S_ki
+    buffer_t<Real_t> lap_weight, div_weight, grad_weight, efield, gradD, xc;
     int n_factor_affected_k;
     Geom geom; // Geometry: 0: 1D flat, 1: 1D Cylind, 2: 1D Spherical.
-    void * integrator {nullptr};
 
     void fill_local_r_(int, const Real_t * const ANYODE_RESTRICT, Real_t * const ANYODE_RESTRICT) const;
     void apply_fd_(int);
@@ -65,29 +109,50 @@ public:
     vector<vector<Real_t>> fields;
     vector<int> modulated_rxns;
     vector<vector<Real_t> > modulation;
+    vector<Real_t> k_eff; // N x nr modulated rate coefficients, see update_k_eff()
+    vector<Real_t> transport_diag, transport_sub, transport_sup; // see update_transport_jac()
+    vector<int> transport_species; // species with non-zero D or mobility, see update_transport_jac()
+    vector<int> stencil_idx; // N x nstencil: bin of each stencil point (reflections resolved)
+    // Stencil major (nstencil x N) weights and species major (n x N) D & gradD used by
+    // the vectorized interior stencil of rhs, see update_transport_jac()
+    vector<Real_t> lap_weight_T, grad_weight_T, div_weight_T, D_T, gradD_T;
     const Real_t ilu_limit;
     const int n_jac_diags;
     const bool use_log2;
     const bool clip_to_pos;
     const int nroots = 0;
+    // Threaded evaluation (OpenMP builds) when n*N (rhs) or n*n*N (Jacobians) exceeds:
+    long par_threshold_rhs {65536};
+    long par_threshold_jac {65536};
+    vector<int> sparse_colptrs, sparse_rowvals; // CSC pattern of the (N == 1) Jacobian, diagonal included
 private:
-    std::unique_ptr<block_diag_ilu::BlockDiagMatrix<Real_t>> jac_cache;
-    std::unique_ptr<block_diag_ilu::BlockDiagMatrix<Real_t>> jac_times_cache;
-    std::unique_ptr<block_diag_ilu::BlockDiagMatrix<Real_t>> prec_cache;
-    bool update_prec_cache = false;
-    Real_t old_gamma;
+    vector<int> sparse_idx; // n x n column major map into sparse_rowvals (-1: structural zero)
+    mutable std::unique_ptr<SparseLUSymbolic> sparse_symbolic; // fill-reducing order & pattern of L+U
+    mutable std::mutex sparse_symbolic_mutex; // built on first use, possibly by concurrent solvers
+    PrecFactorization prec_factorization {PrecFactorization::AUTO}; // default of SolverState
+    JtimesMode jtimes_mode {JtimesMode::ANALYTIC};
+    std::unique_ptr<Workspace<Real_t>> work; // used by the evaluations without a Workspace argument
     int start_idx_(int bi) const;
     int biw_(int bi, int li) const;
+    void build_network_index_();
+    const Real_t * efield_for_(const Real_t * const, Workspace<Real_t>&) const;
+    void calc_efield_(const Real_t * const, Real_t * const ANYODE_RESTRICT, Real_t * const ANYODE_RESTRICT) const;
+    void populate_rlinC_(const Real_t * const ANYODE_RESTRICT, Real_t * const ANYODE_RESTRICT) const;
+    void transport_rhs_(int, int, const Real_t * const ANYODE_RESTRICT, const Real_t * const ANYODE_RESTRICT,
+                        Real_t * const ANYODE_RESTRICT, Real_t * const ANYODE_RESTRICT) const;
+    bool state_cached_(Real_t, const Real_t * const, const Workspace<Real_t>&) const;
+    void cache_state_(Real_t, const Real_t * const, const Real_t * const, Workspace<Real_t>&) const;
+    long state_epoch {0}; // bumped by invalidate_state_cache()
+    int nthreads {0}; // see set_nthreads()
 
 public:
     // counters
-    long nfev {0};
-    long njev {0};
-    long nprec_setup {0};
-    long nprec_solve {0};
-    long njacvec_dot {0};
-    long nprec_solve_ilu {0};
-    long nprec_solve_lu {0};
+    mutable std::atomic<long> nfev {0}; // atomic: rhs & *_jac_* may run concurrently (see Workspace)
+    mutable std::atomic<long> njev {0};
+    mutable std::atomic<long> nstate_reuse {0}; // evaluations reusing the state cached by rhs (see Workspace)
+    long get_nfev() const { return nfev; }
+    long get_njev() const { return njev; }
+    long get_nstate_reuse() const { return nstate_reuse; }
 
     ReactionDiffusion(int,
 		      const vector<vector<int> >,
@@ -125,22 +190,104 @@ public:
 
     void zero_counters();
 
-    int get_ny() const override;
-    int get_mlower() const override;
-    int get_mupper() const override;
+    int get_ny() const;
+    int get_mlower() const;
+    int get_mupper() const;
+    int get_nnz() const;
 
-    AnyODE::Status rhs(Real_t, const Real_t * const, Real_t * const ANYODE_RESTRICT) override;
+    std::unique_ptr<Workspace<Real_t>> make_workspace() const;
+    int get_nthreads() const;
+    void set_nthreads(int); // 0: omp_get_max_threads()
+    void calibrate_parallel(int nrep=5);
+
+    AnyODE::Status rhs(Real_t, const Real_t * const, Real_t * const ANYODE_RESTRICT);
+    AnyODE::Status rhs(Real_t, const Real_t * const, Real_t * const ANYODE_RESTRICT, Workspace<Real_t>&) const;
+    // Additive parts of rhs (log transforms included, rhs == reaction + transport part)
+    AnyODE::Status rhs_part(Real_t, const Real_t * const, Real_t * const ANYODE_RESTRICT, RhsPart, Workspace<Real_t>&) const;
     // AnyODE::Status roots(Real_t xval, const Real_t * const y, Real_t * const out) override;
 
-    AnyODE::Status dense_jac_rmaj(Real_t, const Real_t * const ANYODE_RESTRICT, const Real_t * const ANYODE_RESTRICT, Real_t * const ANYODE_RESTRICT, long int, double * const ANYODE_RESTRICT dfdt=nullptr) override;
-    AnyODE::Status dense_jac_cmaj(Real_t, const Real_t * const ANYODE_RESTRICT, const Real_t * const ANYODE_RESTRICT, Real_t * const ANYODE_RESTRICT, long int, double * const ANYODE_RESTRICT dfdt=nullptr) override;
-    AnyODE::Status banded_jac_cmaj(Real_t, const Real_t * const ANYODE_RESTRICT,  const Real_t * const ANYODE_RESTRICT, Real_t * const ANYODE_RESTRICT, long int) override;
+    AnyODE::Status dense_jac_rmaj(Real_t, const Real_t * const ANYODE_RESTRICT, const Real_t * const ANYODE_RESTRICT, Real_t * const ANYODE_RESTRICT, long int, double * const ANYODE_RESTRICT dfdt=nullptr);
+    AnyODE::Status dense_jac_cmaj(Real_t, const Real_t * const ANYODE_RESTRICT, const Real_t * const ANYODE_RESTRICT, Real_t * const ANYODE_RESTRICT, long int, double * const ANYODE_RESTRICT dfdt=nullptr);
+    AnyODE::Status banded_jac_cmaj(Real_t, const Real_t * const ANYODE_RESTRICT,  const Real_t * const ANYODE_RESTRICT, Real_t * const ANYODE_RESTRICT, long int);
     AnyODE::Status compressed_jac_cmaj(Real_t, const Real_t * const ANYODE_RESTRICT, const Real_t * const ANYODE_RESTRICT, Real_t * const ANYODE_RESTRICT, long int);
+    AnyODE::Status sparse_jac_csc(Real_t, const Real_t * const ANYODE_RESTRICT, const Real_t * const ANYODE_RESTRICT, Real_t * const ANYODE_RESTRICT, int * const, int * const);
+    // Reentrant versions of the above (scratch space from the Workspace)
+    AnyODE::Status dense_jac_rmaj(Real_t, const Real_t * const ANYODE_RESTRICT, const Real_t * const ANYODE_RESTRICT, Real_t * const ANYODE_RESTRICT, long int, Workspace<Real_t>&) const;
+    AnyODE::Status dense_jac_cmaj(Real_t, const Real_t * const ANYODE_RESTRICT, const Real_t * const ANYODE_RESTRICT, Real_t * const ANYODE_RESTRICT, long int, Workspace<Real_t>&) const;
+    AnyODE::Status banded_jac_cmaj(Real_t, const Real_t * const ANYODE_RESTRICT, const Real_t * const ANYODE_RESTRICT, Real_t * const ANYODE_RESTRICT, long int, Workspace<Real_t>&) const;
+    AnyODE::Status compressed_jac_cmaj(Real_t, const Real_t * const ANYODE_RESTRICT, const Real_t * const ANYODE_RESTRICT, Real_t * const ANYODE_RESTRICT, long int, Workspace<Real_t>&) const;
+    AnyODE::Status sparse_jac_csc(Real_t, const Real_t * const ANYODE_RESTRICT, const Real_t * const ANYODE_RESTRICT, Real_t * const ANYODE_RESTRICT, int * const, int * const, Workspace<Real_t>&) const;
+    // Jacobian of a part of rhs (fy: that part of f) in the format of compressed_jac_cmaj
+    AnyODE::Status compressed_jac_part(Real_t, const Real_t * const ANYODE_RESTRICT, const Real_t * const ANYODE_RESTRICT, Real_t * const ANYODE_RESTRICT, long int, RhsPart, Workspace<Real_t>&) const;
+    void update_sparse_pattern();
+    const SparseLUSymbolic& get_sparse_symbolic() const; // computed once per sparsity pattern
+    const vector<int>& get_sparse_order() const;
 
-    Real_t get_mod_k(int bi, int ri) const;
+    void update_k_eff(); // call after changing k, modulated_rxns or modulation
+    void update_transport_jac(); // call after changing D, mobility or efield (unless auto_efield)
+    void invalidate_state_cache() { ++state_epoch; } // call after changing parameters (D, fields, ...)
+    Real_t get_mod_k(int bi, int ri) const { return k_eff[bi*nr + ri]; }
+    // rhs is affine in y (first order reactions at most, no auto_efield & linear concentrations)
+    bool is_linear() const;
 
     // For iterative linear solver
     // void local_reaction_jac(const int, const Real_t * const, Real_t * const ANYODE_RESTRICT, Real_t) const;
+    AnyODE::Status jtimes(const Real_t * const ANYODE_RESTRICT vec,
+                          Real_t * const ANYODE_RESTRICT out,
+                          Real_t t, const Real_t * const ANYODE_RESTRICT y,
+                          const Real_t * const ANYODE_RESTRICT fy
+        );
+    // Matrix-free J*vec evaluated from (t, y, vec), or directional differences of f reusing fy
+    AnyODE::Status jtimes(const Real_t * const ANYODE_RESTRICT, Real_t * const ANYODE_RESTRICT,
+                          Real_t, const Real_t * const ANYODE_RESTRICT, const Real_t * const ANYODE_RESTRICT,
+                          Workspace<Real_t>&) const;
+
+    void per_rxn_contrib_to_fi(Real_t, const Real_t * const ANYODE_RESTRICT, int, Real_t * const ANYODE_RESTRICT) const;
+    int get_geom_as_int() const;
+    int get_prec_factorization_as_int() const;
+    void set_prec_factorization_from_int(int);
+    PrecFactorization prec_factorization_from_int(int) const; // throws if not applicable
+    int get_jtimes_mode_as_int() const;
+    void set_jtimes_mode_from_int(int);
+    void calc_efield(const Real_t * const);
+
+}; // class ReactionDiffusion
+
+template <typename Real_t = double>
+class SolverState : public AnyODE::OdeSysBase<Real_t>
+{
+    // The AnyODE::OdeSysBase (CVODE) interface of a ReactionDiffusion instance:
+    // everything an integration mutates (Workspace, Jacobian & preconditioner
+    // caches, counters) lives here, the instance itself is only read. One
+    // instance may hence be integrated by concurrent solvers, each passing its
+    // own SolverState.
+public:
+    const ReactionDiffusion<Real_t> &rd;
+    const PrecFactorization prec_factorization;
+    // counters (besides nfev & njev of OdeSysBase)
+    long nprec_setup {0};
+    long nprec_solve {0};
+    long njacvec_dot {0};
+    long nprec_solve_ilu {0};
+    long nprec_solve_lu {0};
+    long nprec_factor_ilu {0}; // incomplete factorizations of prec_cache
+    long nprec_factor_lu {0}; // (banded, block-tridiagonal or sparse) LU factorizations of prec_cache (cache misses)
+    long nprec_reuse_lu {0}; // solves reusing an earlier factorization (cache hits)
+
+    // prec_factorization: see ReactionDiffusion::set_prec_factorization_from_int (-1: that of rd)
+    SolverState(const ReactionDiffusion<Real_t> &rd, int prec_factorization=-1);
+    void zero_counters();
+
+    int get_ny() const override { return rd.get_ny(); }
+    int get_mlower() const override { return rd.get_mlower(); }
+    int get_mupper() const override { return rd.get_mupper(); }
+    int get_nnz() const override { return rd.get_nnz(); }
+
+    AnyODE::Status rhs(Real_t, const Real_t * const, Real_t * const ANYODE_RESTRICT) override;
+    AnyODE::Status dense_jac_rmaj(Real_t, const Real_t * const ANYODE_RESTRICT, const Real_t * const ANYODE_RESTRICT, Real_t * const ANYODE_RESTRICT, long int, double * const ANYODE_RESTRICT dfdt=nullptr) override;
+    AnyODE::Status dense_jac_cmaj(Real_t, const Real_t * const ANYODE_RESTRICT, const Real_t * const ANYODE_RESTRICT, Real_t * const ANYODE_RESTRICT, long int, double * const ANYODE_RESTRICT dfdt=nullptr) override;
+    AnyODE::Status banded_jac_cmaj(Real_t, const Real_t * const ANYODE_RESTRICT,  const Real_t * const ANYODE_RESTRICT, Real_t * const ANYODE_RESTRICT, long int) override;
+    AnyODE::Status sparse_jac_csc(Real_t, const Real_t * const ANYODE_RESTRICT, const Real_t * const ANYODE_RESTRICT, Real_t * const ANYODE_RESTRICT, int * const, int * const) override;
     AnyODE::Status jtimes(const Real_t * const ANYODE_RESTRICT vec,
                           Real_t * const ANYODE_RESTRICT out,
                           Real_t t, const Real_t * const ANYODE_RESTRICT y,
@@ -159,11 +306,17 @@ public:
                                    const Real_t * const ANYODE_RESTRICT ewt
                                    ) override;
 
-    void per_rxn_contrib_to_fi(Real_t, const Real_t * const ANYODE_RESTRICT, int, Real_t * const ANYODE_RESTRICT) const;
-    int get_geom_as_int() const;
-    void calc_efield(const Real_t * const);
-
-}; // class ReactionDiffusion
+private:
+    std::unique_ptr<Workspace<Real_t>> work;
+    std::unique_ptr<block_diag_ilu::BlockDiagMatrix<Real_t>> jac_cache;
+    std::unique_ptr<block_diag_ilu::BlockDiagMatrix<Real_t>> prec_cache;
+    std::unique_ptr<block_diag_ilu::ILU<Real_t>> prec_ilu;
+    std::unique_ptr<AnyODE::BandedMatrix<Real_t>> prec_banded; // LU factorized in-place by prec_lu
+    std::unique_ptr<AnyODE::DecompositionBase<Real_t>> prec_lu; // banded, block-tridiagonal, sparse, split LU or multigrid
+    vector<Real_t> jac_cache_tdiag; // transport part of the diagonal of jac_cache (operator splitting)
+    bool update_prec_cache = false;
+    Real_t old_gamma;
+}; // class SolverState
 
 } // namespace chemreac
 #endif // CHEMREAC_PVHQOBGMVZECTIJSMOKFUXJXXM
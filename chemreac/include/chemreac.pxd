@@ -6,10 +6,16 @@ from libcpp.vector cimport vector
 from libcpp.utility cimport pair
 from libcpp.unordered_map cimport unordered_map
 from libcpp.string cimport string
+from libcpp.memory cimport unique_ptr
 
 from anyode cimport Info
 
 cdef extern from "chemreac.hpp" namespace "chemreac":
+    string get_simd_isa() except +
+
+    cdef cppclass Workspace[T]:
+        pass
+
     cdef cppclass ReactionDiffusion[T]:
         # (Private)
         T * lap_weight
@@ -36,6 +42,8 @@ cdef extern from "chemreac.hpp" namespace "chemreac":
         vector[int] modulated_rxns
         vector[vector[T]] modulation
         T ilu_limit
+        long par_threshold_rhs
+        long par_threshold_jac
         int n_jac_diags
         bool use_log2
         bool clip_to_pos
@@ -43,15 +51,7 @@ cdef extern from "chemreac.hpp" namespace "chemreac":
         vector[T] gradD
         T * xc
 
-        long nfev
-        long njev
-        long nprec_setup
-        long nprec_solve
-        long njacvec_dot
-        long nprec_solve_ilu
-        long nprec_solve_lu
-
-        Info current_info
+        vector[int] sparse_colptrs, sparse_rowvals
 
         ReactionDiffusion(int,
                           const vector[vector[int]],
@@ -86,15 +86,55 @@ cdef extern from "chemreac.hpp" namespace "chemreac":
                           bool
                           ) except +
         void zero_counters() except +
-        void rhs(T, const T * const, T * const) except +
-        void dense_jac_rmaj(T, const T * const, const T * const, T * const, long int) except +
-        void dense_jac_cmaj(T, const T * const, const T * const, T * const, long int) except +
-        void banded_jac_cmaj(T, const T * const, const T * const, T * const, long int) except +
-        void compressed_jac_cmaj(T, const T * const, const T * const, T * const, long int) except +
+        long get_nfev()
+        long get_njev()
+        long get_nstate_reuse()
+        void rhs(T, const T * const, T * const) nogil except +
+        void dense_jac_rmaj(T, const T * const, const T * const, T * const, long int) nogil except +
+        void dense_jac_cmaj(T, const T * const, const T * const, T * const, long int) nogil except +
+        void banded_jac_cmaj(T, const T * const, const T * const, T * const, long int) nogil except +
+        void compressed_jac_cmaj(T, const T * const, const T * const, T * const, long int) nogil except +
+        void sparse_jac_csc(T, const T * const, const T * const, T * const, int * const, int * const) nogil except +
+        unique_ptr[Workspace[T]] make_workspace() except +
+        int get_nthreads() except +
+        void set_nthreads(int) except +
+        void calibrate_parallel(int) nogil except +
+        void rhs(T, const T * const, T * const, Workspace[T]&) nogil except +
+        void dense_jac_rmaj(T, const T * const, const T * const, T * const, long int, Workspace[T]&) nogil except +
+        void dense_jac_cmaj(T, const T * const, const T * const, T * const, long int, Workspace[T]&) nogil except +
+        void banded_jac_cmaj(T, const T * const, const T * const, T * const, long int, Workspace[T]&) nogil except +
+        void compressed_jac_cmaj(T, const T * const, const T * const, T * const, long int, Workspace[T]&) nogil except +
+        void sparse_jac_csc(T, const T * const, const T * const, T * const, int * const, int * const,
+                            Workspace[T]&) nogil except +
+        int get_nnz() except +
+        bool is_linear() except +
+        void update_sparse_pattern() except +
+        void update_k_eff() except +
+        void update_transport_jac() except +
+        void invalidate_state_cache() except +
+        const vector[int]& get_sparse_order() except +
 
         void per_rxn_contrib_to_fi(T, const T * const, int, T * const) except +
         int get_geom_as_int() except +
-        void calc_efield(const T * const) except +
+        int get_prec_factorization_as_int() except +
+        void set_prec_factorization_from_int(int) except +
+        int get_jtimes_mode_as_int() except +
+        void set_jtimes_mode_from_int(int) except +
+        void calc_efield(const T * const) nogil except +
 
         int stencil_bi_lbound_(int) except +
         int xc_bi_map_(int) except +
+
+    cdef cppclass SolverState[T]:
+        int nfev, njev
+        long nprec_setup
+        long nprec_solve
+        long njacvec_dot
+        long nprec_solve_ilu
+        long nprec_solve_lu
+        long nprec_factor_ilu
+        long nprec_factor_lu
+        long nprec_reuse_lu
+        Info current_info
+
+        SolverState(const ReactionDiffusion[T]&, int) except +
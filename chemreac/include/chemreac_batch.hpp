@@ -0,0 +1,310 @@
+#pragma once
+
+// Batched implicit integration of many small single compartment (N == 1)
+// systems sharing one reaction network but differing in initial
+// concentrations and rate coefficients.
+//
+// Members are processed in blocks which are advanced in lock-step using
+// structure-of-arrays storage: element i of member b in a block of nb
+// members is stored at [i*nb + b], so that every kernel (rates, Jacobian,
+// LU factorization, substitution) has a contiguous innermost loop over
+// members. Every member has its own step size control, members which have
+// reached the last output (or failed) are masked.
+//
+// Method: ROS3 (Sandu et al. 1997), a 3-stage L-stable Rosenbrock method
+// of order 3 with an embedded method of order 2. The iteration matrix
+// I/(gamma*h) - J is factorized without pivoting (as in KPP): a zero or
+// non-finite pivot rejects the step of that member.
+
+#include <algorithm>
+#include <cmath>
+#include <limits>
+#include <stdexcept>
+#include <vector>
+#include "chemreac.hpp"
+#include "chemreac_stepping.hpp"
+
+namespace chemreac {
+
+template <typename Real_t = double>
+class BatchRosenbrock {
+    // Compressed network: per reaction the active reactants (with their
+    // orders) and the non-zero net stoichiometric coefficients.
+    std::vector<int> actv_ptr, actv_si, actv_order;
+    const std::vector<int> net_ptr, net_si, net_coeff;
+
+    static constexpr Real_t gamma = 0.43586652150845899941601945119356;
+    static constexpr Real_t c21 = -1.0156171083877702091975600115545;
+    static constexpr Real_t c31 = 4.0759956452537699824805835358067;
+    static constexpr Real_t c32 = 9.2076794298330791242156818474003;
+    static constexpr Real_t m1 = 1.0;
+    static constexpr Real_t m2 = 6.1697947043828245592553615689730;
+    static constexpr Real_t m3 = -0.42772256543218573326238373806514;
+    static constexpr Real_t e1 = 0.5;
+    static constexpr Real_t e2 = -2.9079558716805469821718236208017;
+    static constexpr Real_t e3 = 0.22354069897811569627360909276199;
+
+public:
+    const int n, nr;
+    int block_size = 64;
+    StepControl<Real_t> step_control;
+
+    // per_bin: members are the bins of rd (linear concentrations, rate coefficients
+    // from rd.k_eff, i.e. k with the per bin modulation applied), see SplitIntegrator.
+    BatchRosenbrock(const ReactionDiffusion<Real_t> &rd, bool per_bin=false) :
+        net_ptr(rd.net_ptr), net_si(rd.net_si), net_coeff(rd.net_coeff), n(rd.n), nr(rd.nr),
+        step_control{3, 0.2, 6.0, 0.9, 0.2} {
+        if (rd.N != 1 && !per_bin)
+            throw std::invalid_argument("BatchRosenbrock requires N == 1");
+        if ((rd.logy || rd.logt) && !per_bin)
+            throw std::invalid_argument("BatchRosenbrock does not support logy/logt");
+        if (rd.fields.size() > 0 || (rd.modulated_rxns.size() > 0 && !per_bin))
+            throw std::invalid_argument("BatchRosenbrock does not support fields or modulation");
+        actv_ptr.push_back(0);
+        for (int ri=0; ri<nr; ++ri){
+            for (int si=0; si<n; ++si){
+                if (rd.coeff_active[ri*n + si]){
+                    actv_si.push_back(si);
+                    actv_order.push_back(rd.coeff_active[ri*n + si]);
+                }
+            }
+            actv_ptr.push_back(actv_si.size());
+        }
+    }
+
+    // y0: (nmembers, n), k: (nmembers, nr), yout: (nmembers, nt, n).
+    // mxsteps: maximum number of (accepted and rejected) steps between two outputs,
+    // nreached < nt signals failure (unreached rows of yout are NaN).
+    void predefined(const int nmembers, const Real_t * const y0, const Real_t * const k,
+                    const std::size_t nt, const Real_t * const tout, Real_t * const yout,
+                    const std::vector<Real_t> &atol, const Real_t rtol,
+                    const Real_t dx0, const Real_t dx_min, const Real_t dx_max, const long int mxsteps,
+                    int * const nreached, long int * const nsteps, long int * const nrejected,
+                    const int nthreads=1) const {
+        check_atol(atol, n);
+        const int nblocks = (nmembers + block_size - 1)/block_size;
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(dynamic) num_threads(nthreads)
+#endif
+        for (int bi=0; bi<nblocks; ++bi){
+            const int m0 = bi*block_size;
+            block_(std::min(block_size, nmembers - m0), y0 + m0*n, k + m0*nr, nt, tout, yout + m0*nt*n,
+                   atol, rtol, dx0, dx_min, dx_max, mxsteps, nreached + m0, nsteps + m0, nrejected + m0);
+        }
+#if !defined(_OPENMP)
+        (void)nthreads;
+#endif
+    }
+
+    void rates(const int nb, const Real_t * const ANYODE_RESTRICT k, const Real_t * const ANYODE_RESTRICT y,
+               Real_t * const ANYODE_RESTRICT r) const {
+        for (int ri=0; ri<nr; ++ri){
+            Real_t * const ANYODE_RESTRICT rr = r + ri*nb;
+            std::copy(k + ri*nb, k + (ri+1)*nb, rr);
+            for (int ai=actv_ptr[ri]; ai<actv_ptr[ri+1]; ++ai){
+                const Real_t * const ANYODE_RESTRICT ys = y + actv_si[ai]*nb;
+                for (int oi=0; oi<actv_order[ai]; ++oi)
+                    for (int b=0; b<nb; ++b)
+                        rr[b] *= ys[b];
+            }
+        }
+    }
+
+    void dydt(const int nb, const Real_t * const ANYODE_RESTRICT r, Real_t * const ANYODE_RESTRICT f) const {
+        std::fill(f, f + n*nb, Real_t(0));
+        for (int ri=0; ri<nr; ++ri){
+            for (int ni=net_ptr[ri]; ni<net_ptr[ri+1]; ++ni){
+                Real_t * const ANYODE_RESTRICT fs = f + net_si[ni]*nb;
+                const Real_t c = net_coeff[ni];
+                for (int b=0; b<nb; ++b)
+                    fs[b] += c*r[ri*nb + b];
+            }
+        }
+    }
+
+    // J[(si*n + dsi)*nb + b] = d(dydt[si])/d(y[dsi]) of member b, q: work array (nb)
+    void jac(const int nb, const Real_t * const ANYODE_RESTRICT k, const Real_t * const ANYODE_RESTRICT y,
+             Real_t * const ANYODE_RESTRICT J, Real_t * const ANYODE_RESTRICT q) const {
+        std::fill(J, J + n*n*nb, Real_t(0));
+        for (int ri=0; ri<nr; ++ri){
+            for (int di=actv_ptr[ri]; di<actv_ptr[ri+1]; ++di){
+                const int dsi = actv_si[di];
+                for (int b=0; b<nb; ++b)
+                    q[b] = actv_order[di]*k[ri*nb + b];
+                for (int oi=1; oi<actv_order[di]; ++oi)
+                    for (int b=0; b<nb; ++b)
+                        q[b] *= y[dsi*nb + b];
+                for (int ai=actv_ptr[ri]; ai<actv_ptr[ri+1]; ++ai){
+                    if (ai == di)
+                        continue;
+                    const Real_t * const ANYODE_RESTRICT ys = y + actv_si[ai]*nb;
+                    for (int oi=0; oi<actv_order[ai]; ++oi)
+                        for (int b=0; b<nb; ++b)
+                            q[b] *= ys[b];
+                }
+                for (int ni=net_ptr[ri]; ni<net_ptr[ri+1]; ++ni){
+                    Real_t * const ANYODE_RESTRICT js = J + (net_si[ni]*n + dsi)*nb;
+                    const Real_t c = net_coeff[ni];
+                    for (int b=0; b<nb; ++b)
+                        js[b] += c*q[b];
+                }
+            }
+        }
+    }
+
+private:
+    // In place LU factorization (no pivoting) of nb matrices, sets ok[b] = 0 for singular ones
+    void lu_factor_(const int nb, Real_t * const ANYODE_RESTRICT A, char * const ANYODE_RESTRICT ok,
+                    Real_t * const ANYODE_RESTRICT inv) const {
+        for (int p=0; p<n; ++p){
+            const Real_t * const ANYODE_RESTRICT App = A + (p*n + p)*nb;
+            for (int b=0; b<nb; ++b){
+                const bool good = App[b] != 0 && std::isfinite(App[b]);
+                ok[b] &= good;
+                inv[b] = good ? 1/App[b] : 0;
+            }
+            for (int i=p+1; i<n; ++i){
+                Real_t * const ANYODE_RESTRICT Aip = A + (i*n + p)*nb;
+                for (int b=0; b<nb; ++b)
+                    Aip[b] *= inv[b];
+                for (int j=p+1; j<n; ++j){
+                    Real_t * const ANYODE_RESTRICT Aij = A + (i*n + j)*nb;
+                    const Real_t * const ANYODE_RESTRICT Apj = A + (p*n + j)*nb;
+                    for (int b=0; b<nb; ++b)
+                        Aij[b] -= Aip[b]*Apj[b];
+                }
+            }
+        }
+    }
+
+    void lu_solve_(const int nb, const Real_t * const ANYODE_RESTRICT LU, Real_t * const ANYODE_RESTRICT x) const {
+        for (int i=1; i<n; ++i)
+            for (int j=0; j<i; ++j)
+                for (int b=0; b<nb; ++b)
+                    x[i*nb + b] -= LU[(i*n + j)*nb + b]*x[j*nb + b];
+        for (int i=n-1; i>=0; --i){
+            for (int j=i+1; j<n; ++j)
+                for (int b=0; b<nb; ++b)
+                    x[i*nb + b] -= LU[(i*n + j)*nb + b]*x[j*nb + b];
+            for (int b=0; b<nb; ++b)
+                x[i*nb + b] /= LU[(i*n + i)*nb + b];
+        }
+    }
+
+    void block_(const int nb, const Real_t * const y0, const Real_t * const k,
+                const std::size_t nt, const Real_t * const tout, Real_t * const yout,
+                const std::vector<Real_t> &atol, const Real_t rtol,
+                const Real_t dx0, const Real_t dx_min, const Real_t dx_max, const long int mxsteps,
+                int * const nreached, long int * const nsteps, long int * const nrejected) const {
+        enum : char {ACTIVE=0, DONE=1, FAILED=2};
+        std::vector<Real_t> kb(nr*nb), r(nr*nb), y(n*nb), ynew(n*nb), ytmp(n*nb), f(n*nb);
+        std::vector<Real_t> K1(n*nb), K2(n*nb), K3(n*nb), A(n*n*nb), q(nb);
+        std::vector<Real_t> t(nb, tout[0]), h(nb), hs(nb);
+        std::vector<char> status(nb, nt > 1 ? ACTIVE : DONE), ok(nb), rejected_last(nb, 0);
+        std::vector<int> iout(nb, 1);
+        std::vector<long int> nsteps_output(nb, 0);  // nsteps + nrejected at last output
+        for (int b=0; b<nb; ++b){
+            for (int ri=0; ri<nr; ++ri)
+                kb[ri*nb + b] = k[b*nr + ri];
+            for (int i=0; i<n; ++i)
+                yout[b*nt*n + i] = y[i*nb + b] = y0[b*n + i];
+            nsteps[b] = nrejected[b] = 0;
+        }
+        if (nt > 1){
+            // Initial step size (cf. Hairer, Norsett & Wanner, sec. II.4)
+            rates(nb, &kb[0], &y[0], &r[0]);
+            dydt(nb, &r[0], &f[0]);
+            for (int b=0; b<nb; ++b){
+                const Real_t span = tout[nt-1] - tout[0];
+                if (dx0 > 0) {
+                    h[b] = dx0;
+                } else {
+                    const Real_t d0 = weighted_rms(n, n, &y[b], &y[b], &y[b], atol, rtol, nb);
+                    const Real_t d1 = weighted_rms(n, n, &y[b], &y[b], &f[b], atol, rtol, nb);
+                    h[b] = (d0 < 1e-5 || d1 < 1e-5) ? 1e-6*span : 0.01*d0/d1;
+                    h[b] = std::min(h[b], span);
+                }
+                if (dx_max > 0)
+                    h[b] = std::min(h[b], dx_max);
+            }
+        }
+        while (std::find(status.begin(), status.end(), ACTIVE) != status.end()){
+            for (int b=0; b<nb; ++b){
+                // masked members take a dummy (discarded) unit step
+                hs[b] = (status[b] == ACTIVE) ? std::min(h[b], tout[iout[b]] - t[b]) : 1;
+                ok[b] = 1;
+            }
+            rates(nb, &kb[0], &y[0], &r[0]);
+            dydt(nb, &r[0], &f[0]);
+            jac(nb, &kb[0], &y[0], &A[0], &q[0]);
+            for (int i=0; i<n*n*nb; ++i)
+                A[i] = -A[i];
+            for (int i=0; i<n; ++i)
+                for (int b=0; b<nb; ++b)
+                    A[(i*n + i)*nb + b] += 1/(gamma*hs[b]);
+            lu_factor_(nb, &A[0], &ok[0], &q[0]);
+            for (int b=0; b<nb; ++b)  // keep masked & singular members finite
+                if (!ok[b])
+                    for (int i=0; i<n; ++i)
+                        for (int j=0; j<n; ++j)
+                            A[(i*n + j)*nb + b] = (i == j);
+            // Stage 1
+            std::copy(f.begin(), f.end(), K1.begin());
+            lu_solve_(nb, &A[0], &K1[0]);
+            // Stage 2 (a21 = 1)
+            for (int i=0; i<n*nb; ++i)
+                ytmp[i] = y[i] + K1[i];
+            rates(nb, &kb[0], &ytmp[0], &r[0]);
+            dydt(nb, &r[0], &f[0]);
+            for (int i=0; i<n; ++i)
+                for (int b=0; b<nb; ++b)
+                    K2[i*nb + b] = f[i*nb + b] + c21/hs[b]*K1[i*nb + b];
+            lu_solve_(nb, &A[0], &K2[0]);
+            // Stage 3 (a31 = 1, a32 = 0: same stage value as stage 2)
+            for (int i=0; i<n; ++i)
+                for (int b=0; b<nb; ++b)
+                    K3[i*nb + b] = f[i*nb + b] + (c31*K1[i*nb + b] + c32*K2[i*nb + b])/hs[b];
+            lu_solve_(nb, &A[0], &K3[0]);
+            for (int i=0; i<n*nb; ++i){
+                ynew[i] = y[i] + m1*K1[i] + m2*K2[i] + m3*K3[i];
+                ytmp[i] = e1*K1[i] + e2*K2[i] + e3*K3[i];
+            }
+            // Per member step size control
+            for (int b=0; b<nb; ++b){
+                if (status[b] != ACTIVE)
+                    continue;
+                const Real_t err = weighted_rms(n, n, &y[b], &ynew[b], &ytmp[b], atol, rtol, nb);
+                const bool accepted = step_control.update(hs[b], h[b], err, ok[b], rejected_last[b]);
+                rejected_last[b] = !accepted;
+                if (accepted){
+                    const bool to_output = hs[b] == tout[iout[b]] - t[b];
+                    t[b] += hs[b];
+                    for (int i=0; i<n; ++i)
+                        y[i*nb + b] = ynew[i*nb + b];
+                    ++nsteps[b];
+                    if (to_output){
+                        t[b] = tout[iout[b]];
+                        for (int i=0; i<n; ++i)
+                            yout[(b*nt + iout[b])*n + i] = y[i*nb + b];
+                        if (static_cast<std::size_t>(++iout[b]) == nt)
+                            status[b] = DONE;
+                        nsteps_output[b] = nsteps[b] + nrejected[b];
+                    }
+                } else {
+                    ++nrejected[b];
+                }
+                if (dx_max > 0)
+                    h[b] = std::min(h[b], dx_max);
+                if (status[b] == ACTIVE && (nsteps[b] + nrejected[b] - nsteps_output[b] >= mxsteps ||
+                                               h[b] < StepControl<Real_t>::h_min(t[b], dx_min)))
+                    status[b] = FAILED;
+            }
+        }
+        for (int b=0; b<nb; ++b){
+            nreached[b] = iout[b];
+            std::fill(yout + (b*nt + iout[b])*n, yout + (b*nt + nt)*n, std::numeric_limits<Real_t>::quiet_NaN());
+        }
+    }
+};
+
+}
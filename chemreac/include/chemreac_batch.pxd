@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+# -*- mode: cython-mode -*-
+
+from libcpp.vector cimport vector
+from chemreac cimport ReactionDiffusion
+
+cdef extern from "chemreac_batch.hpp" namespace "chemreac":
+    cdef cppclass BatchRosenbrock[T]:
+        int block_size
+        BatchRosenbrock(const ReactionDiffusion[T]&) except +
+        void predefined(int, const T * const, const T * const, size_t, const T * const, T * const,
+                        const vector[T]&, T, T, T, T, long int, int * const, long int * const,
+                        long int * const, int) nogil except +
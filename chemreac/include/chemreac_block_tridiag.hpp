@@ -0,0 +1,294 @@
+#pragma once
+
+// Direct solvers for the block-tridiagonal matrices assembled by
+// ReactionDiffusion::compressed_jac_cmaj when n_jac_diags == 1:
+// dense n x n blocks on the diagonal and diagonal n x n blocks on
+// the sub- and super-diagonal (no periodic "saturating" corners).
+
+#include <algorithm>
+#include <stdexcept>
+#include <utility>
+#include <vector>
+#include "block_diag_ilu.hpp"
+#include "anyode/anyode.hpp"
+#include "anyode/anyode_decomposition.hpp"
+
+extern "C" void dgetri_(const int* n, double* a, const int* lda, const int* ipiv,
+                        double* work, const int* lwork, int* info);
+extern "C" void sgetri_(const int* n, float* a, const int* lda, const int* ipiv,
+                        float* work, const int* lwork, int* info);
+
+namespace chemreac {
+
+    template<typename T> struct getri_callback;
+    template<> struct getri_callback<double> {
+        template<class...Args> void operator()(Args&&... args) const noexcept { dgetri_(std::forward<Args>(args)...); }
+    };
+    template<> struct getri_callback<float> {
+        template<class...Args> void operator()(Args&&... args) const noexcept { sgetri_(std::forward<Args>(args)...); }
+    };
+
+    template <typename Real_t>
+    void check_block_tridiag_(const block_diag_ilu::BlockDiagMatrix<Real_t>& source)
+    {
+        if (source.m_nsat != 0)
+            throw std::runtime_error("Periodic (saturated) matrices not supported.");
+        if (source.m_nblocks > 1 && source.m_ndiag != 1)
+            throw std::runtime_error("Block-tridiagonal solvers require ndiag == 1.");
+    }
+
+    // c -= a*b (all n x n, column major, leading dimension n)
+    template <typename Real_t>
+    void block_gemm_sub_(const int n, const Real_t * const ANYODE_RESTRICT a,
+                         const Real_t * const ANYODE_RESTRICT b, Real_t * const ANYODE_RESTRICT c)
+    {
+        for (int ci=0; ci<n; ++ci)
+            for (int ki=0; ki<n; ++ki){
+                const Real_t bkc = b[ci*n + ki];
+                if (bkc == 0) continue;
+                for (int ri=0; ri<n; ++ri)
+                    c[ci*n + ri] -= a[ki*n + ri]*bkc;
+            }
+    }
+
+    // y -= a*x (a: n x n column major)
+    template <typename Real_t>
+    void block_gemv_sub_(const int n, const Real_t * const ANYODE_RESTRICT a,
+                         const Real_t * const ANYODE_RESTRICT x, Real_t * const ANYODE_RESTRICT y)
+    {
+        for (int ci=0; ci<n; ++ci)
+            for (int ri=0; ri<n; ++ri)
+                y[ri] -= a[ci*n + ri]*x[ci];
+    }
+
+    template <typename Real_t = double>
+    struct BlockTridiagLU : public AnyODE::DecompositionBase<Real_t> {
+        // Block Thomas algorithm on the Schur complements
+        //     D'_0 = D_0,  D'_i = D_i - A_i D'_{i-1}^-1 C_{i-1}
+        // exploiting that A_i (sub) and C_i (sup) are diagonal: with D'_i^-1 at
+        // hand the update is a scaling of its rows and columns and the sweeps
+        // are plain matrix-vector products. Cost: 2*N*n**3 flops, N*n**2 memory,
+        // no fill outside the blocks.
+        const int m_nblocks, m_blockw;
+        std::vector<Real_t> m_diag; // D'_i^-1 after factorize()
+        std::vector<Real_t> m_sub, m_sup; // diagonals of A_{i+1}, C_i
+        std::vector<int> m_ipiv;
+        std::vector<Real_t> m_work;
+
+        BlockTridiagLU(const block_diag_ilu::BlockDiagMatrix<Real_t>& source) :
+            m_nblocks(source.m_nblocks), m_blockw(source.m_blockw),
+            m_diag(m_nblocks*m_blockw*m_blockw),
+            m_sub((m_nblocks - 1)*m_blockw), m_sup((m_nblocks - 1)*m_blockw),
+            m_ipiv(m_blockw), m_work(m_blockw*m_blockw)
+        {
+            check_block_tridiag_(source);
+            const int n = m_blockw;
+            for (int bi=0; bi<m_nblocks; ++bi){
+                for (int ci=0; ci<n; ++ci)
+                    for (int ri=0; ri<n; ++ri)
+                        m_diag[(bi*n + ci)*n + ri] = source.block(bi, ri, ci);
+                if (bi < m_nblocks - 1)
+                    for (int li=0; li<n; ++li){
+                        m_sub[bi*n + li] = source.sub(0, bi, li);
+                        m_sup[bi*n + li] = source.sup(0, bi, li);
+                    }
+            }
+        }
+        int factorize() override final {
+            int n = m_blockw;
+            int lwork = n*n;
+            constexpr AnyODE::getrf_callback<Real_t> getrf{};
+            constexpr getri_callback<Real_t> getri{};
+            int info = 0;
+            for (int bi=0; bi<m_nblocks; ++bi){
+                Real_t * const dblk = &m_diag[bi*n*n];
+                if (bi > 0){
+                    const Real_t * const prev = &m_diag[(bi-1)*n*n];
+                    const Real_t * const a = &m_sub[(bi-1)*n];
+                    const Real_t * const c = &m_sup[(bi-1)*n];
+                    for (int ci=0; ci<n; ++ci)
+                        for (int ri=0; ri<n; ++ri)
+                            dblk[ci*n + ri] -= a[ri]*prev[ci*n + ri]*c[ci];
+                }
+                getrf(&n, &n, dblk, &n, &m_ipiv[0], &info);
+                if (info != 0)
+                    return info;
+                getri(&n, dblk, &n, &m_ipiv[0], &m_work[0], &lwork, &info);
+                if (info != 0)
+                    return info;
+            }
+            return info;
+        }
+        int solve(const Real_t * const b, Real_t * const x) override final {
+            const int n = m_blockw;
+            Real_t * const tmp = &m_work[0];
+            for (int bi=0; bi<m_nblocks; ++bi){ // forward sweep: x_i = D'_i^-1 (b_i - A_i x_{i-1})
+                for (int li=0; li<n; ++li)
+                    tmp[li] = (bi > 0) ? b[bi*n + li] - m_sub[(bi-1)*n + li]*x[(bi-1)*n + li] : b[bi*n + li];
+                std::fill(x + bi*n, x + (bi+1)*n, Real_t(0));
+                block_gemv_sub_(n, &m_diag[bi*n*n], tmp, x + bi*n);
+                for (int li=0; li<n; ++li)
+                    x[bi*n + li] = -x[bi*n + li];
+            }
+            for (int bi=m_nblocks-2; bi>=0; --bi){ // back substitution: x_i -= D'_i^-1 C_i x_{i+1}
+                for (int li=0; li<n; ++li)
+                    tmp[li] = m_sup[bi*n + li]*x[(bi+1)*n + li];
+                block_gemv_sub_(n, &m_diag[bi*n*n], tmp, x + bi*n);
+            }
+            return 0;
+        }
+    };
+
+    template <typename Real_t = double>
+    struct BlockCyclicReductionLU : public AnyODE::DecompositionBase<Real_t> {
+        // Block cyclic reduction: each level eliminates the odd block rows,
+        // halving the system. All block operations within a level are
+        // independent and are distributed over OpenMP threads (when enabled).
+        // Requires roughly twice the flops of BlockTridiagLU, so it only pays
+        // off for large N with several threads available.
+        struct Level {
+            int nb;
+            // For block row j: A (coupling to j-1), B (diagonal), C (coupling to j+1).
+            // After factorize() odd rows hold LU(B_j), U_j = B_j^-1 A_j and V_j = B_j^-1 C_j.
+            std::vector<Real_t> A, B, C, r;
+            std::vector<int> ipiv;
+            Level(int nb, int n) : nb(nb), A(nb*n*n, 0), B(nb*n*n, 0), C(nb*n*n, 0),
+                                   r(nb*n), ipiv(nb*n) {}
+        };
+        const int m_nblocks, m_blockw;
+        const int m_omp_min_work; // skip threading for small levels
+        const int m_nthreads; // OpenMP team size
+        std::vector<Level> m_levels;
+
+        BlockCyclicReductionLU(const block_diag_ilu::BlockDiagMatrix<Real_t>& source,
+                               int omp_min_work=65536, int nthreads=1) :
+            m_nblocks(source.m_nblocks), m_blockw(source.m_blockw), m_omp_min_work(omp_min_work),
+            m_nthreads(nthreads)
+        {
+            check_block_tridiag_(source);
+            const int n = m_blockw;
+            for (int nb=m_nblocks; ; nb = (nb + 1)/2){
+                m_levels.emplace_back(nb, n);
+                if (nb == 1)
+                    break;
+            }
+            Level& lvl = m_levels[0];
+            for (int bi=0; bi<m_nblocks; ++bi){
+                for (int ci=0; ci<n; ++ci)
+                    for (int ri=0; ri<n; ++ri)
+                        lvl.B[(bi*n + ci)*n + ri] = source.block(bi, ri, ci);
+                if (bi < m_nblocks - 1)
+                    for (int li=0; li<n; ++li){
+                        lvl.A[((bi+1)*n + li)*n + li] = source.sub(0, bi, li);
+                        lvl.C[(bi*n + li)*n + li] = source.sup(0, bi, li);
+                    }
+            }
+        }
+        int factorize() override final {
+            int n = m_blockw;
+            const int nn = n*n;
+            const char trans = 'N';
+            for (std::size_t li=0; li+1<m_levels.size(); ++li){
+                Level& cur = m_levels[li];
+                Level& nxt = m_levels[li+1];
+                std::fill(nxt.A.begin(), nxt.A.end(), Real_t(0));
+                std::fill(nxt.C.begin(), nxt.C.end(), Real_t(0));
+                const int nelim = cur.nb/2;
+                int failed = 0;
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(static) num_threads(m_nthreads) reduction(|:failed) if (nelim*nn*n > m_omp_min_work)
+#endif
+                for (int k=0; k<nelim; ++k){
+                    const int j = 2*k + 1;
+                    int info;
+                    constexpr AnyODE::getrf_callback<Real_t> getrf{};
+                    constexpr AnyODE::getrs_callback<Real_t> getrs{};
+                    getrf(&n, &n, &cur.B[j*nn], &n, &cur.ipiv[j*n], &info);
+                    if (info != 0) {
+                        failed |= 1;
+                        continue;
+                    }
+                    getrs(&trans, &n, &n, &cur.B[j*nn], &n, &cur.ipiv[j*n], &cur.A[j*nn], &n, &info);
+                    getrs(&trans, &n, &n, &cur.B[j*nn], &n, &cur.ipiv[j*n], &cur.C[j*nn], &n, &info);
+                }
+                if (failed)
+                    return 1;
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(static) num_threads(m_nthreads) if (cur.nb*nn > m_omp_min_work)
+#endif
+                for (int k=0; k<nxt.nb; ++k){
+                    const int i = 2*k;
+                    std::copy(&cur.B[i*nn], &cur.B[(i+1)*nn], &nxt.B[k*nn]);
+                    if (i > 0){ // eliminate row i-1
+                        block_gemm_sub_(n, &cur.A[i*nn], &cur.C[(i-1)*nn], &nxt.B[k*nn]);
+                        block_gemm_sub_(n, &cur.A[i*nn], &cur.A[(i-1)*nn], &nxt.A[k*nn]);
+                    }
+                    if (i < cur.nb - 1){ // eliminate row i+1
+                        block_gemm_sub_(n, &cur.C[i*nn], &cur.A[(i+1)*nn], &nxt.B[k*nn]);
+                        block_gemm_sub_(n, &cur.C[i*nn], &cur.C[(i+1)*nn], &nxt.C[k*nn]);
+                    }
+                }
+            }
+            Level& last = m_levels.back();
+            int info;
+            constexpr AnyODE::getrf_callback<Real_t> getrf{};
+            getrf(&n, &n, &last.B[0], &n, &last.ipiv[0], &info);
+            return info;
+        }
+        int solve(const Real_t * const b, Real_t * const x) override final {
+            const int n = m_blockw;
+            const int nn = n*n;
+            const int nrhs = 1;
+            const char trans = 'N';
+            std::copy(b, b + m_nblocks*n, m_levels[0].r.begin());
+            for (std::size_t li=0; li+1<m_levels.size(); ++li){ // reduction
+                Level& cur = m_levels[li];
+                Level& nxt = m_levels[li+1];
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(static) num_threads(m_nthreads) if (cur.nb*nn > m_omp_min_work)
+#endif
+                for (int k=0; k<cur.nb/2; ++k){
+                    const int j = 2*k + 1;
+                    int info;
+                    constexpr AnyODE::getrs_callback<Real_t> getrs{};
+                    getrs(&trans, &n, &nrhs, &cur.B[j*nn], &n, &cur.ipiv[j*n], &cur.r[j*n], &n, &info);
+                }
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(static) num_threads(m_nthreads) if (cur.nb*nn > m_omp_min_work)
+#endif
+                for (int k=0; k<nxt.nb; ++k){
+                    const int i = 2*k;
+                    std::copy(&cur.r[i*n], &cur.r[(i+1)*n], &nxt.r[k*n]);
+                    if (i > 0)
+                        block_gemv_sub_(n, &cur.A[i*nn], &cur.r[(i-1)*n], &nxt.r[k*n]);
+                    if (i < cur.nb - 1)
+                        block_gemv_sub_(n, &cur.C[i*nn], &cur.r[(i+1)*n], &nxt.r[k*n]);
+                }
+            }
+            Level& last = m_levels.back();
+            int info;
+            constexpr AnyODE::getrs_callback<Real_t> getrs{};
+            getrs(&trans, &n, &nrhs, &last.B[0], &n, &last.ipiv[0], &last.r[0], &n, &info);
+            if (info != 0)
+                return info;
+            for (int li=static_cast<int>(m_levels.size())-2; li>=0; --li){ // back substitution
+                Level& cur = m_levels[li];
+                const Level& nxt = m_levels[li+1];
+                for (int k=0; k<nxt.nb; ++k)
+                    std::copy(&nxt.r[k*n], &nxt.r[(k+1)*n], &cur.r[2*k*n]);
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(static) num_threads(m_nthreads) if (cur.nb*nn > m_omp_min_work)
+#endif
+                for (int k=0; k<cur.nb/2; ++k){
+                    const int j = 2*k + 1;
+                    block_gemv_sub_(n, &cur.A[j*nn], &cur.r[(j-1)*n], &cur.r[j*n]);
+                    if (j < cur.nb - 1)
+                        block_gemv_sub_(n, &cur.C[j*nn], &cur.r[(j+1)*n], &cur.r[j*n]);
+                }
+            }
+            std::copy(m_levels[0].r.begin(), m_levels[0].r.end(), x);
+            return 0;
+        }
+    };
+
+}
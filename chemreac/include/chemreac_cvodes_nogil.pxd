@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# -*- mode: cython-mode -*-
+
+# Same as cvodes_anyode.pxd from pycvodes but declared nogil (the
+# cvodes_anyode_nogil.pxd shipped with pycvodes 0.11.1 is out of date).
+
+from libcpp cimport bool
+from libcpp.vector cimport vector
+from cvodes_cxx cimport LMM, IterType, LinSol
+
+cdef extern from "cvodes_anyode.hpp" namespace "cvodes_anyode":
+    cdef int simple_adaptive[U](
+        double **,
+        int *,
+        U * const,
+        vector[double],
+        double,
+        LMM,
+        const double,
+        vector[int]&,
+        long int,
+        double,
+        double,
+        double,
+        bool,
+        IterType,
+        LinSol,
+        int,
+        double,
+        unsigned,
+        bool,
+        int,
+        bool,
+        bool,
+        int,
+        double **
+    ) nogil except +
+
+    cdef int simple_predefined[U](
+        U * const,
+        vector[double],
+        double,
+        LMM,
+        const double * const,
+        size_t,
+        const double * const,
+        double * const,
+        vector[int]&,
+        vector[double]&,
+        long int,
+        double,
+        double,
+        double,
+        bool,
+        IterType,
+        LinSol,
+        int,
+        double,
+        unsigned,
+        int,
+        bool,
+        bool,
+        double *
+    ) nogil except +
@@ -0,0 +1,133 @@
+#pragma once
+
+// Ensemble integration: many independent CVODE runs of one reaction
+// network (differing in initial conditions, rate constants and/or
+// fields) distributed over threads. Every thread owns one SolverState
+// (work buffers, preconditioner storage) and one CVODE integrator,
+// both reused for all members processed by that thread. The model is
+// shared by all threads unless the members differ in k or fields
+// (then every thread needs a copy of its own).
+
+#include <algorithm>
+#include <limits>
+#include <memory>
+#include <vector>
+#if defined(_OPENMP)
+#include <omp.h>
+#endif
+#include <stdexcept>
+#include "cvodes_anyode.hpp"
+#include "chemreac.hpp"
+
+namespace chemreac {
+
+    using cvodes_cxx::LMM;
+    using cvodes_cxx::IterType;
+    using cvodes_cxx::LinSol;
+
+    template <typename Real_t>
+    void ensemble_predefined(const std::vector<ReactionDiffusion<Real_t> *> &models, // one, or one per thread
+                             const int nthreads,
+                             const int prec_factorization, // see SolverState
+                             const int nmembers,
+                             const double * const y0,      // (nmembers, ny)
+                             const double * const k,       // (nmembers, nr) or nullptr
+                             const double * const fields,  // (nmembers, ng, N) or nullptr
+                             const std::vector<double> &atol,
+                             const double rtol,
+                             const LMM lmm,
+                             const std::size_t nt,
+                             const double * const tout,
+                             double * const yout,          // (nmembers, nt, ny)
+                             int * const nreached,         // (nmembers,)
+                             long int * const nfev,        // (nmembers,)
+                             long int * const njev,        // (nmembers,)
+                             long int * const nsteps,      // (nmembers,)
+                             const long int mxsteps,
+                             const double dx0,
+                             const double dx_min,
+                             const double dx_max,
+                             const bool with_jacobian,
+                             IterType iter_type,
+                             LinSol linear_solver,
+                             const int maxl,
+                             const double eps_lin,
+                             const int autorestart,
+                             const bool with_jtimes)
+    {
+        // Members which fail (or throw) are reported through nreached < nt,
+        // unreached output rows are filled with NaN.
+        using OdeSys = SolverState<Real_t>;
+        if (nthreads < 1 || (models.size() != 1 && models.size() != static_cast<std::size_t>(nthreads)))
+            throw std::invalid_argument("Need one model, or one per thread");
+        if ((k || fields) && models.size() != static_cast<std::size_t>(nthreads))
+            throw std::invalid_argument("Per member k or fields need one model per thread");
+        const int ny = models[0]->get_ny();
+        if (iter_type == IterType::Undecided)
+            iter_type = (lmm == LMM::Adams) ? IterType::Functional : IterType::Newton;
+        if (linear_solver == LinSol::DEFAULT)
+            linear_solver = (models[0]->get_mlower() == -1) ? LinSol::DENSE : LinSol::BANDED;
+        if (prec_factorization != -1)
+            models[0]->prec_factorization_from_int(prec_factorization); // throws here rather than in the threads
+#if defined(_OPENMP)
+#pragma omp parallel num_threads(nthreads)
+#endif
+        {
+#if defined(_OPENMP)
+            ReactionDiffusion<Real_t> * const model = models[(models.size() == 1) ? 0 : omp_get_thread_num()];
+#else
+            ReactionDiffusion<Real_t> * const model = models[0];
+#endif
+            OdeSys state(*model, prec_factorization);
+            OdeSys * const odesys = &state;
+            std::unique_ptr<cvodes_cxx::Integrator> integr;
+            std::vector<double> atol_ = atol;
+            std::vector<int> root_indices;
+            std::vector<double> root_out;
+#if defined(_OPENMP)
+#pragma omp for schedule(dynamic)
+#endif
+            for (int mi=0; mi<nmembers; ++mi){
+                const double * const y0_ = y0 + mi*ny;
+                double * const yout_ = yout + mi*nt*ny;
+                nreached[mi] = 0;
+                nsteps[mi] = 0;
+                try {
+                    if (k){
+                        std::copy(k + mi*model->nr, k + (mi+1)*model->nr, model->k.begin());
+                        model->update_k_eff();
+                    }
+                    if (fields){
+                        const int ng = model->fields.size();
+                        for (int gi=0; gi<ng; ++gi)
+                            std::copy(fields + (mi*ng + gi)*model->N, fields + (mi*ng + gi + 1)*model->N,
+                                      model->fields[gi].begin());
+                        model->invalidate_state_cache();
+                    }
+                    odesys->zero_counters();
+                    const double h0 = (dx0 == 0.0) ? odesys->get_dx0(tout[0], y0_) : dx0;
+                    if (!integr){
+                        integr = cvodes_anyode::get_integrator<OdeSys>(
+                            odesys, atol_, rtol, lmm, y0_, tout[0], mxsteps, h0, dx_min, dx_max,
+                            with_jacobian, iter_type, linear_solver, maxl, eps_lin, with_jtimes);
+                        odesys->integrator = static_cast<void*>(integr.get());
+                    } else {
+                        integr->set_init_step(h0);  // predefined() re-initializes CVODE
+                    }
+                    root_indices.clear();
+                    root_out.clear();
+                    nreached[mi] = integr->predefined(nt, tout, y0_, yout_, 0, root_indices, root_out,
+                                                      autorestart, true);
+                    nsteps[mi] = integr->get_n_steps();
+                } catch (...) {
+                    integr.reset();  // do not trust the state of a failed integrator
+                }
+                nfev[mi] = odesys->nfev;
+                njev[mi] = odesys->njev;
+                std::fill(yout_ + std::max(nreached[mi], 0)*ny, yout_ + nt*ny,
+                          std::numeric_limits<double>::quiet_NaN());
+            }
+        }
+    }
+
+}
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# -*- mode: cython-mode -*-
+
+from libcpp cimport bool
+from libcpp.vector cimport vector
+from cvodes_cxx cimport LMM, IterType, LinSol
+from chemreac cimport ReactionDiffusion
+
+cdef extern from "chemreac_ensemble.hpp" namespace "chemreac":
+    cdef void ensemble_predefined(
+        const vector[ReactionDiffusion[double]*]&,
+        int,
+        int,
+        int,
+        const double * const,
+        const double * const,
+        const double * const,
+        const vector[double]&,
+        double,
+        LMM,
+        size_t,
+        const double * const,
+        double * const,
+        int * const,
+        long int * const,
+        long int * const,
+        long int * const,
+        long int,
+        double,
+        double,
+        double,
+        bool,
+        IterType,
+        LinSol,
+        int,
+        double,
+        int,
+        bool
+    ) nogil except +
@@ -0,0 +1,456 @@
+#pragma once
+
+// Exponential propagation of linear systems (ReactionDiffusion::is_linear):
+// rhs is affine in y, y' = A*y + b, with A the (constant) Jacobian and b the
+// source terms (zeroth order reactions, fields times g_values), hence
+//
+//     y(t) = exp((t - t0)*Ahat) [y(t0); 1],   Ahat = [A b; 0 0]
+//
+// which is evaluated at the output times directly (no time stepping error):
+//
+//     N == 1: "bateman": generalised Bateman solution of acyclic networks
+//             (Parlett's recurrence on the triangular, permuted, Ahat) with
+//             well separated rates; for short times (or when not applicable:
+//             cycles, equal rates) "pade": scaling & squaring of the diagonal
+//             Pade approximant of degree 6 on the dense Ahat.
+//     N > 1:  "krylov": Arnoldi approximation of the action of exp on a vector
+//             with step size control (Sidje 1998, Expokit's EXPV) using
+//             matrix-vector products with the compressed block Jacobian (with
+//             rhs differences when the stencil reaches beyond n_jac_diags).
+//
+// Concentrations are linear (logy is not linear), times are linear
+// irrespective of rd.logt.
+
+#include <algorithm>
+#include <cmath>
+#include <limits>
+#include <memory>
+#include <stdexcept>
+#include <string>
+#include <vector>
+#include "chemreac.hpp"
+#include "chemreac_stepping.hpp"
+
+namespace chemreac {
+
+// F := exp(A), A & F: m x m (column major). Diagonal Pade approximant of
+// degree 6 with scaling & squaring (cf. Expokit's DGPADM). Returns false if
+// the denominator is singular.
+template <typename Real_t>
+bool expm_pade(const int m, const Real_t * const A, Real_t * const F){
+    static constexpr Real_t c[7] = {1, 1.0/2, 5.0/44, 1.0/66, 1.0/792, 1.0/15840, 1.0/665280};
+    const int mm = m*m;
+    Real_t nrm = 0; // infinity norm
+    for (int ri=0; ri<m; ++ri){
+        Real_t rowsum = 0;
+        for (int ci=0; ci<m; ++ci)
+            rowsum += std::abs(A[ci*m + ri]);
+        nrm = std::max(nrm, rowsum);
+    }
+    const int s = (nrm > 0) ? std::max(0, static_cast<int>(std::log2(nrm)) + 2) : 0;
+    const Real_t scale = std::ldexp(Real_t(1), -s);
+    std::vector<Real_t> A1(mm), A2(mm), A4(mm), A6(mm), U(mm), V(mm), tmp(mm);
+    for (int i=0; i<mm; ++i)
+        A1[i] = scale*A[i];
+    auto matmul = [m](const Real_t * const X, const Real_t * const Y, Real_t * const Z){
+        std::fill(Z, Z + m*m, 0);
+        for (int ci=0; ci<m; ++ci)
+            for (int ki=0; ki<m; ++ki){
+                const Real_t y = Y[ci*m + ki];
+                if (y == 0) continue;
+                for (int ri=0; ri<m; ++ri)
+                    Z[ci*m + ri] += X[ki*m + ri]*y;
+            }
+    };
+    matmul(&A1[0], &A1[0], &A2[0]);
+    matmul(&A2[0], &A2[0], &A4[0]);
+    matmul(&A4[0], &A2[0], &A6[0]);
+    for (int i=0; i<mm; ++i){ // odd (U) and even (V) parts of the numerator
+        tmp[i] = c[3]*A2[i] + c[5]*A4[i];
+        V[i] = c[2]*A2[i] + c[4]*A4[i] + c[6]*A6[i];
+    }
+    for (int i=0; i<m; ++i){
+        tmp[i*m + i] += c[1];
+        V[i*m + i] += c[0];
+    }
+    matmul(&A1[0], &tmp[0], &U[0]);
+    for (int i=0; i<mm; ++i){ // (V - U) F = V + U
+        F[i] = V[i] + U[i];
+        tmp[i] = V[i] - U[i];
+    }
+    std::vector<int> ipiv(m);
+    int n_ = m, info;
+    const char trans = 'N';
+    constexpr AnyODE::getrf_callback<Real_t> getrf{};
+    constexpr AnyODE::getrs_callback<Real_t> getrs{};
+    getrf(&n_, &n_, &tmp[0], &n_, &ipiv[0], &info);
+    if (info != 0)
+        return false;
+    getrs(&trans, &n_, &n_, &tmp[0], &n_, &ipiv[0], F, &n_, &info);
+    for (int si=0; si<s; ++si){
+        std::copy(F, F + mm, tmp.begin());
+        matmul(&tmp[0], &tmp[0], F);
+    }
+    return true;
+}
+
+template <typename Real_t = double>
+class LinearPropagator {
+    const ReactionDiffusion<Real_t> &rd;
+    std::unique_ptr<Workspace<Real_t>> ws;
+    const int ny;
+    block_diag_ilu::BlockDiagMatrix<Real_t> jac; // A
+    std::vector<Real_t> b, f0; // b: source terms, f0: rhs at y = 0 (time variable of rd)
+    Real_t tfactor; // dt/d(time variable of rd) at rd's t == 0
+    Real_t anorm; // infinity norm of Ahat (scaled source column)
+    Real_t eta = 1; // scaling of the last component of [y; eta] (Krylov)
+    // N == 1
+    std::vector<Real_t> dense; // Ahat (na x na, column major)
+    std::vector<int> perm; // topological order: Ahat[perm, perm] is lower triangular
+    std::vector<int> reach; // (na x na) F[perm, perm][ri, ci] may be non-zero
+    Real_t min_gap = 0; // smallest |L[i, i] - L[j, j]| of the reachable pairs
+    // N > 1
+    std::vector<Real_t> V, H, Hs, F, p;
+
+    static constexpr Real_t bateman_min_tgap = 1e-2; // t*min_gap, otherwise Pade
+    static constexpr Real_t bateman_rel_gap = 1e-3;
+
+public:
+    const bool with_source; // b != 0
+    const int na; // size of Ahat
+    const bool jac_exact; // the stencil is within n_jac_diags
+    std::string method; // "bateman", "pade" or "krylov" (set by the constructor)
+    int krylov_dim = 30;
+    long nmatvec {0}, nkrylov_steps {0}, nkrylov_rejected {0}, nexpm {0}, nbateman {0};
+
+    LinearPropagator(const ReactionDiffusion<Real_t> &rd) :
+        rd(rd), ws(rd.make_workspace()), ny(rd.n*rd.N),
+        jac(nullptr, rd.N, rd.n, rd.n_jac_diags, (rd.geom == Geom::PERIODIC) ? rd.nsidep : 0, rd.n),
+        b(ny), f0(ny),
+        tfactor((rd.logt && rd.use_log2) ? std::log(Real_t(2)) : 1),
+        with_source(source_(rd, b, f0, *ws, tfactor)),
+        na(ny + (with_source ? 1 : 0)), jac_exact(stencil_in_band(rd))
+    {
+        if (!rd.is_linear())
+            throw std::invalid_argument("LinearPropagator requires a linear system (see is_linear)");
+        if (!jac_exact && rd.clip_to_pos)
+            throw std::invalid_argument("LinearPropagator: clip_to_pos requires the stencil within n_jac_diags");
+        const std::vector<Real_t> zeros(ny, 0);
+        jac.set_to(0);
+        rd.compressed_jac_cmaj(0, &zeros[0], &f0[0], jac.m_data, 0, *ws);
+        for (int i=0; i<jac.m_ndata; ++i)
+            jac.m_data[i] /= tfactor;
+        if (rd.N == 1)
+            init_dense_();
+        else
+            init_krylov_();
+    }
+
+    // y0: (N, n) linear concentrations, tout: (nt) linear & increasing times,
+    // yout: (nt, N, n). atol (size 1 or n) & rtol control the Krylov approximation.
+    // mxsteps: maximum number of Krylov steps between two outputs. Returns the
+    // number of reached outputs (unreached rows of yout are NaN).
+    int predefined(const Real_t * const y0, const std::size_t nt, const Real_t * const tout,
+                   Real_t * const yout, const std::vector<Real_t> &atol, const Real_t rtol,
+                   const long int mxsteps){
+        check_atol(atol, rd.n);
+        for (std::size_t i=1; i<nt; ++i)
+            if (tout[i] < tout[i-1])
+                throw std::invalid_argument("tout must be non-decreasing");
+        nmatvec = nkrylov_steps = nkrylov_rejected = nexpm = nbateman = 0;
+        std::copy(y0, y0 + ny, yout);
+        std::size_t iout = 1;
+        if (rd.N == 1){
+            for (; iout < nt; ++iout)
+                if (!dense_(y0, tout[iout] - tout[0], yout + iout*ny))
+                    break;
+        } else {
+            std::vector<Real_t> w(na);
+            Real_t nrm = 0;
+            for (int i=0; i<ny; ++i)
+                nrm += y0[i]*y0[i];
+            eta = (nrm > 0) ? std::sqrt(nrm) : 1;
+            std::copy(y0, y0 + ny, w.begin());
+            if (with_source)
+                w[ny] = eta;
+            anorm = jac_anorm_();
+            Real_t atol_nrm = 0;
+            for (int i=0; i<ny; ++i)
+                atol_nrm += atol[atol.size() == 1 ? 0 : i % rd.n]*atol[atol.size() == 1 ? 0 : i % rd.n];
+            atol_nrm = std::sqrt(atol_nrm);
+            for (; iout < nt; ++iout){
+                Real_t wnrm = 0;
+                for (int i=0; i<na; ++i)
+                    wnrm += w[i]*w[i];
+                if (!krylov_(&w[0], tout[iout] - tout[iout-1], rtol*std::sqrt(wnrm) + atol_nrm, mxsteps))
+                    break;
+                std::copy(w.begin(), w.begin() + ny, yout + iout*ny);
+            }
+        }
+        std::fill(yout + iout*ny, yout + nt*ny, std::numeric_limits<Real_t>::quiet_NaN());
+        return iout;
+    }
+
+private:
+    static bool source_(const ReactionDiffusion<Real_t> &rd, std::vector<Real_t> &b, std::vector<Real_t> &f0,
+                        Workspace<Real_t> &ws, const Real_t tfactor){
+        const std::vector<Real_t> zeros(b.size(), 0);
+        rd.rhs(0, &zeros[0], &f0[0], ws);
+        bool nonzero = false;
+        for (std::size_t i=0; i<b.size(); ++i){
+            b[i] = f0[i]/tfactor;
+            nonzero = nonzero || b[i] != 0;
+        }
+        return nonzero;
+    }
+
+    void init_dense_(){
+        const int n = rd.n;
+        dense.assign(na*na, 0);
+        for (int ci=0; ci<n; ++ci)
+            for (int ri=0; ri<n; ++ri)
+                dense[ci*na + ri] = jac.block(0, ri, ci);
+        for (int ri=0; ri<n && with_source; ++ri)
+            dense[n*na + ri] = b[ri];
+        // Topological order (Kahn) of the dependency graph (ci -> ri for Ahat[ri, ci] != 0)
+        std::vector<int> indeg(na, 0);
+        for (int ci=0; ci<na; ++ci)
+            for (int ri=0; ri<na; ++ri)
+                if (ri != ci && dense[ci*na + ri] != 0)
+                    ++indeg[ri];
+        perm.clear();
+        std::vector<int> queue;
+        for (int i=0; i<na; ++i)
+            if (indeg[i] == 0)
+                queue.push_back(i);
+        while (!queue.empty()){
+            const int ci = queue.back();
+            queue.pop_back();
+            perm.push_back(ci);
+            for (int ri=0; ri<na; ++ri)
+                if (ri != ci && dense[ci*na + ri] != 0 && --indeg[ri] == 0)
+                    queue.push_back(ri);
+        }
+        method = "pade";
+        if (static_cast<int>(perm.size()) != na)
+            return; // cyclic
+        reach.assign(na*na, 0);
+        min_gap = std::numeric_limits<Real_t>::infinity();
+        for (int d=0; d<na; ++d){
+            for (int j=0; j+d<na; ++j){
+                const int i = j + d;
+                bool nz = (d == 0) || L_(i, j) != 0;
+                for (int k=j+1; k<i && !nz; ++k)
+                    nz = L_(i, k) != 0 && reach[j*na + k];
+                reach[j*na + i] = nz;
+                if (nz && d > 0){
+                    const Real_t gap = std::abs(L_(i, i) - L_(j, j));
+                    if (gap <= bateman_rel_gap*std::max(std::abs(L_(i, i)), std::abs(L_(j, j))))
+                        return; // (nearly) equal rates
+                    min_gap = std::min(min_gap, gap);
+                }
+            }
+        }
+        method = "bateman";
+    }
+
+    Real_t L_(const int i, const int j) const { return dense[perm[j]*na + perm[i]]; }
+
+    bool dense_(const Real_t * const y0, const Real_t t, Real_t * const y){
+        // y := first n components of exp(t*Ahat) [y0; 1]
+        const int n = rd.n;
+        std::vector<Real_t> Fm(na*na);
+        if (method == "bateman" && t*min_gap >= bateman_min_tgap){
+            // Parlett's recurrence for F = exp(t*L), L lower triangular:
+            // F[i, j]*(L[j, j] - L[i, i]) = L[i, j]*(F[j, j] - F[i, i]) + sum_k L[i, k]*F[k, j] - F[i, k]*L[k, j]
+            ++nbateman;
+            std::vector<Real_t> Fp(na*na, 0); // permuted, column major
+            for (int i=0; i<na; ++i)
+                Fp[i*na + i] = std::exp(t*L_(i, i));
+            for (int d=1; d<na; ++d){
+                for (int j=0; j+d<na; ++j){
+                    const int i = j + d;
+                    if (!reach[j*na + i])
+                        continue;
+                    const Real_t lii = L_(i, i), ljj = L_(j, j), hi = std::max(lii, ljj);
+                    // (F[j, j] - F[i, i])/(L[j, j] - L[i, i]) without cancellation
+                    const Real_t divdiff = std::exp(t*hi)*-std::expm1(-t*std::abs(ljj - lii))/std::abs(ljj - lii);
+                    Real_t acc = 0;
+                    for (int k=j+1; k<i; ++k)
+                        acc += L_(i, k)*Fp[j*na + k] - Fp[k*na + i]*L_(k, j);
+                    Fp[j*na + i] = L_(i, j)*divdiff + acc/(ljj - lii);
+                }
+            }
+            for (int ci=0; ci<na; ++ci)
+                for (int ri=0; ri<na; ++ri)
+                    Fm[perm[ci]*na + perm[ri]] = Fp[ci*na + ri];
+        } else {
+            ++nexpm;
+            std::vector<Real_t> tA(na*na);
+            for (int i=0; i<na*na; ++i)
+                tA[i] = t*dense[i];
+            if (!expm_pade(na, &tA[0], &Fm[0]))
+                return false;
+        }
+        for (int ri=0; ri<n; ++ri){
+            Real_t acc = with_source ? Fm[n*na + ri] : 0;
+            for (int ci=0; ci<n; ++ci)
+                acc += Fm[ci*na + ri]*y0[ci];
+            y[ri] = acc;
+        }
+        return true;
+    }
+
+    void init_krylov_(){
+        method = "krylov";
+        p.resize(na);
+    }
+
+    Real_t jac_anorm_(){
+        // infinity norm of Ahat (row sums of |jac| & the scaled source column)
+        block_diag_ilu::BlockDiagMatrix<Real_t> absjac(
+            nullptr, rd.N, rd.n, rd.n_jac_diags, (rd.geom == Geom::PERIODIC) ? rd.nsidep : 0, rd.n);
+        for (int i=0; i<jac.m_ndata; ++i)
+            absjac.m_data[i] = std::abs(jac.m_data[i]);
+        std::vector<Real_t> ones(ny, 1), rowsum(ny);
+        absjac.dot_vec(&ones[0], &rowsum[0]);
+        Real_t nrm = 0;
+        for (int i=0; i<ny; ++i)
+            nrm = std::max(nrm, rowsum[i] + (with_source ? std::abs(b[i])/eta : 0));
+        return nrm;
+    }
+
+    void matvec_(const Real_t * const v, Real_t * const out){
+        // out := Ahat v (with the source column scaled by 1/eta)
+        ++nmatvec;
+        if (jac_exact){
+            jac.dot_vec(v, out);
+        } else { // rhs is affine: A v = f(v) - f(0)
+            rd.rhs(0, v, out, *ws);
+            for (int i=0; i<ny; ++i)
+                out[i] = (out[i] - f0[i])/tfactor;
+        }
+        if (with_source){
+            for (int i=0; i<ny; ++i)
+                out[i] += b[i]/eta*v[ny];
+            out[ny] = 0;
+        }
+    }
+
+    static Real_t round_(const Real_t x){
+        // 2 significant digits (rounded up)
+        if (!std::isfinite(x) || x <= 0)
+            return x;
+        const Real_t s = std::pow(Real_t(10), std::floor(std::log10(x)) - 1);
+        return std::ceil(x/s)*s;
+    }
+
+    Real_t norm2_(const Real_t * const v) const {
+        Real_t sum = 0;
+        for (int i=0; i<na; ++i)
+            sum += v[i]*v[i];
+        return std::sqrt(sum);
+    }
+
+    bool krylov_(Real_t * const w, const Real_t dt, const Real_t tol, const long int mxsteps){
+        // w := exp(dt*Ahat) w with an (estimated) error below tol (2-norm), cf. Expokit's DGEXPV
+        if (dt == 0)
+            return true;
+        const int m = std::min(krylov_dim, na - 1), ld = m + 2;
+        const Real_t btol = 1e-7, gamma = 0.9, delta = 1.2;
+        const int mxreject = 10;
+        const Real_t tol_rate = tol/dt; // per unit time
+        Real_t beta = norm2_(w);
+        if (beta == 0 || anorm == 0)
+            return true;
+        V.resize((m + 1)*na);
+        H.resize(ld*ld);
+        Hs.resize(ld*ld);
+        F.resize(ld*ld);
+        const Real_t xm0 = Real_t(1)/m;
+        const Real_t fact = std::pow((m + 1)/std::exp(Real_t(1)), m + 1)*std::sqrt(2*std::acos(Real_t(-1))*(m + 1));
+        Real_t t_new = round_(std::pow(fact*tol_rate/(4*beta*anorm), xm0)/anorm);
+        Real_t t_now = 0;
+        for (long nstep=0; t_now < dt; ++nstep){
+            if (nstep >= mxsteps)
+                return false;
+            ++nkrylov_steps;
+            Real_t t_step = (std::isfinite(t_new) && t_new > 0) ? std::min(dt - t_now, t_new) : dt - t_now;
+            // Arnoldi (modified Gram-Schmidt)
+            std::fill(H.begin(), H.end(), 0);
+            for (int i=0; i<na; ++i)
+                V[i] = w[i]/beta;
+            int mb = m, k1 = 2;
+            for (int j=0; j<m; ++j){
+                matvec_(&V[j*na], &p[0]);
+                for (int i=0; i<=j; ++i){
+                    Real_t hij = 0;
+                    for (int k=0; k<na; ++k)
+                        hij += V[i*na + k]*p[k];
+                    for (int k=0; k<na; ++k)
+                        p[k] -= hij*V[i*na + k];
+                    H[j*ld + i] = hij;
+                }
+                const Real_t s = norm2_(&p[0]);
+                if (s < btol){ // happy breakdown: the Krylov subspace is invariant
+                    k1 = 0;
+                    mb = j + 1;
+                    t_step = dt - t_now;
+                    break;
+                }
+                H[j*ld + j + 1] = s;
+                for (int k=0; k<na; ++k)
+                    V[(j + 1)*na + k] = p[k]/s;
+            }
+            Real_t avnorm = 0;
+            if (k1 != 0){
+                H[m*ld + m + 1] = 1;
+                matvec_(&V[m*na], &p[0]);
+                avnorm = norm2_(&p[0]);
+            }
+            Real_t err_loc = btol, xm = xm0;
+            const int mx = mb + k1;
+            for (int ireject=0; ; ++ireject){
+                for (int ci=0; ci<mx; ++ci)
+                    for (int ri=0; ri<mx; ++ri)
+                        Hs[ci*mx + ri] = t_step*H[ci*ld + ri];
+                ++nexpm;
+                if (!expm_pade(mx, &Hs[0], &F[0]))
+                    return false;
+                if (k1 == 0)
+                    break;
+                const Real_t phi1 = std::abs(beta*F[m]), phi2 = std::abs(beta*F[m + 1]*avnorm);
+                if (phi1 > 10*phi2){
+                    err_loc = phi2;
+                    xm = xm0;
+                } else if (phi1 > phi2){
+                    err_loc = phi1*phi2/(phi1 - phi2);
+                    xm = xm0;
+                } else {
+                    err_loc = phi1;
+                    xm = Real_t(1)/std::max(m - 1, 1);
+                }
+                if (err_loc <= delta*t_step*tol_rate)
+                    break;
+                if (ireject == mxreject)
+                    return false;
+                ++nkrylov_rejected;
+                t_step = round_(gamma*t_step*std::pow(t_step*tol_rate/err_loc, xm));
+            }
+            const int mv = mb + std::max(0, k1 - 1); // k1 == 2: corrected scheme (uses V[m])
+            for (int k=0; k<na; ++k){
+                Real_t acc = 0;
+                for (int j=0; j<mv; ++j)
+                    acc += V[j*na + k]*F[j];
+                w[k] = beta*acc;
+            }
+            beta = norm2_(w);
+            t_now = (t_step >= dt - t_now) ? dt : t_now + t_step;
+            err_loc = std::max(err_loc, anorm*std::numeric_limits<Real_t>::epsilon());
+            t_new = round_(gamma*t_step*std::pow(t_step*tol_rate/err_loc, xm));
+        }
+        return true;
+    }
+};
+
+}
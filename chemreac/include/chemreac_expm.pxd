@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+# -*- mode: cython-mode -*-
+
+from libcpp cimport bool
+from libcpp.string cimport string
+from libcpp.vector cimport vector
+from chemreac cimport ReactionDiffusion
+
+cdef extern from "chemreac_expm.hpp" namespace "chemreac":
+    cdef cppclass LinearPropagator[T]:
+        const bool with_source, jac_exact
+        string method
+        int krylov_dim
+        long nmatvec, nkrylov_steps, nkrylov_rejected, nexpm, nbateman
+        LinearPropagator(const ReactionDiffusion[T]&) except +
+        int predefined(const T * const, size_t, const T * const, T * const,
+                       const vector[T]&, T, long int) nogil except +
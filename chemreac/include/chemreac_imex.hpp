@@ -0,0 +1,342 @@
+#pragma once
+
+// Additive Runge-Kutta (IMEX) integration: one part of ReactionDiffusion::rhs
+// (see RhsPart) is integrated implicitly, the other one explicitly:
+//
+//     implicit_transport == true:  diffusion & drift implicit, reactions & fields explicit
+//     implicit_transport == false: reactions & fields implicit, diffusion & drift explicit
+//
+// Methods of Kennedy & Carpenter (2003): ARK3(2)4L[2]SA (order 3) and
+// ARK4(3)6L[2]SA (order 4), i.e. an explicit table paired with an ESDIRK table
+// (explicit first stage, gamma on the diagonal), with embedded methods for the
+// step size control. The stage equations z - h*gamma*f_I(t_i, z) = r are solved
+// by a simplified Newton iteration with the Jacobian of the implicit part
+// (compressed_jac_part) evaluated once per step, so that the linear systems
+// only involve the implicit part: I - h*gamma*J_I is banded per species for the
+// transport (no coupling between species, SpeciesBandLU) and block diagonal
+// (one n x n LU per bin) for the reactions. A linear implicit transport (no logy,
+// logt or auto_efield and the stencil within n_jac_diags) takes one solve per stage.
+//
+// y and t are the variables of rd (i.e. logarithmic with logy & logt).
+// Periodic geometry is not supported with implicit transport.
+
+#include <algorithm>
+#include <cmath>
+#include <limits>
+#include <memory>
+#include <stdexcept>
+#include <vector>
+#include "chemreac.hpp"
+#include "chemreac_stepping.hpp"
+
+namespace chemreac {
+
+template <typename Real_t = double>
+class ImexARK {
+    const ReactionDiffusion<Real_t> &rd;
+    std::unique_ptr<Workspace<Real_t>> ws;
+    int ns; // number of stages
+    Real_t gamma;
+    std::vector<Real_t> c, b, bhat, ae, ai; // ae & ai: ns x ns (row major)
+    block_diag_ilu::BlockDiagMatrix<Real_t> jac; // of the implicit part at the start of the step
+    std::unique_ptr<SpeciesBandLU<Real_t>> band_lu; // implicit transport
+    std::vector<Real_t> block_lu; // implicit reactions: n x n column major per bin
+    std::vector<int> block_ipiv;
+    std::vector<Real_t> fe, fi; // stage derivatives (ns x ny) of the explicit & implicit parts
+    std::vector<Real_t> r, z, dz, ynew, yerr;
+
+public:
+    const int order;
+    const RhsPart implicit_part, explicit_part;
+    const bool linear_implicit; // J_I is exact & constant: one Newton iteration solves the stage
+    StepControl<Real_t> step_control;
+    Real_t newton_tol = 0.05; // on the (error weighted) norm of the Newton update
+    int newton_maxiter = 7;
+    long nsteps {0}, nrejected {0}, nfev_explicit {0}, nfev_implicit {0}, njev {0};
+    long nfactor {0}, nsolve {0}, nnewton_fail {0};
+
+    ImexARK(const ReactionDiffusion<Real_t> &rd, int order=3, bool implicit_transport=true) :
+        rd(rd), ws(rd.make_workspace()),
+        jac(nullptr, rd.N, rd.n, rd.n_jac_diags, (rd.geom == Geom::PERIODIC) ? rd.nsidep : 0, rd.n),
+        order(order),
+        implicit_part(implicit_transport ? RhsPart::TRANSPORT : RhsPart::REACTION),
+        explicit_part(implicit_transport ? RhsPart::REACTION : RhsPart::TRANSPORT),
+        linear_implicit(implicit_transport && !rd.logy && !rd.logt && !rd.auto_efield && stencil_in_band(rd)),
+        step_control{Real_t(order), 0.2, 5.0, 0.9, 0.25}
+    {
+        if (order == 3)
+            set_ark324_();
+        else if (order == 4)
+            set_ark436_();
+        else
+            throw std::invalid_argument("order must be 3 or 4");
+        if (implicit_transport && rd.geom == Geom::PERIODIC)
+            throw std::invalid_argument("ImexARK does not support implicit transport in periodic geometry");
+        const int ny = rd.n*rd.N;
+        fe.resize(ns*ny);
+        fi.resize(ns*ny);
+        for (auto v : {&r, &z, &dz, &ynew, &yerr})
+            v->resize(ny);
+        if (!implicit_transport){
+            block_lu.resize(rd.N*rd.n*rd.n);
+            block_ipiv.resize(rd.N*rd.n);
+        }
+    }
+
+    // y0: (N, n), yout: (nt, N, n), atol of size 1 or n. mxsteps: maximum number of
+    // (accepted and rejected) steps between two outputs. Returns the number of
+    // reached outputs (unreached rows of yout are NaN).
+    int predefined(const Real_t * const y0, const std::size_t nt, const Real_t * const tout,
+                   Real_t * const yout, const std::vector<Real_t> &atol, const Real_t rtol,
+                   const Real_t dx0, const Real_t dx_min, const Real_t dx_max, const long int mxsteps){
+        const int ny = rd.n*rd.N;
+        check_atol(atol, rd.n);
+        nsteps = nrejected = nfev_explicit = nfev_implicit = njev = nfactor = nsolve = nnewton_fail = 0;
+        std::vector<Real_t> y(y0, y0 + ny);
+        std::copy(y0, y0 + ny, yout);
+        std::size_t iout = 1;
+        if (nt < 2)
+            return nt;
+        Real_t t = tout[0];
+        eval_(t, y.data(), &fe[0], &fi[0]);
+        Real_t h = (dx0 > 0) ? dx0 : initial_step_(y.data(), atol, rtol);
+        h = std::min(h, tout[nt-1] - tout[0]);
+        bool new_state = true, rejected_last = false;
+        long nsteps_output = 0;
+        while (iout < nt){
+            if (dx_max > 0)
+                h = std::min(h, dx_max);
+            const Real_t hs = std::min(h, tout[iout] - t);
+            if (new_state){
+                jac.set_to(0);
+                rd.compressed_jac_part(t, y.data(), &fi[0], jac.m_data, 0, implicit_part, *ws);
+                ++njev;
+                new_state = false;
+            }
+            const bool ok = step_(t, y.data(), hs, atol, rtol);
+            const Real_t err = ok ? weighted_rms(ny, rd.n, y.data(), ynew.data(), yerr.data(), atol, rtol) :
+                std::numeric_limits<Real_t>::infinity();
+            const bool accepted = step_control.update(hs, h, err, ok, rejected_last);
+            rejected_last = !accepted;
+            if (accepted){
+                const bool to_output = hs == tout[iout] - t;
+                t = to_output ? tout[iout] : t + hs;
+                std::swap(y, ynew);
+                eval_(t, y.data(), &fe[0], &fi[0]);
+                new_state = true;
+                ++nsteps;
+                if (to_output){
+                    std::copy(y.begin(), y.end(), yout + iout*ny);
+                    ++iout;
+                    nsteps_output = nsteps + nrejected;
+                }
+            } else {
+                ++nrejected;
+            }
+            if (iout < nt && (nsteps + nrejected - nsteps_output >= mxsteps ||
+                              h < StepControl<Real_t>::h_min(t, dx_min)))
+                break;
+        }
+        std::fill(yout + iout*ny, yout + nt*ny, std::numeric_limits<Real_t>::quiet_NaN());
+        return iout;
+    }
+
+private:
+    void set_tableau_(int s, Real_t g, std::vector<Real_t> c_, std::vector<Real_t> b_, std::vector<Real_t> bhat_,
+                      std::vector<Real_t> ae_, std::vector<Real_t> ai_){
+        // ae_ & ai_: strictly lower triangular parts (row major, row by row)
+        ns = s;
+        gamma = g;
+        c = c_;
+        b = b_;
+        bhat = bhat_;
+        ae.assign(s*s, 0);
+        ai.assign(s*s, 0);
+        for (int i=1, k=0; i<s; ++i){
+            for (int j=0; j<i; ++j, ++k){
+                ae[i*s + j] = ae_[k];
+                ai[i*s + j] = ai_[k];
+            }
+            ai[i*s + i] = g;
+        }
+    }
+
+    void set_ark324_(){
+        const Real_t g = 1767732205903.0/4055673282236;
+        const std::vector<Real_t> b_ {
+            1471266399579.0/7840856788654, -4482444167858.0/7529755066697,
+            11266239266428.0/11593286722821, 1767732205903.0/4055673282236};
+        set_tableau_(
+            4, g, {0, 1767732205903.0/2027836641118, 3.0/5, 1}, b_,
+            {2756255671327.0/12835298489170, -10771552573575.0/22201958757719,
+             9247589265047.0/10645013368117, 2193209047091.0/5459859503100},
+            {1767732205903.0/2027836641118,
+             5535828885825.0/10492691773637, 788022342437.0/10882634858940,
+             6485989280629.0/16251701735622, -4246266847089.0/9704473918619, 10755448449292.0/10357097424841},
+            {g,
+             2746238789719.0/10658868560708, -640167445237.0/6845629431997,
+             b_[0], b_[1], b_[2]});
+    }
+
+    void set_ark436_(){
+        const std::vector<Real_t> b_ {
+            82889.0/524892, 0, 15625.0/83664, 69875.0/102672, -2260.0/8211, 1.0/4};
+        set_tableau_(
+            6, 1.0/4, {0, 1.0/2, 83.0/250, 31.0/50, 17.0/20, 1}, b_,
+            {4586570599.0/29645900160, 0, 178811875.0/945068544, 814220225.0/1159782912,
+             -3700637.0/11593932, 61727.0/225920},
+            {1.0/2,
+             13861.0/62500, 6889.0/62500,
+             -116923316275.0/2393684061468, -2731218467317.0/15368042101831, 9408046702089.0/11113171139209,
+             -451086348788.0/2902428689909, -2682348792572.0/7519795681897, 12662868775082.0/11960479115383,
+             3355817975965.0/11060851509271,
+             647845179188.0/3216320057751, 73281519250.0/8382639484533, 552539513391.0/3454668386233,
+             3354512671639.0/8306763924573, 4040.0/17871},
+            {1.0/4,
+             8611.0/62500, -1743.0/31250,
+             5012029.0/34652500, -654441.0/2922500, 174375.0/388108,
+             15267082809.0/155376265600, -71443401.0/120774400, 730878875.0/902184768, 2285395.0/8070912,
+             b_[0], b_[1], b_[2], b_[3], b_[4]});
+    }
+
+    void eval_(const Real_t t, const Real_t * const y, Real_t * const fe_out, Real_t * const fi_out){
+        rd.rhs_part(t, y, fe_out, explicit_part, *ws);
+        rd.rhs_part(t, y, fi_out, implicit_part, *ws);
+        ++nfev_explicit;
+        ++nfev_implicit;
+    }
+
+    Real_t initial_step_(const Real_t * const y, const std::vector<Real_t> &atol, const Real_t rtol){
+        // cf. Hairer, Norsett & Wanner (1993), II.4
+        const int ny = rd.n*rd.N;
+        for (int i=0; i<ny; ++i)
+            dz[i] = fe[i] + fi[i];
+        const Real_t d0 = weighted_rms(ny, rd.n, y, y, y, atol, rtol),
+            d1 = weighted_rms(ny, rd.n, y, y, &dz[0], atol, rtol);
+        return (d0 < 1e-5 || d1 < 1e-5) ? 1e-6 : 0.01*d0/d1;
+    }
+
+    bool factorize_(const Real_t h){
+        // I - h*gamma*J_I
+        const int N = rd.N, n = rd.n;
+        const Real_t hg = h*gamma;
+        ++nfactor;
+        if (implicit_part == RhsPart::TRANSPORT){
+            const int kl = jac.m_ndiag;
+            band_lu.reset(new SpeciesBandLU<Real_t>(
+                N, n, kl, (N > 1) ? rd.transport_species : std::vector<int>(), rd.par_threshold_jac,
+                rd.get_nthreads()));
+            for (int si : band_lu->m_species){
+                for (int bi=0; bi<N; ++bi){
+                    (*band_lu)(si, bi, bi) = 1 - hg*jac.block(bi, si, si);
+                    for (int di=0; di<kl; ++di){
+                        if (bi < N-di-1){
+                            (*band_lu)(si, bi+di+1, bi) = -hg*jac.sub(di, bi, si);
+                            (*band_lu)(si, bi, bi+di+1) = -hg*jac.sup(di, bi, si);
+                        }
+                    }
+                }
+            }
+            return band_lu->factorize() == 0;
+        }
+        int failed = 0;
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(static) reduction(|:failed) if (N*n*n*n > rd.par_threshold_jac)
+#endif
+        for (int bi=0; bi<N; ++bi){
+            int nn = n, info;
+            Real_t * const A = &block_lu[bi*n*n];
+            for (int ci=0; ci<n; ++ci)
+                for (int ri=0; ri<n; ++ri)
+                    A[ci*n + ri] = ((ri == ci) ? 1 : 0) - hg*jac.block(bi, ri, ci);
+            constexpr AnyODE::getrf_callback<Real_t> getrf{};
+            getrf(&nn, &nn, A, &nn, &block_ipiv[bi*n], &info);
+            if (info != 0)
+                failed |= 1;
+        }
+        return failed == 0;
+    }
+
+    void solve_(Real_t * const x){ // in-place: x := (I - h*gamma*J_I)^-1 x
+        ++nsolve;
+        if (implicit_part == RhsPart::TRANSPORT){
+            band_lu->solve(x);
+            return;
+        }
+        const int N = rd.N, n = rd.n;
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(static) if (N*n*n > rd.par_threshold_jac)
+#endif
+        for (int bi=0; bi<N; ++bi){
+            int nn = n, nrhs = 1, info;
+            const char trans = 'N';
+            constexpr AnyODE::getrs_callback<Real_t> getrs{};
+            getrs(&trans, &nn, &nrhs, &block_lu[bi*n*n], &nn, &block_ipiv[bi*n], x + bi*n, &nn, &info);
+        }
+    }
+
+    bool step_(const Real_t t, const Real_t * const y, const Real_t h,
+               const std::vector<Real_t> &atol, const Real_t rtol){
+        // Stage 0 (fe[0:ny], fi[0:ny]) evaluated at (t, y) by the caller.
+        // Result in ynew, error estimate in yerr.
+        const int ny = rd.n*rd.N;
+        if (!factorize_(h))
+            return false;
+        const Real_t hg = h*gamma;
+        for (int i=1; i<ns; ++i){
+            const Real_t ti = t + c[i]*h;
+            for (int k=0; k<ny; ++k){
+                Real_t acc = 0;
+                for (int j=0; j<i; ++j)
+                    acc += ae[i*ns + j]*fe[j*ny + k] + ai[i*ns + j]*fi[j*ny + k];
+                r[k] = y[k] + h*acc;
+                z[k] = r[k] + hg*fi[(i-1)*ny + k]; // predictor
+            }
+            Real_t * const fii = &fi[i*ny];
+            bool converged = false;
+            Real_t prev = 0;
+            for (int it=0; it<newton_maxiter; ++it){
+                rd.rhs_part(ti, &z[0], fii, implicit_part, *ws);
+                ++nfev_implicit;
+                for (int k=0; k<ny; ++k)
+                    dz[k] = r[k] + hg*fii[k] - z[k];
+                solve_(&dz[0]);
+                for (int k=0; k<ny; ++k)
+                    z[k] += dz[k];
+                const Real_t nrm = weighted_rms(ny, rd.n, y, &z[0], &dz[0], atol, rtol);
+                if (linear_implicit){
+                    converged = std::isfinite(nrm);
+                    break;
+                }
+                if (!std::isfinite(nrm) || (it > 0 && nrm > 2*prev))
+                    break; // diverging
+                if (nrm <= newton_tol){
+                    converged = true;
+                    break;
+                }
+                prev = nrm;
+            }
+            if (!converged){
+                ++nnewton_fail;
+                return false;
+            }
+            for (int k=0; k<ny; ++k)
+                fii[k] = (z[k] - r[k])/hg;
+            rd.rhs_part(ti, &z[0], &fe[i*ny], explicit_part, *ws);
+            ++nfev_explicit;
+        }
+        for (int k=0; k<ny; ++k){
+            Real_t acc = 0, acc_err = 0;
+            for (int i=0; i<ns; ++i){
+                const Real_t f = fe[i*ny + k] + fi[i*ny + k];
+                acc += b[i]*f;
+                acc_err += (b[i] - bhat[i])*f;
+            }
+            ynew[k] = y[k] + h*acc;
+            yerr[k] = h*acc_err;
+        }
+        return true;
+    }
+};
+
+}
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+# -*- mode: cython-mode -*-
+
+from libcpp cimport bool
+from libcpp.vector cimport vector
+from chemreac cimport ReactionDiffusion
+
+cdef extern from "chemreac_imex.hpp" namespace "chemreac":
+    cdef cppclass ImexARK[T]:
+        const bool linear_implicit
+        long nsteps, nrejected, nfev_explicit, nfev_implicit, njev, nfactor, nsolve, nnewton_fail
+        ImexARK(const ReactionDiffusion[T]&, int, bool) except +
+        int predefined(const T * const, size_t, const T * const, T * const,
+                       const vector[T]&, T, T, T, T, long int) nogil except +
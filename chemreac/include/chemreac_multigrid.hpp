@@ -0,0 +1,263 @@
+#pragma once
+
+// Geometric multigrid V-cycle for the block-tridiagonal matrices assembled
+// by ReactionDiffusion::compressed_jac_cmaj when n_jac_diags == 1 (used as a
+// preconditioner for the iterative linear solvers).
+//
+// Coarse grids keep every other bin center of the finer grid; the odd bins
+// are interpolated linearly (in x, so non-uniform and logarithmic grids are
+// handled) from their two even neighbours. Coarse operators are Galerkin
+// products P^T*A*P which keeps them block-tridiagonal (with dense blocks).
+// Smoothing is damped block-Jacobi over the diagonal (reaction) blocks and
+// the coarsest level is solved directly by block Thomas elimination.
+
+#include <algorithm>
+#include <vector>
+#include "block_diag_ilu.hpp"
+#include "anyode/anyode.hpp"
+#include "anyode/anyode_decomposition.hpp"
+#include "chemreac_block_tridiag.hpp"
+
+namespace chemreac {
+
+    template <typename Real_t = double>
+    struct BlockMultigrid : public AnyODE::DecompositionBase<Real_t> {
+        struct Level {
+            int nb;
+            // For block row j: A (coupling to j-1), B (diagonal), C (coupling to j+1),
+            // all dense n x n column major. LU holds the inverted diagonal blocks
+            // (LU factorized ones on the coarsest level).
+            std::vector<Real_t> A, B, C, LU, x, rhs, res;
+            std::vector<Real_t> wl, wr; // interpolation weights of odd bins from bins j-1 & j+1
+            std::vector<int> ipiv;
+            Level(int nb, int n) : nb(nb), A(nb*n*n, 0), B(nb*n*n, 0), C(nb*n*n, 0), LU(nb*n*n),
+                                   x(nb*n), rhs(nb*n), res(nb*n), wl(nb, 0), wr(nb, 0), ipiv(nb*n) {}
+        };
+        const int m_nblocks, m_blockw;
+        const int m_nsmooth; // pre- and post-smoothing sweeps
+        const Real_t m_omega; // block-Jacobi damping
+        const int m_omp_min_work; // skip threading for small levels
+        const int m_nthreads; // OpenMP team size
+        std::vector<Level> m_levels;
+
+        // xc: bin centers (size N), coarsest: max number of blocks solved directly
+        BlockMultigrid(const block_diag_ilu::BlockDiagMatrix<Real_t>& source, const Real_t * const xc,
+                       int coarsest=8, int nsmooth=2, Real_t omega=2.0/3, int omp_min_work=65536,
+                       int nthreads=1) :
+            m_nblocks(source.m_nblocks), m_blockw(source.m_blockw), m_nsmooth(nsmooth),
+            m_omega(omega), m_omp_min_work(omp_min_work), m_nthreads(nthreads)
+        {
+            check_block_tridiag_(source);
+            const int n = m_blockw;
+            std::vector<Real_t> centers(xc, xc + m_nblocks);
+            for (int nb=m_nblocks; ; nb = (nb + 1)/2){
+                m_levels.emplace_back(nb, n);
+                Level& lvl = m_levels.back();
+                for (int j=1; j<nb; j += 2){
+                    if (j == nb - 1){
+                        lvl.wl[j] = 1; // no right neighbour: constant extrapolation
+                    } else {
+                        const Real_t h = centers[j+1] - centers[j-1];
+                        lvl.wl[j] = (centers[j+1] - centers[j])/h;
+                        lvl.wr[j] = (centers[j] - centers[j-1])/h;
+                    }
+                }
+                if (nb <= std::max(coarsest, 1))
+                    break;
+                for (int j=0; 2*j<nb; ++j)
+                    centers[j] = centers[2*j];
+            }
+            Level& lvl = m_levels[0];
+            for (int bi=0; bi<m_nblocks; ++bi){
+                for (int ci=0; ci<n; ++ci)
+                    for (int ri=0; ri<n; ++ri)
+                        lvl.B[(bi*n + ci)*n + ri] = source.block(bi, ri, ci);
+                if (bi < m_nblocks - 1)
+                    for (int li=0; li<n; ++li){
+                        lvl.A[((bi+1)*n + li)*n + li] = source.sub(0, bi, li);
+                        lvl.C[(bi*n + li)*n + li] = source.sup(0, bi, li);
+                    }
+            }
+        }
+    private:
+        // Coarse bins (and weights) which fine bin j interpolates from, returns count
+        int parents_(const Level& fine, int j, int * const K, Real_t * const w) const {
+            if (j % 2 == 0){
+                K[0] = j/2; w[0] = 1;
+                return 1;
+            }
+            K[0] = j/2; w[0] = fine.wl[j];
+            if (fine.wr[j] == 0)
+                return 1;
+            K[1] = j/2 + 1; w[1] = fine.wr[j];
+            return 2;
+        }
+        const Real_t * fine_block_(const Level& fine, int i, int j) const {
+            const int nn = m_blockw*m_blockw;
+            if (j == i)
+                return &fine.B[i*nn];
+            return (j < i) ? &fine.A[i*nn] : &fine.C[i*nn];
+        }
+        void galerkin_(const Level& fine, Level& coarse) const {
+            const int n = m_blockw, nn = n*n;
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(static) num_threads(m_nthreads) if (fine.nb*nn*9 > m_omp_min_work)
+#endif
+            for (int I=0; I<coarse.nb; ++I){
+                Real_t * const blk[3] = {&coarse.A[I*nn], &coarse.B[I*nn], &coarse.C[I*nn]};
+                for (int k=0; k<3; ++k)
+                    std::fill(blk[k], blk[k] + nn, Real_t(0));
+                for (int i=std::max(2*I-1, 0); i<=std::min(2*I+1, fine.nb-1); ++i){
+                    int Ki[2]; Real_t wi[2];
+                    const int npi = parents_(fine, i, Ki, wi);
+                    Real_t pI = 0; // P(i, I)
+                    for (int q=0; q<npi; ++q)
+                        if (Ki[q] == I) pI = wi[q];
+                    if (pI == 0) continue;
+                    for (int j=std::max(i-1, 0); j<=std::min(i+1, fine.nb-1); ++j){
+                        const Real_t * const a = fine_block_(fine, i, j);
+                        int Kj[2]; Real_t wj[2];
+                        const int npj = parents_(fine, j, Kj, wj);
+                        for (int q=0; q<npj; ++q){
+                            const Real_t s = pI*wj[q];
+                            Real_t * const c = blk[Kj[q] - I + 1];
+                            for (int idx=0; idx<nn; ++idx)
+                                c[idx] += s*a[idx];
+                        }
+                    }
+                }
+            }
+        }
+        void residual_(Level& lvl) const { // res = rhs - A*x
+            const int n = m_blockw, nn = n*n;
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(static) num_threads(m_nthreads) if (lvl.nb*nn*3 > m_omp_min_work)
+#endif
+            for (int j=0; j<lvl.nb; ++j){
+                std::copy(&lvl.rhs[j*n], &lvl.rhs[(j+1)*n], &lvl.res[j*n]);
+                block_gemv_sub_(n, &lvl.B[j*nn], &lvl.x[j*n], &lvl.res[j*n]);
+                if (j > 0)
+                    block_gemv_sub_(n, &lvl.A[j*nn], &lvl.x[(j-1)*n], &lvl.res[j*n]);
+                if (j < lvl.nb - 1)
+                    block_gemv_sub_(n, &lvl.C[j*nn], &lvl.x[(j+1)*n], &lvl.res[j*n]);
+            }
+        }
+        void smooth_(Level& lvl) { // x += omega*B^-1*(rhs - A*x)
+            const int n = m_blockw, nn = n*n;
+            residual_(lvl);
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(static) num_threads(m_nthreads) if (lvl.nb*nn > m_omp_min_work)
+#endif
+            for (int j=0; j<lvl.nb; ++j){
+                const Real_t * const ANYODE_RESTRICT binv = &lvl.LU[j*nn];
+                const Real_t * const ANYODE_RESTRICT res = &lvl.res[j*n];
+                Real_t * const ANYODE_RESTRICT x = &lvl.x[j*n];
+                for (int ci=0; ci<n; ++ci)
+                    for (int ri=0; ri<n; ++ri)
+                        x[ri] += m_omega*binv[ci*n + ri]*res[ci];
+            }
+        }
+        void coarse_solve_(Level& lvl) { // block Thomas, LU holds B'_j and C holds B'_j^-1 C_j
+            int n = m_blockw, nrhs = 1;
+            const int nn = n*n;
+            const char trans = 'N';
+            constexpr AnyODE::getrs_callback<Real_t> getrs{};
+            std::copy(lvl.rhs.begin(), lvl.rhs.end(), lvl.x.begin());
+            for (int j=0; j<lvl.nb; ++j){
+                int info;
+                if (j > 0)
+                    block_gemv_sub_(n, &lvl.A[j*nn], &lvl.x[(j-1)*n], &lvl.x[j*n]);
+                getrs(&trans, &n, &nrhs, &lvl.LU[j*nn], &n, &lvl.ipiv[j*n], &lvl.x[j*n], &n, &info);
+            }
+            for (int j=lvl.nb-2; j>=0; --j)
+                block_gemv_sub_(n, &lvl.C[j*nn], &lvl.x[(j+1)*n], &lvl.x[j*n]);
+        }
+        void vcycle_(std::size_t li) {
+            Level& lvl = m_levels[li];
+            const int n = m_blockw;
+            if (li + 1 == m_levels.size()){
+                coarse_solve_(lvl);
+                return;
+            }
+            std::fill(lvl.x.begin(), lvl.x.end(), Real_t(0));
+            for (int k=0; k<m_nsmooth; ++k)
+                smooth_(lvl);
+            residual_(lvl);
+            Level& crs = m_levels[li+1];
+            std::fill(crs.rhs.begin(), crs.rhs.end(), Real_t(0));
+            for (int j=0; j<lvl.nb; ++j){ // restriction: P^T
+                int K[2]; Real_t w[2];
+                const int np = parents_(lvl, j, K, w);
+                for (int q=0; q<np; ++q)
+                    for (int si=0; si<n; ++si)
+                        crs.rhs[K[q]*n + si] += w[q]*lvl.res[j*n + si];
+            }
+            vcycle_(li + 1);
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(static) num_threads(m_nthreads) if (lvl.nb*n*4 > m_omp_min_work)
+#endif
+            for (int j=0; j<lvl.nb; ++j){ // prolongation: P
+                int K[2]; Real_t w[2];
+                const int np = parents_(lvl, j, K, w);
+                for (int q=0; q<np; ++q)
+                    for (int si=0; si<n; ++si)
+                        lvl.x[j*n + si] += w[q]*crs.x[K[q]*n + si];
+            }
+            for (int k=0; k<m_nsmooth; ++k)
+                smooth_(lvl);
+        }
+    public:
+        int factorize() override final {
+            int n = m_blockw;
+            const int nn = n*n;
+            const char trans = 'N';
+            for (std::size_t li=0; li<m_levels.size(); ++li){
+                Level& lvl = m_levels[li];
+                if (li > 0)
+                    galerkin_(m_levels[li-1], lvl);
+                std::copy(lvl.B.begin(), lvl.B.end(), lvl.LU.begin());
+                if (li + 1 == m_levels.size()) { // block Thomas elimination
+                    for (int j=0; j<lvl.nb; ++j){
+                        int info;
+                        constexpr AnyODE::getrf_callback<Real_t> getrf{};
+                        constexpr AnyODE::getrs_callback<Real_t> getrs{};
+                        if (j > 0)
+                            block_gemm_sub_(n, &lvl.A[j*nn], &lvl.C[(j-1)*nn], &lvl.LU[j*nn]);
+                        getrf(&n, &n, &lvl.LU[j*nn], &n, &lvl.ipiv[j*n], &info);
+                        if (info != 0)
+                            return info;
+                        if (j < lvl.nb - 1)
+                            getrs(&trans, &n, &n, &lvl.LU[j*nn], &n, &lvl.ipiv[j*n], &lvl.C[j*nn], &n, &info);
+                    }
+                    break;
+                }
+                int failed = 0;
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(static) num_threads(m_nthreads) reduction(|:failed) if (lvl.nb*nn*n > m_omp_min_work)
+#endif
+                for (int j=0; j<lvl.nb; ++j){ // explicit inverses of the diagonal blocks
+                    int info, lwork = n;
+                    constexpr AnyODE::getrf_callback<Real_t> getrf{};
+                    constexpr getri_callback<Real_t> getri{};
+                    getrf(&n, &n, &lvl.LU[j*nn], &n, &lvl.ipiv[j*n], &info);
+                    if (info != 0){
+                        failed |= 1;
+                        continue;
+                    }
+                    getri(&n, &lvl.LU[j*nn], &n, &lvl.ipiv[j*n], &lvl.res[j*n], &lwork, &info); // res as work
+                }
+                if (failed)
+                    return 1;
+            }
+            return 0;
+        }
+        int solve(const Real_t * const b, Real_t * const x) override final {
+            Level& lvl = m_levels[0];
+            std::copy(b, b + m_nblocks*m_blockw, lvl.rhs.begin());
+            vcycle_(0);
+            std::copy(lvl.x.begin(), lvl.x.end(), x);
+            return 0;
+        }
+    };
+
+}
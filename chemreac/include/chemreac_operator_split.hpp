@@ -0,0 +1,168 @@
+#pragma once
+
+// Operator-split approximate factorization of the preconditioner matrix
+// P = I - gamma*J assembled by ReactionDiffusion::compressed_jac_cmaj:
+//
+//     P ~= R*T,   R = I - gamma*J_reaction (block diagonal, n x n per bin)
+//                 T = I - gamma*J_transport (banded per species, N x N)
+//
+// Both factors are factorized independently (bins and species are
+// distributed over OpenMP threads when enabled) at a cost linear in N.
+// The splitting error is O(gamma^2) so this is a preconditioner, not a
+// direct solver. Periodic ("saturating") corners are not represented.
+
+#include <algorithm>
+#include <vector>
+#include "block_diag_ilu.hpp"
+#include "anyode/anyode.hpp"
+#include "anyode/anyode_decomposition.hpp"
+
+namespace chemreac {
+
+    // One banded N x N matrix per species (kl == ku) acting on bin-major vectors,
+    // LU factorized (gbtrf) species by species. Only the listed species are
+    // factorized/solved, the others are taken to be the identity.
+    template <typename Real_t = double>
+    struct SpeciesBandLU {
+        const int m_nblocks, m_blockw, m_kl;
+        const int m_ldb; // leading dimension of the LAPACK band storage
+        const int m_omp_min_work; // skip threading for small systems
+        const int m_nthreads; // OpenMP team size
+        const std::vector<int> m_species;
+        std::vector<Real_t> m_band; // species-major
+        std::vector<int> m_ipiv;
+        std::vector<Real_t> m_work;
+
+        SpeciesBandLU(int nblocks, int blockw, int kl, std::vector<int> species, int omp_min_work=65536,
+                      int nthreads=1) :
+            m_nblocks(nblocks), m_blockw(blockw), m_kl(kl), m_ldb(3*kl + 1), m_omp_min_work(omp_min_work),
+            m_nthreads(nthreads), m_species(species), m_band(m_ldb*nblocks*blockw, 0),
+            m_ipiv(nblocks*blockw), m_work(nblocks*blockw) {}
+        // element (ri, ci) of the matrix of species si
+        Real_t& operator()(int si, int ri, int ci) {
+            return m_band[(si*m_nblocks + ci)*m_ldb + 2*m_kl + ri - ci];
+        }
+        int factorize() {
+            int N = m_nblocks, kl = m_kl, ldb = m_ldb;
+            const int ns = m_species.size();
+            int failed = 0;
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(static) num_threads(m_nthreads) reduction(|:failed) if (N*ns*ldb > m_omp_min_work)
+#endif
+            for (int idx=0; idx<ns; ++idx){
+                const int si = m_species[idx];
+                int info;
+                constexpr AnyODE::gbtrf_callback<Real_t> gbtrf{};
+                gbtrf(&N, &N, &kl, &kl, &m_band[si*N*ldb], &ldb, &m_ipiv[si*N], &info);
+                if (info != 0)
+                    failed |= 1;
+            }
+            return failed;
+        }
+        void solve(Real_t * const x) { // in-place, x: bin-major (N x n)
+            int N = m_nblocks, kl = m_kl, ldb = m_ldb, nrhs = 1;
+            const int n = m_blockw, ns = m_species.size();
+            const char trans = 'N';
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(static) num_threads(m_nthreads) if (N*ns*ldb > m_omp_min_work)
+#endif
+            for (int idx=0; idx<ns; ++idx){
+                const int si = m_species[idx];
+                int info;
+                Real_t * const w = &m_work[si*N];
+                for (int bi=0; bi<N; ++bi)
+                    w[bi] = x[bi*n + si];
+                constexpr AnyODE::gbtrs_callback<Real_t> gbtrs{};
+                gbtrs(&trans, &N, &kl, &kl, &nrhs, &m_band[si*N*ldb], &ldb, &m_ipiv[si*N], w, &N, &info);
+                for (int bi=0; bi<N; ++bi)
+                    x[bi*n + si] = w[bi];
+            }
+        }
+    };
+
+    template <typename Real_t = double>
+    struct OperatorSplitLU : public AnyODE::DecompositionBase<Real_t> {
+        const int m_nblocks, m_blockw;
+        const int m_omp_min_work; // skip threading for small systems
+        const int m_nthreads; // OpenMP team size
+        std::vector<Real_t> m_reac; // n x n column major blocks of R (bin-major)
+        std::vector<int> m_reac_ipiv;
+        SpeciesBandLU<Real_t> m_transport; // T
+
+        // tdiag: the transport contribution to the diagonal of source (size N*n, bin-major)
+        OperatorSplitLU(const block_diag_ilu::BlockDiagMatrix<Real_t>& source,
+                        const Real_t * const tdiag, int omp_min_work=65536, int nthreads=1) :
+            m_nblocks(source.m_nblocks), m_blockw(source.m_blockw), m_omp_min_work(omp_min_work),
+            m_nthreads(nthreads),
+            m_reac(source.m_nblocks*source.m_blockw*source.m_blockw),
+            m_reac_ipiv(source.m_nblocks*source.m_blockw),
+            m_transport(source.m_nblocks, source.m_blockw, source.m_ndiag,
+                        all_species_(source.m_nblocks == 1 ? 0 : source.m_blockw), omp_min_work,
+                        nthreads)
+        {
+            const int n = m_blockw, N = m_nblocks, kl = source.m_ndiag;
+            for (int bi=0; bi<N; ++bi){
+                for (int ci=0; ci<n; ++ci)
+                    for (int ri=0; ri<n; ++ri)
+                        m_reac[(bi*n + ci)*n + ri] = source.block(bi, ri, ci);
+                for (int si=0; si<n; ++si)
+                    m_reac[(bi*n + si)*n + si] -= tdiag[bi*n + si];
+            }
+            if (N == 1)
+                return;
+            for (int si=0; si<n; ++si){
+                for (int bi=0; bi<N; ++bi){
+                    m_transport(si, bi, bi) = 1 + tdiag[bi*n + si];
+                    for (int di=0; di<kl; ++di){
+                        if (bi < N-di-1){
+                            m_transport(si, bi+di+1, bi) = source.sub(di, bi, si);
+                            m_transport(si, bi, bi+di+1) = source.sup(di, bi, si);
+                        }
+                    }
+                }
+            }
+        }
+        int factorize() override final {
+            int n = m_blockw;
+            const int N = m_nblocks, nn = n*n;
+            int failed = 0;
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(static) num_threads(m_nthreads) reduction(|:failed) if (N*nn*n > m_omp_min_work)
+#endif
+            for (int bi=0; bi<N; ++bi){
+                int info;
+                constexpr AnyODE::getrf_callback<Real_t> getrf{};
+                getrf(&n, &n, &m_reac[bi*nn], &n, &m_reac_ipiv[bi*n], &info);
+                if (info != 0)
+                    failed |= 1;
+            }
+            if (failed)
+                return failed;
+            return m_transport.factorize();
+        }
+        int solve(const Real_t * const b, Real_t * const x) override final {
+            int n = m_blockw, nrhs = 1;
+            const int N = m_nblocks, nn = n*n;
+            const char trans = 'N';
+            std::copy(b, b + N*n, x);
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(static) num_threads(m_nthreads) if (N*nn > m_omp_min_work)
+#endif
+            for (int bi=0; bi<N; ++bi){ // x := R^-1 b
+                int info;
+                constexpr AnyODE::getrs_callback<Real_t> getrs{};
+                getrs(&trans, &n, &nrhs, &m_reac[bi*nn], &n, &m_reac_ipiv[bi*n], x + bi*n, &n, &info);
+            }
+            m_transport.solve(x); // x := T^-1 x (species by species)
+            return 0;
+        }
+    private:
+        static std::vector<int> all_species_(int n) {
+            std::vector<int> species(n);
+            for (int si=0; si<n; ++si)
+                species[si] = si;
+            return species;
+        }
+    };
+
+}
@@ -0,0 +1,295 @@
+#pragma once
+
+// Explicit stabilised Runge-Kutta-Chebyshev integration (RKC, Sommeijer,
+// Shampine & Verwer 1997): a second order method whose number of stages s
+// grows with sqrt(h*rho(J)), so that mildly stiff problems with a real
+// dominated spectrum (diffusion) take steps limited by accuracy rather than
+// by the explicit stability limit, using only rhs evaluations and a handful
+// of state vectors (no Jacobian storage).
+//
+// The spectral radius is estimated from:
+//   - the stencil weights (Gershgorin bound of the diffusion & drift part) when
+//     the transport is linear (no logy, logt or auto_efield), combined with a
+//     nonlinear power method on the reactions & fields part (rhs_part), or
+//   - the nonlinear power method on rhs otherwise,
+// re-estimated every rho_interval steps and after rejected steps.
+//
+// y and t are the variables of rd (i.e. logarithmic with logy & logt).
+
+#include <algorithm>
+#include <cmath>
+#include <limits>
+#include <memory>
+#include <stdexcept>
+#include <vector>
+#include "chemreac.hpp"
+#include "chemreac_stepping.hpp"
+
+namespace chemreac {
+
+template <typename Real_t = double>
+class RKC {
+    const ReactionDiffusion<Real_t> &rd;
+    std::unique_ptr<Workspace<Real_t>> ws;
+    const int ny;
+    // yn, f(yn), two previous stages, the new stage (result) and f at the result,
+    // plus the last dominant eigenvector estimate of the power method
+    std::vector<Real_t> yn, fn, yjm1, yjm2, y, fnp1, eigvec;
+    Real_t rho_transport {0}; // Gershgorin bound from the stencil (linear transport only)
+
+public:
+    const bool stencil_rho; // rho = rho_transport + power method on the reactions only
+    int max_stages = 1000;
+    int rho_interval = 25; // steps between estimates of the spectral radius
+    StepControl<Real_t> step_control;
+    long nsteps {0}, nrejected {0}, nfev {0}, nfev_rho {0}, nrho {0}, max_stages_used {0};
+    Real_t rho {0}; // last estimate of the spectral radius
+
+    RKC(const ReactionDiffusion<Real_t> &rd) :
+        rd(rd), ws(rd.make_workspace()), ny(rd.n*rd.N), yn(ny), fn(ny), yjm1(ny), yjm2(ny), y(ny),
+        fnp1(ny), eigvec(ny), stencil_rho(!rd.logy && !rd.logt && !rd.auto_efield),
+        step_control{3, 0.1, 10.0, 0.8, 0.1}
+    {
+        if (stencil_rho && rd.N > 1)
+            rho_transport = transport_gershgorin_();
+    }
+
+    // y0: (N, n), yout: (nt, N, n), atol of size 1 or n. mxsteps: maximum number of
+    // (accepted and rejected) steps between two outputs. Returns the number of
+    // reached outputs (unreached rows of yout are NaN).
+    int predefined(const Real_t * const y0, const std::size_t nt, const Real_t * const tout,
+                   Real_t * const yout, const std::vector<Real_t> &atol, const Real_t rtol,
+                   const Real_t dx0, const Real_t dx_min, const Real_t dx_max, const long int mxsteps){
+        check_atol(atol, rd.n);
+        nsteps = nrejected = nfev = nfev_rho = nrho = max_stages_used = 0;
+        std::copy(y0, y0 + ny, yn.begin());
+        std::copy(y0, y0 + ny, yout);
+        std::size_t iout = 1;
+        if (nt < 2)
+            return nt;
+        Real_t t = tout[0];
+        const Real_t span = tout[nt-1] - tout[0];
+        const Real_t hmax = (dx_max > 0) ? std::min(dx_max, span) : span;
+        rhs_(t, &yn[0], &fn[0]);
+        std::copy(fn.begin(), fn.end(), eigvec.begin());
+        estimate_rho_(t);
+        Real_t h = (dx0 > 0) ? dx0 : initial_step_(t, hmax, atol, rtol);
+        long nsteps_output = 0, last_rho = 0;
+        bool rejected_last = false, fresh_rho = true;
+        while (iout < nt){
+            if (!fresh_rho && (rejected_last || nsteps - last_rho >= rho_interval)){
+                estimate_rho_(t);
+                last_rho = nsteps;
+                fresh_rho = true;
+            }
+            h = std::min(h, hmax);
+            Real_t hs = std::min(h, tout[iout] - t);
+            int s = 1 + static_cast<int>(std::sqrt(1 + 1.54*hs*rho));
+            if (s > max_stages){
+                s = max_stages;
+                hs = (s*s - 1)/(1.54*rho);
+            }
+            s = std::max(s, 2);
+            max_stages_used = std::max<long>(max_stages_used, s);
+            step_(t, hs, s);
+            rhs_(t + hs, &y[0], &fnp1[0]);
+            for (int i=0; i<ny; ++i) // local error estimate (yjm2: scratch)
+                yjm2[i] = Real_t(0.8)*(yn[i] - y[i]) + Real_t(0.4)*hs*(fn[i] + fnp1[i]);
+            const Real_t err = weighted_rms(ny, rd.n, &y[0], &yn[0], &yjm2[0], atol, rtol);
+            const bool accepted = step_control.update(hs, h, err, true, rejected_last);
+            rejected_last = !accepted;
+            if (accepted){
+                const bool to_output = hs == tout[iout] - t;
+                t = to_output ? tout[iout] : t + hs;
+                std::swap(yn, y);
+                std::swap(fn, fnp1);
+                ++nsteps;
+                fresh_rho = false;
+                if (to_output){
+                    std::copy(yn.begin(), yn.end(), yout + iout*ny);
+                    ++iout;
+                    nsteps_output = nsteps + nrejected;
+                }
+            } else {
+                ++nrejected;
+            }
+            if (iout < nt && (nsteps + nrejected - nsteps_output >= mxsteps ||
+                              h < StepControl<Real_t>::h_min(t, dx_min)))
+                break;
+        }
+        std::fill(yout + iout*ny, yout + nt*ny, std::numeric_limits<Real_t>::quiet_NaN());
+        return iout;
+    }
+
+private:
+    void rhs_(const Real_t t, const Real_t * const yy, Real_t * const f){
+        rd.rhs(t, yy, f, *ws);
+        ++nfev;
+    }
+
+    Real_t transport_gershgorin_() const {
+        // max over rows of the sum of absolute values of the (linear) transport Jacobian,
+        // assembled from the full stencil (cf. ReactionDiffusion::update_transport_jac)
+        const int N = rd.N, n = rd.n, ns = rd.nstencil;
+        std::vector<int> cols(ns + 1);
+        std::vector<Real_t> vals(ns + 1);
+        Real_t bound = 0;
+        for (int si : rd.transport_species){
+            for (int bi=0; bi<N; ++bi){
+                int ncols = 0;
+                auto add = [&](int col, Real_t val){
+                    for (int ci=0; ci<ncols; ++ci){
+                        if (cols[ci] == col){
+                            vals[ci] += val;
+                            return;
+                        }
+                    }
+                    cols[ncols] = col;
+                    vals[ncols++] = val;
+                };
+                for (int k=0; k<ns; ++k){
+                    const int sbi = rd.stencil_idx[bi*ns + k];
+                    const Real_t drift = -rd.mobility[si]*rd.div_weight[bi*ns + k];
+                    add(sbi, rd.D[bi*n + si]*rd.lap_weight[bi*ns + k] +
+                        rd.gradD[bi*n + si]*rd.grad_weight[bi*ns + k] + rd.efield[bi]*drift);
+                    add(bi, drift*rd.efield[sbi]);
+                }
+                Real_t row = 0;
+                for (int ci=0; ci<ncols; ++ci)
+                    row += std::abs(vals[ci]);
+                bound = std::max(bound, row);
+            }
+        }
+        return bound;
+    }
+
+    void estimate_rho_(const Real_t t){
+        // Nonlinear power method (cf. rkcrho in rkc.f): v <- f(y + v) - f(y), scaled to a
+        // small perturbation of y, starting from the last eigenvector estimate.
+        // Scratch: y (perturbed state), fnp1 (f at the perturbed state) & yjm1 (f(y) of the part).
+        ++nrho;
+        const RhsPart part = stencil_rho ? RhsPart::REACTION : RhsPart::ALL;
+        const Real_t * f0 = &fn[0];
+        if (part != RhsPart::ALL){
+            rd.rhs_part(t, &yn[0], &yjm1[0], part, *ws);
+            ++nfev_rho;
+            f0 = &yjm1[0];
+        }
+        const Real_t uround = std::numeric_limits<Real_t>::epsilon();
+        Real_t ynrm = 0, vnrm = 0;
+        for (int i=0; i<ny; ++i){
+            ynrm += yn[i]*yn[i];
+            vnrm += eigvec[i]*eigvec[i];
+        }
+        ynrm = std::sqrt(ynrm);
+        vnrm = std::sqrt(vnrm);
+        const Real_t dynrm = (ynrm != 0) ? ynrm*std::sqrt(uround) : std::sqrt(uround);
+        if (vnrm == 0){ // e.g. f(y0) == 0
+            for (int i=0; i<ny; ++i)
+                eigvec[i] = (i % 2) ? 1 : -1;
+            vnrm = std::sqrt(Real_t(ny));
+        }
+        for (int i=0; i<ny; ++i)
+            eigvec[i] *= dynrm/vnrm;
+        Real_t sigma = 0;
+        bool converged = false;
+        for (int it=0; it<50; ++it){
+            for (int i=0; i<ny; ++i)
+                y[i] = yn[i] + eigvec[i];
+            rd.rhs_part(t, &y[0], &fnp1[0], part, *ws);
+            ++nfev_rho;
+            Real_t nrm = 0;
+            for (int i=0; i<ny; ++i){
+                eigvec[i] = fnp1[i] - f0[i];
+                nrm += eigvec[i]*eigvec[i];
+            }
+            nrm = std::sqrt(nrm);
+            const Real_t sigma_prev = sigma;
+            sigma = nrm/dynrm;
+            if (it >= 1 && std::abs(sigma - sigma_prev) <= Real_t(0.01)*std::max(sigma, Real_t(1e-300))){
+                converged = true;
+                break;
+            }
+            if (nrm == 0)
+                break; // e.g. no reactions
+            for (int i=0; i<ny; ++i)
+                eigvec[i] *= dynrm/nrm;
+        }
+        if (!converged && sigma == 0) // keep a usable direction for the next estimate
+            std::copy(fn.begin(), fn.end(), eigvec.begin());
+        rho = Real_t(1.2)*sigma + (stencil_rho ? rho_transport : 0);
+    }
+
+    Real_t initial_step_(const Real_t t, const Real_t hmax, const std::vector<Real_t> &atol, const Real_t rtol){
+        // cf. rkc.f: one explicit Euler step to estimate the local error of a step of length h
+        Real_t h = hmax;
+        if (rho*h > 1)
+            h = 1/rho;
+        for (int i=0; i<ny; ++i)
+            y[i] = yn[i] + h*fn[i];
+        rhs_(t + h, &y[0], &fnp1[0]);
+        for (int i=0; i<ny; ++i)
+            fnp1[i] -= fn[i];
+        const Real_t est = h*weighted_rms(ny, rd.n, &yn[0], &yn[0], &fnp1[0], atol, rtol);
+        if (Real_t(0.1)*h < hmax*std::sqrt(est))
+            return std::max(Real_t(0.1)*h/std::sqrt(est), 16*std::numeric_limits<Real_t>::epsilon()*hmax);
+        return hmax;
+    }
+
+    void step_(const Real_t t, const Real_t h, const int s){
+        // s stage damped (eps = 2/13) Chebyshev step from (t, yn) with fn = f(t, yn), result in y
+        const Real_t w0 = 1 + 2/(13*Real_t(s)*s);
+        const Real_t temp1 = w0*w0 - 1, temp2 = std::sqrt(temp1);
+        const Real_t arg = s*std::log(w0 + temp2);
+        const Real_t w1 = std::sinh(arg)*temp1/(std::cosh(arg)*s*temp2 - w0*std::sinh(arg));
+        Real_t bjm1 = 1/(4*w0*w0), bjm2 = bjm1;
+        // stage 1
+        Real_t mus = w1*bjm1;
+        const int nyl = ny;
+        const Real_t * const ANYODE_RESTRICT pyn = &yn[0];
+        const Real_t * const ANYODE_RESTRICT pfn = &fn[0];
+        {
+            Real_t * const ANYODE_RESTRICT pyjm2 = &yjm2[0];
+            Real_t * const ANYODE_RESTRICT pyjm1 = &yjm1[0];
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(static) if (nyl > rd.par_threshold_rhs)
+#endif
+            for (int i=0; i<nyl; ++i){
+                pyjm2[i] = pyn[i];
+                pyjm1[i] = pyn[i] + h*mus*pfn[i];
+            }
+        }
+        Real_t thjm2 = 0, thjm1 = mus;
+        Real_t zjm1 = w0, zjm2 = 1, dzjm1 = 1, dzjm2 = 0, d2zjm1 = 0, d2zjm2 = 0;
+        // stages 2, ..., s (Chebyshev recursion, y holds f(yjm1) & then the new stage)
+        for (int j=2; j<=s; ++j){
+            const Real_t zj = 2*w0*zjm1 - zjm2;
+            const Real_t dzj = 2*w0*dzjm1 - dzjm2 + 2*zjm1;
+            const Real_t d2zj = 2*w0*d2zjm1 - d2zjm2 + 4*dzjm1;
+            const Real_t bj = d2zj/(dzj*dzj);
+            const Real_t ajm1 = 1 - zjm1*bjm1;
+            const Real_t mu = 2*w0*bj/bjm1, nu = -bj/bjm2;
+            mus = mu*w1/w0;
+            const Real_t * const ANYODE_RESTRICT pyjm2 = &yjm2[0], * const ANYODE_RESTRICT pyjm1 = &yjm1[0];
+            Real_t * const ANYODE_RESTRICT py = &y[0];
+            rhs_(t + h*thjm1, pyjm1, py);
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(static) if (nyl > rd.par_threshold_rhs)
+#endif
+            for (int i=0; i<nyl; ++i)
+                py[i] = mu*pyjm1[i] + nu*pyjm2[i] + (1 - mu - nu)*pyn[i] + h*mus*(py[i] - ajm1*pfn[i]);
+            const Real_t thj = mu*thjm1 + nu*thjm2 + mus*(1 - ajm1);
+            if (j < s){
+                std::swap(yjm2, yjm1); // yjm2 := yjm1
+                std::swap(yjm1, y); // yjm1 := y (y: scratch)
+                thjm2 = thjm1; thjm1 = thj;
+                bjm2 = bjm1; bjm1 = bj;
+                zjm2 = zjm1; zjm1 = zj;
+                dzjm2 = dzjm1; dzjm1 = dzj;
+                d2zjm2 = d2zjm1; d2zjm1 = d2zj;
+            }
+        }
+    }
+};
+
+}
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+# -*- mode: cython-mode -*-
+
+from libcpp cimport bool
+from libcpp.vector cimport vector
+from chemreac cimport ReactionDiffusion
+
+cdef extern from "chemreac_rkc.hpp" namespace "chemreac":
+    cdef cppclass RKC[T]:
+        const bool stencil_rho
+        int max_stages, rho_interval
+        long nsteps, nrejected, nfev, nfev_rho, nrho, max_stages_used
+        T rho
+        RKC(const ReactionDiffusion[T]&) except +
+        int predefined(const T * const, size_t, const T * const, T * const,
+                       const vector[T]&, T, T, T, T, long int) nogil except +
@@ -0,0 +1,299 @@
+#pragma once
+
+// Rosenbrock (linearly implicit Runge-Kutta) integration of ReactionDiffusion.
+// No Newton iterations: every stage solves one linear system with the same
+// matrix I/(gamma*h) - J (written in the form of Hairer & Wanner, IV.7):
+//
+//     (I/(gamma*h) - J) K_i = f(t + alpha_i*h, y + sum_j a_ij K_j) + sum_j c_ij/h K_j + gamma_i*h*df/dt
+//     y(t + h) = y + sum_i m_i K_i,   error estimate: sum_i e_i K_i
+//
+// The Jacobian is assembled by compressed_jac_cmaj once per step (it is kept
+// when a step is rejected) and I - gamma*h*J is factorized once per attempted
+// step using its block structure: the block-tridiagonal solver when
+// n_jac_diags == 1 (or N == 1, i.e. one dense n x n LU) and a banded LU of
+// bandwidth n*n_jac_diags otherwise. The factorization is shared by all stages.
+//
+// Methods (both of order 3 with an embedded method of order 2):
+//     "rodas3": RODAS3 (Sandu et al. 1997), 4 stages, L-stable, stiffly accurate
+//     "ros3p":  ROS3P (Lang & Verwer 2001), 3 stages, A-stable, no order
+//               reduction for parabolic problems
+//
+// y and t are the variables of rd (i.e. logarithmic with logy & logt), df/dt is
+// only non-zero with logt (finite difference). A stencil reaching beyond
+// n_jac_diags makes J approximate which lowers the order of the method.
+// Periodic geometry is not supported.
+
+#include <algorithm>
+#include <cmath>
+#include <limits>
+#include <memory>
+#include <stdexcept>
+#include <string>
+#include <vector>
+#include "chemreac.hpp"
+#include "chemreac_stepping.hpp"
+
+namespace chemreac {
+
+template <typename Real_t = double>
+class Rosenbrock {
+    const ReactionDiffusion<Real_t> &rd;
+    std::unique_ptr<Workspace<Real_t>> ws;
+    int ns; // number of stages
+    Real_t gamma;
+    std::vector<Real_t> a, c; // ns x ns (row major, strictly lower triangular)
+    std::vector<Real_t> alpha, gamma_i, m, e;
+    std::vector<int> new_f; // stage i evaluates f (otherwise reuses that of stage i - 1)
+    block_diag_ilu::BlockDiagMatrix<Real_t> jac, mtx; // J & I - gamma*h*J
+    std::unique_ptr<AnyODE::BandedMatrix<Real_t>> banded;
+    std::unique_ptr<AnyODE::DecompositionBase<Real_t>> lu;
+    std::vector<Real_t> f0, dfdt, fs, K, r, ytmp, ynew, yerr;
+    bool jac_current = false; // jac (and dfdt) evaluated at the current state
+
+public:
+    const std::string method;
+    const int order = 3;
+    const bool block_tridiag; // factorization: BlockTridiagLU (otherwise banded LU)
+    StepControl<Real_t> step_control;
+    long nsteps {0}, nrejected {0}, nfev {0}, njev {0}, nfactor {0}, nsolve {0};
+
+    Rosenbrock(const ReactionDiffusion<Real_t> &rd, const std::string &method="rodas3") :
+        rd(rd), ws(rd.make_workspace()),
+        jac(nullptr, rd.N, rd.n, rd.n_jac_diags, 0, rd.n),
+        mtx(nullptr, rd.N, rd.n, rd.n_jac_diags, 0, rd.n),
+        method(method), block_tridiag(rd.N == 1 || rd.n_jac_diags == 1),
+        step_control{Real_t(order), 0.2, 6.0, 0.9, 0.25}
+    {
+        if (method == "rodas3")
+            set_rodas3_();
+        else if (method == "ros3p")
+            set_ros3p_();
+        else
+            throw std::invalid_argument("Unknown Rosenbrock method: " + method);
+        if (rd.geom == Geom::PERIODIC)
+            throw std::invalid_argument("Rosenbrock does not support periodic geometry");
+        const int ny = rd.n*rd.N;
+        for (auto v : {&f0, &dfdt, &fs, &r, &ytmp, &ynew, &yerr})
+            v->resize(ny);
+        K.resize(ns*ny);
+    }
+
+    // y0: (N, n), yout: (nt, N, n), atol of size 1 or n. mxsteps: maximum number of
+    // (accepted and rejected) steps between two outputs. Returns the number of
+    // reached outputs (unreached rows of yout are NaN).
+    int predefined(const Real_t * const y0, const std::size_t nt, const Real_t * const tout,
+                   Real_t * const yout, const std::vector<Real_t> &atol, const Real_t rtol,
+                   const Real_t dx0, const Real_t dx_min, const Real_t dx_max, const long int mxsteps){
+        const int ny = rd.n*rd.N;
+        std::vector<Real_t> y(y0, y0 + ny);
+        std::copy(y0, y0 + ny, yout);
+        std::size_t iout = 1;
+        Real_t t = tout[0], h = 0;
+        if (nt > 1){
+            h = init_(t, y, tout[nt-1], atol, dx0);
+            for (; iout < nt; ++iout){
+                if (!advance_(t, y, tout[iout], h, atol, rtol, dx_min, dx_max, mxsteps,
+                              [](Real_t, const std::vector<Real_t>&){}))
+                    break;
+                std::copy(y.begin(), y.end(), yout + iout*ny);
+            }
+        }
+        std::fill(yout + iout*ny, yout + nt*ny, std::numeric_limits<Real_t>::quiet_NaN());
+        return iout;
+    }
+
+    // Integrates from t0 to tend storing every accepted step: xout (t0 included) &
+    // yout (bin-major states) are appended to. mxsteps: maximum number of (accepted
+    // and rejected) steps. Returns the number of accepted steps (tend was reached
+    // if xout.back() == tend).
+    int adaptive(const Real_t * const y0, const Real_t t0, const Real_t tend,
+                 std::vector<Real_t> &xout, std::vector<Real_t> &yout,
+                 const std::vector<Real_t> &atol, const Real_t rtol,
+                 const Real_t dx0, const Real_t dx_min, const Real_t dx_max, const long int mxsteps){
+        const int ny = rd.n*rd.N;
+        std::vector<Real_t> y(y0, y0 + ny);
+        xout.push_back(t0);
+        yout.insert(yout.end(), y.begin(), y.end());
+        Real_t t = t0;
+        Real_t h = init_(t, y, tend, atol, dx0);
+        advance_(t, y, tend, h, atol, rtol, dx_min, dx_max, mxsteps,
+                 [&](Real_t ti, const std::vector<Real_t> &yi){
+                     xout.push_back(ti);
+                     yout.insert(yout.end(), yi.begin(), yi.end());
+                 });
+        return nsteps;
+    }
+
+private:
+    void set_tableau_(int s, Real_t g, std::vector<Real_t> a_, std::vector<Real_t> c_,
+                      std::vector<Real_t> alpha_, std::vector<Real_t> gamma_i_,
+                      std::vector<Real_t> m_, std::vector<Real_t> e_){
+        // a_ & c_: strictly lower triangular parts (row major, row by row)
+        ns = s;
+        gamma = g;
+        a.assign(s*s, 0);
+        c.assign(s*s, 0);
+        for (int i=1, k=0; i<s; ++i)
+            for (int j=0; j<i; ++j, ++k){
+                a[i*s + j] = a_[k];
+                c[i*s + j] = c_[k];
+            }
+        alpha = alpha_;
+        gamma_i = gamma_i_;
+        m = m_;
+        e = e_;
+        new_f.assign(s, 1);
+        for (int i=1; i<s; ++i){
+            bool same = alpha[i] == alpha[i-1];
+            for (int j=0; j<i; ++j)
+                same = same && a[i*s + j] == ((j < i - 1) ? a[(i-1)*s + j] : 0);
+            new_f[i] = !same;
+        }
+    }
+
+    void set_rodas3_(){
+        set_tableau_(4, 0.5,
+                     {0, 2, 0, 2, 0, 1},
+                     {4, 1, -1, 1, -1, -8.0/3},
+                     {0, 0, 1, 1}, {0.5, 1.5, 0, 0},
+                     {2, 0, 1, 1}, {0, 0, 0, 1});
+    }
+
+    void set_ros3p_(){
+        // gamma = 1/2 + sqrt(3)/6
+        set_tableau_(3, 0.78867513459481288225457439025098,
+                     {1.2679491924311227064725536584941, 1.2679491924311227064725536584941, 0},
+                     {-1.6076951545867362388353219509648, -3.4641016151377545870548926830117,
+                      -1.7320508075688772935274463415059},
+                     {0, 1, 1},
+                     {0.78867513459481288225457439025098, -0.21132486540518711774542560974902,
+                      -1.0773502691896257645091487805020},
+                     {2, 0.57735026918962576450914878050196, 0.42264973081037423549085121949804},
+                     {-0.11324865405187117745425609749021, -0.42264973081037423549085121949804, 0});
+    }
+
+    Real_t init_(const Real_t t, const std::vector<Real_t> &y, const Real_t tend,
+                 const std::vector<Real_t> &atol, const Real_t dx0){
+        // Resets the counters, evaluates f0 and returns the initial step size
+        // (cf. Hairer, Norsett & Wanner (1993), II.4)
+        check_atol(atol, rd.n);
+        nsteps = nrejected = nfev = njev = nfactor = nsolve = 0;
+        rd.rhs(t, y.data(), &f0[0], *ws);
+        ++nfev;
+        jac_current = false;
+        if (dx0 > 0)
+            return dx0;
+        const int ny = rd.n*rd.N;
+        const Real_t d0 = weighted_rms(ny, rd.n, y.data(), y.data(), y.data(), atol, Real_t(0)),
+            d1 = weighted_rms(ny, rd.n, y.data(), y.data(), &f0[0], atol, Real_t(0));
+        const Real_t h = (d0 < 1e-5 || d1 < 1e-5) ? 1e-6 : 0.01*d0/d1;
+        return std::min(h, tend - t);
+    }
+
+    template <typename Record>
+    bool advance_(Real_t &t, std::vector<Real_t> &y, const Real_t tend, Real_t &h,
+                  const std::vector<Real_t> &atol, const Real_t rtol, const Real_t dx_min,
+                  const Real_t dx_max, const long int mxsteps, Record record){
+        // Steps from t to tend (f0 evaluated at (t, y)), record(t, y) is called
+        // after every accepted step. Returns false on failure.
+        const int ny = rd.n*rd.N;
+        long nattempts = 0;
+        bool rejected_last = false;
+        while (t < tend){
+            if (dx_max > 0)
+                h = std::min(h, dx_max);
+            const Real_t hs = std::min(h, tend - t);
+            const bool ok = step_(t, y.data(), hs);
+            const Real_t err = ok ? weighted_rms(ny, rd.n, y.data(), ynew.data(), yerr.data(), atol, rtol) :
+                std::numeric_limits<Real_t>::infinity();
+            const bool accepted = step_control.update(hs, h, err, ok, rejected_last);
+            rejected_last = !accepted;
+            ++nattempts;
+            if (accepted){
+                t = (hs == tend - t) ? tend : t + hs;
+                std::swap(y, ynew);
+                rd.rhs(t, y.data(), &f0[0], *ws);
+                ++nfev;
+                jac_current = false;
+                ++nsteps;
+                record(t, y);
+            } else {
+                ++nrejected;
+            }
+            if (t < tend && (nattempts >= mxsteps || h < StepControl<Real_t>::h_min(t, dx_min)))
+                return false;
+        }
+        return true;
+    }
+
+    bool factorize_(const Real_t h){
+        // I - gamma*h*J
+        ++nfactor;
+        mtx.set_to_eye_plus_scaled_mtx(-gamma*h, jac);
+        if (block_tridiag){
+            lu.reset(new BlockTridiagLU<Real_t>(mtx));
+        } else {
+            const int kl = rd.n*rd.n_jac_diags;
+            banded.reset(new AnyODE::BandedMatrix<Real_t>(mtx, kl, kl));
+            lu.reset(new AnyODE::BandedLU<Real_t>(banded.get()));
+        }
+        return lu->factorize() == 0;
+    }
+
+    bool step_(const Real_t t, const Real_t * const y, const Real_t h){
+        // f0 evaluated at (t, y) by the caller. Result in ynew, error estimate in yerr.
+        const int ny = rd.n*rd.N;
+        if (!jac_current){
+            jac.set_to(0);
+            rd.compressed_jac_cmaj(t, y, &f0[0], jac.m_data, 0, *ws);
+            ++njev;
+            if (rd.logt){ // rd.f depends explicitly on t only through the logarithmic time
+                const Real_t dt = std::sqrt(std::numeric_limits<Real_t>::epsilon())*std::max(std::abs(t), Real_t(1));
+                rd.rhs(t + dt, y, &dfdt[0], *ws);
+                ++nfev;
+                for (int k=0; k<ny; ++k)
+                    dfdt[k] = (dfdt[k] - f0[k])/dt;
+            }
+            jac_current = true;
+        }
+        if (!factorize_(h))
+            return false;
+        const Real_t hg = h*gamma;
+        const Real_t * f = &f0[0]; // f of the current stage
+        for (int i=0; i<ns; ++i){
+            if (i > 0 && new_f[i]){
+                for (int k=0; k<ny; ++k){
+                    Real_t acc = 0;
+                    for (int j=0; j<i; ++j)
+                        acc += a[i*ns + j]*K[j*ny + k];
+                    ytmp[k] = y[k] + acc;
+                }
+                rd.rhs(t + alpha[i]*h, &ytmp[0], &fs[0], *ws);
+                ++nfev;
+                f = &fs[0];
+            }
+            for (int k=0; k<ny; ++k){
+                Real_t acc = 0;
+                for (int j=0; j<i; ++j)
+                    acc += c[i*ns + j]*K[j*ny + k];
+                // (I - gamma*h*J) K_i = gamma*h*(...)
+                r[k] = hg*(f[k] + acc/h + ((rd.logt) ? gamma_i[i]*h*dfdt[k] : 0));
+            }
+            if (lu->solve(&r[0], &K[i*ny]) != 0)
+                return false;
+            ++nsolve;
+        }
+        for (int k=0; k<ny; ++k){
+            Real_t acc = 0, acc_err = 0;
+            for (int i=0; i<ns; ++i){
+                acc += m[i]*K[i*ny + k];
+                acc_err += e[i]*K[i*ny + k];
+            }
+            ynew[k] = y[k] + acc;
+            yerr[k] = acc_err;
+        }
+        return true;
+    }
+};
+
+}
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+# -*- mode: cython-mode -*-
+
+from libcpp cimport bool
+from libcpp.string cimport string
+from libcpp.vector cimport vector
+from chemreac cimport ReactionDiffusion
+
+cdef extern from "chemreac_rosenbrock.hpp" namespace "chemreac":
+    cdef cppclass Rosenbrock[T]:
+        const bool block_tridiag
+        long nsteps, nrejected, nfev, njev, nfactor, nsolve
+        Rosenbrock(const ReactionDiffusion[T]&, const string&) except +
+        int predefined(const T * const, size_t, const T * const, T * const,
+                       const vector[T]&, T, T, T, T, long int) nogil except +
+        int adaptive(const T * const, T, T, vector[T]&, vector[T]&,
+                     const vector[T]&, T, T, T, T, long int) nogil except +
@@ -0,0 +1,193 @@
+#pragma once
+
+// Sparse (CSC) representation of the single-compartment Jacobian and a
+// direct sparse LU used for large reaction networks (N == 1), where the
+// n x n Jacobian is mostly structural zeros.
+
+#include <algorithm>
+#include <set>
+#include <stdexcept>
+#include <vector>
+#include "block_diag_ilu.hpp"
+#include "anyode/anyode.hpp"
+#include "anyode/anyode_decomposition.hpp"
+
+namespace chemreac {
+
+    template <typename Real_t = double>
+    struct CSCBlockView {
+        // Mimics the (block, sub, sup) interface of the block_diag_ilu matrix
+        // views for a single n x n block stored in compressed sparse column
+        // format. Structural zeros are redirected to a scratch entry.
+        Real_t * const m_data;
+        const int * const m_idx; // n x n column major map: entry -> index in m_data (-1: structural zero)
+        const int m_blockw;
+        Real_t m_sink;
+        CSCBlockView(Real_t * const data, const int * const idx, int blockw) :
+            m_data(data), m_idx(idx), m_blockw(blockw) {}
+        Real_t& block(int bi, int ri, int ci) {
+            AnyODE::ignore(bi);
+            const int idx = m_idx[ci*m_blockw + ri];
+            if (idx < 0){
+                m_sink = 0;
+                return m_sink;
+            }
+            return m_data[idx];
+        }
+        Real_t& sub(int di, int bi, int li) {
+            AnyODE::ignore(di); AnyODE::ignore(bi); AnyODE::ignore(li);
+            m_sink = 0;
+            return m_sink;
+        }
+        Real_t& sup(int di, int bi, int li) {
+            return sub(di, bi, li);
+        }
+    };
+
+    inline std::vector<int> minimum_degree_ordering(const int n, const std::vector<int>& colptrs,
+                                                    const std::vector<int>& rowvals)
+    {
+        // Fill-reducing ordering from (exact) minimum degree elimination on
+        // the symmetrized graph of the pattern, ties broken by lowest index.
+        // Returns order where order[k] is the index eliminated at step k.
+        std::vector<std::set<int> > adj(n);
+        for (int ci=0; ci<n; ++ci)
+            for (int idx=colptrs[ci]; idx<colptrs[ci+1]; ++idx){
+                const int ri = rowvals[idx];
+                if (ri == ci) continue;
+                adj[ri].insert(ci);
+                adj[ci].insert(ri);
+            }
+        std::vector<int> order;
+        order.reserve(n);
+        std::vector<bool> done(n, false);
+        for (int k=0; k<n; ++k){
+            int best = -1;
+            for (int i=0; i<n; ++i){
+                if (done[i]) continue;
+                if (best == -1 || adj[i].size() < adj[best].size())
+                    best = i;
+            }
+            for (int nb : adj[best]){
+                adj[nb].erase(best);
+                for (int other : adj[best])
+                    if (other != nb)
+                        adj[nb].insert(other);
+            }
+            adj[best].clear();
+            done[best] = true;
+            order.push_back(best);
+        }
+        return order;
+    }
+
+    struct SparseLUSymbolic {
+        // Row-wise (CSR) pattern of L + U for the symmetrically permuted
+        // matrix, including all fill-in. Computed once per network.
+        int m_n;
+        std::vector<int> m_order; // permuted index -> original index
+        std::vector<int> m_rowptr, m_colidx, m_diagpos;
+        std::vector<int> m_srcidx; // position in CSC data for each entry (-1 for fill-in)
+
+        SparseLUSymbolic(const int n, const std::vector<int>& colptrs, const std::vector<int>& rowvals,
+                         const std::vector<int>& order) :
+            m_n(n), m_order(order), m_rowptr(n + 1, 0), m_diagpos(n)
+        {
+            std::vector<int> iperm(n);
+            for (int k=0; k<n; ++k)
+                iperm[order[k]] = k;
+            std::vector<std::set<int> > rows(n);
+            for (int ci=0; ci<n; ++ci){
+                rows[iperm[ci]].insert(iperm[ci]); // pivots are always stored
+                for (int idx=colptrs[ci]; idx<colptrs[ci+1]; ++idx)
+                    rows[iperm[rowvals[idx]]].insert(iperm[ci]);
+            }
+            for (int i=0; i<n; ++i){
+                for (auto it=rows[i].begin(); it != rows[i].end() && *it < i; ++it){
+                    const int k = *it;
+                    for (auto jt=rows[k].upper_bound(k); jt != rows[k].end(); ++jt)
+                        rows[i].insert(*jt); // elements > k: visited later by `it`
+                }
+                m_rowptr[i+1] = m_rowptr[i] + rows[i].size();
+            }
+            m_colidx.reserve(m_rowptr[n]);
+            for (int i=0; i<n; ++i)
+                for (int j : rows[i]){
+                    if (j == i)
+                        m_diagpos[i] = m_colidx.size();
+                    m_colidx.push_back(j);
+                }
+            m_srcidx.assign(m_rowptr[n], -1);
+            for (int ci=0; ci<n; ++ci){
+                for (int idx=colptrs[ci]; idx<colptrs[ci+1]; ++idx){
+                    const int i = iperm[rowvals[idx]];
+                    const int j = iperm[ci];
+                    const auto beg = m_colidx.begin() + m_rowptr[i];
+                    const auto pos = std::lower_bound(beg, m_colidx.begin() + m_rowptr[i+1], j);
+                    m_srcidx[pos - m_colidx.begin()] = idx;
+                }
+            }
+        }
+        int nnz() const { return m_rowptr[m_n]; }
+    };
+
+    template <typename Real_t = double>
+    struct SparseLU : public AnyODE::DecompositionBase<Real_t> {
+        // LU factorization without pivoting (the fill-reducing order is fixed
+        // by the symbolic factorization). Intended for I - gamma*J where the
+        // diagonal dominates for the step sizes CVODE tries; a zero pivot is
+        // reported through the return value of factorize().
+        const SparseLUSymbolic& m_sym;
+        std::vector<Real_t> m_vals, m_work;
+        std::vector<int> m_colpos;
+
+        SparseLU(const SparseLUSymbolic& sym, const Real_t * const csc_data) :
+            m_sym(sym), m_vals(sym.nnz()), m_work(sym.m_n), m_colpos(sym.m_n, -1)
+        {
+            for (int idx=0; idx<sym.nnz(); ++idx)
+                m_vals[idx] = (sym.m_srcidx[idx] < 0) ? 0 : csc_data[sym.m_srcidx[idx]];
+        }
+        int factorize() override final {
+            const int n = m_sym.m_n;
+            const auto& rowptr = m_sym.m_rowptr;
+            const auto& colidx = m_sym.m_colidx;
+            for (int i=0; i<n; ++i){
+                for (int idx=rowptr[i]; idx<rowptr[i+1]; ++idx)
+                    m_colpos[colidx[idx]] = idx;
+                for (int idx=rowptr[i]; idx<m_sym.m_diagpos[i]; ++idx){
+                    const int k = colidx[idx];
+                    const Real_t l = m_vals[idx] /= m_vals[m_sym.m_diagpos[k]];
+                    if (l == 0) continue;
+                    for (int kdx=m_sym.m_diagpos[k]+1; kdx<rowptr[k+1]; ++kdx)
+                        m_vals[m_colpos[colidx[kdx]]] -= l*m_vals[kdx];
+                }
+                for (int idx=rowptr[i]; idx<rowptr[i+1]; ++idx)
+                    m_colpos[colidx[idx]] = -1;
+                if (m_vals[m_sym.m_diagpos[i]] == 0)
+                    return i + 1;
+            }
+            return 0;
+        }
+        int solve(const Real_t * const b, Real_t * const x) override final {
+            const int n = m_sym.m_n;
+            const auto& rowptr = m_sym.m_rowptr;
+            const auto& colidx = m_sym.m_colidx;
+            for (int i=0; i<n; ++i){ // L (unit diagonal)
+                Real_t tmp = b[m_sym.m_order[i]];
+                for (int idx=rowptr[i]; idx<m_sym.m_diagpos[i]; ++idx)
+                    tmp -= m_vals[idx]*m_work[colidx[idx]];
+                m_work[i] = tmp;
+            }
+            for (int i=n-1; i>=0; --i){ // U
+                Real_t tmp = m_work[i];
+                for (int idx=m_sym.m_diagpos[i]+1; idx<rowptr[i+1]; ++idx)
+                    tmp -= m_vals[idx]*m_work[colidx[idx]];
+                m_work[i] = tmp/m_vals[m_sym.m_diagpos[i]];
+            }
+            for (int i=0; i<n; ++i)
+                x[m_sym.m_order[i]] = m_work[i];
+            return 0;
+        }
+    };
+
+}
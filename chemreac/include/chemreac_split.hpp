@@ -0,0 +1,194 @@
+#pragma once
+
+// Operator splitting integrator: the reactions of every bin are integrated
+// independently (BatchRosenbrock with the bins as members, blocks of bins
+// are distributed over OpenMP threads) and the (linear) transport is
+// integrated implicitly, species by species, alternating as:
+//
+//     Lie (order 1):    y(t + h) = T(h) R(h) y(t)
+//     Strang (order 2): y(t + h) = T(h/2) R(h) T(h/2) y(t)
+//
+// The transport substeps use the L-stable SDIRK2 method (gamma = 1 - 1/sqrt(2),
+// both stages share one banded factorization of I - gamma*h*J_transport) on
+// the full finite difference stencil (lap_weight, div_weight & grad_weight).
+// The splitting error is estimated by step doubling which controls the step
+// size; the reaction substeps use tighter tolerances (inner_tol_factor).
+//
+// Concentrations and time are linear irrespective of rd.logy and rd.logt.
+// Not supported: fields, auto_efield and periodic geometry.
+
+#include <cmath>
+#include <limits>
+#include <memory>
+#include <stdexcept>
+#include <utility>
+#include <vector>
+#include "chemreac.hpp"
+#include "chemreac_batch.hpp"
+#include "chemreac_stepping.hpp"
+
+namespace chemreac {
+
+template <typename Real_t = double>
+class SplitIntegrator {
+    const ReactionDiffusion<Real_t> &rd;
+    BatchRosenbrock<Real_t> reaction;
+    const int kl; // bandwidth of the transport operator (one-sided stencils at the boundaries)
+    // Factorizations of I - gamma*dt*J_transport (most recently used last)
+    std::vector<std::pair<Real_t, std::unique_ptr<SpeciesBandLU<Real_t>>>> transport_lu;
+
+    static constexpr Real_t sdirk_gamma = 0.29289321881345247559915563789515; // 1 - 1/sqrt(2)
+
+public:
+    const int order;
+    int nthreads = 1;
+    Real_t inner_tol_factor = 0.1;
+    StepControl<Real_t> step_control;
+    long nsteps {0}, nrejected {0}, nreaction_steps {0}, ntransport_factor {0};
+
+    SplitIntegrator(const ReactionDiffusion<Real_t> &rd, int order=2) :
+        rd(rd), reaction(rd, true), kl(rd.nstencil - 1), order(order),
+        step_control{Real_t(order + 1), 0.2, 5.0, 0.9, 0.2} {
+        if (order != 1 && order != 2)
+            throw std::invalid_argument("order must be 1 (Lie) or 2 (Strang)");
+        if (rd.auto_efield)
+            throw std::invalid_argument("SplitIntegrator does not support auto_efield");
+        if (rd.geom == Geom::PERIODIC)
+            throw std::invalid_argument("SplitIntegrator does not support periodic geometry");
+    }
+
+    // y0: (N, n), yout: (nt, N, n), atol of size 1 or n. mxsteps: maximum number of
+    // (accepted and rejected) steps between two outputs. Returns the number of
+    // reached outputs (unreached rows of yout are NaN).
+    int predefined(const Real_t * const y0, const std::size_t nt, const Real_t * const tout,
+                   Real_t * const yout, const std::vector<Real_t> &atol, const Real_t rtol,
+                   const Real_t dx0, const Real_t dx_min, const Real_t dx_max, const long int mxsteps){
+        const int ny = rd.n*rd.N;
+        check_atol(atol, rd.n);
+        nsteps = nrejected = nreaction_steps = ntransport_factor = 0;
+        std::vector<Real_t> y(y0, y0 + ny), yfull(ny), yhalf(ny);
+        std::copy(y0, y0 + ny, yout);
+        std::size_t iout = 1;
+        if (nt < 2)
+            return nt;
+        Real_t t = tout[0];
+        Real_t h = (dx0 > 0) ? dx0 : 1e-3*(tout[nt-1] - tout[0]);
+        long nsteps_output = 0;
+        bool rejected_last = false;
+        while (iout < nt){
+            if (dx_max > 0)
+                h = std::min(h, dx_max);
+            const Real_t hs = std::min(h, tout[iout] - t);
+            // Step doubling: one step of length hs & two of hs/2
+            std::copy(y.begin(), y.end(), yfull.begin());
+            std::copy(y.begin(), y.end(), yhalf.begin());
+            bool ok = split_step_(yfull.data(), hs, atol, rtol);
+            ok = ok && split_step_(yhalf.data(), hs/2, atol, rtol);
+            ok = ok && split_step_(yhalf.data(), hs/2, atol, rtol);
+            Real_t err = std::numeric_limits<Real_t>::infinity();
+            if (ok){
+                for (int i=0; i<ny; ++i) // Richardson error estimate (yfull: scratch)
+                    yfull[i] = (yhalf[i] - yfull[i])/(std::pow(Real_t(2), order) - 1);
+                err = weighted_rms(ny, rd.n, y.data(), yhalf.data(), yfull.data(), atol, rtol);
+            }
+            const bool accepted = step_control.update(hs, h, err, ok, rejected_last);
+            rejected_last = !accepted;
+            if (accepted){
+                const bool to_output = hs == tout[iout] - t;
+                t += hs;
+                std::swap(y, yhalf);
+                ++nsteps;
+                if (to_output){
+                    t = tout[iout];
+                    std::copy(y.begin(), y.end(), yout + iout*ny);
+                    ++iout;
+                    nsteps_output = nsteps + nrejected;
+                }
+            } else {
+                ++nrejected;
+            }
+            if (iout < nt && (nsteps + nrejected - nsteps_output >= mxsteps ||
+                              h < StepControl<Real_t>::h_min(t, dx_min)))
+                break;
+        }
+        std::fill(yout + iout*ny, yout + nt*ny, std::numeric_limits<Real_t>::quiet_NaN());
+        return iout;
+    }
+
+private:
+    bool split_step_(Real_t * const y, const Real_t h, const std::vector<Real_t> &atol, const Real_t rtol){
+        if (order == 1)
+            return reaction_step_(y, h, atol, rtol) && transport_step_(y, h);
+        return transport_step_(y, h/2) && reaction_step_(y, h, atol, rtol) && transport_step_(y, h/2);
+    }
+
+    bool reaction_step_(Real_t * const y, const Real_t h, const std::vector<Real_t> &atol, const Real_t rtol){
+        const int N = rd.N, n = rd.n;
+        const Real_t tspan[2] = {0, h};
+        std::vector<Real_t> ybins(2*N*n), ratol(atol);
+        std::vector<int> nreached(N);
+        std::vector<long int> nsteps_bin(N), nrejected_bin(N);
+        for (auto& a : ratol)
+            a *= inner_tol_factor;
+        reaction.predefined(N, y, &rd.k_eff[0], 2, tspan, &ybins[0], ratol, rtol*inner_tol_factor,
+                            0, 0, 0, 500, &nreached[0], &nsteps_bin[0], &nrejected_bin[0], nthreads);
+        for (int bi=0; bi<N; ++bi){
+            nreaction_steps += nsteps_bin[bi];
+            if (nreached[bi] != 2)
+                return false;
+            std::copy(&ybins[(2*bi + 1)*n], &ybins[(2*bi + 2)*n], y + bi*n);
+        }
+        return true;
+    }
+
+    SpeciesBandLU<Real_t> * transport_lu_(const Real_t dt){
+        for (auto& entry : transport_lu)
+            if (entry.first == dt)
+                return entry.second.get();
+        const int N = rd.N, n = rd.n, ns = rd.nstencil;
+        std::unique_ptr<SpeciesBandLU<Real_t>> lu {new SpeciesBandLU<Real_t>(
+                N, n, kl, rd.transport_species, rd.par_threshold_jac, nthreads)};
+        const Real_t c = sdirk_gamma*dt;
+        for (int si : rd.transport_species){
+            for (int bi=0; bi<N; ++bi){
+                (*lu)(si, bi, bi) += 1;
+                if ((rd.D[bi*n + si] == 0.0) && (rd.mobility[si] == 0.0))
+                    continue;
+                for (int k=0; k<ns; ++k){ // cf. ReactionDiffusion::update_transport_jac
+                    const int sbi = rd.stencil_idx[bi*ns + k];
+                    const Real_t drift = -rd.mobility[si]*rd.div_weight[bi*ns + k];
+                    const Real_t contrib = rd.D[bi*n + si]*rd.lap_weight[bi*ns + k] +
+                        rd.gradD[bi*n + si]*rd.grad_weight[bi*ns + k] + rd.efield[bi]*drift;
+                    (*lu)(si, bi, bi) -= c*drift*rd.efield[sbi];
+                    (*lu)(si, bi, sbi) -= c*contrib;
+                }
+            }
+        }
+        ntransport_factor++;
+        if (lu->factorize() != 0)
+            return nullptr;
+        if (transport_lu.size() == 4) // substeps of h & h/2 (Strang: h/2 & h/4)
+            transport_lu.erase(transport_lu.begin());
+        transport_lu.emplace_back(dt, std::move(lu));
+        return transport_lu.back().second.get();
+    }
+
+    bool transport_step_(Real_t * const y, const Real_t h){
+        // SDIRK2 for the linear y' = T*y:
+        // (I - gamma*h*T)*Y1 = y, (I - gamma*h*T)*Y2 = y + (1 - gamma)*h*T*Y1, y := Y2
+        if (rd.N == 1 || rd.transport_species.size() == 0)
+            return true;
+        SpeciesBandLU<Real_t> * const lu = transport_lu_(h);
+        if (!lu)
+            return false;
+        const int ny = rd.n*rd.N;
+        std::vector<Real_t> Y(y, y + ny);
+        lu->solve(&Y[0]);
+        for (int i=0; i<ny; ++i) // h*T*Y1 = (Y1 - y)/gamma
+            y[i] += (1 - sdirk_gamma)/sdirk_gamma*(Y[i] - y[i]);
+        lu->solve(y);
+        return true;
+    }
+};
+
+}
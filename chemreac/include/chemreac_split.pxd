@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+# -*- mode: cython-mode -*-
+
+from libcpp.vector cimport vector
+from chemreac cimport ReactionDiffusion
+
+cdef extern from "chemreac_split.hpp" namespace "chemreac":
+    cdef cppclass SplitIntegrator[T]:
+        int nthreads
+        T inner_tol_factor
+        long nsteps, nrejected, nreaction_steps, ntransport_factor
+        SplitIntegrator(const ReactionDiffusion[T]&, int) except +
+        int predefined(const T * const, size_t, const T * const, T * const,
+                       const vector[T]&, T, T, T, T, long int) nogil except +
@@ -0,0 +1,78 @@
+#pragma once
+
+// Building blocks shared by the native one-step integrators (chemreac_batch.hpp,
+// chemreac_split.hpp, chemreac_imex.hpp, chemreac_rkc.hpp, chemreac_rosenbrock.hpp
+// and chemreac_expm.hpp): the tolerance check, the error weighted norm, the step
+// size controller and the test whether the stencil fits in the compressed Jacobian.
+
+#include <algorithm>
+#include <cmath>
+#include <limits>
+#include <stdexcept>
+#include <vector>
+#include "chemreac.hpp"
+
+namespace chemreac {
+
+template <typename Real_t>
+void check_atol(const std::vector<Real_t> &atol, const int n){
+    if (atol.size() != 1 && atol.size() != static_cast<std::size_t>(n))
+        throw std::invalid_argument("atol of incorrect length");
+}
+
+// Weighted root mean square of v over ny entries (every stride-th element, species
+// index i % n) with the scales atol[i % n] + rtol*max(|y[i]|, |y1[i]|), atol of size 1 or n.
+template <typename Real_t>
+Real_t weighted_rms(const int ny, const int n, const Real_t * const y, const Real_t * const y1,
+                    const Real_t * const v, const std::vector<Real_t> &atol, const Real_t rtol,
+                    const int stride=1){
+    Real_t sum = 0;
+    for (int i=0; i<ny; ++i){
+        const Real_t sc = atol[atol.size() == 1 ? 0 : i % n] +
+            rtol*std::max(std::abs(y[i*stride]), std::abs(y1[i*stride]));
+        sum += (v[i*stride]/sc)*(v[i*stride]/sc);
+    }
+    return std::sqrt(sum/ny);
+}
+
+// The stencil of rd lies within n_jac_diags, i.e. the compressed Jacobian is exact.
+template <typename Real_t>
+bool stencil_in_band(const ReactionDiffusion<Real_t> &rd){
+    for (int bi=0; bi<rd.N; ++bi)
+        for (int k=0; k<rd.nstencil; ++k)
+            if (std::abs(rd.stencil_idx[bi*rd.nstencil + k] - bi) > rd.n_jac_diags)
+                return false;
+    return true;
+}
+
+// Step size control from a weighted rms error estimate err (accept if err <= 1):
+// the next step is hs*fac_safe*err^(-1/q) clipped to [fac_min, fac_max]*hs and
+// not grown right after a rejection; failed attempts (e.g. a singular matrix or a
+// non-finite error) shrink the step by fac_fail.
+template <typename Real_t>
+struct StepControl {
+    Real_t q, fac_min, fac_max, fac_safe, fac_fail;
+
+    // hs: attempted step (hs <= h, e.g. cut at an output), h: proposal which is
+    // updated for the next attempt. Returns true if the step is accepted.
+    bool update(const Real_t hs, Real_t &h, const Real_t err, const bool ok, const bool rejected_last) const {
+        Real_t fac = fac_safe*std::pow(err, -1/q);
+        fac = std::isfinite(fac) ? std::min(fac_max, std::max(fac_min, fac)) : fac_max;
+        if (ok && std::isfinite(err) && err <= 1){
+            if (rejected_last)
+                fac = std::min(fac, Real_t(1));
+            h = (hs < h) ? std::max(h, hs*fac) : hs*fac;
+            return true;
+        }
+        h = hs*((ok && std::isfinite(err)) ? std::min(fac, Real_t(1)) : fac_fail);
+        return false;
+    }
+
+    // Smallest step size worth attempting at t: dx_min, or (dx_min <= 0) 16 ulp of t
+    static Real_t h_min(const Real_t t, const Real_t dx_min){
+        return (dx_min > 0) ? dx_min :
+            16*std::numeric_limits<Real_t>::epsilon()*std::max(std::abs(t), Real_t(1e-300));
+    }
+};
+
+}
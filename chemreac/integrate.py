@@ -15,12 +15,27 @@ choices to the user of the script through the use of environment variables.
 .. note :: Preferred ways to perform the integration is
     using :py:class:`Integration` or :py:func:`run`
 
+Thread safety
+-------------
+The native evaluations and the ``cvode`` integrations release the GIL, so
+integrations may run concurrently in threads (e.g. using a ``ThreadPoolExecutor``).
+The work buffers, cached factorizations and counters of a ``cvode`` integration
+belong to the solver, hence one :py:class:`~chemreac.core.ReactionDiffusion`
+instance may be integrated by several threads at a time as long as its
+parameters are not changed meanwhile (the per instance counters ``nfev``,
+``njev`` and ``last_integration_info`` are then shared, use the returned
+``info`` instead). Read-only inputs such as ``y0`` and ``tout`` may be shared.
+Plain evaluations (``f`` and the ``*_jac_*`` methods) of a single shared
+instance are reentrant when each thread passes its own ``workspace`` (see
+:py:meth:`~chemreac.core.ReactionDiffusion.make_workspace`).
+
 """
 
 from __future__ import (absolute_import, division, print_function)
 
 
 import os
+import sys
 import time
 
 import numpy as np
@@ -39,21 +54,53 @@ class IntegrationError(Exception):
     pass
 
 
+def _prep_tols(kwargs):
+    # Pops atol (as an array of size 1 or n) & rtol (defaults: DEFAULTS) from kwargs
+    atol = np.asarray(kwargs.pop('atol', DEFAULTS['atol']))
+    if atol.ndim == 0:
+        atol = atol.reshape((1,))
+    return atol, kwargs.pop('rtol', DEFAULTS['rtol'])
+
+
+def _native_funcs(rd, *names):
+    # Drivers from the extension module which rd's class was compiled in
+    # (differs from chemreac._chemreac for chemreac.specialize).
+    from .core import _native_base
+    mod = sys.modules[_native_base(type(rd)).__module__]
+    return tuple(getattr(mod, name) for name in names)
+
+
+def _default_nthreads(rd):
+    # rd.nthreads unless set explicitly: omp_get_max_threads() (i.e. respecting
+    # OMP_NUM_THREADS) if compiled with OpenMP, otherwise 1.
+    return rd.nthreads
+
+
 def integrate_cvode(rd, y0, tout, dense_output=None, **kwargs):
     """
     see :py:func:`integrate`
 
     kwargs:
       method: linear multistep method: 'bdf' or 'adams'
+      linear_solver: 'default', 'dense', 'banded', 'gmres', 'gmres_classic',
+        'bicgstab', 'tfqmr', 'klu' (sparse, requires N == 1 and sundials with KLU),
+        'block_tridiag', 'block_cyclic_reduction' (requires nstencil == 3) or
+        'sparse_lu' (requires N == 1)
+      preconditioner: 'auto' (banded LU or ILU, see ``ilu_limit``), 'block_tridiag',
+        'block_cyclic_reduction', 'sparse_lu', 'operator_split' (per-bin reaction
+        blocks followed by per-species transport solves, cost linear in N) or
+        'multigrid' (geometric V-cycle with block-Jacobi smoothing, requires
+        nstencil == 3); anything but 'auto' implies an iterative linear solver
+        ('gmres' unless specified). Default: ``rd.prec_factorization`` (which is
+        left unchanged by the integration)
+      with_jtimes: Jacobian-vector products for the iterative linear solvers from
+        ``rd`` (see ``ReactionDiffusion.jtimes_mode``) instead of CVODE's difference quotients
 
     """
-    from ._chemreac import cvode_predefined, cvode_adaptive
+    cvode_predefined, cvode_adaptive = _native_funcs(rd, 'cvode_predefined', 'cvode_adaptive')
 
     # Handle kwargs
-    kwargs['atol'] = np.asarray(kwargs.pop('atol', DEFAULTS['atol']))
-    if kwargs['atol'].ndim == 0:
-        kwargs['atol'] = kwargs['atol'].reshape((1,))
-    kwargs['rtol'] = kwargs.pop('rtol', DEFAULTS['rtol'])
+    kwargs['atol'], kwargs['rtol'] = _prep_tols(kwargs)
     kwargs['method'] = kwargs.pop('method', 'bdf')
     if dense_output is None:
         dense_output = (len(tout) == 2)
@@ -86,22 +133,134 @@ def integrate_cvode(rd, y0, tout, dense_output=None, **kwargs):
     kwargs.update({
         'nfev': rd.nfev,
         'njev': rd.njev,
+        'nstate_reuse': rd.nstate_reuse,
         'time_wall': time_wall,
         'time_cpu': time_cpu,
         'success': success,
         'nsteps': -1,
         'integrator': ['cvode'],
     })
-    if kwargs.get('linear_solver', 'default') in 'gmres gmres_classic bicgstab tfqmr'.split():
-        kwargs['nprec_setup'] = rd.nprec_setup
-        kwargs['nprec_solve'] = rd.nprec_solve
-        kwargs['njacvec_dot'] = rd.njacvec_dot
-        kwargs['nprec_solve_ilu'] = rd.nprec_solve_ilu
-        kwargs['nprec_solve_lu'] = rd.nprec_solve_lu
-    kwargs.update(info)
+    kwargs.update(info)  # nfev, njev and the preconditioner counters (nprec_*) of the solver
     return yout, tout, kwargs
 
 
+def integrate_cvode_ensemble(rd, Y0, tout, K=None, fields=None, nthreads=None, **kwargs):
+    """
+    Integrates many independent members of the reaction network of ``rd``
+    (e.g. for uncertainty quantification) in one native call.
+
+    The members are distributed over ``nthreads`` OpenMP threads sharing ``rd``
+    (copies of it when ``K`` or ``fields`` are given), each one reusing its own
+    solver state and CVODE integrator.
+
+    Parameters
+    ----------
+    rd : ReactionDiffusion
+        Used as template (not modified).
+    Y0 : array_like
+        Initial conditions of shape ``(M, rd.ny)`` (or ``(M, N, n)``), or
+        of shape ``(rd.ny,)`` when shared by all members.
+    tout : array_like
+        Times for which to report results (shared by all members).
+    K : array_like (optional)
+        Rate coefficients of shape ``(M, rd.nr)`` (default: ``rd.k``).
+    fields : array_like (optional)
+        Fields of shape ``(M, len(rd.g_values), rd.N)`` (default: ``rd.fields``).
+    nthreads : int (optional)
+        Default: ``rd.nthreads``.
+    \*\*kwargs :
+        see :py:func:`integrate_cvode` (``dense_output`` and
+        ``return_on_error`` are not supported: failing members are
+        reported in ``info['success']``).
+
+    Returns
+    -------
+    yout : array of shape ``(M, len(tout), N, n)`` (NaN where not reached)
+    info : dict with per member arrays (``nreached``, ``success``, ``nfev``,
+        ``njev``, ``nsteps``) and ``time_wall``, ``time_cpu``
+
+    """
+    cvode_ensemble, = _native_funcs(rd, 'cvode_ensemble')
+    tout = np.ascontiguousarray(tout, dtype=np.float64).flatten()
+    Y0 = np.asarray(Y0, dtype=np.float64)
+    if Y0.size == rd.n*rd.N:
+        M = 1 if K is None else len(K)
+        M = M if fields is None else len(fields)
+        Y0 = np.tile(Y0.flatten(), (M, 1))
+    Y0 = np.ascontiguousarray(Y0.reshape((Y0.shape[0], rd.n*rd.N)))
+    if nthreads is None:
+        nthreads = _default_nthreads(rd)
+
+    atol, rtol = _prep_tols(kwargs)
+    method = kwargs.pop('method', 'bdf')
+
+    time_wall = time.time()
+    time_cpu = time.clock()
+    yout, info = cvode_ensemble(rd, Y0, K, tout, atol, rtol, method, fields=fields,
+                                nthreads=nthreads, **kwargs)
+    info['time_wall'] = time.time() - time_wall
+    info['time_cpu'] = time.clock() - time_cpu
+    return yout, info
+
+
+def integrate_rosenbrock_batch(rd, Y0, tout, K=None, nthreads=None, **kwargs):
+    """
+    Integrates many small single compartment systems (``rd.N == 1``) sharing
+    the reaction network of ``rd`` using a batched Rosenbrock method (ROS3)
+    which advances blocks of members in lock-step (see ``chemreac_batch.hpp``).
+
+    Compared to :py:func:`integrate_cvode_ensemble` this avoids the per
+    member solver overhead, which dominates for small systems (``n < ~20``).
+    ``logy``, ``logt``, fields and modulation are not supported.
+
+    Parameters
+    ----------
+    rd : ReactionDiffusion
+        Used as template (not modified).
+    Y0 : array_like
+        Initial conditions of shape ``(M, n)`` (or ``(n,)`` when shared).
+    tout : array_like
+        Times for which to report results (shared by all members).
+    K : array_like (optional)
+        Rate coefficients of shape ``(M, rd.nr)`` (default: ``rd.k``).
+    nthreads : int (optional)
+        Default: ``rd.nthreads``.
+    \*\*kwargs :
+        ``atol``, ``rtol``, ``first_step``, ``dx_min``, ``dx_max``,
+        ``nsteps`` (maximum number of steps between outputs) and
+        ``block_size`` (members advanced in lock-step, default: 64).
+
+    Returns
+    -------
+    yout : array of shape ``(M, len(tout), 1, n)`` (NaN where not reached)
+    info : dict with per member arrays (``nreached``, ``success``, ``nsteps``,
+        ``nrejected``) and ``time_wall``, ``time_cpu``
+
+    """
+    batch_rosenbrock, = _native_funcs(rd, 'batch_rosenbrock')
+    if rd.N != 1:
+        raise ValueError("integrate_rosenbrock_batch requires N == 1")
+    tout = np.ascontiguousarray(tout, dtype=np.float64).flatten()
+    Y0 = np.asarray(Y0, dtype=np.float64)
+    if Y0.ndim == 1:
+        Y0 = np.tile(Y0, (1 if K is None else len(K), 1))
+    Y0 = np.ascontiguousarray(Y0.reshape((Y0.shape[0], rd.n)))
+    if K is None:
+        K = np.tile(np.asarray(rd.k, dtype=np.float64), (Y0.shape[0], 1))
+    K = np.ascontiguousarray(K, dtype=np.float64)
+    if nthreads is None:
+        nthreads = _default_nthreads(rd)
+
+    atol, rtol = _prep_tols(kwargs)
+
+    time_wall = time.time()
+    time_cpu = time.clock()
+    yout, info = batch_rosenbrock(rd, Y0, K, tout, atol, rtol, nthreads=nthreads, **kwargs)
+    info['time_wall'] = time.time() - time_wall
+    info['time_cpu'] = time.clock() - time_cpu
+    return yout, info
+
+
 def _integrate_rk4(rd, y0, tout, **kwargs):
     """
     For demonstration purposes only, fixed step size
@@ -111,7 +270,7 @@ def _integrate_rk4(rd, y0, tout, **kwargs):
 
     see integrate
     """
-    from ._chemreac import rk4
+    rk4, = _native_funcs(rd, 'rk4')
     time_wall = time.time()
     time_cpu = time.clock()
     yout, Dyout = rk4(rd, y0, tout)
@@ -127,6 +286,230 @@ def _integrate_rk4(rd, y0, tout, **kwargs):
     return yout, tout, info
 
 
+def integrate_split(rd, y0, tout, order=2, nthreads=None, **kwargs):
+    """
+    Integrates by operator splitting (see ``chemreac_split.hpp``): the
+    reactions of each bin are integrated independently (ROS3, bins
+    distributed over ``nthreads``) and the transport implicitly (SDIRK2,
+    one banded solve per species), combined as Lie (``order=1``) or Strang
+    (``order=2``) splitting. The step size is controlled by step doubling.
+
+    Fields, ``auto_efield`` and periodic geometry are not supported.
+
+    see :py:func:`integrate`
+
+    kwargs:
+      order: 1 (Lie) or 2 (Strang, default)
+      nthreads: default: ``rd.nthreads``
+      atol, rtol, first_step, dx_min, dx_max, nsteps (maximum number of steps
+        between outputs) and inner_tol_factor (tolerance factor of the
+        reaction substeps, default: 0.1)
+
+    """
+    split_predefined, = _native_funcs(rd, 'split_predefined')
+    if nthreads is None:
+        nthreads = _default_nthreads(rd)
+    atol, rtol = _prep_tols(kwargs)
+    tout = np.asarray(tout, dtype=np.float64).flatten()
+    # The splitting integrator works on linear concentrations and time
+    y0 = np.asarray(y0, dtype=np.float64).flatten()
+    y0 = rd.expb(y0) if rd.logy else y0
+    t = rd.expb(tout) if rd.logt else tout
+
+    time_wall = time.time()
+    time_cpu = time.clock()
+    yout, info = split_predefined(rd, np.ascontiguousarray(y0), np.ascontiguousarray(t),
+                                  atol, rtol, order=order, nthreads=nthreads, **kwargs)
+    if rd.logy:
+        with np.errstate(divide='ignore'):
+            yout = rd.logb(yout)
+    kwargs.update({
+        'time_wall': time.time() - time_wall,
+        'time_cpu': time.clock() - time_cpu,
+        'integrator': ['split'],
+        'atol': atol,
+        'rtol': rtol,
+        'order': order,
+        'nthreads': nthreads,
+    })
+    kwargs.update(info)
+    return yout, tout, kwargs
+
+
+def integrate_imex(rd, y0, tout, order=3, implicit='transport', **kwargs):
+    """
+    Integrates using an additive Runge-Kutta (IMEX) method (ARK3(2)4L[2]SA or
+    ARK4(3)6L[2]SA of Kennedy & Carpenter) where one part of the rhs is treated
+    implicitly (the linear systems only involve that part: banded per species
+    for the transport, block diagonal for the reactions) and the other one
+    explicitly (see ``chemreac_imex.hpp``).
+
+    see :py:func:`integrate`
+
+    kwargs:
+      order: 3 (default) or 4
+      implicit: 'transport' (diffusion & drift, default) or 'reaction'
+        (reactions & fields)
+      atol, rtol, first_step, dx_min, dx_max, nsteps (maximum number of steps
+        between outputs)
+
+    """
+    imex_predefined, = _native_funcs(rd, 'imex_predefined')
+    atol, rtol = _prep_tols(kwargs)
+    tout = np.ascontiguousarray(tout, dtype=np.float64).flatten()
+    y0 = np.ascontiguousarray(y0, dtype=np.float64).flatten()
+
+    rd.zero_counters()
+    time_wall = time.time()
+    time_cpu = time.clock()
+    yout, info = imex_predefined(rd, y0, tout, atol, rtol, order=order, implicit=implicit, **kwargs)
+    kwargs.update({
+        'time_wall': time.time() - time_wall,
+        'time_cpu': time.clock() - time_cpu,
+        'integrator': ['imex'],
+        'atol': atol,
+        'rtol': rtol,
+        'order': order,
+        'implicit': implicit,
+    })
+    kwargs.update(info)
+    return yout, tout, kwargs
+
+
+def integrate_rkc(rd, y0, tout, **kwargs):
+    """
+    Integrates using the explicit stabilised Runge-Kutta-Chebyshev method
+    (RKC, second order, adaptive step size and number of stages). Only
+    ``rd.f`` is evaluated (no Jacobian storage, memory: a handful of state
+    vectors), the spectral radius is estimated from the stencil weights and
+    by a nonlinear power method (see ``chemreac_rkc.hpp``). Suited for large,
+    mildly stiff problems dominated by diffusion.
+
+    see :py:func:`integrate`
+
+    kwargs:
+      atol, rtol, first_step, dx_min, dx_max, nsteps (maximum number of steps
+        between outputs), max_stages (default: 1000) and rho_interval (steps
+        between spectral radius estimates, default: 25)
+
+    """
+    rkc_predefined, = _native_funcs(rd, 'rkc_predefined')
+    atol, rtol = _prep_tols(kwargs)
+    tout = np.ascontiguousarray(tout, dtype=np.float64).flatten()
+    y0 = np.ascontiguousarray(y0, dtype=np.float64).flatten()
+
+    rd.zero_counters()
+    time_wall = time.time()
+    time_cpu = time.clock()
+    yout, info = rkc_predefined(rd, y0, tout, atol, rtol, **kwargs)
+    kwargs.update({
+        'time_wall': time.time() - time_wall,
+        'time_cpu': time.clock() - time_cpu,
+        'integrator': ['rkc'],
+        'atol': atol,
+        'rtol': rtol,
+        'njev': 0,
+    })
+    kwargs.update(info)
+    return yout, tout, kwargs
+
+
+def integrate_rosenbrock(rd, y0, tout, method='rodas3', dense_output=None, **kwargs):
+    """
+    Integrates using a Rosenbrock (linearly implicit) method: the Jacobian
+    is assembled once per step and ``I - gamma*h*J`` is factorized once per
+    step using its block structure (block-tridiagonal solver when
+    ``n_jac_diags == 1``, banded LU otherwise), the factorization is reused
+    by all stages (see ``chemreac_rosenbrock.hpp``). Periodic geometry is
+    not supported.
+
+    see :py:func:`integrate`
+
+    kwargs:
+      method: 'rodas3' (L-stable, default) or 'ros3p' (A-stable, suited for
+        parabolic problems), both of order 3
+      dense_output: report every accepted step (requires ``len(tout) == 2``,
+        default: ``len(tout) == 2``)
+      atol, rtol, first_step, dx_min, dx_max, nsteps (maximum number of steps
+        between outputs)
+
+    """
+    rosenbrock_predefined, rosenbrock_adaptive = _native_funcs(
+        rd, 'rosenbrock_predefined', 'rosenbrock_adaptive')
+    atol, rtol = _prep_tols(kwargs)
+    if dense_output is None:
+        dense_output = (len(tout) == 2)
+    tout = np.ascontiguousarray(tout, dtype=np.float64).flatten()
+    y0 = np.ascontiguousarray(y0, dtype=np.float64).flatten()
+
+    rd.zero_counters()
+    time_wall = time.time()
+    time_cpu = time.clock()
+    if dense_output:
+        if not len(tout) == 2:
+            raise ValueError("dense_output implies tout == (t0, tend)")
+        tout, yout, info = rosenbrock_adaptive(rd, y0, tout[0], tout[-1], atol, rtol,
+                                               method=method, **kwargs)
+    else:
+        yout, info = rosenbrock_predefined(rd, y0, tout, atol, rtol, method=method, **kwargs)
+    kwargs.update({
+        'time_wall': time.time() - time_wall,
+        'time_cpu': time.clock() - time_cpu,
+        'integrator': ['rosenbrock'],
+        'atol': atol,
+        'rtol': rtol,
+        'method': method,
+    })
+    kwargs.update(info)
+    return yout, tout, kwargs
+
+
+def integrate_expm(rd, y0, tout, **kwargs):
+    """
+    Evaluates the exact solution of linear systems (first order reactions at
+    most, no ``auto_efield`` and no ``logy``, see ``rd.linear``) at ``tout``
+    as the exponential of the (constant) Jacobian, source terms from
+    zeroth order reactions and fields included (see ``chemreac_expm.hpp``):
+
+    - ``N == 1``: analytic (generalised Bateman) solution of acyclic networks,
+      otherwise Pade approximation of the matrix exponential.
+    - ``N > 1``: Krylov (Arnoldi) approximation of its action on ``y0``.
+
+    There is no time stepping: the cost is independent of the stiffness of
+    the reactions and the output times may be arbitrarily far apart.
+
+    see :py:func:`integrate`
+
+    kwargs:
+      atol, rtol (of the Krylov approximation), krylov_dim (default: 30) and
+        nsteps (maximum number of Krylov steps between outputs)
+
+    """
+    if not rd.linear:
+        raise ValueError("integrate_expm requires a linear system (see ReactionDiffusion.linear)")
+    expm_predefined, = _native_funcs(rd, 'expm_predefined')
+    atol, rtol = _prep_tols(kwargs)
+    tout = np.asarray(tout, dtype=np.float64).flatten()
+    y0 = np.ascontiguousarray(y0, dtype=np.float64).flatten()
+    t = rd.expb(tout) if rd.logt else tout
+
+    rd.zero_counters()
+    time_wall = time.time()
+    time_cpu = time.clock()
+    yout, info = expm_predefined(rd, y0, np.ascontiguousarray(t), atol, rtol, **kwargs)
+    kwargs.update({
+        'time_wall': time.time() - time_wall,
+        'time_cpu': time.clock() - time_cpu,
+        'integrator': ['expm'],
+        'atol': atol,
+        'rtol': rtol,
+        'nfev': rd.nfev,
+        'njev': rd.njev,
+    })
+    kwargs.update(info)
+    return yout, tout, kwargs
+
+
 def _integrate_cb(callbacks, integrator, rd, y0, tout, linear_solver='dense',
                   dense_output=None, **kwargs):
     if dense_output is None:
@@ -377,7 +760,14 @@ class Integration(object):
         (default: None => ``numpy.finfo(np.float64).tiny``).
     integrator : string
         "cvode" or "scipy" where scipy uses VODE
-        as the integrator.
+        as the integrator, "split" for operator splitting
+        (see :py:func:`integrate_split`), "imex" for additive
+        Runge-Kutta (see :py:func:`integrate_imex`), "rkc" for explicit
+        stabilised Runge-Kutta-Chebyshev (see
+        :py:func:`integrate_rkc`), "rosenbrock" for linearly implicit
+        Rosenbrock methods (see :py:func:`integrate_rosenbrock`) or "expm"
+        for the exact solution of linear systems (see
+        :py:func:`integrate_expm`).
 
     **kwargs :
         Keyword arguments passed on to integartor, e.g.:
@@ -416,6 +806,11 @@ class Integration(object):
         'pyodeint': integrate_pyodeint,
         'pygslodeiv2': integrate_pygslodeiv2,
         'rk4': _integrate_rk4,
+        'split': integrate_split,
+        'imex': integrate_imex,
+        'rkc': integrate_rkc,
+        'rosenbrock': integrate_rosenbrock,
+        'expm': integrate_expm,
     }
 
     def __init__(self, rd, C0, tout, sigm_damp=False,
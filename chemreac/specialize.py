@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+Mechanism specific extension modules.
+
+The generic extension (``chemreac._chemreac``) loops over the stoichiometry
+of every reaction for every species (and pair of species for the Jacobian).
+For a fixed reaction network the source template can instead be rendered
+with the rate expressions unrolled and only the non-zero stoichiometric
+terms kept. The resulting module is compiled on demand and exposes a class
+with the same Python API as :class:`chemreac.ReactionDiffusion`.
+
+Building requires a source checkout (``src/chemreac.cpp.mako`` and
+``chemreac/_chemreac.pyx``), Cython, mako and a C++ compiler.
+
+Compiled modules are kept in a content addressed cache directory
+(``$CHEMREAC_CACHE_DIR``, default: ``~/.cache/chemreac``), keyed by a hash
+of the reaction network, the build configuration and the sources. Concurrent
+processes serialize builds of the same module through a lock file (which is
+held shared while loading) and least recently used entries (together with
+their lock files and left-over build directories) are evicted when the cache
+grows beyond ``$CHEMREAC_CACHE_MAX_SIZE`` bytes (default: 512 MiB).
+"""
+from __future__ import (absolute_import, division, print_function)
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import sysconfig
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # no locking (e.g. on Windows)
+
+from ._release import __version__
+from ._config import env as _config_env
+from .chemistry import ReactionSystem
+from .core import ReactionDiffusion, ReactionDiffusionBase
+
+_pkg_dir = os.path.dirname(os.path.abspath(__file__))
+_template_path = os.path.join(_pkg_dir, os.pardir, 'src', 'chemreac.cpp.mako')
+_pyx_path = os.path.join(_pkg_dir, '_chemreac.pyx')
+_anyode_dir = os.environ.get('CHEMREAC_ANYODE_DIR', os.path.join(_pkg_dir, os.pardir, 'external', 'anyode'))
+
+_classes = {}  # mechanism key -> class
+
+
+def _cache_dir():
+    return os.environ.get('CHEMREAC_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'chemreac'))
+
+
+def _cache_max_size():
+    return int(os.environ.get('CHEMREAC_CACHE_MAX_SIZE', 512*1024**2))
+
+
+def _mechanism(rd):
+    return dict(n=rd.n, stoich_active=[list(_) for _ in rd.stoich_active],
+                stoich_prod=[list(_) for _ in rd.stoich_prod],
+                stoich_inact=[list(_) for _ in rd.stoich_inact])
+
+
+def _compile_args():
+    return ['-std=c++11', '-fvisibility=hidden', '-fopenmp-simd', '-ffp-contract=off'] + (
+        ['-fopenmp'] if _config_env['WITH_OPENMP'] == '1' else [])
+
+
+def _file_digest(path):
+    with open(path, 'rb') as fh:
+        return hashlib.sha256(fh.read()).hexdigest()
+
+
+def _mechanism_key(mechanism):
+    """ Canonical hash of everything which affects the compiled module """
+    import finitediff as fd
+    import pycvodes as pc
+    import block_diag_ilu as bdi
+    return hashlib.sha256(json.dumps(dict(
+        mechanism=mechanism,
+        version=__version__,
+        config=_config_env,
+        compile_args=_compile_args(),
+        compiler=[sysconfig.get_config_var(k) for k in ('CXX', 'CC', 'CFLAGS')],
+        ext_suffix=sysconfig.get_config_var('EXT_SUFFIX'),
+        dependencies=[getattr(mod, '__version__', None) for mod in (fd, pc, bdi)],
+        sources=[_file_digest(p) if os.path.exists(p) else None for p in (_template_path, _pyx_path)],
+    ), sort_keys=True).encode('utf-8')).hexdigest()[:24]
+
+
+def _render(mechanism, dest):
+    from mako.template import Template
+    from mako.exceptions import text_error_template
+    subsd = {'MECHANISM': mechanism}
+    try:
+        rendered = Template(open(_template_path, 'rt').read()).render(**subsd)
+    except Exception:
+        raise RuntimeError("Failed to render %s:\n%s" % (_template_path, text_error_template().render()))
+    with open(dest, 'wt') as fh:
+        fh.write(rendered)
+
+
+def _build(mechanism, modname, build_dir):
+    import numpy as np
+    import finitediff as fd
+    import pycvodes as pc
+    import block_diag_ilu as bdi
+    from Cython.Build import cythonize
+    from setuptools import Extension
+    from setuptools.dist import Distribution
+
+    for path, what in [(_template_path, 'template'), (_pyx_path, 'Cython source')]:
+        if not os.path.exists(path):
+            raise IOError("Could not find %s (%s): specialization requires a source checkout" % (what, path))
+    cpp_path = os.path.join(build_dir, modname + '_impl.cpp')
+    pyx_path = os.path.join(build_dir, modname + '.pyx')
+    _render(mechanism, cpp_path)
+    shutil.copy(_pyx_path, pyx_path)
+    package_include = os.path.join(_pkg_dir, 'include')
+    ext = Extension(modname, [pyx_path])
+    ext, = cythonize([ext], include_path=[
+        package_include, pc.get_include(), os.path.join(_anyode_dir, 'cython_def')
+    ], build_dir=build_dir, quiet=True)
+    ext.include_dirs += [np.get_include(), fd.get_include(), bdi.get_include(),
+                         pc.get_include(), package_include, os.path.join(_anyode_dir, 'include')]
+    ext.sources = [cpp_path] + ext.sources
+    ext.language = 'c++'
+    # hidden visibility: the specialised chemreac::ReactionDiffusion must not
+    # be interposed by (or interpose) the one in chemreac._chemreac
+    ext.extra_compile_args = _compile_args()
+    ext.extra_link_args = ['-fopenmp'] if _config_env['WITH_OPENMP'] == '1' else []
+    ext.define_macros += (
+        [('CHEMREAC_WITH_OPENMP_SIMD', None)] +
+        ([('CHEMREAC_WITH_DEBUG', None)] if _config_env['WITH_DEBUG'] == '1' else []) +
+        ([('CHEMREAC_WITH_DATA_DUMPING', None)] if _config_env['WITH_DATA_DUMPING'] == '1' else [])
+    )
+    ext.libraries += pc.config['SUNDIALS_LIBS'].split(',') + pc.config['LAPACK'].split(',') + ['m']
+    dist = Distribution({'name': modname, 'ext_modules': [ext]})
+    cmd = dist.get_command_obj('build_ext')
+    cmd.build_lib = build_dir
+    cmd.build_temp = os.path.join(build_dir, 'temp')
+    cmd.ensure_finalized()
+    cmd.run()
+    return cmd.get_ext_fullpath(modname)
+
+
+def _import(modname, path):
+    try:
+        import importlib.util
+        spec_from_file_location = importlib.util.spec_from_file_location
+    except (ImportError, AttributeError):  # Python 2
+        import imp
+        return imp.load_dynamic(modname, path)
+    spec = spec_from_file_location(modname, path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    sys.modules[modname] = mod
+    return mod
+
+
+@contextmanager
+def _locked(path, blocking=True, shared=False):
+    """ Exclusive (or ``shared``) lock on ``path`` (yields False if not acquired when ``blocking=False``)
+
+    :func:`_evict` removes lock files while holding them exclusively, a lock
+    acquired on a removed file is therefore retried with a new one.
+    """
+    if fcntl is None:
+        yield True
+        return
+    while True:
+        fh = open(path, 'a')
+        try:
+            fcntl.flock(fh, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB))
+        except (IOError, OSError):
+            fh.close()
+            yield False
+            return
+        try:
+            current = os.stat(path).st_ino == os.fstat(fh.fileno()).st_ino
+        except OSError:
+            current = False
+        if current:
+            break
+        fh.close()
+    try:
+        yield True
+    finally:
+        fcntl.flock(fh, fcntl.LOCK_UN)
+        fh.close()
+
+
+def _tmp_prefix(key):
+    # build directories of an entry (left behind by crashed builds)
+    return 'tmp' + key + '-'
+
+
+def _remove_stale(cache_dir, key):
+    # the caller holds the exclusive lock of ``key``
+    for name in os.listdir(cache_dir):
+        if name.startswith(_tmp_prefix(key)):
+            shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+
+
+def _entry_size(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def _evict(cache_dir, max_size, keep=()):
+    """ Removes least recently used cache entries until the total size is below ``max_size`` """
+    entries = []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if os.path.isdir(path) and not name.startswith('tmp'):
+            entries.append((os.path.getmtime(path), name, _entry_size(path)))
+    total = sum(size for _, _, size in entries)
+    for _, name, size in sorted(entries):
+        if total <= max_size:
+            break
+        if name in keep:
+            continue
+        lock_path = os.path.join(cache_dir, name + '.lock')
+        with _locked(lock_path, blocking=False) as acquired:
+            if not acquired:
+                continue  # being built (or loaded) by another process
+            shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+            _remove_stale(cache_dir, name)
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+        total -= size
+
+
+def _cached_module(mechanism, key):
+    modname = '_chemreac_' + key
+    cache_dir = _cache_dir()
+    entry = os.path.join(cache_dir, key)
+    path = os.path.join(entry, modname + sysconfig.get_config_var('EXT_SUFFIX'))
+    lock_path = os.path.join(cache_dir, key + '.lock')
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+    with _locked(lock_path, shared=True):  # keeps _evict from removing the entry while loading
+        if os.path.exists(path):
+            os.utime(entry, None)  # mark as recently used
+            return _import(modname, path)
+    with _locked(lock_path):
+        if not os.path.exists(path):  # not built by someone else meanwhile
+            _remove_stale(cache_dir, key)
+            build_dir = tempfile.mkdtemp(prefix=_tmp_prefix(key), dir=cache_dir)
+            try:
+                built = _build(mechanism, modname, build_dir)
+                tmp_entry = tempfile.mkdtemp(prefix=_tmp_prefix(key), dir=cache_dir)
+                shutil.copy(built, os.path.join(tmp_entry, os.path.basename(path)))
+                shutil.rmtree(entry, ignore_errors=True)  # incomplete entry
+                os.rename(tmp_entry, entry)
+            finally:
+                shutil.rmtree(build_dir, ignore_errors=True)
+        mod = _import(modname, path)
+    _evict(cache_dir, _cache_max_size(), keep=(key,))
+    return mod
+
+
+def specialized_class(rd, build_dir=None):
+    """ Returns a mechanism specific subclass for the reaction network of ``rd``
+
+    The class is compiled on first use (see the module docstring regarding
+    the cache) and behaves like :class:`chemreac.ReactionDiffusion`, but its
+    constructor rejects other reaction networks (rate constants, diffusion,
+    geometry etc. may differ).
+
+    Parameters
+    ----------
+    rd : ReactionDiffusion instance or chempy.ReactionSystem
+    build_dir : str (optional)
+        Build in this directory instead of using the cache.
+
+    """
+    if isinstance(rd, ReactionSystem):
+        rd = ReactionDiffusion.from_ReactionSystem(rd)
+    mechanism = _mechanism(rd)
+    key = _mechanism_key(mechanism)
+    if key in _classes:
+        return _classes[key]
+
+    if build_dir is None:
+        mod = _cached_module(mechanism, key)
+    else:
+        modname = '_chemreac_' + key
+        mod = _import(modname, _build(mechanism, modname, build_dir))
+    namespace = {k: v for k, v in ReactionDiffusion.__dict__.items()
+                 if k not in ('__dict__', '__weakref__')}
+    cls = type('ReactionDiffusion', (mod.PyReactionDiffusion, ReactionDiffusionBase), namespace)
+    cls.mechanism = mechanism
+    _classes[key] = cls
+    return cls
+
+
+def specialize(rd, build_dir=None, **kwargs):
+    """ Returns an instance of a mechanism specific ReactionDiffusion class
+
+    Parameters
+    ----------
+    rd : ReactionDiffusion instance or chempy.ReactionSystem
+    build_dir : str (optional)
+        see :func:`specialized_class`
+    \\*\\*kwargs :
+        passed on to :meth:`ReactionDiffusion.from_ReactionSystem`
+        when ``rd`` is a ``ReactionSystem``.
+
+    Examples
+    --------
+    >>> from chemreac import ReactionDiffusion
+    >>> rd = ReactionDiffusion(2, [[0]], [[1]], [3.0])
+    >>> srd = specialize(rd)  # doctest: +SKIP
+    >>> srd.k  # doctest: +SKIP
+    [3.0]
+
+    """
+    if isinstance(rd, ReactionSystem):
+        rd = ReactionDiffusion.from_ReactionSystem(rd, **kwargs)
+    elif kwargs:
+        raise ValueError("kwargs only accepted together with a ReactionSystem")
+    cls = specialized_class(rd, build_dir)
+    _, args = rd.__reduce__()
+    return cls(*args, param_names=rd.param_names, **{
+        attr: getattr(rd, '_' + attr) for attr in ReactionDiffusion.kwarg_attrs})
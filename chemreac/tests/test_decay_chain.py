@@ -2,9 +2,13 @@
 
 from __future__ import division, print_function, absolute_import
 
+from math import factorial
+
 import numpy as np
+import pytest
 
 from chemreac import ReactionDiffusion
+from chemreac.integrate import Integration
 from .test_reactiondiffusion import _test_f, _test_dense_jac_rmaj
 
 
@@ -34,3 +38,32 @@ def test_dc():
             jref[i, i-1] = k[i-1]
     assert np.allclose(jref, jout)
     _test_dense_jac_rmaj(rd, 0, y0)
+
+
+@pytest.mark.parametrize("rates,logt", [
+    ([1]*6, False), ([1]*6, True), ([3.40715, 4.0, 0.7, 0.05], False)])
+def test_dc__expm(rates, logt):
+    n = len(rates) + 1
+    rd = ReactionDiffusion(n, [[i] for i in range(n-1)],
+                           [[i] for i in range(1, n)], k=rates, logt=logt)
+    assert rd.linear
+    y0 = np.zeros(n)
+    y0[0] = 1
+    tout = np.logspace(-3, 2, 17)
+    integr = Integration(rd, y0, tout, integrator='expm')
+    assert integr.info['success']
+    assert integr.info['method'] == ('pade' if len(set(rates)) == 1 else 'bateman')
+    ref = Integration(rd, y0, tout, integrator='cvode', atol=1e-12, rtol=1e-12)
+    assert np.allclose(integr.Cout, ref.Cout, atol=1e-10, rtol=1e-8)
+    if len(set(rates)) == 1:  # Poisson distribution
+        t = tout - tout[0]
+        for i in range(n-1):
+            Cref = t**i/factorial(i)*np.exp(-t)
+            assert np.allclose(integr.Cout[:, 0, i], Cref, atol=1e-14, rtol=1e-12)
+
+
+def test_dc__expm__nonlinear():
+    rd = ReactionDiffusion(2, [[0, 0]], [[1]], k=[1.0])
+    assert not rd.linear
+    with pytest.raises(ValueError):
+        Integration(rd, [1.0, 0.0], [0, 1], integrator='expm')
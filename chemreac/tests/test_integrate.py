@@ -180,6 +180,379 @@ def test_integrate__only_1_species_diffusion__mass_conservation(N_wjac_geom_vary
                        rtol=rtol*(1e2 if varying else 1))
 
 
+@pytest.mark.parametrize("solver", ['block_tridiag', 'block_cyclic_reduction'])
+def test_integrate__block_tridiag_linear_solver(solver):
+    # A -> B, with diffusion of both species
+    N = 13
+    x = np.linspace(0.1, 1.0, N+1)
+    y0 = np.array([[1.0 + 0.1*bi, 0.2] for bi in range(N)]).flatten()
+    rd = ReactionDiffusion(2, [[0]], [[1]], k=[0.7], N=N, D=[0.02, 0.03], x=x,
+                           nstencil=3, lrefl=True, rrefl=True)
+    tout = np.linspace(0, 3.0, 17)
+    atol, rtol = 1e-10, 1e-8
+    ref = run(rd, y0, tout, atol=atol, rtol=rtol, integrator='cvode')
+    integr = run(rd, y0, tout, atol=atol, rtol=rtol, integrator='cvode',
+                 linear_solver=solver)
+    assert rd.prec_factorization == 'auto'  # restored
+    assert integr.info['nprec_factor_lu'] > 0
+    assert integr.info['nprec_solve_ilu'] == 0
+    assert np.allclose(integr.Cout, ref.Cout, atol=1e3*atol, rtol=1e3*rtol)
+
+
+def test_integrate__prec_factorization_kept():
+    # ilu_limit=0: 'auto' uses ILU, a factorization set on rd is used as is
+    N = 13
+    x = np.linspace(0.1, 1.0, N+1)
+    y0 = np.array([[1.0 + 0.1*bi, 0.2] for bi in range(N)]).flatten()
+    rd = ReactionDiffusion(2, [[0]], [[1]], k=[0.7], N=N, D=[0.02, 0.03], x=x,
+                           nstencil=3, lrefl=True, rrefl=True, ilu_limit=0.0)
+    tout = np.linspace(0, 3.0, 17)
+    kw = dict(atol=1e-10, rtol=1e-8, integrator='cvode', linear_solver='gmres')
+    assert run(rd, y0, tout, **kw).info['nprec_solve_ilu'] > 0
+    rd.prec_factorization = 'block_tridiag'
+    integr = run(rd, y0, tout, **kw)
+    assert rd.prec_factorization == 'block_tridiag'
+    assert integr.info['nprec_solve_ilu'] == 0
+    assert integr.info['nprec_factor_lu'] > 0
+    integr = run(rd, y0, tout, preconditioner='auto', **kw)
+    assert rd.prec_factorization == 'block_tridiag'
+    assert integr.info['nprec_solve_ilu'] > 0
+
+
+def test_integrate__sparse_lu_linear_solver():
+    # A -> B -> C -> D, B + C -> E
+    rd = ReactionDiffusion(5, [[0], [1], [2], [1, 2]], [[1], [2], [3], [4]],
+                           k=[0.3, 5.0, 11.0, 2.0])
+    y0 = [1.0, 0.2, 0.1, 0.0, 0.0]
+    tout = np.linspace(0, 3.0, 17)
+    atol, rtol = 1e-10, 1e-8
+    ref = run(rd, y0, tout, atol=atol, rtol=rtol, integrator='cvode')
+    integr = run(rd, y0, tout, atol=atol, rtol=rtol, integrator='cvode',
+                 linear_solver='sparse_lu')
+    assert rd.prec_factorization == 'auto'  # restored
+    assert integr.info['nprec_factor_lu'] > 0
+    assert np.allclose(integr.Cout, ref.Cout, atol=1e3*atol, rtol=1e3*rtol)
+
+
+@pytest.mark.parametrize("logy", [False, True])
+def test_integrate__operator_split_preconditioner(logy):
+    # A -> B, 2 B -> C with diffusion, GMRES preconditioned by operator splitting
+    N = 40
+    x = np.linspace(0.1, 1.0, N+1)
+    y0 = np.array([[1.0 + 0.02*bi, 1e-3, 1e-3] for bi in range(N)]).flatten()
+    rd = ReactionDiffusion(3, [[0], [1, 1]], [[1], [2]], k=[0.7, 3.0], N=N,
+                           D=[0.02, 0.03, 0.01], x=x, logy=logy)
+    tout = np.linspace(0, 3.0, 17)
+    atol, rtol = 1e-10, 1e-8
+    ref = run(rd, y0, tout, atol=atol, rtol=rtol, integrator='cvode')
+    integr = run(rd, y0, tout, atol=atol, rtol=rtol, integrator='cvode',
+                 preconditioner='operator_split')
+    assert rd.prec_factorization == 'auto'  # restored
+    assert integr.info['nprec_factor_lu'] > 0
+    assert integr.info['nprec_solve_ilu'] == 0
+    assert np.allclose(integr.Cout, ref.Cout, atol=1e3*atol, rtol=1e3*rtol)
+
+
+@pytest.mark.parametrize("geom", ['uniform', 'logspace'])
+def test_integrate__multigrid_preconditioner(geom):
+    # A -> B with diffusion, GMRES preconditioned by a multigrid V-cycle
+    N = 300
+    if geom == 'uniform':
+        x = np.linspace(0.1, 1.0, N+1)
+    else:
+        x = np.logspace(-3, 0, N+1)
+    y0 = np.array([[1.0 + np.sin(0.05*bi), 1e-3] for bi in range(N)]).flatten()
+    rd = ReactionDiffusion(2, [[0]], [[1]], k=[0.7], N=N, D=[1e-3, 2e-3], x=x,
+                           nstencil=3, lrefl=True, rrefl=True)
+    tout = np.linspace(0, 1.0, 11)
+    atol, rtol = 1e-10, 1e-8
+    ref = run(rd, y0, tout, atol=atol, rtol=rtol, integrator='cvode')
+    integr = run(rd, y0, tout, atol=atol, rtol=rtol, integrator='cvode',
+                 preconditioner='multigrid')
+    assert rd.prec_factorization == 'auto'  # restored
+    assert integr.info['nprec_factor_lu'] > 0
+    assert np.allclose(integr.Cout, ref.Cout, atol=1e3*atol, rtol=1e3*rtol)
+
+
+@pytest.mark.parametrize("jtimes_mode", ['analytic', 'finite_difference'])
+def test_integrate__jtimes(jtimes_mode):
+    # A -> B, 2 B -> C with diffusion, GMRES with matrix-free J*v
+    N = 40
+    y0 = np.array([[1.0 + 0.01*bi, 0.1, 0.0] for bi in range(N)]).flatten()
+    rd = ReactionDiffusion(3, [[0], [1, 1]], [[1], [2]], k=[0.7, 3.0], N=N,
+                           D=[0.02, 0.03, 0.0], logy=True)
+    tout = np.linspace(0, 3.0, 7)
+    atol, rtol = 1e-10, 1e-8
+    ref = run(rd, y0, tout, atol=atol, rtol=rtol, integrator='cvode')
+    rd.jtimes_mode = jtimes_mode
+    integr = run(rd, y0, tout, atol=atol, rtol=rtol, integrator='cvode',
+                 linear_solver='gmres', with_jtimes=True)
+    assert rd.jtimes_mode == jtimes_mode
+    assert integr.info['njacvec_dot'] > 0
+    assert np.allclose(integr.Cout, ref.Cout, atol=1e3*atol, rtol=1e3*rtol)
+
+
+def test_integrate__threads():
+    # distinct instances may be integrated concurrently (the GIL is released)
+    from concurrent.futures import ThreadPoolExecutor
+    N = 32
+    tout = np.linspace(0, 3.0, 7)
+    y0 = np.ones(2*N)
+    rds = [ReactionDiffusion(2, [[0]], [[1]], k=[0.1*(i+1)], N=N, D=[0.01, 0.02])
+           for i in range(8)]
+    serial = [run(rd, y0, tout, integrator='cvode').Cout for rd in rds]
+    with ThreadPoolExecutor(4) as executor:
+        threaded = list(executor.map(lambda rd: run(rd, y0, tout, integrator='cvode').Cout, rds))
+    for ref, res in zip(serial, threaded):
+        assert np.allclose(res, ref, rtol=1e-14, atol=0)
+
+
+def test_integrate__threads__workspace():
+    # one instance may be evaluated concurrently given per-thread workspaces
+    from concurrent.futures import ThreadPoolExecutor
+    N = 16
+    rd = ReactionDiffusion(3, [[0, 1], [2]], [[2], [0]], k=[2.0, 0.5], N=N,
+                           D=[0.01, 0.02, 0.03], logy=True)
+    ys = [np.linspace(0.1, 1.0+i, 3*N) for i in range(8)]
+
+    def evaluate(y, workspace=None):
+        fout, jout = rd.alloc_fout(), rd.alloc_jout(banded=False)
+        rd.f(0, y, fout, workspace)
+        rd.dense_jac_cmaj(0, y, jout, workspace)
+        return fout, jout
+
+    serial = [evaluate(y) for y in ys]
+    nfev, njev = rd.nfev, rd.njev
+    rd.zero_counters()
+    with ThreadPoolExecutor(4) as executor:
+        threaded = list(executor.map(lambda y: evaluate(y, rd.make_workspace()), ys))
+    for (fref, jref), (fout, jout) in zip(serial, threaded):
+        assert np.allclose(fout, fref, rtol=1e-15, atol=0)
+        assert np.allclose(jout, jref, rtol=1e-15, atol=0)
+    assert (rd.nfev, rd.njev) == (nfev, njev)
+
+    other = ReactionDiffusion(3, [[0, 1], [2]], [[2], [0]], k=[2.0, 0.5], N=N)
+    with pytest.raises(ValueError):
+        rd.f(0, ys[0], rd.alloc_fout(), other.make_workspace())
+
+
+def test_integrate__threads__shared():
+    # one instance may be integrated concurrently (each integration has its own solver state)
+    from concurrent.futures import ThreadPoolExecutor
+    N = 32
+    rd = ReactionDiffusion(2, [[0]], [[1]], k=[0.3], N=N, D=[0.01, 0.02])
+    tout = np.linspace(0, 3.0, 7)
+    y0s = [np.linspace(0.5, 1.0 + i, 2*N) for i in range(8)]
+    kw = dict(integrator='cvode', linear_solver='gmres')
+    serial = [run(rd, y0, tout, **kw) for y0 in y0s]
+    with ThreadPoolExecutor(4) as executor:
+        threaded = list(executor.map(lambda y0: run(rd, y0, tout, **kw), y0s))
+    for ref, res in zip(serial, threaded):
+        assert np.allclose(res.Cout, ref.Cout, rtol=1e-14, atol=0)
+        assert res.info['nprec_solve'] == ref.info['nprec_solve'] > 0
+
+
+@pytest.mark.parametrize("nthreads", [1, 3])
+def test_integrate_cvode_ensemble(nthreads):
+    from chemreac.integrate import integrate_cvode, integrate_cvode_ensemble
+    N = 4
+    rd = ReactionDiffusion(2, [[0], [1]], [[1], [0]], k=[1.0, 0.1], N=N, D=[0.01, 0.02])
+    tout = np.linspace(0, 2.0, 5)
+    M = 7
+    Y0 = np.random.RandomState(42).uniform(0.5, 1.5, (M, 2*N))
+    K = np.array([[0.5 + i, 0.1*i] for i in range(M)])
+    kw = dict(atol=1e-10, rtol=1e-10)
+    yout, info = integrate_cvode_ensemble(rd, Y0, tout, K=K, nthreads=nthreads, **kw)
+    assert yout.shape == (M, tout.size, N, 2)
+    assert np.all(info['success'])
+    assert np.all(info['nreached'] == tout.size)
+    assert np.all(info['nfev'] > 0)
+    assert list(rd.k) == [1.0, 0.1]  # template untouched
+    for i in range(M):
+        ref = ReactionDiffusion(2, [[0], [1]], [[1], [0]], k=list(K[i]), N=N, D=[0.01, 0.02])
+        yref, _, _ = integrate_cvode(ref, Y0[i], tout, **kw)
+        assert np.allclose(yout[i], yref, rtol=1e-12, atol=1e-14)
+
+    yout1, info1 = integrate_cvode_ensemble(rd, Y0[0], tout, K=K[:2], **kw)
+    assert yout1.shape == (2, tout.size, N, 2)
+    assert np.allclose(yout1[0], yout[0])
+
+
+def test_integrate_cvode_ensemble__efield():
+    # the per-thread copies must inherit the prescribed electric field
+    from chemreac.integrate import integrate_cvode, integrate_cvode_ensemble
+    N = 8
+
+    def mk_rd(k):
+        rd = ReactionDiffusion(2, [[0], [1]], [[1], [0]], k=k, N=N, D=[0.01, 0.02],
+                               z_chg=[1, -1], mobility=[0.3, -0.2], x=np.linspace(0, 1, N+1))
+        rd.efield = np.linspace(0.5, 1.5, N)
+        return rd
+
+    tout = np.linspace(0, 1.0, 5)
+    M = 4
+    Y0 = np.random.RandomState(42).uniform(0.5, 1.5, (M, 2*N))
+    K = np.array([[0.5 + i, 0.1*i] for i in range(M)])
+    kw = dict(atol=1e-10, rtol=1e-10)
+    rd = mk_rd([1.0, 0.1])
+    rd.jtimes_mode = 'finite_difference'
+    yout, info = integrate_cvode_ensemble(rd, Y0, tout, K=K, nthreads=2, with_jtimes=True,
+                                          iter_type='newton', linear_solver='gmres', **kw)
+    assert np.all(info['success'])
+    for i in range(M):
+        ref = mk_rd(list(K[i]))
+        ref.jtimes_mode = 'finite_difference'
+        yref, _, _ = integrate_cvode(ref, Y0[i], tout, with_jtimes=True,
+                                     iter_type='newton', linear_solver='gmres', **kw)
+        assert np.allclose(yout[i], yref, rtol=1e-12, atol=1e-14)
+
+
+def test_integrate_cvode_ensemble__linear_solver():
+    # ilu_limit=0 would make the copies fall back to (incomplete) ILU
+    # preconditioning unless they inherit the block-tridiagonal factorization
+    from chemreac.integrate import integrate_cvode, integrate_cvode_ensemble
+    N = 16
+
+    def mk_rd():
+        return ReactionDiffusion(2, [[0], [1]], [[1], [0]], k=[1.0, 0.1], N=N,
+                                 D=[0.5, 0.2], ilu_limit=0.0)
+
+    tout = np.linspace(0, 1.0, 5)
+    y0 = np.random.RandomState(42).uniform(0.5, 1.5, 2*N)
+    kw = dict(atol=1e-8, rtol=1e-6, linear_solver='block_tridiag')
+    rd = mk_rd()
+    yout, info = integrate_cvode_ensemble(rd, y0, tout, **kw)
+    assert np.all(info['success'])
+    assert rd.prec_factorization == 'auto'  # template untouched
+    yref, _, info_ref = integrate_cvode(mk_rd(), y0, tout, **kw)
+    assert np.allclose(yout[0], yref, rtol=1e-12, atol=1e-14)
+    assert info['nfev'][0] == info_ref['nfev']
+
+
+@pytest.mark.parametrize("block_size", [1, 4, 64])
+def test_integrate_rosenbrock_batch(block_size):
+    from chemreac.integrate import integrate_rosenbrock_batch
+    rd = ReactionDiffusion(3, [[0], [1, 1]], [[1], [2]], k=[1.0, 1.0])
+    tout = np.linspace(0, 3.0, 7)
+    M = 11
+    Y0 = np.array([[1.0 + 0.1*i, 0.2, 0.0] for i in range(M)])
+    K = np.array([[0.3 + 0.2*i, 10.0**(i % 4)] for i in range(M)])
+    yout, info = integrate_rosenbrock_batch(rd, Y0, tout, K=K, atol=1e-12, rtol=1e-9,
+                                            block_size=block_size)
+    assert yout.shape == (M, tout.size, 1, 3)
+    assert np.all(info['success'])
+    assert np.all(info['nsteps'] > 0)
+    Aref = Y0[:, 0:1]*np.exp(-K[:, 0:1]*tout)
+    assert np.allclose(yout[:, :, 0, 0], Aref, rtol=1e-6, atol=1e-12)
+    mass = yout[..., 0, 0] + yout[..., 0, 1] + 2*yout[..., 0, 2]
+    assert np.allclose(mass, (Y0[:, 0] + Y0[:, 1])[:, None], rtol=1e-12, atol=0)
+
+    with pytest.raises(ValueError):
+        integrate_rosenbrock_batch(ReactionDiffusion(3, [[0]], [[1]], k=[1.0], N=3), Y0, tout)
+
+
+@pytest.mark.parametrize("order", [1, 2])
+def test_integrate__split(order):
+    # A -> B, 2 B -> C with diffusion: splitting vs. cvode
+    N = 30
+    y0 = np.array([[1.0 + 0.5*np.sin(0.2*bi), 0.1, 0.0] for bi in range(N)]).flatten()
+    rd = ReactionDiffusion(3, [[0], [1, 1]], [[1], [2]], k=[0.7, 3.0], N=N,
+                           D=[0.02, 0.03, 0.0], x=np.linspace(0, 1, N+1))
+    tout = np.linspace(0, 3.0, 7)
+    ref = run(rd, y0, tout, atol=1e-12, rtol=1e-10, integrator='cvode')
+    for rtol in (1e-4, 1e-6):
+        integr = run(rd, y0, tout, atol=1e-10, rtol=rtol, integrator='split', order=order)
+        assert integr.info['success']
+        assert integr.info['nsteps'] > 0
+        assert integr.info['integrator'] == ['split']
+        assert np.allclose(integr.Cout, ref.Cout, atol=1e-8, rtol=rtol**(order/(order + 1.0)))
+    with pytest.raises(ValueError):
+        run(rd, y0, tout, integrator='split', order=3)
+
+
+@pytest.mark.parametrize("implicit,order,logy", [
+    ('transport', 3, False), ('transport', 4, True), ('reaction', 3, True), ('reaction', 4, False)])
+def test_integrate__imex(implicit, order, logy):
+    # A -> B, 2 B -> C with diffusion: additive Runge-Kutta vs. cvode
+    N = 30
+    y0 = np.array([[1.0 + 0.5*np.sin(0.2*bi), 0.1, 1e-3] for bi in range(N)]).flatten()
+    rd = ReactionDiffusion(3, [[0], [1, 1]], [[1], [2]], k=[0.7, 3.0], N=N,
+                           D=[0.02, 0.03, 0.0], x=np.linspace(0, 1, N+1), logy=logy)
+    tout = np.linspace(0, 3.0, 7)
+    ref = run(rd, y0, tout, atol=1e-12, rtol=1e-10, integrator='cvode')
+    rtol = 1e-7
+    integr = run(rd, y0, tout, atol=1e-12, rtol=rtol, integrator='imex', order=order,
+                 implicit=implicit)
+    assert integr.info['success']
+    assert integr.info['nsteps'] > 0
+    assert integr.info['nsolve'] > 0
+    assert integr.info['linear_implicit'] == (implicit == 'transport' and not logy)
+    assert np.allclose(integr.Cout, ref.Cout, atol=1e-9, rtol=100*rtol)
+    with pytest.raises(ValueError):
+        run(rd, y0, tout, integrator='imex', implicit='both')
+
+
+@pytest.mark.parametrize("logy", [False, True])
+def test_integrate__rkc(logy):
+    # A -> B with diffusion on a fine grid: stabilised explicit vs. cvode
+    N = 200
+    y0 = np.array([[1.0 + 0.5*np.cos(0.03*bi), 0.1] for bi in range(N)]).flatten()
+    rd = ReactionDiffusion(2, [[0]], [[1]], k=[0.5], N=N, D=[0.01, 0.01],
+                           x=np.linspace(1, 2, N+1), lrefl=True, rrefl=True, logy=logy)
+    tout = np.linspace(0, 1.0, 5)
+    ref = run(rd, y0, tout, atol=1e-12, rtol=1e-10, integrator='cvode')
+    rtol = 1e-6
+    integr = run(rd, y0, tout, atol=1e-10, rtol=rtol, integrator='rkc')
+    assert integr.info['success']
+    assert integr.info['integrator'] == ['rkc']
+    assert integr.info['njev'] == 0
+    assert integr.info['max_stages_used'] > 2
+    assert integr.info['stencil_rho'] == (not logy)
+    assert np.allclose(integr.Cout, ref.Cout, atol=1e-8, rtol=100*rtol)
+
+
+@pytest.mark.parametrize("method,logy", product(['rodas3', 'ros3p'], [False, True]))
+def test_integrate__rosenbrock(method, logy):
+    # A -> B, 2 B -> C with diffusion: block-tridiagonal factorization vs. cvode
+    N = 40
+    y0 = np.array([[1.0 + 0.5*np.cos(0.1*bi), 0.1, 1e-3] for bi in range(N)]).flatten()
+    rd = ReactionDiffusion(3, [[0], [1, 1]], [[1], [2]], k=[2.0, 5.0], N=N, D=[0.01, 0.02, 0],
+                           x=np.linspace(1, 2, N+1), lrefl=True, rrefl=True, logy=logy)
+    tout = np.linspace(0, 1.0, 5)
+    ref = run(rd, y0, tout, atol=1e-12, rtol=1e-10, integrator='cvode')
+    rtol = 1e-7
+    integr = run(rd, y0, tout, atol=1e-12, rtol=rtol, integrator='rosenbrock', method=method)
+    assert integr.info['success']
+    assert integr.info['integrator'] == ['rosenbrock']
+    assert integr.info['block_tridiag']
+    assert integr.info['njev'] == integr.info['nsteps']
+    assert integr.info['nsolve'] == (4 if method == 'rodas3' else 3)*integr.info['nfactor']
+    assert np.allclose(integr.Cout, ref.Cout, atol=1e-10, rtol=30*rtol)
+
+
+@pytest.mark.parametrize("nstencil,logt", product([3, 5], [False, True]))
+def test_integrate__expm(nstencil, logt):
+    # A -> B with diffusion and a field producing A: Krylov vs. cvode
+    N = 40
+    y0 = np.array([[1.0 + 0.5*np.cos(0.1*bi), 0.1] for bi in range(N)]).flatten()
+    rd = ReactionDiffusion(2, [[0]], [[1]], k=[2.0], N=N, D=[0.01, 0.02],
+                           x=np.linspace(1, 2, N+1), nstencil=nstencil, lrefl=True,
+                           rrefl=True, logt=logt, fields=[[1.5]*N], g_values=[[0.7, 0]],
+                           g_value_parents=[-1])
+    assert rd.linear
+    tout = np.linspace(0.5, 3.0, 6)
+    ref = run(rd, y0, tout, atol=1e-12, rtol=1e-10, integrator='cvode')
+    integr = run(rd, y0, tout, atol=1e-12, rtol=1e-10, integrator='expm')
+    assert integr.info['success']
+    assert integr.info['integrator'] == ['expm']
+    assert integr.info['method'] == 'krylov'
+    assert integr.info['with_source']
+    assert integr.info['nmatvec'] > 0
+    assert integr.info['njev'] == 1
+    assert integr.info['nfev'] == 1 + (0 if integr.info['jac_exact'] else integr.info['nmatvec'])
+    assert np.allclose(integr.Cout, ref.Cout, atol=1e-9, rtol=1e-7)
+
+
 @pytest.mark.parametrize("log", LOG_COMOBS)
 def test_integrators(log):
     logy, logt, use_log2 = log
@@ -226,6 +599,17 @@ def test_integrators(log):
             'method': 'bdf',
             'tout': tend-t0,
         },
+        'rosenbrock1': {
+            'atol': [1e-8, 1e-8],
+            'rtol': 1e-8,
+            'tout': tout
+        },
+        'rosenbrock2': {
+            'atol': 1e-8,
+            'rtol': 1e-8,
+            'method': 'ros3p',
+            'tout': (t0, tend)
+        },
     }
 
     # A -> B
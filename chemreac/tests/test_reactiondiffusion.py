@@ -994,3 +994,110 @@ def test_per_bin_diffusion():
     y = [0, 1, 2, 1, 0]
     rd.f(0.0, np.asarray(y, dtype=np.float64), fout)
     assert np.all(fout[:2] == 0) and np.all(fout[-2:] == 0) and fout[2] < 0
+
+
+@pytest.mark.parametrize("logy", TR_FLS)
+def test_sparse_jac_csc(logy):
+    # A -> B; B + 2C -> B + D; radiolytic production of C
+    rd = ReactionDiffusion(4, [[0], [1, 2, 2]], [[1], [1, 3]], [0.05, 3.0],
+                           fields=[[7.0]], g_values=[[0, 0, 0.5, 0]],
+                           g_value_parents=[-1], logy=logy)
+    y0 = np.array([1.3, 1e-4, 0.7, 1e5])
+    if logy:
+        y0 = rd.logb(y0)
+    assert rd.nnz == 8
+    jref = rd.alloc_jout(banded=False)
+    rd.dense_jac_cmaj(0.0, y0, jref)
+    data, colptrs, rowvals = rd.alloc_jout_sparse()
+    rd.sparse_jac_csc(0.0, y0, data, colptrs, rowvals)
+    jout = np.zeros_like(jref)
+    for ci in range(rd.n):
+        for idx in range(colptrs[ci], colptrs[ci+1]):
+            jout[rowvals[idx], ci] = data[idx]
+    assert np.allclose(jout, jref)
+    assert sorted(rd.sparse_order) == list(range(rd.n))
+
+
+def test_ReactionDiffusion__k_eff_updates():
+    # the tabulated (modulated) rate coefficients follow k, modulated_rxns & modulation
+    N = 3
+    rd = ReactionDiffusion(2, [[0]], [[1]], [2.0], N=N, D=[0, 0],
+                           modulated_rxns=[0], modulation=[[1.0, 2.0, 3.0]])
+    y = np.ones(2*N)
+    fout = rd.alloc_fout()
+
+    def rates():
+        rd.f(0, y, fout)
+        return fout[1::2]
+
+    assert np.allclose(rates(), [2, 4, 6])
+    rd.k = [5.0]
+    assert np.allclose(rates(), [5, 10, 15])
+    rd.modulation = [[3.0, 2.0, 1.0]]
+    assert np.allclose(rates(), [15, 10, 5])
+    rd.modulated_rxns = []
+    rd.modulation = []
+    assert np.allclose(rates(), [5, 5, 5])
+
+
+def test_ReactionDiffusion__state_reuse():
+    # the Jacobian reuses the state cached by f at the same (t, y)
+    rd = ReactionDiffusion(2, [[0]], [[1]], [2.0], N=3, D=[.1, .2], logy=True)
+    y = np.log(np.linspace(0.5, 1.5, 6))
+    fout = rd.alloc_fout()
+    jref = rd.alloc_jout(banded=False)
+    rd.dense_jac_cmaj(0, y, jref)
+    rd.zero_counters()
+    rd.f(0, y, fout)
+    jout = rd.alloc_jout(banded=False)
+    rd.dense_jac_cmaj(0, y, jout)
+    assert rd.nstate_reuse == 1
+    assert np.allclose(jout, jref)
+    rd.k = [3.0]  # parameters changed: no reuse
+    rd.dense_jac_cmaj(0, y, jout)
+    assert rd.nstate_reuse == 1
+
+
+def test_ReactionDiffusion__efield():
+    # the tabulated transport operator follows assignments to efield
+    N = 5
+    rd = ReactionDiffusion(1, [], [], [], N=N, D=[0.0], mobility=[1.0])
+    y = np.linspace(0.5, 1.5, N)
+    fout = rd.alloc_fout()
+    rd.f(0, y, fout)
+    assert np.all(fout == 0)
+    efield = rd.efield
+    efield[:] = 2.0
+    assert np.all(rd.efield == 0)  # a copy
+    rd.efield = efield
+    assert np.all(rd.efield == 2.0)
+    rd.f(0, y, fout)
+    assert np.any(fout != 0)
+    jout = rd.alloc_jout(banded=False)
+    rd.dense_jac_cmaj(0, y, jout)
+    assert np.allclose(fout, jout.dot(y))  # linear in y (no reactions)
+
+
+def test_ReactionDiffusion__parallel_settings():
+    rd = ReactionDiffusion(2, [[0]], [[1]], [2.0], N=40, D=[.1, .2])
+    y = np.linspace(0.5, 1.5, 2*rd.N)
+    fref = rd.alloc_fout()
+    rd.nthreads = 1
+    assert rd.nthreads == 1
+    rd.f(0, y, fref)
+    rd.nthreads = 2
+    rd.par_threshold_rhs = 0
+    assert rd.par_threshold_rhs == 0
+    fout = rd.alloc_fout()
+    rd.f(1, y, fout)
+    assert np.all(fout == fref)
+    thresholds = rd.calibrate_parallel(2)
+    assert thresholds['par_threshold_rhs'] == rd.par_threshold_rhs >= 0
+    assert thresholds['par_threshold_jac'] == rd.par_threshold_jac >= 0
+    with pytest.raises(Exception):
+        rd.nthreads = -1
+
+
+def test_get_simd_isa():
+    from chemreac._chemreac import get_simd_isa
+    assert get_simd_isa() in ('avx512f', 'avx2', 'sse2', 'generic')
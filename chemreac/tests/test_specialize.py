@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import (absolute_import, division, print_function)
+
+import os
+
+import numpy as np
+import pytest
+
+from chemreac import ReactionDiffusion
+from chemreac.integrate import run
+from chemreac.util.testing import veryslow
+
+from chemreac.specialize import specialize, _template_path
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import Cython
+    import mako
+except ImportError:
+    Cython, mako = None, None
+
+requires_build = pytest.mark.skipif(
+    Cython is None or not os.path.exists(_template_path),
+    reason="specialization requires Cython, mako and a source checkout")
+
+
+@veryslow
+@requires_build
+@pytest.mark.parametrize('logy', [False, True])
+def test_specialize(logy, tmpdir):
+    N = 3
+    rd = ReactionDiffusion(4, [[0], [1, 2, 2]], [[1], [1, 3]], [0.05, 3.0], N=N,
+                           D=[.1, .2, .3, .4], logy=logy, substance_names='ABCD')
+    srd = specialize(rd, build_dir=str(tmpdir))
+    assert type(srd) is not type(rd)
+    assert srd.substance_names == rd.substance_names
+    y = np.linspace(0.3, 1.8, rd.n*N)
+    fref, fout = rd.alloc_fout(), srd.alloc_fout()
+    rd.f(0, y, fref)
+    srd.f(0, y, fout)
+    assert np.allclose(fout, fref, rtol=1e-14, atol=0)
+    Jref, Jout = rd.alloc_jout(banded=False), srd.alloc_jout(banded=False)
+    rd.dense_jac_cmaj(0, y, Jref)
+    srd.dense_jac_cmaj(0, y, Jout)
+    assert np.allclose(Jout, Jref, rtol=1e-14, atol=0)
+
+    tout = np.linspace(0, 3, 7)
+    ref = run(rd, y, tout, integrator='cvode')
+    res = run(srd, y, tout, integrator='cvode')
+    assert res.info['success']
+    assert np.allclose(res.yout, ref.yout)
+
+    with pytest.raises(Exception):
+        type(srd)(4, [[0], [1, 2]], [[1], [1, 3]], [0.05, 3.0])
+
+
+@veryslow
+@requires_build
+def test_specialize__cache(tmpdir, monkeypatch):
+    from chemreac import specialize as _specialize
+    monkeypatch.setenv('CHEMREAC_CACHE_DIR', str(tmpdir))
+    monkeypatch.setattr(_specialize, '_classes', {})
+    rd = ReactionDiffusion(2, [[0]], [[1]], [3.0])
+    srd1 = specialize(rd)
+    key = _specialize._mechanism_key(_specialize._mechanism(rd))
+    assert os.path.isdir(str(tmpdir.join(key)))
+    monkeypatch.setattr(_specialize, '_classes', {})
+    monkeypatch.setattr(_specialize, '_build', None)  # must not rebuild
+    srd2 = specialize(rd)
+    fout = srd2.alloc_fout()
+    srd2.f(0, np.array([1.0, 0.0]), fout)
+    assert np.allclose(fout, [-3, 3])
+    assert type(srd1).mechanism == type(srd2).mechanism
+
+
+def test_mechanism_key():
+    from chemreac.specialize import _mechanism, _mechanism_key
+    rd1 = ReactionDiffusion(2, [[0]], [[1]], [3.0])
+    rd2 = ReactionDiffusion(2, [[0]], [[1]], [5.0], N=3, logy=True)
+    rd3 = ReactionDiffusion(2, [[0, 0]], [[1]], [3.0])
+    mech = _mechanism(rd1)
+    assert _mechanism_key(mech) == _mechanism_key(dict(reversed(list(mech.items()))))
+    assert _mechanism_key(mech) == _mechanism_key(_mechanism(rd2))
+    assert _mechanism_key(mech) != _mechanism_key(_mechanism(rd3))
+
+
+def test_evict(tmpdir):
+    from chemreac.specialize import _evict
+    for i, name in enumerate('abcd'):
+        d = tmpdir.mkdir(name)
+        d.join('mod.so').write('x'*100)
+        os.utime(str(d), (i, i))
+        tmpdir.join(name + '.lock').write('')
+    tmpdir.mkdir('tmpb-crashed').join('mod.cpp').write('x'*100)  # left-over build
+    _evict(str(tmpdir), 250, keep=('a',))
+    assert sorted(p.basename for p in tmpdir.listdir() if p.isdir()) == ['a', 'd']
+    assert sorted(p.basename for p in tmpdir.listdir() if p.isfile()) == ['a.lock', 'd.lock']
+
+
+@pytest.mark.skipif(fcntl is None, reason="no file locking")
+def test_evict__locked(tmpdir):
+    from chemreac.specialize import _evict, _locked
+    for name in 'ab':
+        tmpdir.mkdir(name).join('mod.so').write('x'*100)
+    with _locked(str(tmpdir.join('a.lock')), shared=True):  # being loaded
+        _evict(str(tmpdir), 0)
+    assert sorted(p.basename for p in tmpdir.listdir() if p.isdir()) == ['a']
@@ -88,9 +88,8 @@ if len(sys.argv) > 1 and '--help' not in sys.argv[1:] and sys.argv[1] not in (
     if os.path.exists(template_path):
         from mako.template import Template
         from mako.exceptions import text_error_template
-        subsd = {'WITH_OPENMP': _WITH_OPENMP}
         try:
-            rendered = Template(open(template_path, 'rt').read()).render(**subsd)
+            rendered = Template(open(template_path, 'rt').read()).render()
         except:
             sys.stderr.write(text_error_template().render_unicode())
             raise
@@ -116,8 +115,12 @@ if len(sys.argv) > 1 and '--help' not in sys.argv[1:] and sys.argv[1] not in (
     ]
     ext_modules[0].sources = [rendered_path] + ext_modules[0].sources
     ext_modules[0].language = 'c++'
-    ext_modules[0].extra_compile_args = ['-std=c++11'] + (['-fopenmp'] if _WITH_OPENMP else [])
+    # -fopenmp-simd: vectorized kernels (see CHEMREAC_SIMD in chemreac.cpp.mako), no contraction
+    # to FMA so that the kernels dispatched at runtime give the same results on every host.
+    ext_modules[0].extra_compile_args = ['-std=c++11', '-fopenmp-simd', '-ffp-contract=off'] + (
+        ['-fopenmp'] if _WITH_OPENMP else [])
     ext_modules[0].define_macros +=  (
+        [('CHEMREAC_WITH_OPENMP_SIMD', None)] +
         ([('CHEMREAC_WITH_DEBUG', None)] if _WITH_DEBUG else []) +
         ([('CHEMREAC_WITH_DATA_DUMPING', None)] if _WITH_DATA_DUMPING else []) +
         ([('BLOCK_DIAG_ILU_WITH_OPENMP', None)] if os.environ.get('BLOCK_DIAG_ILU_WITH_OPENMP', '') == '1' else [])
@@ -1,11 +1,55 @@
 // ${'-{0}- eval: (read-only-mode) -{0}-'.format('*')}
 // ${__import__('codecs').encode('Guvf svyr jnf trarengrq, qb abg rqvg', 'rot_13')}
-<%doc> This is a source file template for use with the Python rendering engine "mako" </%doc>
+<%doc> This is a source file template for use with the Python rendering engine "mako"
+
+  MECHANISM (optional): dict with keys n, stoich_active, stoich_prod, stoich_inact.
+  When given, rate expressions and Jacobian blocks are unrolled for that
+  reaction network (see chemreac.specialize).
+</%doc>
+<%
+    MECHANISM = context.get('MECHANISM', None)
+    if MECHANISM:
+        mech_n = MECHANISM['n']
+        mech_actv = MECHANISM['stoich_active']
+        mech_nr = len(mech_actv)
+        mech_coeff_active = [[actv.count(si) for si in range(mech_n)] for actv in mech_actv]
+        mech_coeff_total = [[MECHANISM['stoich_prod'][ri].count(si) - mech_actv[ri].count(si) -
+                             MECHANISM['stoich_inact'][ri].count(si) for si in range(mech_n)]
+                            for ri in range(mech_nr)]
+
+        def _lincomb(terms):
+            # terms: [(integer coefficient, expression)]
+            out = ''
+            for coeff, expr in terms:
+                sign = ' - ' if coeff < 0 else ' + '
+                out += sign + ('' if abs(coeff) == 1 else '%d*' % abs(coeff)) + expr
+            return ('-' if out.startswith(' - ') else '') + out[3:]
+
+        mech_dydt = [_lincomb([(mech_coeff_total[ri][si], 'local_r[%d]' % ri)
+                               for ri in range(mech_nr) if mech_coeff_total[ri][si] != 0])
+                     for si in range(mech_n)]
+        mech_jac = []  # [(si, dsi, expression)]
+        for si in range(mech_n):
+            for dsi in range(mech_n):
+                terms = []
+                for ri in range(mech_nr):
+                    Akj, Ski = mech_coeff_active[ri][dsi], mech_coeff_total[ri][si]
+                    if Akj == 0 or Ski == 0:
+                        continue
+                    factors = ['get_mod_k(bi, %d)' % ri] + ['LINC(bi, %d)' % dsi]*(Akj - 1) + [
+                        'LINC(bi, %d)' % rsi for rsi in mech_actv[ri] if rsi != dsi]
+                    terms.append((Ski*Akj, '*'.join(factors)))
+                if terms:
+                    mech_jac.append((si, dsi, _lincomb(terms)))
+%>
 #include <algorithm> // std::count
 //#include <vector>    // std::vector
 #include <algorithm> // std::max, std::min
 #include <cstdlib> // free,  C++11 aligned_alloc
+#include <chrono> // calibrate_parallel
+#include <limits>
 #include <memory>
+#include <string> // get_simd_isa
 #include "anyode/anyode_buffer.hpp"
 #include "anyode/anyode_decomposition_lapack.hpp"
 #include "finitediff_templated.hpp" // fintie differences
@@ -23,11 +67,33 @@
 #include "chemreac_util.hpp" // save_array, load_array
 #endif
 
-%if WITH_OPENMP:
+#if defined(_OPENMP)
 #include <omp.h>
-%else:
+#else
 #define omp_get_thread_num() 0
-%endif
+#define omp_get_max_threads() 1
+#endif
+
+// Runtime CPU dispatch of the hot elementwise/stencil kernels: with GCC on
+// glibc the kernels marked CHEMREAC_TARGET_CLONES are compiled for AVX-512,
+// AVX2 and the baseline ISA of the build, the widest one supported by the host
+// is picked when the module is loaded (see get_simd_isa). CHEMREAC_SIMD
+// vectorizes over bins: it is enabled by -fopenmp, or by -fopenmp-simd together
+// with -DCHEMREAC_WITH_OPENMP_SIMD (as passed by setup.py).
+#if defined(__GNUC__) && !defined(__clang__) && defined(__x86_64__) && defined(__GLIBC__) && \
+    !defined(CHEMREAC_NO_MULTIVERSIONING)
+#define CHEMREAC_MULTIVERSIONING
+#define CHEMREAC_TARGET_CLONES __attribute__((target_clones("avx512f", "avx2", "default")))
+#else
+#define CHEMREAC_TARGET_CLONES
+#endif
+#if defined(__GNUC__) && !defined(__clang__) && (defined(_OPENMP) || defined(CHEMREAC_WITH_OPENMP_SIMD))
+#define CHEMREAC_SIMD _Pragma("omp simd")
+#define CHEMREAC_UNROLL _Pragma("GCC unroll 8")
+#else
+#define CHEMREAC_SIMD
+#define CHEMREAC_UNROLL
+#endif
 
 
 namespace chemreac {
@@ -43,6 +109,8 @@ using std::max;
 
 #define GRAD_WEIGHT(bi, li) grad_weight[nstencil*(bi) + li]
 
+const int transport_tile = 256; // bins per block of rhs (see transport_rhs_)
+
 
 // 1D discretized reaction diffusion
 template<typename Real_t>
@@ -87,11 +155,7 @@ ReactionDiffusion<Real_t>::ReactionDiffusion(
     div_weight(buffer_factory<double>(nstencil*N)),
     grad_weight(buffer_factory<double>(nstencil*N)),
     efield(buffer_factory<double>(N)),
-    netchg(buffer_factory<double>(N)),
     xc(buffer_factory<double>(nsidep + N + nsidep)),
-    work1(buffer_factory<double>(n*N)),
-    work2(buffer_factory<double>(n*N)),
-    work3(buffer_factory<double>(${"((nr/8)+1)*8*omp_get_num_threads()" if WITH_OPENMP else "nr"})),
     logy(logy), logt(logt), logx(logx), stoich_active(stoich_active),
     stoich_inact(stoich_inact), stoich_prod(stoich_prod),
     k(k),  D(D), z_chg(z_chg), mobility(mobility), x(x), lrefl(lrefl), rrefl(rrefl),
@@ -160,13 +224,19 @@ ReactionDiffusion<Real_t>::ReactionDiffusion(
     for (int bi=0; bi<N; bi++)
         apply_fd_(bi);
 
-    gradD = buffer_factory<Real_t>(N*n);
+    stencil_idx.resize(N*nstencil);
     for (int bi=0; bi<N; ++bi){
         int starti = start_idx_(bi);
+        for (int li=0; li<nstencil; ++li)
+            stencil_idx[bi*nstencil + li] = biw_(starti, li);
+    }
+
+    gradD = buffer_factory<Real_t>(N*n);
+    for (int bi=0; bi<N; ++bi){
         for (int si=0; si<n; ++si){
             gradD[bi*n + si] = 0;
             for (int li=0; li<nstencil; ++li){
-                int biw = biw_(starti, li);
+                int biw = stencil_idx[bi*nstencil + li];
                 gradD[bi*n + si] += GRAD_WEIGHT(bi, li)*D[biw*n + si];
             }
         }
@@ -194,6 +264,7 @@ ReactionDiffusion<Real_t>::ReactionDiffusion(
             coeff_total[rxni*n+si] = coeff_prod[rxni*n+si] - coeff_active[rxni*n+si] - coeff_inact[rxni*n+si];
         }
     }
+    build_network_index_();
 
     // Handle g_values
     if (fields.size() != g_values.size())
@@ -212,15 +283,21 @@ ReactionDiffusion<Real_t>::ReactionDiffusion(
     this->g_values = g_values;
     this->fields = fields;
 
-    // Sanity check modulation
-    for (const auto rxni : this->modulated_rxns)
-        if (rxni >= (int)nr || rxni < 0)
-            throw std::logic_error("illegal reaction index in modulated_rxns");
-    if (this->modulation.size() != this->modulated_rxns.size())
-        throw std::logic_error("modulation size differs from modulated_rxns");
-    for (const auto& mdltn : this->modulation)
-        if (mdltn.size() != (unsigned)N)
-            throw std::logic_error("illegally sized vector in modulation");
+    update_k_eff();
+    update_transport_jac();
+%if MECHANISM:
+
+    // This source is specialised for one reaction network
+    const vector<vector<int> > mech_stoich_active {${', '.join('{%s}' % ', '.join(map(str, l)) for l in mech_actv)}};
+    const vector<vector<int> > mech_stoich_prod {${', '.join('{%s}' % ', '.join(map(str, l)) for l in MECHANISM['stoich_prod'])}};
+    const vector<vector<int> > mech_stoich_inact {${', '.join('{%s}' % ', '.join(map(str, l)) for l in MECHANISM['stoich_inact'])}};
+    if (n != ${mech_n} || this->stoich_active != mech_stoich_active ||
+        this->stoich_prod != mech_stoich_prod || this->stoich_inact != mech_stoich_inact)
+        throw std::logic_error("Reaction network differs from the one this module was generated for.");
+%endif
+
+    work = make_workspace();
+    update_sparse_pattern();
 }
 
 template<typename Real_t>
@@ -251,16 +328,170 @@ int ReactionDiffusion<Real_t>::biw_(int starti, int li) const {
     return biw;
 }
 
+template<typename Real_t>
+void ReactionDiffusion<Real_t>::build_network_index_() {
+    // CSR index lists over the non-zeros of coeff_total & coeff_active so that
+    // rhs and the Jacobian only visit structural non-zeros.
+    net_ptr.assign(1, 0);
+    net_si.clear();
+    net_coeff.clear();
+    for (int rxni=0; rxni<nr; ++rxni){
+        for (int si=0; si<n; ++si){
+            if (coeff_total[rxni*n + si] != 0){
+                net_si.push_back(si);
+                net_coeff.push_back(coeff_total[rxni*n + si]);
+            }
+        }
+        net_ptr.push_back(net_si.size());
+    }
+    vector<vector<int> > rxns(n*n); // reactions contributing to (si, dsi)
+    for (int rxni=0; rxni<nr; ++rxni)
+        for (int dsi=0; dsi<n; ++dsi)
+            if (coeff_active[rxni*n + dsi] != 0)
+                for (int ni=net_ptr[rxni]; ni<net_ptr[rxni+1]; ++ni)
+                    rxns[net_si[ni]*n + dsi].push_back(rxni);
+    jac_nz_si.clear();
+    jac_nz_dsi.clear();
+    jac_ptr.assign(1, 0);
+    jac_rxn.clear();
+    jac_order.clear();
+    jac_net.clear();
+    for (int si=0; si<n; ++si){
+        for (int dsi=0; dsi<n; ++dsi){
+            if (rxns[si*n + dsi].empty())
+                continue;
+            jac_nz_si.push_back(si);
+            jac_nz_dsi.push_back(dsi);
+            for (const int rxni : rxns[si*n + dsi]){
+                jac_rxn.push_back(rxni);
+                jac_order.push_back(coeff_active[rxni*n + dsi]);
+                jac_net.push_back(coeff_total[rxni*n + si]);
+            }
+            jac_ptr.push_back(jac_rxn.size());
+        }
+    }
+}
+
+template<typename Real_t>
+std::unique_ptr<Workspace<Real_t>>
+ReactionDiffusion<Real_t>::make_workspace() const
+{
+    // local_r: one (padded) slice of nr reaction rates per thread
+    // linC_T, transport_T: one tile of species major transport data per thread
+    return AnyODE::make_unique<Workspace<Real_t>>(
+        n*N, N, ((nr/8)+1)*8, n*(transport_tile + nstencil), get_nthreads());
+}
+
+template<typename Real_t>
+int
+ReactionDiffusion<Real_t>::get_nthreads() const
+{
+    return (nthreads > 0) ? nthreads : omp_get_max_threads();
+}
+
+template<typename Real_t>
+void
+ReactionDiffusion<Real_t>::set_nthreads(int nthreads_)
+{
+    // Not to be called during (concurrent) evaluation
+    if (nthreads_ < 0)
+        throw std::invalid_argument("nthreads must be non-negative");
+    nthreads = nthreads_;
+    if (work->nslots < get_nthreads())
+        work = make_workspace();
+}
+
+template<typename Real_t>
+void
+ReactionDiffusion<Real_t>::calibrate_parallel(int nrep)
+{
+    // Sets par_threshold_rhs & par_threshold_jac from timings (best of nrep) of
+    // serial and threaded evaluations of this instance. Assuming t_serial = a*size
+    // and t_threaded = o + a*size/p (p threads) threading pays off for
+    // size > o/(a*(1 - 1/p)).
+    const long never = std::numeric_limits<long>::max();
+    const int p = get_nthreads();
+    if (p == 1){
+        par_threshold_rhs = par_threshold_jac = never;
+        return;
+    }
+    const long nfev0 = nfev, njev0 = njev, nstate_reuse0 = nstate_reuse;
+    vector<Real_t> y(n*N, logy ? 0 : 1), fout(n*N);
+    const int nsat = (geom == Geom::PERIODIC) ? nsidep : 0;
+    block_diag_ilu::BlockDiagMatrix<Real_t> jac {nullptr, N, n, n_jac_diags, nsat, n};
+    auto timing = [&](bool jacobian, bool threaded) -> double {
+        par_threshold_rhs = par_threshold_jac = threaded ? -1 : never;
+        double best = std::numeric_limits<double>::max();
+        for (int ri=0; ri<nrep; ++ri){
+            jac.set_to(0);
+            const auto t0 = std::chrono::steady_clock::now();
+            if (jacobian)
+                compressed_jac_cmaj(0, &y[0], &fout[0], jac.m_data, 0);
+            else
+                rhs(ri, &y[0], &fout[0]);
+            best = min(best, std::chrono::duration<double>(std::chrono::steady_clock::now() - t0).count());
+        }
+        return best;
+    };
+    auto threshold = [&](bool jacobian, long size) -> long {
+        const double t_serial = timing(jacobian, false);
+        const double t_threaded = timing(jacobian, true);
+        const double a = t_serial/size, o = t_threaded - t_serial/p;
+        if (o <= 0)
+            return 0;
+        const double crossover = o/(a*(1 - 1.0/p));
+        return (crossover < never) ? static_cast<long>(crossover) : never;
+    };
+    const long rhs_threshold = threshold(false, n*N);
+    const long jac_threshold = threshold(true, static_cast<long>(n)*n*N);
+    par_threshold_rhs = rhs_threshold;
+    par_threshold_jac = jac_threshold;
+    nfev = nfev0;
+    njev = njev0;
+    nstate_reuse = nstate_reuse0;
+}
+
+template<typename Real_t>
+const Real_t *
+ReactionDiffusion<Real_t>::efield_for_(const Real_t * const linC, Workspace<Real_t>& ws) const
+{
+    // Self-consistent field (auto_efield) in ws, otherwise the prescribed field
+    if (auto_efield){
+        calc_efield_(linC, AnyODE::buffer_get_raw_ptr(ws.efield), AnyODE::buffer_get_raw_ptr(ws.netchg));
+        return AnyODE::buffer_get_raw_ptr(ws.efield);
+    }
+    return &efield[0];
+}
+
+template<typename Real_t>
+bool
+ReactionDiffusion<Real_t>::state_cached_(Real_t t, const Real_t * const y, const Workspace<Real_t>& ws) const
+{
+    // Is ws holding linC, rlinC, efield & dydt of an rhs evaluation at (t, y)?
+    if (ws.state_epoch != state_epoch || ws.state_t != t)
+        return false;
+    return std::equal(y, y + n*N, &ws.state_y[0]);
+}
+
+template<typename Real_t>
+void
+ReactionDiffusion<Real_t>::cache_state_(Real_t t, const Real_t * const y, const Real_t * const dydt,
+                                        Workspace<Real_t>& ws) const
+{
+    Real_t * const state_dydt = AnyODE::buffer_get_raw_ptr(ws.dydt);
+    if (dydt != state_dydt)
+        std::copy(dydt, dydt + n*N, state_dydt);
+    std::copy(y, y + n*N, AnyODE::buffer_get_raw_ptr(ws.state_y));
+    ws.state_t = t;
+    ws.state_epoch = state_epoch;
+}
+
 template<typename Real_t>
 void
 ReactionDiffusion<Real_t>::zero_counters(){
     nfev = 0;
     njev = 0;
-    nprec_setup = 0;
-    nprec_solve = 0;
-    njacvec_dot = 0;
-    nprec_solve_ilu = 0;
-    nprec_solve_lu = 0;
+    nstate_reuse = 0;
 }
 
 template<typename Real_t>
@@ -287,6 +518,81 @@ ReactionDiffusion<Real_t>::get_mupper() const
     return this->get_mlower();
 }
 
+template<typename Real_t>
+int
+ReactionDiffusion<Real_t>::get_nnz() const
+{
+    if (N == 1)
+        return sparse_rowvals.size();
+    else
+        return -1;
+}
+
+template<typename Real_t>
+bool
+ReactionDiffusion<Real_t>::is_linear() const
+{
+    if (logy || auto_efield)
+        return false;
+    for (const auto& active : stoich_active)
+        if (active.size() > 1)
+            return false;
+    return true;
+}
+
+template<typename Real_t>
+void
+ReactionDiffusion<Real_t>::update_sparse_pattern()
+{
+    // Structural non-zeros of a Jacobian block (reactions and
+    // concentration dependent fields), diagonal always included.
+    vector<bool> nz(n*n, false);
+    for (int si=0; si<n; ++si)
+        nz[si*n + si] = true;
+    for (unsigned nzi=0; nzi<jac_nz_si.size(); ++nzi)
+        nz[jac_nz_dsi[nzi]*n + jac_nz_si[nzi]] = true;
+    for (unsigned fi=0; fi<g_values.size(); ++fi){
+        const int dsi = g_value_parents[fi];
+        if (dsi == -1)
+            continue;
+        for (int si=0; si<n; ++si)
+            if (g_values[fi][si] != 0)
+                nz[dsi*n + si] = true;
+    }
+    sparse_colptrs.assign(1, 0);
+    sparse_rowvals.clear();
+    sparse_idx.assign(n*n, -1);
+    for (int ci=0; ci<n; ++ci){
+        for (int ri=0; ri<n; ++ri){
+            if (!nz[ci*n + ri])
+                continue;
+            sparse_idx[ci*n + ri] = sparse_rowvals.size();
+            sparse_rowvals.push_back(ri);
+        }
+        sparse_colptrs.push_back(sparse_rowvals.size());
+    }
+    sparse_symbolic.reset();
+}
+
+template<typename Real_t>
+const SparseLUSymbolic&
+ReactionDiffusion<Real_t>::get_sparse_symbolic() const
+{
+    std::lock_guard<std::mutex> lock(sparse_symbolic_mutex);
+    if (!sparse_symbolic)
+        sparse_symbolic = AnyODE::make_unique<SparseLUSymbolic>(
+            n, sparse_colptrs, sparse_rowvals,
+            minimum_degree_ordering(n, sparse_colptrs, sparse_rowvals));
+    return *sparse_symbolic;
+}
+
+template<typename Real_t>
+const vector<int>&
+ReactionDiffusion<Real_t>::get_sparse_order() const
+{
+    return get_sparse_symbolic().m_order;
+}
+
 
 template<typename Real_t>
 int
@@ -374,17 +680,86 @@ ReactionDiffusion<Real_t>::apply_fd_(int bi){
 #undef FDWEIGHT
 
 template<typename Real_t>
-Real_t
-ReactionDiffusion<Real_t>::get_mod_k(int bi, int ri) const{
-    Real_t tmp = k[ri];
-    // Modulation
-    int enumer = -1;
-    for (auto mi : this->modulated_rxns){
-        enumer++;
-        if (mi == (int)ri)
-            tmp *= this->modulation[enumer][bi];
+void
+ReactionDiffusion<Real_t>::update_k_eff(){
+    // Tabulates the (per bin modulated) rate coefficients used by get_mod_k
+    if (k.size() != (unsigned)nr)
+        throw std::logic_error("k of incorrect length");
+    for (const auto rxni : this->modulated_rxns)
+        if (rxni >= (int)nr || rxni < 0)
+            throw std::logic_error("illegal reaction index in modulated_rxns");
+    if (this->modulation.size() != this->modulated_rxns.size())
+        throw std::logic_error("modulation size differs from modulated_rxns");
+    for (const auto& mdltn : this->modulation)
+        if (mdltn.size() != (unsigned)N)
+            throw std::logic_error("illegally sized vector in modulation");
+    k_eff.resize(N*nr);
+    for (int bi=0; bi<N; ++bi)
+        std::copy(k.begin(), k.end(), k_eff.begin() + bi*nr);
+    for (unsigned mi=0; mi<modulated_rxns.size(); ++mi)
+        for (int bi=0; bi<N; ++bi)
+            k_eff[bi*nr + modulated_rxns[mi]] *= modulation[mi][bi];
+    invalidate_state_cache();
+}
+
+template<typename Real_t>
+void
+ReactionDiffusion<Real_t>::update_transport_jac(){
+    // Tabulates the diffusion (and, for a prescribed efield, drift) contributions
+    // to the Jacobian: they are independent of t and y (before transformations).
+    transport_diag.assign(N*n, 0);
+    transport_sub.assign(n_jac_diags*N*n, 0);
+    transport_sup.assign(n_jac_diags*N*n, 0);
+    transport_species.clear();
+    if (N == 1)
+        return;
+    for (int si=0; si<n; ++si){
+        bool active = (mobility[si] != 0.0);
+        for (int bi=0; bi<N && !active; ++bi)
+            active = (D[bi*n + si] != 0.0);
+        if (active)
+            transport_species.push_back(si);
+    }
+    lap_weight_T.resize(nstencil*N);
+    grad_weight_T.resize(nstencil*N);
+    div_weight_T.resize(nstencil*N);
+    for (int bi=0; bi<N; ++bi){
+        for (int li=0; li<nstencil; ++li){
+            lap_weight_T[li*N + bi] = LAP_WEIGHT(bi, li);
+            grad_weight_T[li*N + bi] = GRAD_WEIGHT(bi, li);
+            div_weight_T[li*N + bi] = DIV_WEIGHT(bi, li);
+        }
+    }
+    D_T.resize(n*N);
+    gradD_T.resize(n*N);
+    for (int bi=0; bi<N; ++bi){
+        for (int si=0; si<n; ++si){
+            D_T[si*N + bi] = D[bi*n + si];
+            gradD_T[si*N + bi] = gradD[bi*n + si];
+        }
+    }
+    for (int bi=0; bi<N; ++bi){
+        for (int si=0; si<n; ++si){
+            if ((D[bi*n + si] == 0.0) && (mobility[si] == 0.0)) continue;
+            for (int k=0; k<nstencil; ++k){
+                const int sbi = stencil_idx[bi*nstencil + k];
+                const Real_t drift = (auto_efield) ? 0 : -mobility[si]*DIV_WEIGHT(bi, k);
+                const Real_t contrib = D[bi*n + si]*LAP_WEIGHT(bi, k) + gradD[bi*n + si]*GRAD_WEIGHT(bi, k) +
+                    efield[bi]*drift;
+                transport_diag[bi*n + si] += drift*efield[sbi];
+                if (sbi == bi) {
+                    transport_diag[bi*n + si] += contrib;
+                } else {
+                    for (int di=0; di<n_jac_diags; ++di){
+                        if ((bi >= di+1) and (sbi == bi-di-1))
+                            transport_sub[(di*N + bi)*n + si] += contrib;
+                        if ((bi < N-di-1) and (sbi == bi+di+1))
+                            transport_sup[(di*N + bi)*n + si] += contrib;
+                    }
+                }
+            }
+        }
     }
-    return tmp;
 }
 
 template<typename Real_t>
@@ -393,6 +768,11 @@ ReactionDiffusion<Real_t>::fill_local_r_(int bi, const Real_t * const ANYODE_RES
                                          Real_t * const ANYODE_RESTRICT local_r) const
 {
     // intent(out) :: local_r
+%if MECHANISM:
+  %for ri, actv in enumerate(mech_actv):
+    local_r[${ri}] = get_mod_k(bi, ${ri})${''.join('*C[bi*n+%d]' % si for si in actv)};
+  %endfor
+%else:
     for (int rxni=0; rxni<nr; ++rxni){
         // reaction rxni
         Real_t tmp = 1;
@@ -406,6 +786,7 @@ ReactionDiffusion<Real_t>::fill_local_r_(int bi, const Real_t * const ANYODE_RES
         // Rate constant
         local_r[rxni] = get_mod_k(bi, rxni)*tmp;
     }
+%endif
 }
 
 // The indices of x, fluxes and bins
@@ -419,7 +800,9 @@ ReactionDiffusion<Real_t>::populate_linC(Real_t * const ANYODE_RESTRICT linC,
                                          const Real_t * const ANYODE_RESTRICT y,
                                          bool apply_exp, bool recip) const
 {
-    ${"#pragma omp parallel for schedule(static) if (N*n > 65536)" if WITH_OPENMP else ""}
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(static) num_threads(get_nthreads()) if (N*n > par_threshold_rhs)
+#endif
     for (int bi=0; bi<N; ++bi){
         if (recip) {
             if (apply_exp) {
@@ -458,104 +841,273 @@ template<typename Real_t>
 AnyODE::Status
 ReactionDiffusion<Real_t>::rhs(Real_t t, const Real_t * const y, Real_t * const ANYODE_RESTRICT dydt)
 {
-    // note condifiontal call to free at end of this function
-    if (logy) {
-        populate_linC(AnyODE::buffer_get_raw_ptr(work1), y, true);
-        populate_linC(AnyODE::buffer_get_raw_ptr(work2), y, true, true);
-    }
-    const Real_t * const linC = (logy) ? AnyODE::buffer_get_raw_ptr(work1) : y;
-    const Real_t * const rlinC = (logy) ? AnyODE::buffer_get_raw_ptr(work2) : nullptr;
-    if (auto_efield){
-        calc_efield(linC);
+    const auto status = rhs(t, y, dydt, *work);
+    if (auto_efield)
+        std::copy(&work->efield[0], &work->efield[0] + N, &efield[0]);
+    return status;
+}
+
+template<typename Real_t>
+AnyODE::Status
+ReactionDiffusion<Real_t>::rhs(Real_t t, const Real_t * const y, Real_t * const ANYODE_RESTRICT dydt,
+                               Workspace<Real_t>& ws) const
+{
+    return rhs_part(t, y, dydt, RhsPart::ALL, ws);
+}
+
+template<typename Real_t>
+AnyODE::Status
+ReactionDiffusion<Real_t>::rhs_part(Real_t t, const Real_t * const y, Real_t * const ANYODE_RESTRICT dydt,
+                                    RhsPart part, Workspace<Real_t>& ws) const
+{
+    const bool with_reaction = part != RhsPart::TRANSPORT, with_transport = part != RhsPart::REACTION;
+    const bool cached = state_cached_(t, y, ws);
+    if (logy && !cached) {
+        populate_linC(AnyODE::buffer_get_raw_ptr(ws.linC), y, true);
+        populate_rlinC_(AnyODE::buffer_get_raw_ptr(ws.linC), AnyODE::buffer_get_raw_ptr(ws.rlinC));
     }
+    const Real_t * const linC = (logy) ? AnyODE::buffer_get_raw_ptr(ws.linC) : y;
+    const Real_t * const rlinC = (logy) ? AnyODE::buffer_get_raw_ptr(ws.rlinC) : nullptr;
+    const Real_t * const efield = (cached && auto_efield) ? AnyODE::buffer_get_raw_ptr(ws.efield) : efield_for_(linC, ws);
+    if (cached)
+        nstate_reuse++;
     const Real_t expb_t = (logt) ? expb(t) : 0.0;
-    ${"Real_t * const local_r = AnyODE::buffer_get_raw_ptr(work3);" if not WITH_OPENMP else ""}
-    ${"#pragma omp parallel for schedule(static) if (N*n > 65536)" if WITH_OPENMP else ""}
-    for (int bi=0; bi<N; ++bi){
-        // compartment bi
-        ${"Real_t * const local_r = AnyODE::buffer_get_raw_ptr(work3) + ((nr/8)+1)*8*omp_get_thread_num();" if WITH_OPENMP else ""}
-
-        for (int si=0; si<n; ++si)
-            DYDT(bi, si) = 0.0; // zero out
+    const int ntiles = (N + transport_tile - 1)/transport_tile;
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(static) num_threads(min(ws.nslots, get_nthreads())) if (N*n > par_threshold_rhs)
+#endif
+    for (int ti=0; ti<ntiles; ++ti){
+        // bins [b0, b1)
+        const int b0 = ti*transport_tile, b1 = min(N, b0 + transport_tile);
+        Real_t * const local_r = AnyODE::buffer_get_raw_ptr(ws.local_r) + ((nr/8)+1)*8*omp_get_thread_num();
+        Real_t * const transport_T = AnyODE::buffer_get_raw_ptr(ws.transport_T) + n*(transport_tile + nstencil)*omp_get_thread_num();
+        if (N > 1 && with_transport)
+            transport_rhs_(b0, b1, linC, efield,
+                           AnyODE::buffer_get_raw_ptr(ws.linC_T) + n*(transport_tile + nstencil)*omp_get_thread_num(),
+                           transport_T);
+        for (int bi=b0; bi<b1; ++bi){
+            // compartment bi
+            for (int si=0; si<n; ++si)
+                DYDT(bi, si) = 0.0; // zero out
+
+            if (with_reaction){
+                // Contributions from reactions
+                // ----------------------------
+                fill_local_r_(bi, linC, local_r);
+%if MECHANISM:
+  %for si, expr in enumerate(mech_dydt):
+    %if expr:
+                DYDT(bi, ${si}) += ${expr};
+    %endif
+  %endfor
+%else:
+                for (int rxni=0; rxni<nr; ++rxni){
+                    // reaction index rxni, species with non-zero net stoichiometry
+                    for (int ni=net_ptr[rxni]; ni<net_ptr[rxni+1]; ++ni)
+                        DYDT(bi, net_si[ni]) += net_coeff[ni]*local_r[rxni];
+                }
+%endif
+                // Contribution from particle/electromagnetic fields
+                for (unsigned fi=0; fi<this->fields.size(); ++fi){
+                    if (fields[fi][bi] == 0)
+                        continue; // exit early
+                    const Real_t gfact = (g_value_parents[fi] == -1) ? \
+                        1.0 : LINC(bi, g_value_parents[fi]);
+                    for (int si=0; si<n; ++si)
+                        if (g_values[fi][si] != 0)
+                            DYDT(bi, si) += fields[fi][bi]*g_values[fi][si]*gfact;
+                }
+            }
 
-        // Contributions from reactions
-        // ----------------------------
-        fill_local_r_(bi, linC, local_r);
-        for (int rxni=0; rxni<nr; ++rxni){
-            // reaction index rxni
+            if (N > 1 && with_transport){
+                // Contributions from diffusion and advection (see transport_rhs_)
+                // ------------------------------------------
+                for (const int si : transport_species)
+                    DYDT(bi, si) += transport_T[si*transport_tile + bi - b0];
+            }
             for (int si=0; si<n; ++si){
-                // species index si
-                const int overall = coeff_total[rxni*n + si];
-                if (overall != 0)
-                    DYDT(bi, si) += overall*local_r[rxni];
+                if (logy){
+                    DYDT(bi, si) *= RLINC(bi, si);
+                    if (!logt and use_log2)
+                        DYDT(bi, si) /= log(2);
+                }
+                if (logt){
+                    DYDT(bi, si) *= expb_t;
+                    if (!logy and use_log2)
+                        DYDT(bi, si) *= log(2);
+                }
             }
         }
-        // Contribution from particle/electromagnetic fields
-        for (unsigned fi=0; fi<this->fields.size(); ++fi){
-            if (fields[fi][bi] == 0)
-                continue; // exit early
-            const Real_t gfact = (g_value_parents[fi] == -1) ? \
-                1.0 : LINC(bi, g_value_parents[fi]);
-            for (int si=0; si<n; ++si)
-                if (g_values[fi][si] != 0)
-                    DYDT(bi, si) += fields[fi][bi]*g_values[fi][si]*gfact;
+    }
+    if (part == RhsPart::ALL)
+        cache_state_(t, y, dydt, ws);
+    else if (!cached)
+        ws.state_epoch = -1; // linC, rlinC & efield overwritten, dydt is only a part of f
+    nfev++;
+    return AnyODE::Status::success;
+}
+#undef DYDT
+
+template<int NS, bool with_advection, typename Real_t>
+CHEMREAC_TARGET_CLONES void
+transport_interior_(const int nb, const int nstencil, const int ldw,
+                    const Real_t * const ANYODE_RESTRICT c, const Real_t * const ANYODE_RESTRICT e,
+                    const Real_t * const ANYODE_RESTRICT lapw, const Real_t * const ANYODE_RESTRICT gradw,
+                    const Real_t * const ANYODE_RESTRICT divw, const Real_t * const ANYODE_RESTRICT D,
+                    const Real_t * const ANYODE_RESTRICT gradD, const Real_t mob,
+                    Real_t * const ANYODE_RESTRICT out)
+{
+    // nb consecutive bins with a centred stencil (NS > 0: nstencil known at compile time),
+    // vectorized over bins. c & e: concentration (one species) & efield of bins
+    // [-nsidep, nb + nsidep), weights: stencil major (leading dimension ldw),
+    // D, gradD & out: nb bins.
+    const int ns = (NS > 0) ? NS : nstencil;
+    const int nsidep = (ns - 1)/2;
+    CHEMREAC_SIMD
+    for (int j=0; j<nb; ++j){
+        Real_t diffusion_unscaled = 0, diffusion_correction = 0, advection_unscaled = 0;
+        CHEMREAC_UNROLL
+        for (int xi=0; xi<ns; ++xi){
+            diffusion_unscaled += lapw[xi*ldw + j] * c[j + xi];
+            diffusion_correction += gradw[xi*ldw + j] * c[j + xi];
+            if (with_advection)
+                advection_unscaled += divw[xi*ldw + j] * (c[j + xi]*e[j + nsidep] + c[j + nsidep]*e[j + xi]);
         }
+        out[j] = (!with_advection && D[j] == 0.0) ? 0 :
+            diffusion_unscaled*D[j] + diffusion_correction*gradD[j] - advection_unscaled*mob;
+    }
+}
 
-        if (N>1){
-            // Contributions from diffusion and advection
-            // ------------------------------------------
-            int starti = start_idx_(bi);
-            for (int si=0; si<n; ++si){ // species index si
-                if ((D[bi*n + si] == 0.0) && (mobility[si] == 0.0)) continue;
-                Real_t diffusion_unscaled = 0;
-                Real_t diffusion_correction = 0;
-                Real_t advection_unscaled = 0;
+template<typename Real_t>
+CHEMREAC_TARGET_CLONES void
+reciprocal_(const int len, const Real_t * const ANYODE_RESTRICT x, Real_t * const ANYODE_RESTRICT out)
+{
+    CHEMREAC_SIMD
+    for (int i=0; i<len; ++i)
+        out[i] = 1/x[i];
+}
+
+template<typename Real_t>
+void
+ReactionDiffusion<Real_t>::populate_rlinC_(const Real_t * const ANYODE_RESTRICT linC,
+                                           Real_t * const ANYODE_RESTRICT rlinC) const
+{
+    // rlinC = 1/linC (logy), in place of a second expb over all n*N elements
+    const int ntiles = (N + transport_tile - 1)/transport_tile;
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(static) num_threads(get_nthreads()) if (N*n > par_threshold_rhs)
+#endif
+    for (int ti=0; ti<ntiles; ++ti){
+        const int b0 = ti*transport_tile, b1 = min(N, b0 + transport_tile);
+        reciprocal_(n*(b1 - b0), linC + b0*n, rlinC + b0*n);
+    }
+}
+
+template<typename Real_t>
+void
+ReactionDiffusion<Real_t>::transport_rhs_(const int b0, const int b1,
+                                          const Real_t * const ANYODE_RESTRICT linC,
+                                          const Real_t * const ANYODE_RESTRICT efield,
+                                          Real_t * const ANYODE_RESTRICT linC_T,
+                                          Real_t * const ANYODE_RESTRICT transport_T) const
+{
+    // Diffusion and advection in bins [b0, b1) (at most transport_tile) of the
+    // species in transport_species, evaluated one species at a time. Output:
+    // transport_T[si*transport_tile + bi - b0]. Bins with a centred stencil use
+    // a species major copy of linC (linC_T: contiguous stencil, no index lookup)
+    // and the transposed tables of update_transport_jac (vectorized over bins),
+    // bins close to the boundaries use stencil_idx.
+    const int lo = min(max(b0, nsidep), b1), hi = max(lo, min(b1, N - nsidep));
+    for (const int si : transport_species){
+        Real_t * const ANYODE_RESTRICT out = transport_T + si*transport_tile;
+        const Real_t mob = mobility[si];
+        const int edges[4] = {b0, lo, hi, b1}; // [b0, lo) & [hi, b1)
+        for (int ei=0; ei<4; ei += 2){
+            for (int bi=edges[ei]; bi<edges[ei+1]; ++bi){
+                const int * const idx = &stencil_idx[bi*nstencil];
+                Real_t diffusion_unscaled = 0, diffusion_correction = 0, advection_unscaled = 0;
                 for (int xi=0; xi<nstencil; ++xi){
-                    int biw = biw_(starti, xi);
-                    diffusion_unscaled += LAP_WEIGHT(bi, xi) * LINC(biw, si);
-                    diffusion_correction += GRAD_WEIGHT(bi, xi) * LINC(biw, si);
+                    diffusion_unscaled += LAP_WEIGHT(bi, xi) * LINC(idx[xi], si);
+                    diffusion_correction += GRAD_WEIGHT(bi, xi) * LINC(idx[xi], si);
                     advection_unscaled += DIV_WEIGHT(bi, xi) * \
-                        (LINC(biw, si)*efield[bi] + LINC(bi, si)*efield[biw]);
+                        (LINC(idx[xi], si)*efield[bi] + LINC(bi, si)*efield[idx[xi]]);
                 }
-                DYDT(bi, si) += diffusion_unscaled*D[bi*n + si];
-                DYDT(bi, si) += diffusion_correction*gradD[bi*n + si];
-                DYDT(bi, si) += advection_unscaled*-mobility[si];
-            }
-        }
-        for (int si=0; si<n; ++si){
-            if (logy){
-                DYDT(bi, si) *= RLINC(bi, si);
-                if (!logt and use_log2)
-                    DYDT(bi, si) /= log(2);
-            }
-            if (logt){
-                DYDT(bi, si) *= expb_t;
-                if (!logy and use_log2)
-                    DYDT(bi, si) *= log(2);
+                out[bi - b0] = ((D[bi*n + si] == 0.0) && (mob == 0.0)) ? 0 :
+                    diffusion_unscaled*D[bi*n + si] + diffusion_correction*gradD[bi*n + si] -
+                    advection_unscaled*mob;
             }
         }
+        if (lo == hi)
+            continue;
+        Real_t * const ANYODE_RESTRICT c = linC_T + si*(transport_tile + nstencil);
+        for (int bi=lo-nsidep; bi<hi+nsidep; ++bi)
+            c[bi - lo + nsidep] = LINC(bi, si);
+        const Real_t * const lapw = &lap_weight_T[lo], * const gradw = &grad_weight_T[lo],
+            * const divw = &div_weight_T[lo], * const Dsi = &D_T[si*N + lo], * const gradDsi = &gradD_T[si*N + lo];
+%for ns in [3, 5, 7, 0]:
+        ${"if (nstencil == %d){" % ns if ns else "{"}
+            if (mob == 0.0)
+                transport_interior_<${ns}, false>(hi - lo, nstencil, N, c, efield + lo - nsidep, lapw, gradw,
+                                                  divw, Dsi, gradDsi, mob, out + lo - b0);
+            else
+                transport_interior_<${ns}, true>(hi - lo, nstencil, N, c, efield + lo - nsidep, lapw, gradw,
+                                                 divw, Dsi, gradDsi, mob, out + lo - b0);
+        } ${"else" if ns else ""}
+%endfor
     }
-    nfev++;
-    return AnyODE::Status::success;
 }
-#undef DYDT
 
 #define FOUT(bi, si) fout[(bi)*n+si]
 #define SUP(di, bi, li) jac.sup(di, bi, li)
-%for token in ["dense_jac_rmaj", "dense_jac_cmaj", "banded_jac_cmaj", "compressed_jac_cmaj"]:
+%for token in ["dense_jac_rmaj", "dense_jac_cmaj", "banded_jac_cmaj", "compressed_jac_cmaj", "sparse_jac_csc", "compressed_jac_part"]:
+ %if token != "compressed_jac_part":
 template<typename Real_t>
 AnyODE::Status
 ReactionDiffusion<Real_t>::${token}(Real_t t,
                                     const Real_t * const ANYODE_RESTRICT y,
                                     const Real_t * const ANYODE_RESTRICT fy,
+  %if token.startswith("sparse"):
+                                    Real_t * const ANYODE_RESTRICT ja,
+                                    int * const colptrs, int * const rowvals)
+  %else:
                                     Real_t * const ANYODE_RESTRICT ja, long int ldj
                                     ${', double * const ANYODE_RESTRICT /* dfdt */' if token.startswith('dense') else ''})
+  %endif
+{
+    const auto status = ${token}(t, y, fy, ja, ${"colptrs, rowvals" if token.startswith("sparse") else "ldj"}, *work);
+    if (auto_efield)
+        std::copy(&work->efield[0], &work->efield[0] + N, &efield[0]);
+    return status;
+}
+ %endif
+
+template<typename Real_t>
+AnyODE::Status
+ReactionDiffusion<Real_t>::${token}(Real_t t,
+                                    const Real_t * const ANYODE_RESTRICT y,
+                                    const Real_t * const ANYODE_RESTRICT fy,
+ %if token.startswith("sparse"):
+                                    Real_t * const ANYODE_RESTRICT ja,
+                                    int * const colptrs, int * const rowvals,
+ %else:
+                                    Real_t * const ANYODE_RESTRICT ja, long int ldj,
+ %endif
+ %if token == "compressed_jac_part":
+                                    RhsPart part,
+ %endif
+                                    Workspace<Real_t>& ws) const
 {
     // Note: blocks are zeroed out, diagonals only incremented
     // `t`: time (log(t) if logt=1)
     // `y`: concentrations (log(conc) if logy=True)
+    // `fy`: f(t, y) (optional, only its `part` for compressed_jac_part)
     // `ja`: jacobian (allocated 1D array to hold dense or banded)
     // `ldj`: leading dimension of ja (useful for padding, ignored by compressed_*)
+    // `colptrs`, `rowvals`: CSC structure (output, sparse_* only)
+ %if token != "compressed_jac_part":
+    const RhsPart part = RhsPart::ALL;
+ %endif
+    const bool with_reaction = part != RhsPart::TRANSPORT, with_transport = part != RhsPart::REACTION;
  %if token.startswith("compressed"):
     ignore(ldj);
     const int nsat = (geom == Geom::PERIODIC) ? nsidep : 0 ;
@@ -570,49 +1122,70 @@ ReactionDiffusion<Real_t>::${token}(Real_t t,
     block_diag_ilu::BlockDenseMatrix<Real_t> jac {ja, N, n, n_jac_diags, static_cast<int>(ldj), true};
  %elif token.startswith("dense_jac_rmaj"):
     block_diag_ilu::BlockDenseMatrix<Real_t> jac {ja, N, n, n_jac_diags, static_cast<int>(ldj), false};
+ %elif token.startswith("sparse_jac_csc"):
+    if (N != 1)
+        throw std::logic_error("sparse_jac_csc requires N == 1.");
+    std::copy(sparse_colptrs.begin(), sparse_colptrs.end(), colptrs);
+    std::copy(sparse_rowvals.begin(), sparse_rowvals.end(), rowvals);
+    CSCBlockView<Real_t> jac {ja, sparse_idx.data(), n};
  %else:
     #error "Unhandled token."
  %endif
     const Real_t exp_t = (logt) ? expb(t) : 0.0;
     const Real_t logbfactor = use_log2 ? log(2) : 1;
 
-    Real_t * fout = nullptr;
+    // linC, rlinC, efield (and f(t, y) when logy) are taken from the state
+    // cached by rhs in ws when (t, y) matches (CVODE evaluates rhs first).
+    bool cached = state_cached_(t, y, ws);
+    if (cached)
+        nstate_reuse++;
+    const Real_t * fout = nullptr;
     if (logy){ // fy useful..
         if (fy){
-            fout = const_cast<Real_t *>(fy);
+            fout = fy;
         } else {
-            fout = new Real_t[n*N];
-            rhs(t, y, fout);
+            if (part != RhsPart::ALL){
+                rhs_part(t, y, AnyODE::buffer_get_raw_ptr(ws.dydt), part, ws);
+                ws.state_epoch = -1; // ws.dydt holds only a part of f
+                cached = true;
+            } else if (!cached){
+                rhs(t, y, AnyODE::buffer_get_raw_ptr(ws.dydt), ws);
+                cached = true;
+            }
+            fout = AnyODE::buffer_get_raw_ptr(ws.dydt);
         }
     }
 
-    // note conditional call to free at end of this function
-    if (logy) {
-        populate_linC(AnyODE::buffer_get_raw_ptr(work1), y, true, false);
-        populate_linC(AnyODE::buffer_get_raw_ptr(work2), y, true, true);
-    }
-    const Real_t * const linC = (logy) ? AnyODE::buffer_get_raw_ptr(work1) : y;
-    const Real_t * const rlinC = (logy) ? AnyODE::buffer_get_raw_ptr(work2) : nullptr;
-    if (auto_efield) {
-        calc_efield(linC);
+    if (logy && !cached) {
+        populate_linC(AnyODE::buffer_get_raw_ptr(ws.linC), y, true, false);
+        populate_rlinC_(AnyODE::buffer_get_raw_ptr(ws.linC), AnyODE::buffer_get_raw_ptr(ws.rlinC));
     }
+    const Real_t * const linC = (logy) ? AnyODE::buffer_get_raw_ptr(ws.linC) : y;
+    const Real_t * const rlinC = (logy) ? AnyODE::buffer_get_raw_ptr(ws.rlinC) : nullptr;
+    const Real_t * const efield = (cached && auto_efield) ? AnyODE::buffer_get_raw_ptr(ws.efield) : efield_for_(linC, ws);
 
-    ${"#pragma omp parallel for schedule(static) if (N*n*n > 65536)" if WITH_OPENMP else ""}
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(static) num_threads(get_nthreads()) if (N*n*n > par_threshold_jac)
+#endif
     for (int bi=0; bi<N; ++bi){
         // Conc. in `bi:th` compartment
         // Contributions from reactions and fields
         // ---------------------------------------
-        for (int si=0; si<n; ++si){
-            // species si
-            for (int dsi=0; dsi<n; ++dsi){
-                // derivative wrt species dsi
+        for (int si=0; si<n; ++si)
+            for (int dsi=0; dsi<n; ++dsi)
                 jac.block(bi, si, dsi) = 0.0;
-                for (int rxni=0; rxni<nr; ++rxni){
-                    // reaction rxni
-                    const int Akj = coeff_active[rxni*n + dsi];
-                    const int Ski = coeff_total[rxni*n + si];
-                    if (Akj == 0 || Ski == 0)
-                        continue;
+        if (with_reaction){
+  %if MECHANISM:
+    %for si, dsi, expr in mech_jac:
+            jac.block(bi, ${si}, ${dsi}) += ${expr};
+    %endfor
+  %else:
+            for (unsigned nzi=0; nzi<jac_nz_si.size(); ++nzi){
+                // structurally non-zero (species si, derivative wrt species dsi)
+                const int si = jac_nz_si[nzi], dsi = jac_nz_dsi[nzi];
+                for (int ei=jac_ptr[nzi]; ei<jac_ptr[nzi+1]; ++ei){
+                    const int rxni = jac_rxn[ei];
+                    const int Akj = jac_order[ei];
                     Real_t qkj = get_mod_k(bi, rxni)*Akj*pow(LINC(bi, dsi), Akj-1);
                     for (unsigned rnti=0; rnti < stoich_active[rxni].size(); ++rnti){
                         const int rnti_si = stoich_active[rxni][rnti];
@@ -620,17 +1193,19 @@ ReactionDiffusion<Real_t>::${token}(Real_t t,
                             continue;
                         qkj *= LINC(bi, rnti_si);
                     }
-                    jac.block(bi, si, dsi) += Ski*qkj;
-                    //std::cout << "jac.block(" << bi << ", " << si << ", " << dsi <<") = " << jac.block(bi, si, dsi) << "\n";
+                    jac.block(bi, si, dsi) += jac_net[ei]*qkj;
                 }
-                // Contribution from particle/electric fields
-                for (unsigned fi=0; fi<(this->fields.size()); ++fi){
-                    const int Ski = (g_values[fi][si] != 0.0) ? 1 : 0;
-                    const int Akj = ((int)dsi == g_value_parents[fi]) ? 1 : 0;
+            }
+  %endif
+            // Contribution from particle/electric fields
+            for (unsigned fi=0; fi<(this->fields.size()); ++fi){
+                const int dsi = g_value_parents[fi];
+                if (dsi == -1)
+                    continue;
+                for (int si=0; si<n; ++si){
                     const Real_t rk = fields[fi][bi]*g_values[fi][si];
-                    if (Ski == 0 || Akj == 0 || rk == 0)
-                        continue;
-                    jac.block(bi, si, dsi) += Akj*Ski*rk;
+                    if (rk != 0)
+                        jac.block(bi, si, dsi) += rk;
                 }
             }
         }
@@ -638,29 +1213,39 @@ ReactionDiffusion<Real_t>::${token}(Real_t t,
 
         // Contributions from diffusion
         // ----------------------------
-        if (N > 1) {
-            int lbound = stencil_bi_lbound_(bi);
+        if (N > 1 && with_transport) {
+            // constant part tabulated by update_transport_jac()
+            const Real_t * const ANYODE_RESTRICT tdiag = &transport_diag[bi*n];
+            for (int si=0; si<n; ++si)
+                jac.block(bi, si, si) += tdiag[si];
+            for (int di=0; di<n_jac_diags; ++di){
+                if (bi >= di+1){
+                    const Real_t * const ANYODE_RESTRICT tsub = &transport_sub[(di*N + bi)*n];
+                    for (int si=0; si<n; ++si)
+                        jac.sub(di, bi-di-1, si) += tsub[si];
+                }
+                if (bi < N-di-1){
+                    const Real_t * const ANYODE_RESTRICT tsup = &transport_sup[(di*N + bi)*n];
+                    for (int si=0; si<n; ++si)
+                        jac.sup(di, bi, si) += tsup[si];
+                }
+            }
+        }
+        if (N > 1 && with_transport && auto_efield) {
+            // drift in the self-consistent field
             for (int si=0; si<n; ++si){ // species index si
-                if ((D[bi*n + si] == 0.0) && (mobility[si] == 0.0)) continue; // exit early if possible
+                if (mobility[si] == 0.0) continue; // exit early if possible
                 for (int k=0; k<nstencil; ++k){
-                    const int sbi = xc_bi_map_(lbound+k);
+                    const int sbi = stencil_idx[bi*nstencil + k];
                     jac.block(bi, si, si) += -mobility[si]*efield[sbi]*DIV_WEIGHT(bi, k);
                     if (sbi == bi) {
-                        jac.block(bi, si, si) += D[bi*n + si]*LAP_WEIGHT(bi, k);
-                        jac.block(bi, si, si) += gradD[bi*n + si]*GRAD_WEIGHT(bi, k);
                         jac.block(bi, si, si) += efield[bi]*-mobility[si]*DIV_WEIGHT(bi, k);
                     } else {
                         for (int di=0; di<n_jac_diags; ++di){
-                            if ((bi >= di+1) and (sbi == bi-di-1)){
-                                jac.sub(di, bi-di-1, si) += D[bi*n + si]*LAP_WEIGHT(bi, k);
-                                jac.sub(di, bi-di-1, si) += gradD[bi*n+si]*GRAD_WEIGHT(bi, k);
+                            if ((bi >= di+1) and (sbi == bi-di-1))
                                 jac.sub(di, bi-di-1, si) += efield[bi]*-mobility[si]*DIV_WEIGHT(bi, k);
-                            }
-                            if ((bi < N-di-1) and (sbi == bi+di+1)){
-                                jac.sup(di, bi, si) += D[bi*n + si]*LAP_WEIGHT(bi, k);
-                                jac.sup(di, bi, si) += gradD[bi*n + si]*GRAD_WEIGHT(bi, k);
+                            if ((bi < N-di-1) and (sbi == bi+di+1))
                                 jac.sup(di, bi, si) += efield[bi]*-mobility[si]*DIV_WEIGHT(bi, k);
-                            }
                         }
                     }
                 }
@@ -697,14 +1282,14 @@ ReactionDiffusion<Real_t>::${token}(Real_t t,
             }
         }
     }
-    if (logy && !fy)
-        delete []fout;
     njev++;
 #if defined(CHEMREAC_WITH_DATA_DUMPING)
     std::ostringstream fname;
     fname << "jac_" << std::setfill('0') << std::setw(5) << njev << ".dat";
   %if token.startswith("banded_jac_cmaj"):
     save_array(jac.m_data, ldj*n*N, fname.str());
+  %elif token.startswith("sparse_jac_csc"):
+    save_array(ja, sparse_rowvals.size(), fname.str());
   %else:
     save_array(ja, ldj*n*N, fname.str());
   %endif
@@ -715,6 +1300,9 @@ ReactionDiffusion<Real_t>::${token}(Real_t t,
 #undef FOUT
 
 
+#define FOUT(bi, si) fout[(bi)*n+si]
+#define OUT(bi, si) out[(bi)*n+si]
+#define W(bi, si) w[(bi)*n+si]
 template<typename Real_t>
 AnyODE::Status
 ReactionDiffusion<Real_t>::jtimes(const Real_t * const ANYODE_RESTRICT vec,
@@ -725,64 +1313,286 @@ ReactionDiffusion<Real_t>::jtimes(const Real_t * const ANYODE_RESTRICT vec,
     )
 {
     // See 4.6.7 on page 67 (77) in cvs_guide.pdf (Sundials 2.5)
-    ignore(t);
-    if (!jac_times_cache){
-        const int nsat = (geom == Geom::PERIODIC) ? nsidep : 0;
-        const int ld = n;
-        jac_times_cache = AnyODE::make_unique<block_diag_ilu::BlockDiagMatrix<Real_t>>(nullptr, N, n, nsidep, nsat, ld);
-        jac_times_cache->set_to(0.0); // compressed_jac_cmaj only increments diagonals
-        const int ld_dummy = 0;
-        compressed_jac_cmaj(t, y, fy, jac_times_cache->m_data, ld_dummy);
+    const auto status = jtimes(vec, out, t, y, fy, *work);
+    if (auto_efield)
+        std::copy(&work->efield[0], &work->efield[0] + N, &efield[0]);
+    return status;
+}
+
+template<typename Real_t>
+AnyODE::Status
+ReactionDiffusion<Real_t>::jtimes(const Real_t * const ANYODE_RESTRICT vec,
+                                  Real_t * const ANYODE_RESTRICT out,
+                                  Real_t t,
+                                  const Real_t * const ANYODE_RESTRICT y,
+                                  const Real_t * const ANYODE_RESTRICT fy,
+                                  Workspace<Real_t>& ws) const
+{
+    // out = J(t, y)*vec without assembling J (same terms as the *_jac_* methods,
+    // the transport part is the full stencil of rhs applied to vec).
+    const int ny = n*N;
+    if (jtimes_mode == JtimesMode::FINITE_DIFFERENCE){
+        // (f(t, y + sigma*vec) - f(t, y))/sigma, see Knoll & Keyes, J. Comput. Phys. 193 (2004)
+        Real_t ynrm = 0, vnrm = 0;
+        for (int i=0; i<ny; ++i){
+            ynrm += y[i]*y[i];
+            vnrm += vec[i]*vec[i];
+        }
+        if (vnrm == 0){
+            std::fill(out, out + ny, 0);
+            return AnyODE::Status::success;
+        }
+        const Real_t sigma = std::sqrt(std::numeric_limits<Real_t>::epsilon()*(1 + std::sqrt(ynrm)))/std::sqrt(vnrm);
+        Real_t * const yp = AnyODE::buffer_get_raw_ptr(ws.jtimes_y);
+        Real_t * const fp = AnyODE::buffer_get_raw_ptr(ws.jtimes_f);
+        for (int i=0; i<ny; ++i)
+            yp[i] = y[i] + sigma*vec[i];
+        auto status = rhs(t, yp, fp, ws);
+        const Real_t * f0 = fy;
+        if (!f0){
+            if (!state_cached_(t, y, ws))
+                status = rhs(t, y, AnyODE::buffer_get_raw_ptr(ws.dydt), ws);
+            f0 = AnyODE::buffer_get_raw_ptr(ws.dydt);
+        }
+        for (int i=0; i<ny; ++i)
+            out[i] = (fp[i] - f0[i])/sigma;
+        return status;
+    }
+
+    const Real_t exp_t = (logt) ? expb(t) : 0.0;
+    const Real_t logbfactor = use_log2 ? log(2) : 1;
+    bool cached = state_cached_(t, y, ws);
+    if (cached)
+        nstate_reuse++;
+    const Real_t * fout = nullptr;
+    if (logy){
+        if (fy){
+            fout = fy;
+        } else {
+            if (!cached){
+                rhs(t, y, AnyODE::buffer_get_raw_ptr(ws.dydt), ws);
+                cached = true;
+            }
+            fout = AnyODE::buffer_get_raw_ptr(ws.dydt);
+        }
+    }
+    if (logy && !cached) {
+        populate_linC(AnyODE::buffer_get_raw_ptr(ws.linC), y, true, false);
+        populate_rlinC_(AnyODE::buffer_get_raw_ptr(ws.linC), AnyODE::buffer_get_raw_ptr(ws.rlinC));
+    }
+    const Real_t * const linC = (logy) ? AnyODE::buffer_get_raw_ptr(ws.linC) : y;
+    const Real_t * const rlinC = (logy) ? AnyODE::buffer_get_raw_ptr(ws.rlinC) : nullptr;
+    const Real_t * const efield = (cached && auto_efield) ? AnyODE::buffer_get_raw_ptr(ws.efield) : efield_for_(linC, ws);
+    // direction in linear concentrations (dC/dy*vec up to the logb factor)
+    const Real_t * w = vec;
+    if (logy){
+        Real_t * const wlin = AnyODE::buffer_get_raw_ptr(ws.jtimes_y);
+        for (int i=0; i<ny; ++i)
+            wlin[i] = linC[i]*vec[i];
+        w = wlin;
+    }
+    const int ntiles = (N + transport_tile - 1)/transport_tile;
+#if defined(_OPENMP)
+#pragma omp parallel for schedule(static) num_threads(min(ws.nslots, get_nthreads())) if (N*n > par_threshold_rhs)
+#endif
+    for (int ti=0; ti<ntiles; ++ti){
+        const int b0 = ti*transport_tile, b1 = min(N, b0 + transport_tile);
+        Real_t * const transport_T = AnyODE::buffer_get_raw_ptr(ws.transport_T) + n*(transport_tile + nstencil)*omp_get_thread_num();
+        if (N > 1) // linear in the concentrations (efield held fixed, as in the *_jac_* methods)
+            transport_rhs_(b0, b1, w, efield,
+                           AnyODE::buffer_get_raw_ptr(ws.linC_T) + n*(transport_tile + nstencil)*omp_get_thread_num(),
+                           transport_T);
+        for (int bi=b0; bi<b1; ++bi){
+            for (int si=0; si<n; ++si)
+                OUT(bi, si) = 0.0;
+            // Reactions
+%if MECHANISM:
+  %for si, dsi, expr in mech_jac:
+            OUT(bi, ${si}) += (${expr})*W(bi, ${dsi});
+  %endfor
+%else:
+            for (unsigned nzi=0; nzi<jac_nz_si.size(); ++nzi){
+                const int si = jac_nz_si[nzi], dsi = jac_nz_dsi[nzi];
+                Real_t jblock = 0;
+                for (int ei=jac_ptr[nzi]; ei<jac_ptr[nzi+1]; ++ei){
+                    const int rxni = jac_rxn[ei];
+                    const int Akj = jac_order[ei];
+                    Real_t qkj = get_mod_k(bi, rxni)*Akj*pow(LINC(bi, dsi), Akj-1);
+                    for (unsigned rnti=0; rnti < stoich_active[rxni].size(); ++rnti){
+                        const int rnti_si = stoich_active[rxni][rnti];
+                        if (rnti_si == dsi)
+                            continue;
+                        qkj *= LINC(bi, rnti_si);
+                    }
+                    jblock += jac_net[ei]*qkj;
+                }
+                OUT(bi, si) += jblock*W(bi, dsi);
+            }
+%endif
+            // Particle/electric fields
+            for (unsigned fi=0; fi<(this->fields.size()); ++fi){
+                const int dsi = g_value_parents[fi];
+                if (dsi == -1)
+                    continue;
+                for (int si=0; si<n; ++si){
+                    const Real_t rk = fields[fi][bi]*g_values[fi][si];
+                    if (rk != 0)
+                        OUT(bi, si) += rk*W(bi, dsi);
+                }
+            }
+            // Diffusion & drift
+            if (N > 1)
+                for (const int si : transport_species)
+                    OUT(bi, si) += transport_T[si*transport_tile + bi - b0];
+            // Logarithmic transformations (cf. the *_jac_* methods)
+            if (logy || logt){
+                for (int si=0; si<n; ++si){
+                    if (logy)
+                        OUT(bi, si) *= RLINC(bi, si);
+                    if (logt)
+                        OUT(bi, si) *= exp_t*logbfactor;
+                    if (logy)
+                        OUT(bi, si) -= FOUT(bi, si)*logbfactor*vec[bi*n + si];
+                }
+            }
+        }
     }
-    std::memset(out, 0, sizeof(Real_t)*get_ny());
-    jac_times_cache->dot_vec(vec, out);
-    njacvec_dot++;
     return AnyODE::Status::success;
 }
+#undef W
+#undef OUT
+#undef FOUT
+
+#undef LINC
+#undef Y
+#undef LAP_WEIGHT
+#undef DIV_WEIGHT
+#undef GRAD_WEIGHT
+
+template<typename Real_t>
+SolverState<Real_t>::SolverState(const ReactionDiffusion<Real_t> &rd, int prec_factorization) :
+    rd(rd), prec_factorization(rd.prec_factorization_from_int(
+        (prec_factorization == -1) ? rd.get_prec_factorization_as_int() : prec_factorization)),
+    work(rd.make_workspace())
+{}
+
+template<typename Real_t>
+void
+SolverState<Real_t>::zero_counters(){
+    this->nfev = 0;
+    this->njev = 0;
+    nprec_setup = 0;
+    nprec_solve = 0;
+    njacvec_dot = 0;
+    nprec_solve_ilu = 0;
+    nprec_solve_lu = 0;
+    nprec_factor_ilu = 0;
+    nprec_factor_lu = 0;
+    nprec_reuse_lu = 0;
+}
+
+template<typename Real_t>
+AnyODE::Status
+SolverState<Real_t>::rhs(Real_t t, const Real_t * const y, Real_t * const ANYODE_RESTRICT dydt)
+{
+    this->nfev++;
+    return rd.rhs(t, y, dydt, *work);
+}
+
+%for token in ["dense_jac_rmaj", "dense_jac_cmaj", "banded_jac_cmaj", "sparse_jac_csc"]:
+template<typename Real_t>
+AnyODE::Status
+SolverState<Real_t>::${token}(Real_t t,
+                              const Real_t * const ANYODE_RESTRICT y,
+                              const Real_t * const ANYODE_RESTRICT fy,
+ %if token.startswith("sparse"):
+                              Real_t * const ANYODE_RESTRICT ja,
+                              int * const colptrs, int * const rowvals)
+ %else:
+                              Real_t * const ANYODE_RESTRICT ja, long int ldj
+                              ${', double * const ANYODE_RESTRICT /* dfdt */' if token.startswith('dense') else ''})
+ %endif
+{
+    this->njev++;
+    return rd.${token}(t, y, fy, ja, ${"colptrs, rowvals" if token.startswith("sparse") else "ldj"}, *work);
+}
+
+%endfor
+template<typename Real_t>
+AnyODE::Status
+SolverState<Real_t>::jtimes(const Real_t * const ANYODE_RESTRICT vec,
+                            Real_t * const ANYODE_RESTRICT out,
+                            Real_t t,
+                            const Real_t * const ANYODE_RESTRICT y,
+                            const Real_t * const ANYODE_RESTRICT fy
+    )
+{
+    // See 4.6.7 on page 67 (77) in cvs_guide.pdf (Sundials 2.5)
+    njacvec_dot++;
+    return rd.jtimes(vec, out, t, y, fy, *work);
+}
 
 template<typename Real_t>
 AnyODE::Status
-ReactionDiffusion<Real_t>::prec_setup(Real_t t,
-                                      const Real_t * const ANYODE_RESTRICT y,
-                                      const Real_t * const ANYODE_RESTRICT fy,
-                                      bool jok, bool& jac_recomputed, Real_t gamma
-                                      )
+SolverState<Real_t>::prec_setup(Real_t t,
+                                const Real_t * const ANYODE_RESTRICT y,
+                                const Real_t * const ANYODE_RESTRICT fy,
+                                bool jok, bool& jac_recomputed, Real_t gamma
+                                )
 {
     auto status = AnyODE::Status::success;
     ignore(gamma);
+    const int n = rd.n, N = rd.N;
     // See 4.6.9 on page 68 (78) in cvs_guide.pdf (Sundials 2.5)
     if (!jac_cache){
-        const int nsat = (geom == Geom::PERIODIC) ? nsidep : 0;
+        const int nsat = (rd.geom == Geom::PERIODIC) ? rd.nsidep : 0;
         const int ld = n;
-        jac_cache = AnyODE::make_unique<block_diag_ilu::BlockDiagMatrix<Real_t>>(nullptr, N, n, nsidep, nsat, ld);
+        jac_cache = AnyODE::make_unique<block_diag_ilu::BlockDiagMatrix<Real_t>>(nullptr, N, n, rd.n_jac_diags, nsat, ld);
     }
     if (!jok){
         const int dummy = 0;
         jac_cache->set_to(0);
-        status = compressed_jac_cmaj(t, y, fy, jac_cache->m_data, dummy);
+        this->njev++;
+        status = rd.compressed_jac_cmaj(t, y, fy, jac_cache->m_data, dummy, *work);
+        if (prec_factorization == PrecFactorization::OPERATOR_SPLIT){
+            // Transport part of the diagonal of jac_cache (the logy scaling of
+            // the diagonal is unity, the -f(y) term belongs to the reactions).
+            jac_cache_tdiag.assign(N*n, 0);
+            const Real_t tfactor = (rd.logt) ? (rd.use_log2 ? std::exp2(t)*log(2) : std::exp(t)) : 1;
+            const Real_t * const ef = (rd.auto_efield) ? AnyODE::buffer_get_raw_ptr(work->efield) : &rd.efield[0];
+            for (int bi=0; bi<N && N>1; ++bi){
+                for (int si=0; si<n; ++si){
+                    Real_t d = rd.transport_diag[bi*n + si];
+                    if (rd.auto_efield && rd.mobility[si] != 0.0)
+                        for (int k=0; k<rd.nstencil; ++k){
+                            const int sbi = rd.stencil_idx[bi*rd.nstencil + k];
+                            const Real_t divw = rd.div_weight[rd.nstencil*bi + k];
+                            d += -rd.mobility[si]*ef[sbi]*divw;
+                            if (sbi == bi)
+                                d += ef[bi]*-rd.mobility[si]*divw;
+                        }
+                    jac_cache_tdiag[bi*n + si] = d*tfactor;
+                }
+            }
+        }
         update_prec_cache = true;
         jac_recomputed = true;
     } else jac_recomputed = false;
     nprec_setup++;
     return status;
 }
-#undef LINC
-#undef Y
-#undef LAP_WEIGHT
-#undef DIV_WEIGHT
-#undef GRAD_WEIGHT
 
 template<typename Real_t>
 AnyODE::Status
-ReactionDiffusion<Real_t>::prec_solve_left(const Real_t t,
-                                           const Real_t * const ANYODE_RESTRICT y,
-                                           const Real_t * const ANYODE_RESTRICT fy,
-                                           const Real_t * const ANYODE_RESTRICT r,
-                                           Real_t * const ANYODE_RESTRICT z,
-                                           Real_t gamma,
-                                           Real_t delta,
-                                           const Real_t * const ANYODE_RESTRICT ewt
-                                           )
+SolverState<Real_t>::prec_solve_left(const Real_t t,
+                                     const Real_t * const ANYODE_RESTRICT y,
+                                     const Real_t * const ANYODE_RESTRICT fy,
+                                     const Real_t * const ANYODE_RESTRICT r,
+                                     Real_t * const ANYODE_RESTRICT z,
+                                     Real_t gamma,
+                                     Real_t delta,
+                                     const Real_t * const ANYODE_RESTRICT ewt
+                                     )
 {
     // See 4.6.9 on page 75 in cvs_guide.pdf (Sundials 2.6.2)
     // Solves P*z = r, where P ~= I - gamma*J
@@ -790,13 +1600,14 @@ ReactionDiffusion<Real_t>::prec_solve_left(const Real_t t,
     if (ewt)
         throw std::runtime_error("Not implemented.");
     nprec_solve++;
+    const int n = rd.n, N = rd.N;
 
     ignore(t); ignore(fy); ignore(y);
     bool recompute = false;
     if (!prec_cache){
-        const int nsat = (geom == Geom::PERIODIC) ? nsidep : 0;
+        const int nsat = (rd.geom == Geom::PERIODIC) ? rd.nsidep : 0;
         const int ld = n;
-        prec_cache = AnyODE::make_unique<block_diag_ilu::BlockDiagMatrix<Real_t>>(nullptr, N, n, nsidep, nsat, ld);
+        prec_cache = AnyODE::make_unique<block_diag_ilu::BlockDiagMatrix<Real_t>>(nullptr, N, n, rd.n_jac_diags, nsat, ld);
         recompute = true;
     } else {
         if (update_prec_cache or (old_gamma != gamma))
@@ -804,7 +1615,10 @@ ReactionDiffusion<Real_t>::prec_solve_left(const Real_t t,
     }
     if (recompute){
         old_gamma = gamma;
+        update_prec_cache = false;
         prec_cache->set_to_eye_plus_scaled_mtx(-gamma, *jac_cache);
+        prec_ilu.reset(); // factorizations of previous prec_cache are stale
+        prec_lu.reset();
 #if defined(CHEMREAC_WITH_DATA_DUMPING)
         {
             std::ostringstream fname;
@@ -829,16 +1643,67 @@ ReactionDiffusion<Real_t>::prec_solve_left(const Real_t t,
 #endif
 
     int info;
-    if (prec_cache->average_diag_weight(0) > ilu_limit) {
-        block_diag_ilu::ILU<Real_t> ilu {*prec_cache};
+    if (prec_factorization == PrecFactorization::AUTO &&
+        prec_cache->average_diag_weight(0) > rd.ilu_limit) {
+        if (!prec_ilu) {
+            nprec_factor_ilu++;
+            try {
+                prec_ilu = AnyODE::make_unique<block_diag_ilu::ILU<Real_t>>(*prec_cache);
+            } catch (const std::runtime_error&) { // singular diagonal block
+                return AnyODE::Status::recoverable_error;
+            }
+        }
         nprec_solve_ilu++;
-        info = ilu.solve(r, z);
+        info = prec_ilu->solve(r, z);
     } else {
-        AnyODE::BandedMatrix<Real_t> bm {*prec_cache, get_mlower(), get_mupper()};
-        AnyODE::BandedLU<Real_t> lu {&bm};
-        lu.factorize();
+        if (prec_lu) {
+            nprec_reuse_lu++;
+        } else {
+            switch(prec_factorization) {
+            case PrecFactorization::BLOCK_TRIDIAG:
+                prec_lu = AnyODE::make_unique<BlockTridiagLU<Real_t>>(*prec_cache);
+                break;
+            case PrecFactorization::BLOCK_CYCLIC_REDUCTION:
+                prec_lu = AnyODE::make_unique<BlockCyclicReductionLU<Real_t>>(
+                    *prec_cache, rd.par_threshold_jac, rd.get_nthreads());
+                break;
+            case PrecFactorization::OPERATOR_SPLIT:
+                {
+                    if (jac_cache_tdiag.size() != static_cast<std::size_t>(N*n))
+                        return AnyODE::Status::recoverable_error; // jac_cache assembled before switching
+                    vector<Real_t> tdiag(jac_cache_tdiag.size());
+                    for (unsigned i=0; i<tdiag.size(); ++i)
+                        tdiag[i] = -gamma*jac_cache_tdiag[i];
+                    prec_lu = AnyODE::make_unique<OperatorSplitLU<Real_t>>(
+                        *prec_cache, tdiag.data(), rd.par_threshold_jac, rd.get_nthreads());
+                }
+                break;
+            case PrecFactorization::MULTIGRID:
+                prec_lu = AnyODE::make_unique<BlockMultigrid<Real_t>>(
+                    *prec_cache, &rd.xc[0] + rd.nsidep, 8, 2, 2.0/3, rd.par_threshold_jac, rd.get_nthreads());
+                break;
+            case PrecFactorization::SPARSE_LU:
+                {
+                    vector<Real_t> csc_data(rd.sparse_rowvals.size());
+                    for (int ci=0; ci<n; ++ci)
+                        for (int idx=rd.sparse_colptrs[ci]; idx<rd.sparse_colptrs[ci+1]; ++idx)
+                            csc_data[idx] = prec_cache->block(0, rd.sparse_rowvals[idx], ci);
+                    // the symbolic factorization is computed once per network
+                    prec_lu = AnyODE::make_unique<SparseLU<Real_t>>(rd.get_sparse_symbolic(), csc_data.data());
+                }
+                break;
+            default:
+                prec_banded = AnyODE::make_unique<AnyODE::BandedMatrix<Real_t>>(*prec_cache, rd.get_mlower(), rd.get_mupper());
+                prec_lu = AnyODE::make_unique<AnyODE::BandedLU<Real_t>>(prec_banded.get());
+            }
+            nprec_factor_lu++;
+            if (prec_lu->factorize() != 0) {
+                prec_lu.reset();
+                return AnyODE::Status::recoverable_error;
+            }
+        }
         nprec_solve_lu++;
-        info = lu.solve(r, z);
+        info = prec_lu->solve(r, z);
     }
     if (info == 0)
         return AnyODE::Status::success;
@@ -871,9 +1736,89 @@ ReactionDiffusion<Real_t>::get_geom_as_int() const
     }
 }
 
+template<typename Real_t>
+int
+ReactionDiffusion<Real_t>::get_prec_factorization_as_int() const
+{
+    switch(prec_factorization){
+    case PrecFactorization::AUTO :                   return 0;
+    case PrecFactorization::BLOCK_TRIDIAG :          return 1;
+    case PrecFactorization::BLOCK_CYCLIC_REDUCTION : return 2;
+    case PrecFactorization::SPARSE_LU :              return 3;
+    case PrecFactorization::OPERATOR_SPLIT :         return 4;
+    case PrecFactorization::MULTIGRID :              return 5;
+    default:                                         return -1;
+    }
+}
+
+template<typename Real_t>
+void
+ReactionDiffusion<Real_t>::set_prec_factorization_from_int(int kind)
+{
+    prec_factorization = prec_factorization_from_int(kind);
+}
+
+template<typename Real_t>
+PrecFactorization
+ReactionDiffusion<Real_t>::prec_factorization_from_int(int kind) const
+{
+    if (kind == 1 || kind == 2 || kind == 5){
+        if (geom == Geom::PERIODIC)
+            throw std::logic_error("Block-tridiagonal factorization does not support periodic geometry.");
+        if (N > 1 && n_jac_diags != 1)
+            throw std::logic_error("Block-tridiagonal factorization requires n_jac_diags == 1.");
+    }
+    if (kind == 3 && N != 1)
+        throw std::logic_error("Sparse LU factorization requires N == 1.");
+    switch(kind) {
+    case 0:  return PrecFactorization::AUTO;
+    case 1:  return PrecFactorization::BLOCK_TRIDIAG;
+    case 2:  return PrecFactorization::BLOCK_CYCLIC_REDUCTION;
+    case 3:  return PrecFactorization::SPARSE_LU;
+    case 4:  return PrecFactorization::OPERATOR_SPLIT;
+    case 5:  return PrecFactorization::MULTIGRID;
+    default: throw std::logic_error("Unknown preconditioner factorization.");
+    }
+}
+
+template<typename Real_t>
+int
+ReactionDiffusion<Real_t>::get_jtimes_mode_as_int() const
+{
+    switch(jtimes_mode){
+    case JtimesMode::ANALYTIC :          return 0;
+    case JtimesMode::FINITE_DIFFERENCE : return 1;
+    default:                             return -1;
+    }
+}
+
+template<typename Real_t>
+void
+ReactionDiffusion<Real_t>::set_jtimes_mode_from_int(int kind)
+{
+    switch(kind) {
+    case 0:
+        jtimes_mode = JtimesMode::ANALYTIC;
+        break;
+    case 1:
+        jtimes_mode = JtimesMode::FINITE_DIFFERENCE;
+        break;
+    default:
+        throw std::logic_error("Unknown jtimes mode.");
+    }
+}
+
 template<typename Real_t>
 void
 ReactionDiffusion<Real_t>::calc_efield(const Real_t * const linC)
+{
+    calc_efield_(linC, &efield[0], AnyODE::buffer_get_raw_ptr(work->netchg));
+}
+
+template<typename Real_t>
+void
+ReactionDiffusion<Real_t>::calc_efield_(const Real_t * const linC, Real_t * const ANYODE_RESTRICT efield,
+                                        Real_t * const ANYODE_RESTRICT netchg) const
 {
     // Prototype for self-generated electric field
     const Real_t F = this->faraday_const; // Faraday's constant
@@ -917,6 +1862,28 @@ ReactionDiffusion<Real_t>::calc_efield(const Real_t * const linC)
         }
     }
 }
+
+std::string get_simd_isa(){
+    // Instruction set used by the CHEMREAC_TARGET_CLONES kernels on this host.
+#if defined(__AVX512F__)
+    std::string isa = "avx512f"; // baseline of the build
+#elif defined(__AVX2__)
+    std::string isa = "avx2";
+#elif defined(__SSE2__)
+    std::string isa = "sse2";
+#else
+    std::string isa = "generic";
+#endif
+#if defined(CHEMREAC_MULTIVERSIONING)
+    __builtin_cpu_init();
+    if (__builtin_cpu_supports("avx512f"))
+        isa = "avx512f";
+    else if (__builtin_cpu_supports("avx2"))
+        isa = "avx2";
+#endif
+    return isa;
+}
 } // namespace chemreac
 
 template class chemreac::ReactionDiffusion<double>; // instantiate template
+template class chemreac::SolverState<double>;
@@ -1,7 +1,17 @@
 #define CATCH_CONFIG_MAIN  // This tells Catch to provide a main()
 #include "catch.hpp"
 #include "chemreac.hpp"
+#include "chemreac_batch.hpp"
+#include "chemreac_expm.hpp"
+#include "chemreac_imex.hpp"
+#include "chemreac_rkc.hpp"
+#include "chemreac_rosenbrock.hpp"
+#include "chemreac_split.hpp"
 #include <array>
+#include <limits>
+#include <set>
+#include <string>
+#include <thread>
 
 #include "test_utils.h"
 
@@ -90,6 +100,1035 @@ TEST_CASE( "jtimes", "[ReactionDiffusion]" ) {
     rd.jtimes(&x[0], &b[0], 0.0, &y[0], nullptr);
     for (int i=0; i<3*4; ++i){
         std::cout << "jtimes out[i="<< i<<"]=" << b[i] << std::endl;
-        REQUIRE( std::abs(bref[i] - b[i]) < 1e-14 );
+        REQUIRE( std::abs(bref[i] - b[i]) < 1e-14*(1 + std::abs(bref[i])) );
+    }
+}
+
+TEST_CASE( "prec_solve_left__banded_lu_reuse", "[ReactionDiffusion]" ) {
+    auto rdp = get_four_species_system(3);
+    auto &rd = *rdp;
+
+    std::array<double, 3*4> y;
+    for (int i=0; i<3; ++i){
+        y[4*i + 0] = 1.3;
+        y[4*i + 1] = 1e-4;
+        y[4*i + 2] = 0.7;
+        y[4*i + 3] = 1e5;
+    }
+    std::array<double, 3*4> r {2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13};
+    std::array<double, 3*4> z;
+    const double gamma = 1e-2;
+    bool jac_recomputed;
+    chemreac::SolverState<double> state(rd); // caches & counters of one integration
+    state.prec_setup(0.0, y.data(), nullptr, false, jac_recomputed, gamma);
+    REQUIRE( jac_recomputed );
+    for (int i=0; i<3; ++i){
+        state.prec_solve_left(0.0, y.data(), nullptr, r.data(), z.data(), gamma, 0.0, nullptr);
+    }
+    REQUIRE( state.nprec_solve_lu == 3 );
+    REQUIRE( state.nprec_factor_lu == 1 );
+    REQUIRE( state.nprec_reuse_lu == 2 );
+
+    // (I - gamma*J)*z == r
+    std::array<double, 3*4*3*4> J_data;
+    std::memset(J_data.data(), 0, J_data.size()*sizeof(double));
+    rd.dense_jac_rmaj(0.0, y.data(), nullptr, J_data.data(), 3*4);
+    for (int ri=0; ri<3*4; ++ri){
+        double lhs = z[ri];
+        for (int ci=0; ci<3*4; ++ci)
+            lhs -= gamma*J_data[ri*3*4 + ci]*z[ci];
+        REQUIRE( std::abs(lhs - r[ri]) < 1e-10*std::abs(r[ri]) );
+    }
+
+    state.prec_solve_left(0.0, y.data(), nullptr, r.data(), z.data(), 2*gamma, 0.0, nullptr);
+    REQUIRE( state.nprec_factor_lu == 2 );
+    state.prec_setup(0.0, y.data(), nullptr, false, jac_recomputed, 2*gamma);
+    state.prec_solve_left(0.0, y.data(), nullptr, r.data(), z.data(), 2*gamma, 0.0, nullptr);
+    REQUIRE( state.nprec_factor_lu == 3 );
+    REQUIRE( state.nprec_reuse_lu == 2 );
+}
+
+TEST_CASE( "prec_solve_left__ilu_reuse", "[ReactionDiffusion]" ) {
+    auto rdp = get_four_species_system(3, 0.0); // always use ILU
+    auto &rd = *rdp;
+
+    std::array<double, 3*4> y;
+    for (int i=0; i<3; ++i){
+        y[4*i + 0] = 1.3;
+        y[4*i + 1] = 1e-4;
+        y[4*i + 2] = 0.7;
+        y[4*i + 3] = 1e5;
+    }
+    std::array<double, 3*4> r {2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13};
+    std::array<double, 3*4> z1, z2;
+    const double gamma = 1e-2;
+    bool jac_recomputed;
+    chemreac::SolverState<double> state(rd);
+    state.prec_setup(0.0, y.data(), nullptr, false, jac_recomputed, gamma);
+    state.prec_solve_left(0.0, y.data(), nullptr, r.data(), z1.data(), gamma, 0.0, nullptr);
+    state.prec_solve_left(0.0, y.data(), nullptr, r.data(), z2.data(), gamma, 0.0, nullptr);
+    REQUIRE( state.nprec_solve_ilu == 2 );
+    REQUIRE( state.nprec_factor_ilu == 1 );
+    REQUIRE( state.nprec_solve_lu == 0 );
+    for (int i=0; i<3*4; ++i)
+        REQUIRE( z1[i] == z2[i] );
+
+    state.prec_solve_left(0.0, y.data(), nullptr, r.data(), z2.data(), 2*gamma, 0.0, nullptr);
+    REQUIRE( state.nprec_factor_ilu == 2 );
+    state.prec_setup(0.0, y.data(), nullptr, false, jac_recomputed, 2*gamma);
+    state.prec_solve_left(0.0, y.data(), nullptr, r.data(), z2.data(), 2*gamma, 0.0, nullptr);
+    REQUIRE( state.nprec_factor_ilu == 3 );
+    REQUIRE( state.nprec_solve_ilu == 4 );
+}
+
+TEST_CASE( "prec_solve_left__block_tridiag", "[ReactionDiffusion]" ) {
+    for (int kind=1; kind<=2; ++kind){
+        for (int N : {1, 3, 7, 8}){
+            auto rdp = get_four_species_system(N);
+            auto &rd = *rdp;
+            rd.set_prec_factorization_from_int(kind);
+            REQUIRE( rd.get_prec_factorization_as_int() == kind );
+            const int ny = 4*N;
+            std::vector<double> y(ny), r(ny), z(ny), J_data(ny*ny, 0.0);
+            for (int i=0; i<N; ++i){
+                y[4*i + 0] = 1.3 + 0.1*i;
+                y[4*i + 1] = 1e-4;
+                y[4*i + 2] = 0.7 - 0.05*i;
+                y[4*i + 3] = 1e5;
+            }
+            for (int i=0; i<ny; ++i)
+                r[i] = 2.0 + i;
+            const double gamma = 1e-2;
+            bool jac_recomputed;
+            chemreac::SolverState<double> state(rd);
+            state.prec_setup(0.0, y.data(), nullptr, false, jac_recomputed, gamma);
+            state.prec_solve_left(0.0, y.data(), nullptr, r.data(), z.data(), gamma, 0.0, nullptr);
+            state.prec_solve_left(0.0, y.data(), nullptr, r.data(), z.data(), gamma, 0.0, nullptr);
+            REQUIRE( state.nprec_solve_ilu == 0 );
+            REQUIRE( state.nprec_factor_lu == 1 );
+            REQUIRE( state.nprec_reuse_lu == 1 );
+
+            // (I - gamma*J)*z == r
+            rd.dense_jac_rmaj(0.0, y.data(), nullptr, J_data.data(), ny);
+            for (int ri=0; ri<ny; ++ri){
+                double lhs = z[ri];
+                for (int ci=0; ci<ny; ++ci)
+                    lhs -= gamma*J_data[ri*ny + ci]*z[ci];
+                REQUIRE( std::abs(lhs - r[ri]) < 1e-10*std::abs(r[ri]) );
+            }
+        }
+    }
+}
+
+TEST_CASE( "solver_state", "[SolverState]" ) {
+    // One (const) instance integrated by concurrent solvers, each with a SolverState
+    const int N = 7, ny = 4*N, nthreads = 4;
+    auto rdp = get_four_species_system(N);
+    const auto &rd = *rdp;
+    REQUIRE_THROWS( chemreac::SolverState<double>(rd, 3) ); // sparse LU requires N == 1
+    std::vector<double> y(ny), r(ny), zref(ny);
+    for (int i=0; i<ny; ++i){
+        y[i] = 0.3 + 0.1*i;
+        r[i] = 2.0 + i;
+    }
+    const double gamma = 1e-2;
+    bool jac_recomputed;
+    chemreac::SolverState<double> ref(rd);
+    ref.prec_setup(0.0, y.data(), nullptr, false, jac_recomputed, gamma);
+    ref.prec_solve_left(0.0, y.data(), nullptr, r.data(), zref.data(), gamma, 0.0, nullptr);
+    REQUIRE( ref.prec_factorization == chemreac::PrecFactorization::AUTO );
+    REQUIRE( ref.njev == 1 );
+
+    std::vector<int> nfail(nthreads, 0);
+    std::vector<std::thread> threads;
+    for (int ti=0; ti<nthreads; ++ti){
+        threads.emplace_back([&, ti](){
+            chemreac::SolverState<double> state(rd);
+            std::vector<double> f(ny), z(ny);
+            bool recomputed;
+            for (int ri=0; ri<5; ++ri){
+                state.rhs(0.0, y.data(), f.data());
+                state.prec_setup(0.0, y.data(), f.data(), ri > 0, recomputed, gamma);
+                state.prec_solve_left(0.0, y.data(), f.data(), r.data(), z.data(), gamma, 0.0, nullptr);
+                nfail[ti] += (z != zref) + (recomputed != (ri == 0));
+            }
+            nfail[ti] += (state.nfev != 5) + (state.njev != 1) + (state.nprec_factor_lu != 1) +
+                (state.nprec_reuse_lu != 4);
+        });
+    }
+    for (auto& thread : threads)
+        thread.join();
+    for (int ti=0; ti<nthreads; ++ti)
+        REQUIRE( nfail[ti] == 0 );
+}
+
+TEST_CASE( "sparse_jac_csc", "[ReactionDiffusion]" ) {
+    auto rdp = get_four_species_system(1);
+    auto &rd = *rdp;
+    // A -> B; B + 2C -> B + D: columns A: (A, B), B: (B, C, D), C: (C, D), D: (D)
+    REQUIRE( rd.get_nnz() == 8 );
+    std::array<double, 4> y {{1.3, 1e-4, 0.7, 1e5}};
+    std::array<double, 4*4> J_data;
+    std::vector<double> data(rd.get_nnz());
+    std::vector<int> colptrs(5), rowvals(rd.get_nnz());
+    rd.dense_jac_cmaj(0.0, y.data(), nullptr, J_data.data(), 4);
+    rd.sparse_jac_csc(0.0, y.data(), nullptr, data.data(), colptrs.data(), rowvals.data());
+    REQUIRE( colptrs[0] == 0 );
+    REQUIRE( colptrs[4] == 8 );
+    int nfound = 0;
+    for (int ci=0; ci<4; ++ci){
+        for (int idx=colptrs[ci]; idx<colptrs[ci+1]; ++idx){
+            REQUIRE( std::abs(data[idx] - J_data[ci*4 + rowvals[idx]]) < 1e-14 );
+            nfound += (J_data[ci*4 + rowvals[idx]] != 0);
+        }
+    }
+    int nnonzero = 0;
+    for (auto v : J_data)
+        nnonzero += (v != 0);
+    REQUIRE( nfound == nnonzero );
+}
+
+TEST_CASE( "network_index", "[ReactionDiffusion]" ) {
+    auto rdp = get_four_species_system(1);
+    auto &rd = *rdp;
+    // A -> B; B + 2C -> B + D (B has zero net stoichiometry in the 2nd reaction)
+    REQUIRE( rd.net_ptr == std::vector<int>({0, 2, 4}) );
+    REQUIRE( rd.net_si == std::vector<int>({0, 1, 2, 3}) );
+    REQUIRE( rd.net_coeff == std::vector<int>({-1, 1, -2, 1}) );
+    // (si, dsi): (A, A), (B, A), (C, B), (C, C), (D, B), (D, C)
+    REQUIRE( rd.jac_nz_si == std::vector<int>({0, 1, 2, 2, 3, 3}) );
+    REQUIRE( rd.jac_nz_dsi == std::vector<int>({0, 0, 1, 2, 1, 2}) );
+    REQUIRE( rd.jac_ptr == std::vector<int>({0, 1, 2, 3, 4, 5, 6}) );
+    REQUIRE( rd.jac_rxn == std::vector<int>({0, 0, 1, 1, 1, 1}) );
+    REQUIRE( rd.jac_order == std::vector<int>({1, 1, 1, 2, 1, 2}) );
+    REQUIRE( rd.jac_net == std::vector<int>({-1, 1, -2, -2, 1, 1}) );
+}
+
+TEST_CASE( "prec_solve_left__sparse_lu", "[ReactionDiffusion]" ) {
+    auto rdp = get_four_species_system(1);
+    auto &rd = *rdp;
+    rd.set_prec_factorization_from_int(3);
+    REQUIRE( rd.get_prec_factorization_as_int() == 3 );
+    const auto order = rd.get_sparse_order();
+    REQUIRE( order.size() == 4 );
+    REQUIRE( std::set<int>(order.begin(), order.end()).size() == 4 );
+    std::array<double, 4> y {{1.3, 1e-4, 0.7, 1e5}};
+    std::array<double, 4> r {{2.0, 3.0, 5.0, 7.0}};
+    std::array<double, 4> z;
+    std::array<double, 4*4> J_data;
+    const double gamma = 0.3;
+    bool jac_recomputed;
+    chemreac::SolverState<double> state(rd);
+    state.prec_setup(0.0, y.data(), nullptr, false, jac_recomputed, gamma);
+    state.prec_solve_left(0.0, y.data(), nullptr, r.data(), z.data(), gamma, 0.0, nullptr);
+    state.prec_solve_left(0.0, y.data(), nullptr, r.data(), z.data(), gamma, 0.0, nullptr);
+    REQUIRE( state.nprec_factor_lu == 1 );
+    REQUIRE( state.nprec_reuse_lu == 1 );
+    rd.dense_jac_rmaj(0.0, y.data(), nullptr, J_data.data(), 4);
+    for (int ri=0; ri<4; ++ri){
+        double lhs = z[ri];
+        for (int ci=0; ci<4; ++ci)
+            lhs -= gamma*J_data[ri*4 + ci]*z[ci];
+        REQUIRE( std::abs(lhs - r[ri]) < 1e-12*std::abs(r[ri]) );
+    }
+}
+
+TEST_CASE( "prec_solve_left__operator_split", "[ReactionDiffusion]" ) {
+    for (bool logy : {false, true}){
+        for (int N : {1, 7, 40}){
+            auto rdp = get_four_species_system(N, 1000.0, logy);
+            auto &rd = *rdp;
+            rd.set_prec_factorization_from_int(4);
+            REQUIRE( rd.get_prec_factorization_as_int() == 4 );
+            const int ny = 4*N;
+            std::vector<double> y(ny), r(ny), z(ny), J_data(ny*ny, 0.0);
+            for (int i=0; i<N; ++i){
+                y[4*i + 0] = 1.3 + 0.1*i;
+                y[4*i + 1] = 1e-4;
+                y[4*i + 2] = 0.7 - 0.01*i;
+                y[4*i + 3] = 1e5;
+            }
+            if (logy)
+                for (auto &yi : y)
+                    yi = std::log(yi);
+            for (int i=0; i<ny; ++i)
+                r[i] = 2.0 + i;
+            const double gamma = 1e-2;
+            bool jac_recomputed;
+            chemreac::SolverState<double> state(rd);
+            state.prec_setup(0.0, y.data(), nullptr, false, jac_recomputed, gamma);
+            state.prec_solve_left(0.0, y.data(), nullptr, r.data(), z.data(), gamma, 0.0, nullptr);
+            state.prec_solve_left(0.0, y.data(), nullptr, r.data(), z.data(), gamma, 0.0, nullptr);
+            REQUIRE( state.nprec_solve_ilu == 0 );
+            REQUIRE( state.nprec_factor_lu == 1 );
+            REQUIRE( state.nprec_reuse_lu == 1 );
+
+            // (I - gamma*J)*z ~= r: exact for N == 1, otherwise the splitting error is
+            // gamma**2*J_reaction*J_transport (large for logy where f/C enters the diagonal)
+            rd.dense_jac_rmaj(0.0, y.data(), nullptr, J_data.data(), ny);
+            double res_split = 0, res_eye = 0, rnorm = 0;
+            for (int ri=0; ri<ny; ++ri){
+                double lhs = z[ri], lhs_eye = r[ri];
+                for (int ci=0; ci<ny; ++ci){
+                    lhs -= gamma*J_data[ri*ny + ci]*z[ci];
+                    lhs_eye -= gamma*J_data[ri*ny + ci]*r[ci];
+                }
+                res_split += (lhs - r[ri])*(lhs - r[ri]);
+                res_eye += (lhs_eye - r[ri])*(lhs_eye - r[ri]);
+                rnorm += r[ri]*r[ri];
+            }
+            if (N == 1)
+                REQUIRE( std::sqrt(res_split/rnorm) < 1e-12 );
+            else
+                REQUIRE( res_split < (logy ? 0.2 : 1e-4)*res_eye );
+        }
+    }
+}
+
+TEST_CASE( "prec_solve_left__multigrid", "[ReactionDiffusion]" ) {
+    // A -> B with diffusion on uniform and geometrically stretched grids
+    for (bool stretched : {false, true}){
+        for (int N : {5, 60, 201}){
+            std::vector<double> x(N+1), D(2*N);
+            for (int i=0; i<=N; ++i)
+                x[i] = stretched ? 1e-3*std::pow(1e3, i/(double)N) : 1.0 + i/(double)N;
+            for (int bi=0; bi<N; ++bi){
+                D[2*bi] = stretched ? 1e-6 : 0.1;
+                D[2*bi + 1] = stretched ? 2e-6 : 0.2;
+            }
+            chemreac::ReactionDiffusion<double> rd(
+                2, {{0}}, {{1}}, {3.0}, N, D, {0, 0}, {0, 0}, x, std::vector<std::vector<int>>(1),
+                0, false, false, false, 3, true, true);
+            rd.set_prec_factorization_from_int(5);
+            REQUIRE( rd.get_prec_factorization_as_int() == 5 );
+            const int ny = 2*N;
+            std::vector<double> y(ny), r(ny), z(ny, 0.0), dz(ny), res(ny), J_data(ny*ny, 0.0);
+            for (int i=0; i<N; ++i){
+                y[2*i] = 1.0 + std::sin(0.3*i);
+                y[2*i + 1] = 0.1;
+            }
+            for (int i=0; i<ny; ++i)
+                r[i] = 1.0 + (i % 7);
+            const double gamma = 1e-2;
+            bool jac_recomputed;
+            chemreac::SolverState<double> state(rd);
+            state.prec_setup(0.0, y.data(), nullptr, false, jac_recomputed, gamma);
+            rd.dense_jac_rmaj(0.0, y.data(), nullptr, J_data.data(), ny);
+            // stationary iteration z += M^-1 (r - (I - gamma*J)*z)
+            double rnorm = 0, resnorm = 0;
+            for (auto ri : r)
+                rnorm += ri*ri;
+            for (int it=0; it<6; ++it){
+                resnorm = 0;
+                for (int ri=0; ri<ny; ++ri){
+                    res[ri] = r[ri] - z[ri];
+                    for (int ci=0; ci<ny; ++ci)
+                        res[ri] += gamma*J_data[ri*ny + ci]*z[ci];
+                    resnorm += res[ri]*res[ri];
+                }
+                state.prec_solve_left(0.0, y.data(), nullptr, res.data(), dz.data(), gamma, 0.0, nullptr);
+                for (int i=0; i<ny; ++i)
+                    z[i] += dz[i];
+                if (N <= 8) // single level: direct block elimination
+                    break;
+            }
+            REQUIRE( state.nprec_factor_lu == 1 );
+            resnorm = 0;
+            for (int ri=0; ri<ny; ++ri){
+                double lhs = z[ri];
+                for (int ci=0; ci<ny; ++ci)
+                    lhs -= gamma*J_data[ri*ny + ci]*z[ci];
+                resnorm += (lhs - r[ri])*(lhs - r[ri]);
+            }
+            REQUIRE( std::sqrt(resnorm/rnorm) < ((N <= 8) ? 1e-12 : 1e-5) );
+        }
+    }
+}
+
+TEST_CASE( "concurrent_evaluation__workspace", "[ReactionDiffusion]" ) {
+    // One instance shared between threads, each using its own Workspace
+    const int N = 7, n = 4, nthreads = 4, nrep = 20;
+    auto rdp = get_four_species_system(N);
+    const auto &rd = *rdp;
+    std::vector<double> y(n*N);
+    for (int i=0; i<n*N; ++i)
+        y[i] = 0.3 + 0.1*i;
+    std::vector<double> fref(n*N), jref(n*N*n*N);
+    rdp->rhs(0, &y[0], &fref[0]);
+    rdp->dense_jac_cmaj(0, &y[0], nullptr, &jref[0], n*N);
+    rdp->zero_counters();
+
+    std::vector<int> nfail(nthreads, 0);
+    std::vector<std::thread> threads;
+    for (int ti=0; ti<nthreads; ++ti){
+        threads.emplace_back([&, ti](){
+            auto ws = rd.make_workspace();
+            std::vector<double> f(n*N), j(n*N*n*N);
+            for (int ri=0; ri<nrep; ++ri){
+                rd.rhs(0, &y[0], &f[0], *ws);
+                std::fill(j.begin(), j.end(), 0.0); // sub/sup diagonals are incremented
+                rd.dense_jac_cmaj(0, &y[0], nullptr, &j[0], n*N, *ws);
+                nfail[ti] += (f != fref) + (j != jref);
+            }
+        });
+    }
+    for (auto& thread : threads)
+        thread.join();
+    for (int ti=0; ti<nthreads; ++ti)
+        REQUIRE( nfail[ti] == 0 );
+    REQUIRE( rd.nfev == nthreads*nrep );
+    REQUIRE( rd.njev == nthreads*nrep );
+}
+
+TEST_CASE( "state_cache", "[ReactionDiffusion]" ) {
+    // The Jacobian reuses linC, rlinC & f(t, y) from the preceding rhs call
+    const int N = 3, n = 4;
+    auto rdp = get_four_species_system(N, 1000.0, true);
+    auto &rd = *rdp;
+    auto ws = rd.make_workspace();
+    std::vector<double> y(n*N), f(n*N), j0(n*N*n*N, 0.0), j1(n*N*n*N, 0.0);
+    for (int i=0; i<n*N; ++i)
+        y[i] = -1.0 + 0.1*i;
+    rd.dense_jac_cmaj(0, &y[0], nullptr, &j0[0], n*N, *ws); // evaluates rhs itself
+    REQUIRE( rd.nfev == 1 );
+    REQUIRE( rd.nstate_reuse == 0 );
+    rd.rhs(0, &y[0], &f[0], *ws);
+    REQUIRE( rd.nstate_reuse == 1 );
+    rd.dense_jac_cmaj(0, &y[0], nullptr, &j1[0], n*N, *ws);
+    REQUIRE( rd.nstate_reuse == 2 );
+    REQUIRE( rd.nfev == 2 );
+    REQUIRE( j0 == j1 );
+
+    y[n*N - 1] += 0.5; // other state: no reuse
+    rd.rhs(0, &y[0], &f[0], *ws);
+    rd.rhs(0.5, &y[0], &f[0], *ws); // other time: no reuse
+    REQUIRE( rd.nstate_reuse == 2 );
+    rd.k[0] *= 2;
+    rd.update_k_eff(); // invalidates
+    std::fill(j1.begin(), j1.end(), 0.0);
+    rd.dense_jac_cmaj(0.5, &y[0], nullptr, &j1[0], n*N, *ws);
+    REQUIRE( rd.nstate_reuse == 2 );
+    rd.zero_counters();
+    REQUIRE( rd.nstate_reuse == 0 );
+}
+
+TEST_CASE( "stencil_idx", "[ReactionDiffusion]" ) {
+    // Neighbour table used by rhs & the Jacobian (reflective boundaries)
+    const int N = 4;
+    auto rdp = get_four_species_system(N);
+    auto &rd = *rdp;
+    REQUIRE( rd.stencil_idx == std::vector<int>({0, 0, 1,  0, 1, 2,  1, 2, 3,  2, 3, 3}) );
+    for (int bi=0; bi<N; ++bi)
+        for (int k=0; k<rd.nstencil; ++k)
+            REQUIRE( rd.stencil_idx[bi*rd.nstencil + k] == rd.xc_bi_map_(rd.stencil_bi_lbound_(bi) + k) );
+    REQUIRE( rd.transport_species == std::vector<int>({0, 1, 2, 3}) );
+}
+
+TEST_CASE( "transport_jac", "[ReactionDiffusion]" ) {
+    // Tabulated diffusion & drift part of the Jacobian vs. finite differences
+    const int N = 5, n = 4, ny = n*N;
+    auto rdp = get_four_species_system(N);
+    auto &rd = *rdp;
+    rd.mobility = {0.3, 0.0, -0.2, 0.1};
+    for (int bi=0; bi<N; ++bi)
+        rd.efield[bi] = 0.5 + 0.1*bi;
+    rd.update_transport_jac();
+    REQUIRE( rd.transport_diag.size() == (unsigned)ny );
+    std::vector<double> y(ny), jac(ny*ny, 0.0), fp(ny), fm(ny);
+    for (int i=0; i<ny; ++i)
+        y[i] = 0.3 + 0.1*i;
+    rd.dense_jac_cmaj(0, &y[0], nullptr, &jac[0], ny);
+    const double h = 1e-6;
+    for (int ci=0; ci<ny; ++ci){
+        std::vector<double> yp(y), ym(y);
+        yp[ci] += h;
+        ym[ci] -= h;
+        rd.rhs(0, &yp[0], &fp[0]);
+        rd.rhs(0, &ym[0], &fm[0]);
+        for (int ri=0; ri<ny; ++ri){
+            const double fd = (fp[ri] - fm[ri])/(2*h);
+            REQUIRE( std::abs(jac[ci*ny + ri] - fd) < 1e-6*(1 + std::abs(fd)) );
+        }
+    }
+}
+
+TEST_CASE( "jtimes_matrix_free", "[ReactionDiffusion]" ) {
+    // Analytic J*v (no assembled matrix) vs. dense Jacobian, and the finite difference mode
+    const int N = 5, n = 4, ny = n*N;
+    for (bool logy : {false, true}){
+        auto rdp = get_four_species_system(N, 1000.0, logy);
+        auto &rd = *rdp;
+        rd.mobility = {0.3, 0.0, -0.2, 0.1};
+        for (int bi=0; bi<N; ++bi)
+            rd.efield[bi] = 0.5 + 0.1*bi;
+        rd.update_transport_jac();
+        std::vector<double> y(ny), v(ny), jac(ny*ny, 0.0), ref(ny, 0.0), out(ny);
+        for (int i=0; i<ny; ++i){
+            y[i] = logy ? std::log(0.3 + 0.1*i) : 0.3 + 0.1*i;
+            v[i] = 1.0 - 0.15*i;
+        }
+        rd.dense_jac_cmaj(0, &y[0], nullptr, &jac[0], ny);
+        for (int ci=0; ci<ny; ++ci)
+            for (int ri=0; ri<ny; ++ri)
+                ref[ri] += jac[ci*ny + ri]*v[ci];
+        REQUIRE( rd.get_jtimes_mode_as_int() == 0 );
+        chemreac::SolverState<double> state(rd);
+        state.jtimes(&v[0], &out[0], 0, &y[0], nullptr);
+        for (int i=0; i<ny; ++i)
+            REQUIRE( std::abs(out[i] - ref[i]) < 1e-12*(1 + std::abs(ref[i])) );
+        REQUIRE( state.njacvec_dot == 1 );
+
+        rd.set_jtimes_mode_from_int(1);
+        rd.jtimes(&v[0], &out[0], 0, &y[0], nullptr);
+        for (int i=0; i<ny; ++i)
+            REQUIRE( std::abs(out[i] - ref[i]) < 1e-5*(1 + std::abs(ref[i])) );
+        REQUIRE_THROWS( rd.set_jtimes_mode_from_int(2) );
+    }
+}
+
+TEST_CASE( "parallel_settings", "[ReactionDiffusion]" ) {
+    // Thread count & thresholds are runtime settings (threads only in OpenMP builds)
+    const int N = 600, n = 4, ny = n*N;
+    auto rdp = get_four_species_system(N);
+    auto &rd = *rdp;
+    std::vector<double> y(ny), f0(ny), f1(ny), j0(ny*n*3, 0.0), j1(ny*n*3, 0.0);
+    for (int i=0; i<ny; ++i)
+        y[i] = 0.3 + 1e-3*i;
+    rd.set_nthreads(1);
+    REQUIRE( rd.get_nthreads() == 1 );
+    rd.rhs(0, &y[0], &f0[0]);
+    rd.compressed_jac_cmaj(0, &y[0], &f0[0], &j0[0], 0);
+    rd.set_nthreads(3);
+    REQUIRE( rd.get_nthreads() == 3 );
+    rd.par_threshold_rhs = rd.par_threshold_jac = 0;
+    rd.rhs(1, &y[0], &f1[0]);
+    rd.compressed_jac_cmaj(1, &y[0], &f1[0], &j1[0], 0);
+    REQUIRE( f0 == f1 );
+    REQUIRE( j0 == j1 );
+    REQUIRE_THROWS( rd.set_nthreads(-1) );
+
+    rd.zero_counters();
+    rd.calibrate_parallel(2);
+    REQUIRE( rd.par_threshold_rhs >= 0 );
+    REQUIRE( rd.par_threshold_jac >= 0 );
+    REQUIRE( rd.nfev == 0 );
+    REQUIRE( rd.njev == 0 );
+    rd.set_nthreads(1);
+    rd.calibrate_parallel(2);
+    REQUIRE( rd.par_threshold_rhs == std::numeric_limits<long>::max() );
+}
+
+TEST_CASE( "simd_kernels", "[ReactionDiffusion]" ) {
+    // Runtime dispatched kernels: transposed tables and reciprocal concentrations (logy)
+    const std::set<std::string> isas {"avx512f", "avx2", "sse2", "generic"};
+    REQUIRE( isas.count(chemreac::get_simd_isa()) == 1 );
+    const int N = 300, n = 4, ny = n*N;
+    auto rdp = get_four_species_system(N);
+    auto rdlp = get_four_species_system(N, 1000.0, true);
+    auto &rd = *rdp;
+    for (int bi=0; bi<N; ++bi){
+        for (int si=0; si<n; ++si)
+            REQUIRE( rd.D_T[si*N + bi] == rd.D[bi*n + si] );
+        for (int li=0; li<rd.nstencil; ++li)
+            REQUIRE( rd.lap_weight_T[li*N + bi] == rd.lap_weight[bi*rd.nstencil + li] );
+    }
+    std::vector<double> y(ny), logy(ny), f(ny), flog(ny);
+    for (int i=0; i<ny; ++i){
+        y[i] = 0.3 + 1e-3*i;
+        logy[i] = std::log(y[i]);
+    }
+    rd.rhs(0, &y[0], &f[0]);
+    rdlp->rhs(0, &logy[0], &flog[0]);
+    for (int i=0; i<ny; ++i)
+        REQUIRE( std::abs(flog[i] - f[i]/y[i]) < 1e-9 );
+}
+
+TEST_CASE( "stepping", "[StepControl]" ) {
+    // weighted_rms: atol per species, strided access (first of two interleaved members)
+    const std::vector<double> y {1, 9, -2, 9}, y1 {3, 9, 1, 9}, v {0.5, 9, 1.5, 9};
+    const double nrm = chemreac::weighted_rms(2, 2, &y[0], &y1[0], &v[0], {0.5, 1.0}, 0.5, 2);
+    REQUIRE( std::abs(nrm - std::sqrt((0.0625 + 0.5625)/2)) < 1e-15 );  // scales: 2 & 2
+    REQUIRE_THROWS_AS( chemreac::check_atol(std::vector<double>{1, 2}, 3), std::invalid_argument );
+
+    const chemreac::StepControl<double> ctrl {3, 0.2, 5.0, 0.9, 0.25};
+    double h = 1;
+    REQUIRE( ctrl.update(1, h, 1/8.0, true, false) );
+    REQUIRE( std::abs(h - 1.8) < 1e-14 );  // 0.9*(1/8)^(-1/3)
+    h = 1;
+    REQUIRE( ctrl.update(1, h, 1/8.0, true, true) );
+    REQUIRE( h == 1 );  // no growth right after a rejection
+    h = 2;
+    REQUIRE( ctrl.update(0.5, h, 1, true, false) );
+    REQUIRE( h == 2 );  // step cut at an output: the proposal is kept
+    h = 1;
+    REQUIRE( !ctrl.update(1, h, 8, true, false) );
+    REQUIRE( std::abs(h - 0.45) < 1e-14 );
+    h = 1;
+    REQUIRE( !ctrl.update(1, h, 0, false, false) );
+    REQUIRE( h == 0.25 );
+    REQUIRE( chemreac::StepControl<double>::h_min(1e3, 0.0) == 16e3*std::numeric_limits<double>::epsilon() );
+    REQUIRE( chemreac::StepControl<double>::h_min(1e3, 1e-9) == 1e-9 );
+
+    // nstencil=5 (reflective) reaches two bins away (n_jac_diags=0: nsidep, i.e. 2)
+    for (int n_jac_diags : {0, 1}){
+        const int N = 8;
+        chemreac::ReactionDiffusion<double> rd(
+            1, {}, {}, {}, N, std::vector<double>(N, 1.0), {0}, {0}, {0, 1, 2, 3, 4, 5, 6, 7, 8},
+            {}, 0, false, false, false, 5, true, true, false, {0, 0}, 1.0, 9.64853399e4,
+            8.854187817e-12, {}, {}, {}, {}, {}, 1000.0, n_jac_diags);
+        REQUIRE( chemreac::stencil_in_band(rd) == (n_jac_diags == 0) );
+    }
+}
+
+TEST_CASE( "BatchRosenbrock", "[BatchRosenbrock]" ) {
+    // A -> B; 2 B -> C (k[0], k[1] per member)
+    const int n = 3, nr = 2, M = 70, nt = 5;
+    chemreac::ReactionDiffusion<double> rd(
+        n, {{0}, {1, 1}}, {{1}, {2}}, {1.0, 1.0}, 1, {0, 0, 0}, {0, 0, 0}, {0, 0, 0}, {0, 1},
+        {{}, {}}, 0, false, false, false, 1, false, false, false, {0, 0});
+    chemreac::BatchRosenbrock<double> batch(rd);
+    batch.block_size = 16;  // several blocks, the last one partially filled
+    std::vector<double> y0(M*n), k(M*nr), tout(nt), yout(M*nt*n), f(n), fref(n), J(n*n), Jref(n*n), q(1), r(nr);
+    std::vector<int> nreached(M);
+    std::vector<long int> nsteps(M), nrejected(M);
+    for (int m=0; m<M; ++m){
+        y0[m*n + 0] = 1.0 + 0.01*m;
+        y0[m*n + 1] = 0.1;
+        y0[m*n + 2] = 0.0;
+        k[m*nr + 0] = 0.5 + 0.1*m;
+        k[m*nr + 1] = 2.0*m;
+    }
+    for (int ti=0; ti<nt; ++ti)
+        tout[ti] = 0.5*ti;
+
+    // rates/Jacobian agree with ReactionDiffusion (block of a single member)
+    rd.k = {k[3*nr + 0], k[3*nr + 1]};
+    rd.update_k_eff();
+    rd.rhs(0, &y0[3*n], &fref[0]);
+    rd.dense_jac_rmaj(0, &y0[3*n], nullptr, &Jref[0], n);
+    batch.rates(1, &k[3*nr], &y0[3*n], &r[0]);
+    batch.dydt(1, &r[0], &f[0]);
+    batch.jac(1, &k[3*nr], &y0[3*n], &J[0], &q[0]);
+    for (int i=0; i<n; ++i)
+        REQUIRE( std::abs(f[i] - fref[i]) < 1e-14 );
+    for (int i=0; i<n*n; ++i)
+        REQUIRE( std::abs(J[i] - Jref[i]) < 1e-14 );
+
+    batch.predefined(M, &y0[0], &k[0], nt, &tout[0], &yout[0], {1e-12}, 1e-8, 0, 0, 0, 5000,
+                     &nreached[0], &nsteps[0], &nrejected[0], 2);
+    for (int m=0; m<M; ++m){
+        REQUIRE( nreached[m] == nt );
+        REQUIRE( nsteps[m] > 0 );
+        for (int ti=0; ti<nt; ++ti){
+            const double A = y0[m*n]*std::exp(-k[m*nr]*tout[ti]);
+            REQUIRE( std::abs(yout[(m*nt + ti)*n] - A) < 1e-6*y0[m*n] );
+            // mass balance: A + B + 2 C
+            const double * const yt = &yout[(m*nt + ti)*n];
+            REQUIRE( std::abs(yt[0] + yt[1] + 2*yt[2] - y0[m*n] - y0[m*n + 1]) < 1e-10 );
+        }
+    }
+}
+
+// A -> B, 2 B -> C with diffusion (N = 12) used by the integrator tests below
+static std::unique_ptr<chemreac::ReactionDiffusion<double>> get_ab_system(bool logy=false){
+    const int n = 3, N = 12;
+    std::vector<double> x(N+1), D(n*N);
+    for (int i=0; i<=N; ++i)
+        x[i] = 1.0 + i/(double)N;
+    for (int bi=0; bi<N; ++bi){
+        D[bi*n + 0] = 0.01;
+        D[bi*n + 1] = 0.02;
+        D[bi*n + 2] = 0.0;
+    }
+    return AnyODE::make_unique<chemreac::ReactionDiffusion<double>>(
+        n, std::vector<std::vector<int>>{{0}, {1, 1}}, std::vector<std::vector<int>>{{1}, {2}},
+        std::vector<double>{2.0, 5.0}, N, D, std::vector<int>{0, 0, 0}, std::vector<double>{0, 0, 0}, x,
+        std::vector<std::vector<int>>(2), 0, logy, false, false, 3, true, true);
+}
+
+// Reference solution: RK4 with a small fixed step (rd: linear y & t)
+static std::vector<double> rk4_reference(chemreac::ReactionDiffusion<double> &rd, const std::vector<double> &y0,
+                                         int nt, const double * const tout, int nsub=4000){
+    const int ny = y0.size();
+    std::vector<double> y(y0), k1(ny), k2(ny), k3(ny), k4(ny), tmp(ny), ref(nt*ny);
+    std::copy(y0.begin(), y0.end(), ref.begin());
+    for (int ti=1; ti<nt; ++ti){
+        const double h = (tout[ti] - tout[ti-1])/nsub;
+        for (int si=0; si<nsub; ++si){
+            rd.rhs(0, y.data(), k1.data());
+            for (int i=0; i<ny; ++i) tmp[i] = y[i] + h/2*k1[i];
+            rd.rhs(0, tmp.data(), k2.data());
+            for (int i=0; i<ny; ++i) tmp[i] = y[i] + h/2*k2[i];
+            rd.rhs(0, tmp.data(), k3.data());
+            for (int i=0; i<ny; ++i) tmp[i] = y[i] + h*k3[i];
+            rd.rhs(0, tmp.data(), k4.data());
+            for (int i=0; i<ny; ++i) y[i] += h/6*(k1[i] + 2*k2[i] + 2*k3[i] + k4[i]);
+        }
+        std::copy(y.begin(), y.end(), ref.begin() + ti*ny);
+    }
+    return ref;
+}
+
+TEST_CASE( "SplitIntegrator", "[SplitIntegrator]" ) {
+    auto rdp = get_ab_system();
+    auto &rd = *rdp;
+    const int n = rd.n, N = rd.N, ny = n*N, nt = 3;
+    const double tout[nt] = {0.0, 0.5, 1.0};
+    std::vector<double> y0(ny);
+    for (int bi=0; bi<N; ++bi){
+        y0[bi*n + 0] = 1.0 + std::cos(3.0*bi/N);
+        y0[bi*n + 1] = 0.1;
+        y0[bi*n + 2] = 0.0;
+    }
+    const auto ref = rk4_reference(rd, y0, nt, tout);
+    for (int order : {1, 2}){
+        double prev_err = 0;
+        for (double rtol : {1e-4, 1e-6}){
+            chemreac::SplitIntegrator<double> split(rd, order);
+            std::vector<double> yout(nt*ny);
+            const int nreached = split.predefined(y0.data(), nt, tout, yout.data(), {1e-10}, rtol,
+                                                  0, 0, 0, 100000);
+            REQUIRE( nreached == nt );
+            REQUIRE( split.nsteps > 0 );
+            REQUIRE( split.nreaction_steps > 0 );
+            REQUIRE( split.ntransport_factor > 0 );
+            double err = 0;
+            for (int i=0; i<nt*ny; ++i)
+                err = std::max(err, std::abs(yout[i] - ref[i])/(1e-10 + std::abs(ref[i])));
+            REQUIRE( err < std::pow(rtol, order/(order + 1.0)) ); // error per step control
+            if (prev_err > 0)
+                REQUIRE( err < prev_err );
+            prev_err = err;
+        }
+    }
+    REQUIRE_THROWS( chemreac::SplitIntegrator<double>(rd, 3) );
+}
+
+TEST_CASE( "rhs_part", "[ReactionDiffusion]" ) {
+    // rhs & compressed_jac_cmaj are the sums of their reaction & transport parts
+    const int N = 5, n = 4, ny = n*N;
+    for (bool logy : {false, true}){
+        auto rdp = get_four_species_system(N, 1000.0, logy);
+        auto &rd = *rdp;
+        rd.mobility = {0.3, 0.0, -0.2, 0.1};
+        for (int bi=0; bi<N; ++bi)
+            rd.efield[bi] = 0.5 + 0.1*bi;
+        rd.update_transport_jac();
+        auto ws = rd.make_workspace();
+        std::vector<double> y(ny), f(ny), fr(ny), ft(ny);
+        for (int i=0; i<ny; ++i)
+            y[i] = 0.3 + 0.1*i;
+        rd.rhs(0, &y[0], &f[0], *ws);
+        rd.rhs_part(0, &y[0], &fr[0], chemreac::RhsPart::REACTION, *ws);
+        rd.rhs_part(0, &y[0], &ft[0], chemreac::RhsPart::TRANSPORT, *ws);
+        for (int i=0; i<ny; ++i)
+            REQUIRE( std::abs(fr[i] + ft[i] - f[i]) < 1e-14*(1 + std::abs(f[i])) );
+        REQUIRE( std::abs(ft[0]) > 0 );
+
+        block_diag_ilu::BlockDiagMatrix<double> jall {nullptr, N, n, 1, 0, n}, jr {nullptr, N, n, 1, 0, n},
+            jt {nullptr, N, n, 1, 0, n}, jt_fy {nullptr, N, n, 1, 0, n};
+        for (auto m : {&jall, &jr, &jt, &jt_fy})
+            m->set_to(0);
+        rd.compressed_jac_part(0, &y[0], nullptr, jr.m_data, 0, chemreac::RhsPart::REACTION, *ws);
+        rd.compressed_jac_part(0, &y[0], nullptr, jt.m_data, 0, chemreac::RhsPart::TRANSPORT, *ws);
+        rd.compressed_jac_part(0, &y[0], &ft[0], jt_fy.m_data, 0, chemreac::RhsPart::TRANSPORT, *ws);
+        rd.compressed_jac_cmaj(0, &y[0], nullptr, jall.m_data, 0, *ws); // must not reuse a part of f
+        auto close = [](double a, double b){ return std::abs(a - b) < 1e-13*(1 + std::abs(b)); };
+        for (int bi=0; bi<N; ++bi){
+            for (int ri=0; ri<n; ++ri){
+                for (int ci=0; ci<n; ++ci){
+                    REQUIRE( close(jr.block(bi, ri, ci) + jt.block(bi, ri, ci), jall.block(bi, ri, ci)) );
+                    REQUIRE( close(jt_fy.block(bi, ri, ci), jt.block(bi, ri, ci)) );
+                    if (ri != ci)
+                        REQUIRE( jt.block(bi, ri, ci) == 0 );
+                }
+                if (bi < N-1){
+                    REQUIRE( jr.sub(0, bi, ri) == 0 );
+                    REQUIRE( jr.sup(0, bi, ri) == 0 );
+                    REQUIRE( close(jt.sub(0, bi, ri), jall.sub(0, bi, ri)) );
+                    REQUIRE( close(jt.sup(0, bi, ri), jall.sup(0, bi, ri)) );
+                }
+            }
+        }
+    }
+}
+
+TEST_CASE( "ImexARK", "[ImexARK]" ) {
+    auto rdp = get_ab_system();
+    auto &rd = *rdp;
+    const int n = rd.n, N = rd.N, ny = n*N, nt = 3;
+    const double tout[nt] = {0.0, 0.5, 1.0};
+    std::vector<double> y0(ny);
+    for (int bi=0; bi<N; ++bi){
+        y0[bi*n + 0] = 1.0 + std::cos(3.0*bi/N);
+        y0[bi*n + 1] = 0.1;
+        y0[bi*n + 2] = 1e-3;
+    }
+    const auto ref = rk4_reference(rd, y0, nt, tout);
+    auto rdp_log = get_ab_system(true);
+    std::vector<double> logy0(ny);
+    for (int i=0; i<ny; ++i)
+        logy0[i] = std::log(y0[i]);
+    for (bool logy : {false, true}){
+        for (bool implicit_transport : {true, false}){
+            for (int order : {3, 4}){
+                double prev_err = 0;
+                for (double rtol : {1e-5, 1e-7}){
+                    chemreac::ImexARK<double> imex(logy ? *rdp_log : rd, order, implicit_transport);
+                    std::vector<double> yout(nt*ny);
+                    const int nreached = imex.predefined(logy ? logy0.data() : y0.data(), nt, tout, yout.data(),
+                                                         {1e-12}, rtol, 0, 0, 0, 100000);
+                    REQUIRE( nreached == nt );
+                    REQUIRE( imex.nsteps > 0 );
+                    REQUIRE( imex.nsolve > 0 );
+                    REQUIRE( imex.linear_implicit == (implicit_transport && !logy) );
+                    double err = 0;
+                    for (int i=0; i<nt*ny; ++i){
+                        const double yi = logy ? std::exp(yout[i]) : yout[i];
+                        err = std::max(err, std::abs(yi - ref[i])/(1e-12 + std::abs(ref[i])));
+                    }
+                    REQUIRE( err < 30*rtol );
+                    if (prev_err > 0)
+                        REQUIRE( err < prev_err );
+                    prev_err = err;
+                }
+            }
+        }
+    }
+    REQUIRE_THROWS( chemreac::ImexARK<double>(rd, 5) );
+}
+
+TEST_CASE( "RKC", "[RKC]" ) {
+    // A -> B with diffusion on a fine grid (rho(J) ~ 4*D/dx**2 = 400)
+    const int n = 2, N = 100, ny = n*N, nt = 3;
+    std::vector<double> x(N+1), D(n*N, 0.01);
+    for (int i=0; i<=N; ++i)
+        x[i] = 1.0 + i/(double)N;
+    auto make_rd = [&](bool logy){
+        return AnyODE::make_unique<chemreac::ReactionDiffusion<double>>(
+            n, std::vector<std::vector<int>>{{0}}, std::vector<std::vector<int>>{{1}}, std::vector<double>{0.5},
+            N, D, std::vector<int>{0, 0}, std::vector<double>{0, 0}, x, std::vector<std::vector<int>>(1),
+            0, logy, false, false, 3, true, true);
+    };
+    auto rdp = make_rd(false), rdp_log = make_rd(true);
+    const double tout[nt] = {0.0, 0.5, 1.0};
+    std::vector<double> y0(ny), logy0(ny);
+    for (int bi=0; bi<N; ++bi){
+        y0[bi*n + 0] = 1.0 + 0.5*std::cos(6.0*bi/N) + ((bi > N/2) ? 0.5 : 0.0);
+        y0[bi*n + 1] = 0.1;
+    }
+    for (int i=0; i<ny; ++i)
+        logy0[i] = std::log(y0[i]);
+    const auto ref = rk4_reference(*rdp, y0, nt, tout);
+    for (bool logy : {false, true}){
+        double prev_err = 0;
+        for (double rtol : {1e-4, 1e-6}){
+            chemreac::RKC<double> rkc(logy ? *rdp_log : *rdp);
+            REQUIRE( rkc.stencil_rho == !logy );
+            std::vector<double> yout(nt*ny);
+            const int nreached = rkc.predefined(logy ? logy0.data() : y0.data(), nt, tout, yout.data(),
+                                                {1e-10}, rtol, 0, 0, 0, 100000);
+            REQUIRE( nreached == nt );
+            REQUIRE( rkc.nrho > 0 );
+            REQUIRE( rkc.max_stages_used > 2 ); // beyond the explicit stability limit
+            if (!logy)
+                REQUIRE( (rkc.rho > 300 && rkc.rho < 1000) );
+            double err = 0;
+            for (int i=0; i<nt*ny; ++i){
+                const double yi = logy ? std::exp(yout[i]) : yout[i];
+                err = std::max(err, std::abs(yi - ref[i])/(1e-10 + std::abs(ref[i])));
+            }
+            REQUIRE( err < 30*rtol );
+            if (prev_err > 0)
+                REQUIRE( err < prev_err );
+            prev_err = err;
+        }
+    }
+}
+
+TEST_CASE( "Rosenbrock", "[Rosenbrock]" ) {
+    auto rdp = get_ab_system();
+    auto &rd = *rdp;
+    const int n = rd.n, N = rd.N, ny = n*N, nt = 3;
+    const double tout[nt] = {0.0, 0.5, 1.0};
+    std::vector<double> y0(ny);
+    for (int bi=0; bi<N; ++bi){
+        y0[bi*n + 0] = 1.0 + std::cos(3.0*bi/N);
+        y0[bi*n + 1] = 0.1;
+        y0[bi*n + 2] = 1e-3;
+    }
+    const auto ref = rk4_reference(rd, y0, nt, tout);
+    auto rdp_log = get_ab_system(true);
+    std::vector<double> logy0(ny);
+    for (int i=0; i<ny; ++i)
+        logy0[i] = std::log(y0[i]);
+    for (bool logy : {false, true}){
+        for (std::string method : {"rodas3", "ros3p"}){
+            const int nstages = (method == "rodas3") ? 4 : 3;
+            double prev_err = 0;
+            for (double rtol : {1e-5, 1e-7}){
+                chemreac::Rosenbrock<double> ros(logy ? *rdp_log : rd, method);
+                REQUIRE( ros.block_tridiag );
+                std::vector<double> yout(nt*ny);
+                const int nreached = ros.predefined(logy ? logy0.data() : y0.data(), nt, tout, yout.data(),
+                                                    {1e-12}, rtol, 0, 0, 0, 100000);
+                REQUIRE( nreached == nt );
+                REQUIRE( ros.nsteps > 0 );
+                REQUIRE( ros.nfactor == ros.nsteps + ros.nrejected );
+                REQUIRE( ros.nsolve == nstages*ros.nfactor );
+                REQUIRE( ros.njev == ros.nsteps ); // the Jacobian is kept on rejection
+                double err = 0;
+                for (int i=0; i<nt*ny; ++i){
+                    const double yi = logy ? std::exp(yout[i]) : yout[i];
+                    err = std::max(err, std::abs(yi - ref[i])/(1e-12 + std::abs(ref[i])));
+                }
+                REQUIRE( err < 30*rtol );
+                if (prev_err > 0)
+                    REQUIRE( err < prev_err );
+                prev_err = err;
+
+                std::vector<double> xadapt, yadapt;
+                const int nsteps = ros.adaptive(logy ? logy0.data() : y0.data(), tout[0], tout[nt-1], xadapt, yadapt,
+                                                {1e-12}, rtol, 0, 0, 0, 100000);
+                REQUIRE( nsteps == ros.nsteps );
+                REQUIRE( xadapt.size() == static_cast<std::size_t>(nsteps + 1) );
+                REQUIRE( yadapt.size() == xadapt.size()*ny );
+                REQUIRE( xadapt.back() == tout[nt-1] );
+                for (int i=0; i<ny; ++i){
+                    const double yi = logy ? std::exp(yadapt[nsteps*ny + i]) : yadapt[nsteps*ny + i];
+                    REQUIRE( std::abs(yi - ref[(nt-1)*ny + i]) < 30*rtol*(1e-12 + std::abs(ref[(nt-1)*ny + i])) );
+                }
+            }
+        }
+    }
+    REQUIRE_THROWS( chemreac::Rosenbrock<double>(rd, "rodas4") );
+
+    // 5-point stencil: banded factorization (n_jac_diags == 2)
+    std::vector<double> x(N+1), D(ny);
+    for (int i=0; i<=N; ++i)
+        x[i] = 1.0 + i/(double)N;
+    for (int bi=0; bi<N; ++bi){
+        D[bi*n + 0] = 0.01;
+        D[bi*n + 1] = 0.02;
+        D[bi*n + 2] = 0.0;
+    }
+    chemreac::ReactionDiffusion<double> rd5(
+        n, std::vector<std::vector<int>>{{0}, {1, 1}}, std::vector<std::vector<int>>{{1}, {2}},
+        std::vector<double>{2.0, 5.0}, N, D, std::vector<int>{0, 0, 0}, std::vector<double>{0, 0, 0}, x,
+        std::vector<std::vector<int>>(2), 0, false, false, false, 5, true, true);
+    const auto ref5 = rk4_reference(rd5, y0, nt, tout);
+    chemreac::Rosenbrock<double> ros5(rd5, "ros3p");
+    REQUIRE( !ros5.block_tridiag );
+    std::vector<double> yout5(nt*ny);
+    REQUIRE( ros5.predefined(y0.data(), nt, tout, yout5.data(), {1e-12}, 1e-7, 0, 0, 0, 100000) == nt );
+    for (int i=0; i<nt*ny; ++i)
+        REQUIRE( std::abs(yout5[i] - ref5[i]) < 3e-6*(1e-12 + std::abs(ref5[i])) );
+}
+
+TEST_CASE( "LinearPropagator_N1", "[LinearPropagator]" ) {
+    // A -> B -> C -> D (cf. examples/decay.py), analytic solution (Bateman)
+    const int n = 4, nt = 5;
+    const std::vector<double> k {3.40715, 4.0, 0.7};
+    chemreac::ReactionDiffusion<double> rd(
+        n, {{0}, {1}, {2}}, {{1}, {2}, {3}}, k, 1, {0, 0, 0, 0}, {0, 0, 0, 0},
+        {0, 0, 0, 0}, {0, 1}, std::vector<std::vector<int>>(3), 0, false, false, false, 1);
+    REQUIRE( rd.is_linear() );
+    const double tout[nt] = {0.0, 1e-6, 0.5, 2.0, 30.0};
+    const std::vector<double> y0 {1.0, 0.2, 0.0, 0.0};
+    chemreac::LinearPropagator<double> prop(rd);
+    REQUIRE( prop.method == "bateman" );
+    REQUIRE( !prop.with_source );
+    std::vector<double> yout(nt*n);
+    REQUIRE( prop.predefined(y0.data(), nt, tout, yout.data(), {1e-12}, 1e-12, 500) == nt );
+    REQUIRE( prop.nbateman == 3 );
+    REQUIRE( prop.nexpm == 1 ); // t = 1e-6
+    for (int ti=0; ti<nt; ++ti){
+        const double t = tout[ti];
+        const double e0 = std::exp(-k[0]*t), e1 = std::exp(-k[1]*t), e2 = std::exp(-k[2]*t);
+        const double A = y0[0]*e0;
+        const double B = y0[1]*e1 + y0[0]*k[0]/(k[1] - k[0])*(e0 - e1);
+        const double C = y0[1]*k[1]/(k[2] - k[1])*(e1 - e2) + k[1]*k[0]*y0[0]/(k[1] - k[0])*(
+            (e0 - e2)/(k[2] - k[0]) - (e1 - e2)/(k[2] - k[1]));
+        const double ref[n] = {A, B, C, y0[0] + y0[1] - A - B - C};
+        for (int si=0; si<n; ++si)
+            REQUIRE( std::abs(yout[ti*n + si] - ref[si]) < 1e-13 + 1e-11*std::abs(ref[si]) );
+    }
+
+    // Equal rates (Poisson) & a source term from a field: Pade
+    const int m = 5;
+    chemreac::ReactionDiffusion<double> rd_eq(
+        m, {{0}, {1}, {2}, {3}}, {{1}, {2}, {3}, {4}}, {1, 1, 1, 1}, 1, std::vector<double>(m, 0),
+        std::vector<int>(m, 0), std::vector<double>(m, 0), {0, 1}, std::vector<std::vector<int>>(4),
+        0, false, false, false, 1, false, false, false, {0, 0}, 1.0, 9.64853399e4, 8.854187817e-12,
+        {{0.3, 0, 0, 0, 0}}, {-1}, {{2.0}});
+    chemreac::LinearPropagator<double> prop_eq(rd_eq);
+    REQUIRE( prop_eq.method == "pade" );
+    REQUIRE( prop_eq.with_source );
+    std::vector<double> z0(m, 0), zout(nt*m);
+    z0[0] = 1;
+    REQUIRE( prop_eq.predefined(z0.data(), nt, tout, zout.data(), {1e-12}, 1e-12, 500) == nt );
+    for (int ti=0; ti<nt; ++ti){
+        const double t = tout[ti];
+        double fact = 1, src = 0.6*(1 - std::exp(-t)); // source 0.3*2.0 into species 0 (A' = 0.6 - A)
+        for (int si=0; si<m-1; ++si){
+            // species si: Poisson term of the initial unit amount and the integrated source
+            double ref = std::pow(t, si)/fact*std::exp(-t);
+            double gamma_inc = 1; // regularized lower incomplete gamma P(si+1, t)
+            double term = 1, sum = 1;
+            for (int j=1; j<=si; ++j){
+                term *= t/j;
+                sum += term;
+            }
+            gamma_inc = 1 - std::exp(-t)*sum;
+            ref += 0.6*gamma_inc;
+            if (si == 0)
+                REQUIRE( std::abs(0.6*gamma_inc - src) < 1e-14 );
+            REQUIRE( std::abs(zout[ti*m + si] - ref) < 1e-12 );
+            fact *= si + 1;
+        }
+    }
+    REQUIRE_THROWS( chemreac::LinearPropagator<double>(*get_ab_system()) ); // 2 B -> C
+}
+
+TEST_CASE( "LinearPropagator_krylov", "[LinearPropagator]" ) {
+    // A -> B with diffusion, optionally a field producing A (source term)
+    const int n = 2, N = 12, ny = n*N, nt = 4;
+    std::vector<double> x(N+1), D(n*N);
+    for (int i=0; i<=N; ++i)
+        x[i] = 1.0 + i/(double)N;
+    for (int bi=0; bi<N; ++bi){
+        D[bi*n + 0] = 0.01;
+        D[bi*n + 1] = 0.02;
+    }
+    std::vector<double> y0(ny);
+    for (int bi=0; bi<N; ++bi){
+        y0[bi*n + 0] = 1.0 + std::cos(3.0*bi/N);
+        y0[bi*n + 1] = 0.1;
+    }
+    const double tout[nt] = {0.0, 0.25, 0.5, 1.0};
+    for (bool with_field : {false, true}){
+        for (int nstencil : {3, 5}){
+            for (int n_jac_diags : {0, 1}){
+                if (nstencil == 3 && n_jac_diags == 1)
+                    continue; // same as the default (nsidep)
+                chemreac::ReactionDiffusion<double> rd(
+                    n, {{0}}, {{1}}, {2.0}, N, D, {0, 0}, {0, 0}, x, std::vector<std::vector<int>>(1),
+                    0, false, false, false, nstencil, true, true, false, {0, 0}, 1.0, 9.64853399e4,
+                    8.854187817e-12, with_field ? std::vector<std::vector<double>>{{0.7, 0}} :
+                    std::vector<std::vector<double>>{}, with_field ? std::vector<int>{-1} : std::vector<int>{},
+                    with_field ? std::vector<std::vector<double>>{std::vector<double>(N, 1.5)} :
+                    std::vector<std::vector<double>>{}, {}, {}, 1000.0, n_jac_diags);
+                const auto ref = rk4_reference(rd, y0, nt, tout);
+                chemreac::LinearPropagator<double> prop(rd);
+                REQUIRE( prop.method == "krylov" );
+                REQUIRE( prop.with_source == with_field );
+                REQUIRE( prop.jac_exact == (nstencil == 3 || n_jac_diags == 0) );
+                std::vector<double> yout(nt*ny);
+                REQUIRE( prop.predefined(y0.data(), nt, tout, yout.data(), {1e-12}, 1e-10, 500) == nt );
+                REQUIRE( prop.nmatvec > 0 );
+                for (int i=0; i<nt*ny; ++i)
+                    REQUIRE( std::abs(yout[i] - ref[i]) < 1e-8*(1e-12 + std::abs(ref[i])) );
+            }
+        }
     }
 }
@@ -16,7 +16,7 @@ using std::vector;
 //  0    k1*C*C     2*C*B*k1   0
 
 
-std::unique_ptr<ReactionDiffusion<double>> get_four_species_system(int N){
+std::unique_ptr<ReactionDiffusion<double>> get_four_species_system(int N, double ilu_limit, bool logy){
     int n = 4;
     int nr = 2;
     vector<vector<int> > stoich_actv {{0}, {1, 2, 2}};
@@ -32,7 +32,7 @@ std::unique_ptr<ReactionDiffusion<double>> get_four_species_system(int N){
     vector<vector<double> > fields;
     vector<int> v;
     int geom = 0;
-    bool logy = false, logt = false, logx = false;
+    bool logt = false, logx = false;
     int nstencil = (N == 1) ? 1 : 3;
     for (int bi=0; bi<N; ++bi){
         D[bi*n + 0] = .1;
@@ -46,5 +46,7 @@ std::unique_ptr<ReactionDiffusion<double>> get_four_species_system(int N){
 	x.push_back(1.0 + (double)i*1.0/N);
     return AnyODE::make_unique<ReactionDiffusion<double>>(
         n, stoich_actv, stoich_prod, k, N, D, z_chg,
-        mobility, x, stoich_inact, geom, logy, logt, logx, nstencil, true, true);
+        mobility, x, stoich_inact, geom, logy, logt, logx, nstencil, true, true,
+        false, std::pair<double, double>(0, 0), 1.0, 9.64853399e4, 8.854187817e-12,
+        g_values, g_value_parents, fields, vector<int>(), vector<vector<double> >(), ilu_limit);
 }
@@ -1,3 +1,3 @@
 #include <memory>
 #include "chemreac.hpp"
-std::unique_ptr<chemreac::ReactionDiffusion<double>> get_four_species_system(int N);
+std::unique_ptr<chemreac::ReactionDiffusion<double>> get_four_species_system(int N, double ilu_limit=1000.0, bool logy=false);